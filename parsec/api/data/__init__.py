@@ -48,6 +48,7 @@ from parsec.api.data.manifest import (
     UserManifest,
     WorkspaceManifest,
     FolderManifest,
+    FolderManifestDelta,
     FileManifest,
 )
 
@@ -100,5 +101,6 @@ __all__ = (
     "UserManifest",
     "WorkspaceManifest",
     "FolderManifest",
+    "FolderManifestDelta",
     "FileManifest",
 )
@@ -1,18 +1,26 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import attr
-from typing import Optional, Tuple, FrozenDict
+from typing import Optional, Tuple, FrozenDict, Union
 from pendulum import Pendulum, now as pendulum_now
 
 from parsec.types import UUID4
-from parsec.crypto import SecretKey, HashDigest
-from parsec.serde import fields, validate, post_load, OneOfSchema
-from parsec.api.protocol import RealmRole, RealmRoleField
+from parsec.crypto import CryptoError, SecretKey, SigningKey, HashDigest
+from parsec.serde import (
+    fields,
+    validate,
+    post_load,
+    packb,
+    OneOfSchema,
+    EnvelopeZipMsgpackSerializer,
+)
+from parsec.api.protocol import RealmRole, RealmRoleField, MAX_BLOCK_SIZE
 from parsec.api.data.base import (
     BaseData,
     BaseSchema,
     BaseAPISignedData,
     BaseSignedDataSchema,
+    DataError,
     DataValidationError,
 )
 from parsec.api.data.entry import EntryID, EntryIDField, EntryName, EntryNameField
@@ -53,6 +61,10 @@ class WorkspaceEntry(BaseData):
         encrypted_on = fields.DateTime(required=True)
         role_cached_on = fields.DateTime(required=True)
         role = RealmRoleField(required=True, allow_none=True)
+        # Block size of the files created in the workspace, default one if missing
+        blocksize = fields.Integer(
+            allow_none=True, missing=None, validate=validate.Range(min=8, max=MAX_BLOCK_SIZE)
+        )
 
         @post_load
         def make_obj(self, data):
@@ -65,9 +77,10 @@ class WorkspaceEntry(BaseData):
     encrypted_on: Pendulum
     role_cached_on: Pendulum
     role: Optional[RealmRole]
+    blocksize: Optional[int] = None
 
     @classmethod
-    def new(cls, name):
+    def new(cls, name, blocksize: Optional[int] = None):
         now = pendulum_now()
         return WorkspaceEntry(
             name=name,
@@ -77,6 +90,7 @@ class WorkspaceEntry(BaseData):
             encrypted_on=now,
             role_cached_on=now,
             role=RealmRole.OWNER,
+            blocksize=blocksize,
         )
 
     def is_revoked(self) -> bool:
@@ -96,7 +110,48 @@ class VerifyParentMixin:
         return data
 
 
+class ManifestSerializer(EnvelopeZipMsgpackSerializer):
+    # Manifests are small and their keys are always the same, hence a preset
+    # dictionary with those keys noticeably improve the compression ratio.
+    # /!\ Never modify this dictionary (see `EnvelopeZipMsgpackSerializer`)
+    ZDICT = b"".join(
+        packb(word)
+        for word in (
+            "user_manifest",
+            "workspace_manifest",
+            "folder_manifest_delta",
+            "folder_manifest",
+            "file_manifest",
+            "last_processed_message",
+            "workspaces",
+            "encryption_revision",
+            "encrypted_on",
+            "role_cached_on",
+            "role",
+            "name",
+            "children_updates",
+            "children",
+            "blocksize",
+            "blocks",
+            "offset",
+            "digest",
+            "size",
+            "key",
+            "created",
+            "updated",
+            "parent",
+            "version",
+            "id",
+            "timestamp",
+            "author",
+            "type",
+        )
+    )
+
+
 class Manifest(BaseAPISignedData):
+    SERIALIZER_CLS = ManifestSerializer
+
     class SCHEMA_CLS(OneOfSchema, BaseSignedDataSchema):
         type_field = "type"
         type_field_remove = False
@@ -108,11 +163,29 @@ class Manifest(BaseAPISignedData):
                 "folder_manifest": FolderManifest.SCHEMA_CLS,
                 "workspace_manifest": WorkspaceManifest.SCHEMA_CLS,
                 "user_manifest": UserManifest.SCHEMA_CLS,
+                "folder_manifest_delta": FolderManifestDelta.SCHEMA_CLS,
             }
 
         def get_obj_type(self, obj):
             return obj["type"]
 
+    def dump_sign_and_encrypt(
+        self, author_signkey: SigningKey, key: SecretKey, compact: bool = False
+    ) -> bytes:
+        """
+        Compact serialization (see `ManifestSerializer`) can only be read by
+        the peers supporting it (see the `compact_manifests` organization config).
+
+        Raises:
+            DataError
+        """
+        try:
+            signed = author_signkey.sign(self.SERIALIZER.dumps(self, envelope=compact))
+            return key.encrypt(signed)
+
+        except CryptoError as exc:
+            raise DataError(str(exc)) from exc
+
     @classmethod
     def verify_and_load(
         cls,
@@ -217,6 +290,105 @@ class WorkspaceManifest(Manifest):
     children: FrozenDict[EntryName, EntryID]
 
 
+class FolderManifestDelta(Manifest):
+    """
+    Changes in the children of a folder (or workspace) manifest compared
+    to the previous version of this manifest.
+
+    A delta is never provided as is to the rest of the code base, it has
+    to be applied on the previous version to obtain the actual manifest.
+    """
+
+    class SCHEMA_CLS(BaseSignedDataSchema):
+        type = fields.CheckedConstant("folder_manifest_delta", required=True)
+        id = EntryIDField(required=True)
+        # None for workspace manifest
+        parent = EntryIDField(required=True, allow_none=True)
+        version = fields.Integer(required=True, validate=validate.Range(min=2))
+        updated = fields.DateTime(required=True)
+        # Removed children are associated with None
+        children_updates = fields.FrozenMap(
+            EntryNameField(validate=validate.Length(min=1, max=256)),
+            EntryIDField(required=True, allow_none=True),
+            required=True,
+        )
+
+        @post_load
+        def make_obj(self, data):
+            data.pop("type")
+            return FolderManifestDelta(**data)
+
+    id: EntryID
+    parent: Optional[EntryID]
+    version: int
+    updated: Pendulum
+    children_updates: FrozenDict[EntryName, Optional[EntryID]]
+
+    @classmethod
+    def from_manifests(
+        cls,
+        base: Union[FolderManifest, WorkspaceManifest],
+        manifest: Union[FolderManifest, WorkspaceManifest],
+    ) -> "FolderManifestDelta":
+        assert base.id == manifest.id
+        assert base.version + 1 == manifest.version
+        children_updates = {
+            name: entry_id
+            for name, entry_id in manifest.children.items()
+            if base.children.get(name) != entry_id
+        }
+        for name in base.children.keys() - manifest.children.keys():
+            children_updates[name] = None
+        return cls(
+            author=manifest.author,
+            timestamp=manifest.timestamp,
+            id=manifest.id,
+            parent=getattr(manifest, "parent", None),
+            version=manifest.version,
+            updated=manifest.updated,
+            children_updates=FrozenDict(children_updates),
+        )
+
+    def apply(
+        self, base: Union[FolderManifest, WorkspaceManifest]
+    ) -> Union[FolderManifest, WorkspaceManifest]:
+        """
+        Raises:
+            DataValidationError
+        """
+        if base.id != self.id:
+            raise DataValidationError(f"Invalid entry ID: expected `{self.id}`, got `{base.id}`")
+        if base.version + 1 != self.version:
+            raise DataValidationError(
+                f"Invalid base version: expected `{self.version - 1}`, got `{base.version}`"
+            )
+        if isinstance(base, FolderManifest):
+            if self.parent is None:
+                raise DataValidationError("Missing parent ID for folder manifest")
+            kwargs = {"parent": self.parent}
+        elif isinstance(base, WorkspaceManifest):
+            if self.parent is not None:
+                raise DataValidationError("Unexpected parent ID for workspace manifest")
+            kwargs = {}
+        else:
+            raise DataValidationError(f"Cannot apply delta on `{type(base).__name__}`")
+
+        children = dict(base.children)
+        for name, entry_id in self.children_updates.items():
+            if entry_id is None:
+                children.pop(name, None)
+            else:
+                children[name] = entry_id
+        return base.evolve(
+            author=self.author,
+            timestamp=self.timestamp,
+            version=self.version,
+            updated=self.updated,
+            children=FrozenDict(children),
+            **kwargs,
+        )
+
+
 class UserManifest(Manifest):
     class SCHEMA_CLS(BaseSignedDataSchema):
         type = fields.CheckedConstant("user_manifest", required=True)
@@ -1,9 +1,11 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 from pendulum import Pendulum
+from typing import Optional
 
 from parsec.crypto import SecretKey
-from parsec.serde import fields, post_load, OneOfSchema
+from parsec.serde import fields, validate, post_load, OneOfSchema
+from parsec.api.protocol import MAX_BLOCK_SIZE
 from parsec.api.data.entry import EntryID, EntryIDField
 from parsec.api.data.base import BaseAPISignedData, BaseSignedDataSchema
 
@@ -34,6 +36,9 @@ class SharingGrantedMessageContent(MessageContent):
         encryption_revision = fields.Integer(required=True)
         encrypted_on = fields.DateTime(required=True)
         key = fields.SecretKey(required=True)
+        blocksize = fields.Integer(
+            allow_none=True, missing=None, validate=validate.Range(min=8, max=MAX_BLOCK_SIZE)
+        )
         # Don't include role given the only reliable way to get this information
         # is to fetch the realm role certificate from the backend.
         # Besides, we will also need the message sender's realm role certificate
@@ -49,6 +54,7 @@ class SharingGrantedMessageContent(MessageContent):
     encryption_revision: int
     encrypted_on: Pendulum
     key: SecretKey
+    blocksize: Optional[int] = None
 
 
 class SharingReencryptedMessageContent(SharingGrantedMessageContent):
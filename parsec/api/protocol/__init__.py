@@ -44,11 +44,19 @@ from parsec.api.protocol.organization import (
     apiv1_organization_stats_serializer,
     apiv1_organization_status_serializer,
     apiv1_organization_update_serializer,
+    organization_config_serializer,
+)
+from parsec.api.protocol.events import (
+    EVENTS_LISTEN_BATCH_MAX_SIZE,
+    events_subscribe_serializer,
+    events_listen_serializer,
+    events_listen_batch_serializer,
 )
-from parsec.api.protocol.events import events_subscribe_serializer, events_listen_serializer
 from parsec.api.protocol.ping import ping_serializer
 from parsec.api.protocol.user import (
+    USER_GET_BATCH_MAX_SIZE,
     user_get_serializer,
+    user_get_batch_serializer,
     apiv1_user_find_serializer,
     apiv1_user_invite_serializer,
     apiv1_user_get_invitation_creator_serializer,
@@ -99,12 +107,22 @@ from parsec.api.protocol.realm import (
     realm_start_reencryption_maintenance_serializer,
     realm_finish_reencryption_maintenance_serializer,
 )
-from parsec.api.protocol.block import block_create_serializer, block_read_serializer
+from parsec.api.protocol.block import (
+    BLOCK_CHUNK_SIZE,
+    BLOCK_CHUNKED_TRANSFER_THRESHOLD,
+    MAX_BLOCK_SIZE,
+    block_create_serializer,
+    block_read_serializer,
+    block_create_chunk_serializer,
+    block_read_chunk_serializer,
+)
 from parsec.api.protocol.vlob import (
+    VLOB_GROUP_CHECK_MAX_SIZE,
     vlob_create_serializer,
     vlob_read_serializer,
     vlob_update_serializer,
     vlob_poll_changes_serializer,
+    vlob_group_check_serializer,
     vlob_list_versions_serializer,
     vlob_maintenance_get_reencryption_batch_serializer,
     vlob_maintenance_save_reencryption_batch_serializer,
@@ -115,6 +133,7 @@ from parsec.api.protocol.cmds import (
     APIV1_AUTHENTICATED_CMDS,
     APIV1_ANONYMOUS_CMDS,
     APIV1_ADMINISTRATION_CMDS,
+    UNCOMPRESSED_CMDS,
 )
 
 
@@ -159,13 +178,18 @@ __all__ = (
     "apiv1_organization_stats_serializer",
     "apiv1_organization_status_serializer",
     "apiv1_organization_update_serializer",
+    "organization_config_serializer",
     # Events
     "events_subscribe_serializer",
     "events_listen_serializer",
+    "EVENTS_LISTEN_BATCH_MAX_SIZE",
+    "events_listen_batch_serializer",
     # Ping
     "ping_serializer",
     # User
+    "USER_GET_BATCH_MAX_SIZE",
     "user_get_serializer",
+    "user_get_batch_serializer",
     "apiv1_user_find_serializer",
     "apiv1_user_invite_serializer",
     "apiv1_user_get_invitation_creator_serializer",
@@ -215,20 +239,28 @@ __all__ = (
     "realm_start_reencryption_maintenance_serializer",
     "realm_finish_reencryption_maintenance_serializer",
     # Vlob
+    "VLOB_GROUP_CHECK_MAX_SIZE",
     "vlob_create_serializer",
     "vlob_read_serializer",
     "vlob_update_serializer",
     "vlob_poll_changes_serializer",
+    "vlob_group_check_serializer",
     "vlob_list_versions_serializer",
     "vlob_maintenance_get_reencryption_batch_serializer",
     "vlob_maintenance_save_reencryption_batch_serializer",
     # Block
+    "BLOCK_CHUNK_SIZE",
+    "BLOCK_CHUNKED_TRANSFER_THRESHOLD",
+    "MAX_BLOCK_SIZE",
     "block_create_serializer",
     "block_read_serializer",
+    "block_create_chunk_serializer",
+    "block_read_chunk_serializer",
     # List of cmds
     "AUTHENTICATED_CMDS",
     "INVITED_CMDS",
     "APIV1_AUTHENTICATED_CMDS",
     "APIV1_ANONYMOUS_CMDS",
     "APIV1_ADMINISTRATION_CMDS",
+    "UNCOMPRESSED_CMDS",
 )
@@ -11,6 +11,7 @@ from parsec.serde import (
     packb as _packb,
     unpackb as _unpackb,
 )
+from parsec.serde.fast_path import FALLBACK, compile_loader, compile_dumper
 
 
 __all__ = ("ProtocolError", "BaseReqSchema", "BaseRepSchema", "CmdSerializer")
@@ -73,7 +74,7 @@ class CmdSerializer:
             f"rep_schema={self._rep_serializer})"
         )
 
-    def __init__(self, req_schema_cls, rep_schema_cls):
+    def __init__(self, req_schema_cls, rep_schema_cls, fast_path=False):
         self.rep_noerror_schema = rep_schema_cls()
 
         class RepWithErrorSchema(OneOfSchema):
@@ -101,3 +102,38 @@ class CmdSerializer:
         self.req_dumps = self._req_serializer.dumps
         self.rep_loads = self._rep_serializer.loads
         self.rep_dumps = self._rep_serializer.dumps
+
+        # Fast path for the backend side, which skips the schema machinery
+        # when the data can be passed through as-is (falling back on the
+        # schema otherwise, e.g. to build the errors of an invalid message)
+        if fast_path:
+            self._fast_req_load = compile_loader(
+                self._req_serializer.schema, ignored_processors=("_drop_cmd_field",)
+            )
+            self._fast_rep_ok_dump = compile_dumper(self.rep_noerror_schema)
+            self._fast_rep_error_dump = compile_dumper(ErrorRepSchema())
+            if self._fast_req_load:
+                self.req_load = self._req_load_with_fast_path
+            if self._fast_rep_ok_dump:
+                self.rep_dump = self._rep_dump_with_fast_path
+
+    def _req_load_with_fast_path(self, data: dict) -> dict:
+        loaded = self._fast_req_load(data)
+        if loaded is FALLBACK:
+            return self._req_serializer.load(data)
+        if self._req_serializer.schema.drop_cmd_field:
+            loaded.pop("cmd", None)
+        return loaded
+
+    def _rep_dump_with_fast_path(self, data: dict) -> dict:
+        status = data.get("status") if type(data) is dict else None
+        if status == "ok":
+            dumped = self._fast_rep_ok_dump(data)
+        elif type(status) is str and status:
+            dumped = self._fast_rep_error_dump(data)
+        else:
+            dumped = FALLBACK
+        if dumped is FALLBACK:
+            return self._rep_serializer.dump(data)
+        dumped["status"] = status
+        return dumped
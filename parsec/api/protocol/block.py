@@ -1,10 +1,27 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from parsec.serde import fields
+from parsec.serde import fields, validate
+from parsec.serde.packing import MAX_BIN_LEN
 from parsec.api.protocol.base import BaseReqSchema, BaseRepSchema, CmdSerializer
 
 
-__all__ = ("block_create_serializer", "block_read_serializer")
+__all__ = (
+    "BLOCK_CHUNK_SIZE",
+    "BLOCK_CHUNKED_TRANSFER_THRESHOLD",
+    "MAX_BLOCK_SIZE",
+    "block_create_serializer",
+    "block_read_serializer",
+    "block_create_chunk_serializer",
+    "block_read_chunk_serializer",
+)
+
+
+# Blocks bigger than this cannot fit in a single message given the msgpack
+# `MAX_BIN_LEN` limit (minus some room for the encryption overhead), hence
+# they must be transferred in chunks with `block_create_chunk`/`block_read_chunk`
+BLOCK_CHUNKED_TRANSFER_THRESHOLD = MAX_BIN_LEN - 1024
+BLOCK_CHUNK_SIZE = 512 * 1024  # 512 KB
+MAX_BLOCK_SIZE = 64 * 1024 * 1024  # 64 MB
 
 
 class BlockCreateReqSchema(BaseReqSchema):
@@ -17,7 +34,7 @@ class BlockCreateRepSchema(BaseRepSchema):
     pass
 
 
-block_create_serializer = CmdSerializer(BlockCreateReqSchema, BlockCreateRepSchema)
+block_create_serializer = CmdSerializer(BlockCreateReqSchema, BlockCreateRepSchema, fast_path=True)
 
 
 class BlockReadReqSchema(BaseReqSchema):
@@ -28,4 +45,41 @@ class BlockReadRepSchema(BaseRepSchema):
     block = fields.Bytes(required=True)
 
 
-block_read_serializer = CmdSerializer(BlockReadReqSchema, BlockReadRepSchema)
+block_read_serializer = CmdSerializer(BlockReadReqSchema, BlockReadRepSchema, fast_path=True)
+
+
+class BlockCreateChunkReqSchema(BaseReqSchema):
+    block_id = fields.UUID(required=True)
+    realm_id = fields.UUID(required=True)
+    # Digest and size of the whole block, so a resumed upload can be
+    # detected as being for the same data
+    digest = fields.HashDigest(required=True)
+    size = fields.Integer(required=True, validate=validate.Range(min=1, max=MAX_BLOCK_SIZE))
+    offset = fields.Integer(required=True, validate=validate.Range(min=0))
+    chunk = fields.Bytes(required=True, validate=validate.Length(min=1, max=BLOCK_CHUNK_SIZE))
+
+
+class BlockCreateChunkRepSchema(BaseRepSchema):
+    # Number of bytes received so far, i.e. where the next chunk should start
+    # (also provided with the `bad_offset` status to resume an upload)
+    offset = fields.Integer(required=True, validate=validate.Range(min=0))
+
+
+block_create_chunk_serializer = CmdSerializer(
+    BlockCreateChunkReqSchema, BlockCreateChunkRepSchema, fast_path=True
+)
+
+
+class BlockReadChunkReqSchema(BaseReqSchema):
+    block_id = fields.UUID(required=True)
+    offset = fields.Integer(required=True, validate=validate.Range(min=0))
+
+
+class BlockReadChunkRepSchema(BaseRepSchema):
+    chunk = fields.Bytes(required=True)
+    size = fields.Integer(required=True, validate=validate.Range(min=0))
+
+
+block_read_chunk_serializer = CmdSerializer(
+    BlockReadChunkReqSchema, BlockReadChunkRepSchema, fast_path=True
+)
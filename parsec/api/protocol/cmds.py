@@ -4,11 +4,15 @@
 AUTHENTICATED_CMDS = {
     "events_subscribe",
     "events_listen",
+    "events_listen_batch",
     "ping",  # TODO: remove ping and ping event (only have them in tests)
+    # Organization
+    "organization_config",
     # Message
     "message_get",
     # User&Device
     "user_get",
+    "user_get_batch",
     "user_create",
     "user_revoke",
     "device_create",
@@ -27,8 +31,11 @@ AUTHENTICATED_CMDS = {
     # Block
     "block_create",
     "block_read",
+    "block_create_chunk",
+    "block_read_chunk",
     # Vlob
     "vlob_poll_changes",
+    "vlob_group_check",
     "vlob_create",
     "vlob_read",
     "vlob_update",
@@ -58,11 +65,15 @@ INVITED_CMDS = {
 APIV1_AUTHENTICATED_CMDS = {
     "events_subscribe",
     "events_listen",
+    "events_listen_batch",
     "ping",
+    # Organization
+    "organization_config",
     # Message
     "message_get",
     # User&Device
     "user_get",
+    "user_get_batch",
     "user_find",
     "user_invite",
     "user_cancel_invitation",
@@ -76,8 +87,11 @@ APIV1_AUTHENTICATED_CMDS = {
     # Block
     "block_create",
     "block_read",
+    "block_create_chunk",
+    "block_read_chunk",
     # Vlob
     "vlob_poll_changes",
+    "vlob_group_check",
     "vlob_create",
     "vlob_read",
     "vlob_update",
@@ -109,3 +123,7 @@ APIV1_ADMINISTRATION_CMDS = {
     "organization_update",
     "ping",
 }
+
+# Cmds carrying encrypted blocks (i.e. incompressible data) in their request
+# or response, hence they are not worth compressing
+UNCOMPRESSED_CMDS = {"block_create", "block_read", "block_create_chunk", "block_read_chunk"}
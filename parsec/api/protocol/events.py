@@ -1,11 +1,20 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from parsec.serde import OneOfSchema, fields, validate
+from parsec.serde import BaseSchema, OneOfSchema, fields, validate
 from parsec.api.protocol.base import BaseReqSchema, BaseRepSchema, CmdSerializer
 from parsec.api.protocol.realm import RealmRoleField
 from parsec.api.protocol.invite import InvitationStatusField
 
 
+__all__ = (
+    "EVENTS_LISTEN_BATCH_MAX_SIZE",
+    "events_listen_serializer",
+    "events_listen_batch_serializer",
+    "events_subscribe_serializer",
+)
+
+EVENTS_LISTEN_BATCH_MAX_SIZE = 1000
+
 EVENTS = (
     "pinged",
     "realm.roles_updated",
@@ -28,12 +37,20 @@ class EventsRealmRolesUpdatedRepSchema(BaseRepSchema):
     role = RealmRoleField(required=True, allow_none=True)
 
 
+class VlobChangeSchema(BaseSchema):
+    src_id = fields.UUID(required=True)
+    src_version = fields.Integer(required=True)
+
+
 class EventsRealmVlobsUpdatedRepSchema(BaseRepSchema):
     event = fields.CheckedConstant("realm.vlobs_updated", required=True)
     realm_id = fields.UUID(required=True)
     checkpoint = fields.Integer(required=True)
     src_id = fields.UUID(required=True)
     src_version = fields.Integer(required=True)
+    # Only provided if the client subscribed with `coalesce_vlobs_updated`, in
+    # which case `checkpoint`, `src_id` and `src_version` are the last change
+    changes = fields.List(fields.Nested(VlobChangeSchema), required=False)
 
 
 class EventsRealmMaintenanceStartedRepSchema(BaseRepSchema):
@@ -80,11 +97,45 @@ class EventsListenRepSchema(OneOfSchema):
         return obj["event"]
 
 
-events_listen_serializer = CmdSerializer(EventsListenReqSchema, EventsListenRepSchema)
+events_listen_serializer = CmdSerializer(
+    EventsListenReqSchema, EventsListenRepSchema, fast_path=True
+)
+
+
+class EventsListenBatchReqSchema(BaseReqSchema):
+    wait = fields.Boolean(missing=True)
+    limit = fields.Integer(
+        validate=validate.Range(min=1, max=EVENTS_LISTEN_BATCH_MAX_SIZE),
+        missing=EVENTS_LISTEN_BATCH_MAX_SIZE,
+    )
+
+
+class EventsListenBatchItemSchema(OneOfSchema):
+    type_field = "event"
+    type_field_remove = False
+    # Same as `events_listen` events, without the `status` field
+    type_schemas = {
+        event: schema.__class__(exclude=("status",))
+        for event, schema in EventsListenRepSchema.type_schemas.items()
+    }
+
+    def get_obj_type(self, obj):
+        return obj["event"]
+
+
+class EventsListenBatchRepSchema(BaseRepSchema):
+    events = fields.List(fields.Nested(EventsListenBatchItemSchema), required=True)
+
+
+events_listen_batch_serializer = CmdSerializer(
+    EventsListenBatchReqSchema, EventsListenBatchRepSchema, fast_path=True
+)
 
 
 class EventsSubscribeReqSchema(BaseReqSchema):
-    pass
+    # Gather the `realm.vlobs_updated` events waiting to be listened into a
+    # single event with multiple changes
+    coalesce_vlobs_updated = fields.Boolean(missing=False)
 
 
 class EventsSubscribeRepSchema(BaseRepSchema):
@@ -123,6 +123,10 @@ class HandshakeAuthenticatedAnswerSchema(BaseSchema):
     device_id = DeviceIDField(required=True)
     rvk = fields.VerifyKey(required=True)
     answer = fields.Bytes(required=True)
+    # Ticket obtained during a previous handshake, allows the backend to
+    # resume the session without looking up the device (the answer is still
+    # checked, as are the organization expiration and the user revocation)
+    session_ticket = fields.Bytes(allow_none=True, missing=None)
 
 
 class HandshakeInvitedAnswerSchema(BaseSchema):
@@ -157,6 +161,7 @@ class APIV1_HandshakeAuthenticatedAnswerSchema(BaseSchema):
     device_id = DeviceIDField(required=True)
     rvk = fields.VerifyKey(required=True)
     answer = fields.Bytes(required=True)
+    session_ticket = fields.Bytes(allow_none=True, missing=None)
 
 
 class APIV1_HandshakeAnonymousAnswerSchema(BaseSchema):
@@ -195,6 +200,7 @@ class HandshakeResultSchema(BaseSchema):
     handshake = fields.CheckedConstant("result", required=True)
     result = fields.String(required=True)
     help = fields.String(missing=None)
+    session_ticket = fields.Bytes(allow_none=True, missing=None)
 
 
 handshake_result_serializer = serializer_factory(HandshakeResultSchema)
@@ -326,7 +332,7 @@ class ServerHandshake:
             {"handshake": "result", "result": "revoked_device", "help": help}
         )
 
-    def build_result_req(self, verify_key=None) -> bytes:
+    def build_result_req(self, verify_key=None, session_ticket: Optional[bytes] = None) -> bytes:
         if not self.state == "answer":
             raise HandshakeError("Invalid state.")
 
@@ -345,7 +351,10 @@ class ServerHandshake:
                 raise HandshakeFailedChallenge("Invalid answer signature") from exc
 
         self.state = "result"
-        return handshake_result_serializer.dumps({"handshake": "result", "result": "ok"})
+        result = {"handshake": "result", "result": "ok"}
+        if session_ticket is not None:
+            result["session_ticket"] = session_ticket
+        return handshake_result_serializer.dumps(result)
 
 
 class BaseClientHandshake:
@@ -355,6 +364,7 @@ class BaseClientHandshake:
         self.challenge_data = None
         self.backend_api_version = None
         self.client_api_version = None
+        self.issued_session_ticket = None
 
     def load_challenge_req(self, req: bytes):
         self.challenge_data = handshake_challenge_serializer.loads(req)
@@ -366,6 +376,7 @@ class BaseClientHandshake:
 
     def process_result_req(self, req: bytes) -> bytes:
         data = handshake_result_serializer.loads(req)
+        self.issued_session_ticket = data["session_ticket"]
         if data["result"] != "ok":
             if data["result"] == "bad_identity":
                 raise HandshakeBadIdentity(data["help"])
@@ -399,14 +410,19 @@ class AuthenticatedClientHandshake(BaseClientHandshake):
         device_id: DeviceID,
         user_signkey: SigningKey,
         root_verify_key: VerifyKey,
+        session_ticket: Optional[bytes] = None,
     ):
         self.organization_id = organization_id
         self.device_id = device_id
         self.user_signkey = user_signkey
         self.root_verify_key = root_verify_key
+        self.session_ticket = session_ticket
 
     def process_challenge_req(self, req: bytes) -> bytes:
         self.load_challenge_req(req)
+        # The challenge is signed even if a session ticket is provided: the
+        # ticket only spares the backend the device lookup, it is not a
+        # proof of possession of the device signing key
         answer = self.user_signkey.sign(self.challenge_data["challenge"])
         return self.HANDSHAKE_ANSWER_SERIALIZER.dumps(
             {
@@ -417,6 +433,7 @@ class AuthenticatedClientHandshake(BaseClientHandshake):
                 "device_id": self.device_id,
                 "rvk": self.root_verify_key,
                 "answer": answer,
+                "session_ticket": self.session_ticket,
             }
         )
 
@@ -73,6 +73,7 @@ class APIV1_OrganizationStatusReqSchema(BaseReqSchema):
 class APIV1_OrganizationStatusRepSchema(BaseRepSchema):
     is_bootstrapped = fields.Boolean(required=True)
     expiration_date = fields.DateTime(allow_none=True, required=False)
+    compact_manifests = fields.Boolean(required=False)
 
 
 apiv1_organization_status_serializer = CmdSerializer(
@@ -83,6 +84,7 @@ apiv1_organization_status_serializer = CmdSerializer(
 class APIV1_OrganizationUpdateReqSchema(BaseReqSchema):
     organization_id = OrganizationIDField(required=True)
     expiration_date = fields.DateTime(allow_none=True, required=False)
+    compact_manifests = fields.Boolean(required=False)
 
 
 class APIV1_OrganizationUpdateRepSchema(BaseRepSchema):
@@ -92,3 +94,18 @@ class APIV1_OrganizationUpdateRepSchema(BaseRepSchema):
 apiv1_organization_update_serializer = CmdSerializer(
     APIV1_OrganizationUpdateReqSchema, APIV1_OrganizationUpdateRepSchema
 )
+
+
+class OrganizationConfigReqSchema(BaseReqSchema):
+    pass
+
+
+class OrganizationConfigRepSchema(BaseRepSchema):
+    # Set by the administrator once all the clients of the organization can
+    # read compact manifests (envelope serialization and folder manifest deltas)
+    compact_manifests = fields.Boolean(required=True)
+
+
+organization_config_serializer = CmdSerializer(
+    OrganizationConfigReqSchema, OrganizationConfigRepSchema
+)
@@ -15,4 +15,4 @@ class PingRepSchema(BaseRepSchema):
     pong = fields.String(required=True)
 
 
-ping_serializer = CmdSerializer(PingReqSchema, PingRepSchema)
+ping_serializer = CmdSerializer(PingReqSchema, PingRepSchema, fast_path=True)
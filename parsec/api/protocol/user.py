@@ -1,12 +1,14 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from parsec.serde import BaseSchema, fields
+from parsec.serde import BaseSchema, fields, validate
 from parsec.api.protocol.base import BaseReqSchema, BaseRepSchema, CmdSerializer
 from parsec.api.protocol.types import UserIDField, DeviceNameField, DeviceIDField, HumanHandleField
 
 
 __all__ = (
+    "USER_GET_BATCH_MAX_SIZE",
     "user_get_serializer",
+    "user_get_batch_serializer",
     "apiv1_user_find_serializer",
     "apiv1_user_invite_serializer",
     "apiv1_user_get_invitation_creator_serializer",
@@ -47,6 +49,34 @@ class UserGetRepSchema(BaseRepSchema):
 user_get_serializer = CmdSerializer(UserGetReqSchema, UserGetRepSchema)
 
 
+USER_GET_BATCH_MAX_SIZE = 100
+
+
+class UserGetBatchReqSchema(BaseReqSchema):
+    user_ids = fields.List(
+        UserIDField(required=True),
+        required=True,
+        validate=validate.Length(min=1, max=USER_GET_BATCH_MAX_SIZE),
+    )
+
+
+class UserGetBatchItemSchema(BaseSchema):
+    user_certificate = fields.Bytes(required=True)
+    revoked_user_certificate = fields.Bytes(required=True, allow_none=True)
+    device_certificates = fields.List(fields.Bytes(required=True), required=True)
+
+
+class UserGetBatchRepSchema(BaseRepSchema):
+    users = fields.List(fields.Nested(UserGetBatchItemSchema, required=True), required=True)
+    not_found = fields.List(UserIDField(required=True), required=True)
+    # Trustchain is shared between all the users and only contains the
+    # certificates not already provided in `users`
+    trustchain = fields.Nested(TrustchainSchema, required=True)
+
+
+user_get_batch_serializer = CmdSerializer(UserGetBatchReqSchema, UserGetBatchRepSchema)
+
+
 class APIV1_UserFindReqSchema(BaseReqSchema):
     query = fields.String(missing=None)
     omit_revoked = fields.Boolean(missing=False)
@@ -6,10 +6,12 @@ from parsec.api.protocol.types import DeviceIDField
 
 
 __all__ = (
+    "VLOB_GROUP_CHECK_MAX_SIZE",
     "vlob_create_serializer",
     "vlob_read_serializer",
     "vlob_update_serializer",
     "vlob_poll_changes_serializer",
+    "vlob_group_check_serializer",
     "vlob_list_versions_serializer",
     "vlob_maintenance_get_reencryption_batch_serializer",
     "vlob_maintenance_save_reencryption_batch_serializer",
@@ -18,6 +20,9 @@ __all__ = (
 
 _validate_version = validate.Range(min=1)
 
+# Upper bound on the number of vlobs checked by a single `vlob_group_check`
+VLOB_GROUP_CHECK_MAX_SIZE = 1000
+
 
 class VlobCreateReqSchema(BaseReqSchema):
     realm_id = fields.UUID(required=True)
@@ -37,7 +42,7 @@ class VlobCreateRepSchema(BaseRepSchema):
     pass
 
 
-vlob_create_serializer = CmdSerializer(VlobCreateReqSchema, VlobCreateRepSchema)
+vlob_create_serializer = CmdSerializer(VlobCreateReqSchema, VlobCreateRepSchema, fast_path=True)
 
 
 class VlobReadReqSchema(BaseReqSchema):
@@ -54,7 +59,7 @@ class VlobReadRepSchema(BaseRepSchema):
     timestamp = fields.DateTime(required=True)
 
 
-vlob_read_serializer = CmdSerializer(VlobReadReqSchema, VlobReadRepSchema)
+vlob_read_serializer = CmdSerializer(VlobReadReqSchema, VlobReadRepSchema, fast_path=True)
 
 
 class VlobUpdateReqSchema(BaseReqSchema):
@@ -69,7 +74,7 @@ class VlobUpdateRepSchema(BaseRepSchema):
     pass
 
 
-vlob_update_serializer = CmdSerializer(VlobUpdateReqSchema, VlobUpdateRepSchema)
+vlob_update_serializer = CmdSerializer(VlobUpdateReqSchema, VlobUpdateRepSchema, fast_path=True)
 
 
 class VlobPollChangesReqSchema(BaseReqSchema):
@@ -82,7 +87,31 @@ class VlobPollChangesRepSchema(BaseRepSchema):
     current_checkpoint = fields.Integer(required=True)
 
 
-vlob_poll_changes_serializer = CmdSerializer(VlobPollChangesReqSchema, VlobPollChangesRepSchema)
+vlob_poll_changes_serializer = CmdSerializer(
+    VlobPollChangesReqSchema, VlobPollChangesRepSchema, fast_path=True
+)
+
+
+class VlobGroupCheckItemSchema(BaseSchema):
+    vlob_id = fields.UUID(required=True)
+    version = fields.Integer(required=True, validate=validate.Range(min=0))
+
+
+class VlobGroupCheckReqSchema(BaseReqSchema):
+    to_check = fields.List(
+        fields.Nested(VlobGroupCheckItemSchema),
+        required=True,
+        validate=validate.Length(max=VLOB_GROUP_CHECK_MAX_SIZE),
+    )
+
+
+class VlobGroupCheckRepSchema(BaseRepSchema):
+    changed = fields.List(fields.Nested(VlobGroupCheckItemSchema), required=True)
+
+
+vlob_group_check_serializer = CmdSerializer(
+    VlobGroupCheckReqSchema, VlobGroupCheckRepSchema, fast_path=True
+)
 
 
 # List available vlobs
@@ -1,13 +1,15 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import zlib
 from uuid import uuid4
 from typing import Optional
 import trio
-from trio import BrokenResourceError
+from trio import BrokenResourceError, ClosedResourceError
 from structlog import get_logger
 from wsproto import WSConnection, ConnectionType
 from wsproto.utilities import LocalProtocolError, RemoteProtocolError
-from wsproto.frame_protocol import CloseReason
+from wsproto.frame_protocol import CloseReason, Opcode
+from wsproto.extensions import PerMessageDeflate
 from wsproto.events import CloseConnection, AcceptConnection, Request, BytesMessage, Ping, Pong
 
 
@@ -16,6 +18,10 @@ __all__ = ("TransportError", "Transport")
 
 logger = get_logger()
 WEBSOCKET_HANDSHAKE_TIMEOUT = 3.0
+# Compressing small messages is not worth the CPU and framing overhead
+COMPRESSION_MIN_SIZE = 1024  # 1Ko
+# Protect against decompression bombs
+MAX_INFLATED_MESSAGE_SIZE = 32 * 1024 * 1024  # 32Mo
 
 
 class TransportError(Exception):
@@ -30,17 +36,75 @@ class TransportClosedByPeer(TransportError):
 # they should be only raised in case of programming error.
 
 
+class SelectivePerMessageDeflate(PerMessageDeflate):
+    """
+    Websocket permessage-deflate extension where the sender decides which
+    messages get compressed (RFC 7692 allows uncompressed messages, they
+    simply don't have the RSV1 bit set). This way we don't waste CPU on small
+    messages or on already encrypted data such as blocks.
+
+    Compression context is not kept between messages, so idle connections
+    don't hold the (rather big) zlib buffers.
+    """
+
+    def __init__(self):
+        super().__init__(client_no_context_takeover=True, server_no_context_takeover=True)
+        self.compress_next_message = False
+        self._inflated_size = 0
+
+    def frame_outbound(self, proto, opcode, rsv, data, fin):
+        if not self.compress_next_message:
+            return (rsv, data)
+        return super().frame_outbound(proto, opcode, rsv, data, fin)
+
+    def frame_inbound_header(self, proto, opcode, rsv, payload_length):
+        # Control frames can be interleaved with the frames of a message
+        if opcode in (Opcode.TEXT, Opcode.BINARY):
+            self._inflated_size = 0
+        return super().frame_inbound_header(proto, opcode, rsv, payload_length)
+
+    def frame_inbound_payload_data(self, proto, data):
+        if not self._inbound_compressed or not self._inbound_is_compressible:
+            return data
+
+        max_length = MAX_INFLATED_MESSAGE_SIZE - self._inflated_size + 1
+        try:
+            inflated = self._decompressor.decompress(bytes(data), max_length)
+        except zlib.error:
+            return CloseReason.INVALID_FRAME_PAYLOAD_DATA
+        self._inflated_size += len(inflated)
+        if self._inflated_size > MAX_INFLATED_MESSAGE_SIZE:
+            return CloseReason.MESSAGE_TOO_BIG
+        return inflated
+
+
 class Transport:
+    # Small reads while waiting for a message (most of them are small
+    # and idle connections shouldn't hold big buffers), big ones once
+    # we know a large message is being received
+    RECEIVE_BYTES_MIN = 2 ** 16  # 64Ko
     RECEIVE_BYTES = 2 ** 20  # 1Mo
 
-    def __init__(self, stream, ws, keepalive: Optional[int] = None):
+    def __init__(
+        self,
+        stream,
+        ws,
+        keepalive: Optional[int] = None,
+        deflate: Optional[SelectivePerMessageDeflate] = None,
+    ):
         self.stream = stream
         self.ws = ws
+        self._deflate = deflate
         self.keepalive = keepalive
         self.conn_id = uuid4().hex
         self.logger = logger.bind(conn_id=self.conn_id)
         self._ws_events = ws.events()
+        self._receive_bytes = self.RECEIVE_BYTES_MIN
         self._handshake = None
+        # Requests multiplexing means concurrent sends on the transport
+        self._send_lock = trio.StrictFIFOLock()
+        # Set by the backend once the peer has switched to requests multiplexing
+        self.multiplexed = False
 
     # Application handshake interface
     # TODO: Investigate a better place for providing an access to the peer API version
@@ -74,9 +138,9 @@ class Transport:
 
     async def _net_recv(self):
         try:
-            in_data = await self.stream.receive_some(self.RECEIVE_BYTES)
+            in_data = await self.stream.receive_some(self._receive_bytes)
 
-        except BrokenResourceError as exc:
+        except (BrokenResourceError, ClosedResourceError) as exc:
             raise TransportError(*exc.args) from exc
 
         if not in_data:
@@ -86,11 +150,14 @@ class Transport:
         else:
             self.ws.receive_data(in_data)
 
-    async def _net_send(self, wsmsg):
+    async def _net_send(self, wsmsg, compress: bool = False):
         try:
-            await self.stream.send_all(self.ws.send(wsmsg))
+            async with self._send_lock:
+                if self._deflate:
+                    self._deflate.compress_next_message = compress
+                await self.stream.send_all(self.ws.send(wsmsg))
 
-        except BrokenResourceError as exc:
+        except (BrokenResourceError, ClosedResourceError) as exc:
             raise TransportError(*exc.args) from exc
 
         except RemoteProtocolError as exc:
@@ -99,11 +166,12 @@ class Transport:
     @classmethod
     async def init_for_client(cls, stream, host):
         ws = WSConnection(ConnectionType.CLIENT)
-        transport = cls(stream, ws)
+        deflate = SelectivePerMessageDeflate()
+        transport = cls(stream, ws, deflate=deflate)
 
         # Because this is a client WebSocket, we need to initiate the connection
         # handshake by sending a Request event.
-        await transport._net_send(Request(host=host, target="/ws"))
+        await transport._net_send(Request(host=host, target="/ws", extensions=[deflate]))
 
         # Get handshake answer
         event = await transport._next_ws_event()
@@ -121,7 +189,8 @@ class Transport:
     @classmethod
     async def init_for_server(cls, stream):
         ws = WSConnection(ConnectionType.SERVER)
-        transport = cls(stream, ws)
+        deflate = SelectivePerMessageDeflate()
+        transport = cls(stream, ws, deflate=deflate)
 
         # Wait for client to init WebSocket handshake
         event = "Websocket handshake timeout"
@@ -130,7 +199,8 @@ class Transport:
 
         if isinstance(event, Request):
             transport.logger.debug("Accepting WebSocket upgrade")
-            await transport._net_send(AcceptConnection())
+            # Compression is only used if the client has asked for it
+            await transport._net_send(AcceptConnection(extensions=[deflate]))
             return transport
 
         transport.logger.warning("Unexpected event during WebSocket handshake", ws_event=event)
@@ -138,31 +208,75 @@ class Transport:
 
     async def aclose(self) -> None:
         try:
+            # Don't wait for a concurrent sender (which could be stalled
+            # forever), closing the stream is enough to make it fail
             try:
-                await self.stream.send_all(
-                    self.ws.send(CloseConnection(code=CloseReason.NORMAL_CLOSURE))
-                )
-            except LocalProtocolError:
-                # TODO: exception occurs when ws.state is already closed...
+                self._send_lock.acquire_nowait()
+            except trio.WouldBlock:
                 pass
+            else:
+                try:
+                    await self.stream.send_all(
+                        self.ws.send(CloseConnection(code=CloseReason.NORMAL_CLOSURE))
+                    )
+                except LocalProtocolError:
+                    # TODO: exception occurs when ws.state is already closed...
+                    pass
+                finally:
+                    self._send_lock.release()
             await self.stream.aclose()
 
-        except (BrokenResourceError, TransportError):
+        except (BrokenResourceError, ClosedResourceError, TransportError):
             pass
 
-    async def send(self, msg: bytes) -> None:
+    async def send(self, msg: bytes, compress: bool = True) -> None:
         """
+        `compress` should be set to False for messages known to be
+        incompressible, in any case small messages are never compressed.
+
         Raises:
             TransportError
         """
-        await self._net_send(BytesMessage(data=msg))
+        await self._net_send(
+            BytesMessage(data=msg), compress=compress and len(msg) >= COMPRESSION_MIN_SIZE
+        )
+
+    async def check_alive(self, timeout: float) -> bool:
+        """
+        Ping the peer and wait for its pong. Must only be used on an idle
+        transport (i.e. no concurrent `recv` and no response expected).
+        """
+        with trio.move_on_after(timeout):
+            try:
+                await self._net_send(Ping(payload=b"health_check"))
+                while True:
+                    event = await self._next_ws_event()
+                    if isinstance(event, Pong):
+                        return True
+                    elif isinstance(event, Ping):
+                        await self._net_send(event.response())
+                    else:
+                        # Peer is closing the connection, or sending data
+                        # nobody asked for: either way it cannot be trusted
+                        self.logger.debug("Unexpected event on idle transport", ws_event=event)
+                        return False
+
+            except TransportError:
+                return False
+
+        self.logger.debug("Health check timeout")
+        return False
 
     async def recv(self) -> bytes:
         """
         Raises:
             TransportError
         """
-        data = bytearray()
+        # wsproto provides the message as multiple chunks when it is received
+        # in multiple reads, those chunks are only concatenated once the
+        # message is complete (hence a single copy with the final size known)
+        chunks = []
+        self._receive_bytes = self.RECEIVE_BYTES_MIN
         while True:
             if self.keepalive:
                 with trio.move_on_after(self.keepalive) as cancel_scope:
@@ -186,9 +300,14 @@ class Transport:
             elif isinstance(event, BytesMessage):
                 # TODO: check that data doesn't go over MAX_BIN_LEN (1 MB)
                 # Msgpack will refuse to unpack it so we should fail early on if that happens
-                data += event.data
                 if event.message_finished:
-                    return data
+                    if not chunks:
+                        # Most common case: message received in a single read
+                        return event.data
+                    chunks.append(event.data)
+                    return b"".join(chunks)
+                chunks.append(event.data)
+                self._receive_bytes = self.RECEIVE_BYTES
 
             elif isinstance(event, Ping):
                 self.logger.debug("Received ping and sending pong")
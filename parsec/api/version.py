@@ -8,6 +8,16 @@ class ApiVersion(namedtuple("ApiVersion", "version revision")):
         return f"{self.version}.{self.revision}"
 
 
-API_V1_VERSION = ApiVersion(version=1, revision=2)
-API_V2_VERSION = ApiVersion(version=2, revision=0)
+API_V1_VERSION = ApiVersion(version=1, revision=3)
+API_V2_VERSION = ApiVersion(version=2, revision=2)
 API_VERSION = API_V2_VERSION
+
+# First revision of each API version supporting requests multiplexing
+MULTIPLEXING_API_VERSIONS = (ApiVersion(version=1, revision=3), ApiVersion(version=2, revision=1))
+
+
+def is_multiplexing_supported(api_version: ApiVersion) -> bool:
+    return any(
+        api_version.version == v.version and api_version.revision >= v.revision
+        for v in MULTIPLEXING_API_VERSIONS
+    )
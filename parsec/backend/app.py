@@ -2,11 +2,13 @@
 
 from typing import Optional
 import trio
+from time import perf_counter
 from structlog import get_logger
 from logging import DEBUG as LOG_LEVEL_DEBUG
 from async_generator import asynccontextmanager
 
 from parsec.event_bus import EventBus
+from parsec.crypto import SecretKey
 from parsec.logging import get_log_level
 from parsec.api.transport import TransportError, TransportClosedByPeer, Transport
 from parsec.api.protocol import (
@@ -16,11 +18,15 @@ from parsec.api.protocol import (
     MessageSerializationError,
     InvalidMessageError,
     InvitationStatus,
+    UNCOMPRESSED_CMDS,
 )
 from parsec.backend.utils import CancelledByNewRequest, collect_apis
 from parsec.backend.config import BackendConfig
+from parsec.backend.metrics import BackendMetrics
+from parsec.backend.scheduler import RequestScheduler, get_request_priority
 from parsec.backend.client_context import AuthenticatedClientContext, InvitedClientContext
 from parsec.backend.handshake import do_handshake
+from parsec.backend.events import EVENTS_ROUTES
 from parsec.backend.memory import components_factory as mocked_components_factory
 from parsec.backend.postgresql import components_factory as postgresql_components_factory
 
@@ -28,23 +34,41 @@ from parsec.backend.postgresql import components_factory as postgresql_component
 logger = get_logger()
 
 
+MAX_CONCURRENT_REQUESTS_PER_CONNECTION = 32
+
+
+def _is_rep_compressible(req: dict) -> bool:
+    cmd = req.get("cmd")
+    return not isinstance(cmd, str) or cmd not in UNCOMPRESSED_CMDS
+
+
 def _filter_binary_fields(data):
     return {k: v if not isinstance(v, bytes) else b"[...]" for k, v in data.items()}
 
 
+def _get_cmd_label(api_cmds: dict, req: dict) -> str:
+    # Only known commands are used as metric label to keep its cardinality bounded
+    cmd = req.get("cmd")
+    return cmd if isinstance(cmd, str) and cmd in api_cmds else "<unknown>"
+
+
 @asynccontextmanager
 async def backend_app_factory(config: BackendConfig, event_bus: Optional[EventBus] = None):
     event_bus = event_bus or EventBus()
+    metrics = BackendMetrics()
 
     if config.db_url == "MOCKED":
         components_factory = mocked_components_factory
     else:
         components_factory = postgresql_components_factory
 
-    async with components_factory(config=config, event_bus=event_bus) as components:
+    async with components_factory(
+        config=config, event_bus=event_bus, metrics=metrics
+    ) as components:
         yield BackendApp(
             config=config,
             event_bus=event_bus,
+            metrics=metrics,
             user=components["user"],
             invite=components["invite"],
             organization=components["organization"],
@@ -63,6 +87,7 @@ class BackendApp:
         self,
         config,
         event_bus,
+        metrics,
         user,
         invite,
         organization,
@@ -76,6 +101,37 @@ class BackendApp:
     ):
         self.config = config
         self.event_bus = event_bus
+        for event, params in EVENTS_ROUTES.items():
+            event_bus.set_event_route(event, *params)
+        self.session_ticket_key = SecretKey(config.session_ticket_key or SecretKey.generate())
+        self.metrics = metrics
+        max_concurrency = config.max_concurrent_requests or config.db_max_connections
+        self.scheduler = RequestScheduler(
+            max_concurrency=max_concurrency,
+            max_bulk_concurrency=config.max_concurrent_block_requests
+            or max(1, max_concurrency // 2),
+        )
+        self._authenticated_clients = set()
+        metrics.add_gauge(
+            "parsec_backend_connected_clients",
+            "Clients currently connected with an authenticated handshake.",
+            lambda: {(): len(self._authenticated_clients)},
+        )
+        metrics.add_gauge(
+            "parsec_backend_events_queue_depth",
+            "Events waiting to be listened by the connected clients.",
+            self._collect_events_queue_depth,
+        )
+        metrics.add_gauge(
+            "parsec_backend_event_bus_handlers",
+            "Callbacks connected to the event bus, per event.",
+            lambda: {(("event", event),): count for event, count in event_bus.stats().items()},
+        )
+        metrics.add_gauge(
+            "parsec_backend_scheduled_requests",
+            "Client requests admitted or waiting for admission, per priority.",
+            self._collect_scheduled_requests,
+        )
 
         self.user = user
         self.invite = invite
@@ -92,6 +148,20 @@ class BackendApp:
             user, invite, organization, message, realm, vlob, ping, blockstore, block, events
         )
 
+    def _collect_events_queue_depth(self):
+        depths = [
+            client_ctx.receive_events_channel.statistics().current_buffer_used
+            for client_ctx in self._authenticated_clients
+        ]
+        return {(("stat", "total"),): sum(depths), (("stat", "max"),): max(depths, default=0)}
+
+    def _collect_scheduled_requests(self):
+        return {
+            (("priority", priority.value.lower()), ("state", state)): count
+            for priority, stats in self.scheduler.stats().items()
+            for state, count in stats.items()
+        }
+
     async def handle_client(self, stream):
         selected_logger = logger
 
@@ -141,18 +211,22 @@ class BackendApp:
             selected_logger.info("Connection established")
 
             if isinstance(client_ctx, AuthenticatedClientContext):
-                with trio.CancelScope() as cancel_scope:
-                    with self.event_bus.connection_context() as client_ctx.event_bus_ctx:
+                self._authenticated_clients.add(client_ctx)
+                try:
+                    with trio.CancelScope() as cancel_scope:
+                        with self.event_bus.connection_context() as client_ctx.event_bus_ctx:
 
-                        def _on_revoked(event, organization_id, user_id):
-                            if (
-                                organization_id == client_ctx.organization_id
-                                and user_id == client_ctx.user_id
-                            ):
+                            def _on_revoked(event, organization_id, user_id):
                                 cancel_scope.cancel()
 
-                        client_ctx.event_bus_ctx.connect("user.revoked", _on_revoked)
-                        await self._handle_client_loop(transport, client_ctx)
+                            client_ctx.event_bus_ctx.connect(
+                                "user.revoked",
+                                _on_revoked,
+                                route=(client_ctx.organization_id, client_ctx.user_id),
+                            )
+                            await self._handle_client_loop(transport, client_ctx)
+                finally:
+                    self._authenticated_clients.discard(client_ctx)
 
             elif isinstance(client_ctx, InvitedClientContext):
                 await self.invite.claimer_joined(
@@ -169,13 +243,17 @@ class BackendApp:
                             ):
                                 if (
                                     status == InvitationStatus.DELETED
-                                    and organization_id == client_ctx.organization_id
                                     and token == client_ctx.invitation.token
                                 ):
                                     cancel_scope.cancel()
 
                             event_bus_ctx.connect(
-                                "invite.status_changed", _on_invite_status_changed
+                                "invite.status_changed",
+                                _on_invite_status_changed,
+                                route=(
+                                    client_ctx.organization_id,
+                                    client_ctx.invitation.greeter_user_id,
+                                ),
                             )
                             await self._handle_client_loop(transport, client_ctx)
                 finally:
@@ -213,42 +291,119 @@ class BackendApp:
             # while processing a command
             raw_req = raw_req or await transport.recv()
             req = unpackb(raw_req)
-            if get_log_level() <= LOG_LEVEL_DEBUG:
-                client_ctx.logger.debug("Request", req=_filter_binary_fields(req))
+
+            # Client can switch to multiplexed mode by sending a request with
+            # an id (see `_handle_client_multiplexed_loop`)
+            if isinstance(req, list):
+                await self._handle_client_multiplexed_loop(
+                    transport, client_ctx, api_cmds, req, len(raw_req)
+                )
+                return
+
             try:
-                cmd = req.get("cmd", "<missing>")
-                if not isinstance(cmd, str):
-                    raise KeyError()
+                rep = await self._process_client_req(client_ctx, api_cmds, req)
 
-                cmd_func = api_cmds[cmd]
+            except CancelledByNewRequest as exc:
+                # Long command handling such as message_get can be cancelled
+                # when the peer send a new request
+                raw_req = exc.new_raw_req
+                continue
 
-            except KeyError:
-                rep = {"status": "unknown_command", "reason": "Unknown command"}
+            raw_rep = packb(rep)
+            self.metrics.observe_payloads(_get_cmd_label(api_cmds, req), len(raw_req), len(raw_rep))
+            await transport.send(raw_rep, compress=_is_rep_compressible(req))
+            raw_req = None
 
-            else:
+    async def _handle_client_multiplexed_loop(
+        self, transport, client_ctx, api_cmds, req, raw_req_size
+    ):
+        """
+        In multiplexed mode each message is a `[req_id, msg]` envelope. Requests are
+        processed concurrently (up to `MAX_CONCURRENT_REQUESTS_PER_CONNECTION`) and
+        each response is sent as soon as it is ready with the id of its request.
+        """
+        transport.multiplexed = True
+        concurrency = trio.Semaphore(MAX_CONCURRENT_REQUESTS_PER_CONNECTION)
+
+        async def _process_and_reply(req_id, req, raw_req_size, cancel_scope):
+            try:
+                rep = await self._process_client_req(client_ctx, api_cmds, req)
+                raw_rep = packb([req_id, rep])
+                self.metrics.observe_payloads(
+                    _get_cmd_label(api_cmds, req), raw_req_size, len(raw_rep)
+                )
+                await transport.send(raw_rep, compress=_is_rep_compressible(req))
+
+            except TransportError:
+                # Let the main loop's recv notify the connection is lost
+                cancel_scope.cancel()
+
+            finally:
+                concurrency.release()
+
+        async with trio.open_service_nursery() as nursery:
+            while True:
                 try:
-                    rep = await cmd_func(client_ctx, req)
+                    req_id, req = req
+                    if not isinstance(req_id, int) or not isinstance(req, dict):
+                        raise ValueError
+                except (TypeError, ValueError):
+                    raise MessageSerializationError("Invalid multiplexed message")
+
+                # Stop reading from the transport (hence providing backpressure
+                # to the client) when too many requests are already in progress
+                await concurrency.acquire()
+                nursery.start_soon(
+                    _process_and_reply, req_id, req, raw_req_size, nursery.cancel_scope
+                )
 
-                except InvalidMessageError as exc:
-                    rep = {
-                        "status": "bad_message",
-                        "errors": exc.errors,
-                        "reason": "Invalid message.",
-                    }
+                raw_req = await transport.recv()
+                raw_req_size = len(raw_req)
+                req = unpackb(raw_req)
 
-                except ProtocolError as exc:
-                    rep = {"status": "bad_message", "reason": str(exc)}
+    async def _process_client_req(self, client_ctx, api_cmds, req):
+        if get_log_level() <= LOG_LEVEL_DEBUG:
+            client_ctx.logger.debug("Request", req=_filter_binary_fields(req))
+        try:
+            cmd = req.get("cmd", "<missing>")
+            if not isinstance(cmd, str):
+                raise KeyError()
 
-                except CancelledByNewRequest as exc:
-                    # Long command handling such as message_get can be cancelled
-                    # when the peer send a new request
-                    raw_req = exc.new_raw_req
-                    continue
+            cmd_func = api_cmds[cmd]
 
-            if get_log_level() <= LOG_LEVEL_DEBUG:
-                client_ctx.logger.debug("Response", rep=_filter_binary_fields(req))
-            else:
-                client_ctx.logger.info("Request", cmd=cmd, status=rep["status"])
-            raw_rep = packb(rep)
-            await transport.send(raw_rep)
-            raw_req = None
+        except KeyError:
+            rep = {"status": "unknown_command", "reason": "Unknown command"}
+
+        else:
+            self.metrics.request_started(cmd)
+            start = perf_counter()
+            priority = get_request_priority(cmd)
+            try:
+                if priority is None:
+                    rep = await cmd_func(client_ctx, req)
+                else:
+                    async with self.scheduler.admit(
+                        priority,
+                        getattr(client_ctx, "organization_id", None),
+                        getattr(client_ctx, "device_id", None),
+                    ):
+                        rep = await cmd_func(client_ctx, req)
+
+            except InvalidMessageError as exc:
+                rep = {"status": "bad_message", "errors": exc.errors, "reason": "Invalid message."}
+
+            except ProtocolError as exc:
+                rep = {"status": "bad_message", "reason": str(exc)}
+
+            except BaseException:
+                # Cancellation or crash, the request has no response
+                self.metrics.request_done(cmd, "<interrupted>", perf_counter() - start)
+                raise
+
+            self.metrics.request_done(cmd, rep["status"], perf_counter() - start)
+
+        if get_log_level() <= LOG_LEVEL_DEBUG:
+            client_ctx.logger.debug("Response", rep=_filter_binary_fields(req))
+        else:
+            client_ctx.logger.info("Request", cmd=cmd, status=rep["status"])
+        return rep
@@ -1,12 +1,27 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 from uuid import UUID
+from typing import Tuple
 
+from parsec.crypto import HashDigest
 from parsec.api.protocol import DeviceID, OrganizationID
-from parsec.api.protocol import block_create_serializer, block_read_serializer
+from parsec.api.protocol import (
+    block_create_serializer,
+    block_read_serializer,
+    block_create_chunk_serializer,
+    block_read_chunk_serializer,
+)
 from parsec.backend.utils import catch_protocol_errors, api
 
 
+# Chunked uploads without activity for this long are dropped
+PENDING_UPLOAD_TIMEOUT = 3600
+# Each device cannot have more chunked uploads in progress (oldest is dropped)
+MAX_PENDING_UPLOADS_PER_DEVICE = 8
+# Chunks received for all the uploads in progress cannot exceed this size
+MAX_PENDING_UPLOADS_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+
 class BlockError(Exception):
     pass
 
@@ -31,6 +46,14 @@ class BlockInMaintenanceError(BlockError):
     pass
 
 
+class BlockInvalidChunkError(BlockError):
+    pass
+
+
+class BlockUploadsLimitReachedError(BlockError):
+    pass
+
+
 class BaseBlockComponent:
     @api("block_read")
     @catch_protocol_errors
@@ -79,6 +102,119 @@ class BaseBlockComponent:
 
         return block_create_serializer.rep_dump({"status": "ok"})
 
+    @api("block_read_chunk")
+    @catch_protocol_errors
+    async def api_block_read_chunk(self, client_ctx, msg):
+        msg = block_read_chunk_serializer.req_load(msg)
+
+        try:
+            chunk, size = await self.read_chunk(
+                client_ctx.organization_id, client_ctx.device_id, **msg
+            )
+
+        except BlockNotFoundError:
+            return block_read_chunk_serializer.rep_dump({"status": "not_found"})
+
+        except BlockTimeoutError:
+            return block_read_chunk_serializer.rep_dump({"status": "timeout"})
+
+        except BlockAccessError:
+            return block_read_chunk_serializer.rep_dump({"status": "not_allowed"})
+
+        except BlockInMaintenanceError:
+            return block_read_chunk_serializer.rep_dump({"status": "in_maintenance"})
+
+        return block_read_chunk_serializer.rep_dump({"status": "ok", "chunk": chunk, "size": size})
+
+    @api("block_create_chunk")
+    @catch_protocol_errors
+    async def api_block_create_chunk(self, client_ctx, msg):
+        msg = block_create_chunk_serializer.req_load(msg)
+
+        try:
+            offset = await self.create_chunk(
+                client_ctx.organization_id, client_ctx.device_id, **msg
+            )
+
+        except BlockInvalidChunkError as exc:
+            return block_create_chunk_serializer.rep_dump(
+                {"status": "bad_message", "reason": str(exc)}
+            )
+
+        except BlockUploadsLimitReachedError:
+            return block_create_chunk_serializer.rep_dump({"status": "uploads_limit_reached"})
+
+        except BlockAlreadyExistsError:
+            return block_create_chunk_serializer.rep_dump({"status": "already_exists"})
+
+        except BlockNotFoundError:
+            return block_create_chunk_serializer.rep_dump({"status": "not_found"})
+
+        except BlockTimeoutError:
+            return block_create_chunk_serializer.rep_dump({"status": "timeout"})
+
+        except BlockAccessError:
+            return block_create_chunk_serializer.rep_dump({"status": "not_allowed"})
+
+        except BlockInMaintenanceError:
+            return block_create_chunk_serializer.rep_dump({"status": "in_maintenance"})
+
+        return block_create_chunk_serializer.rep_dump({"status": "ok", "offset": offset})
+
+    async def read_chunk(
+        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID, offset: int
+    ) -> Tuple[bytes, int]:
+        """
+        Access is checked for each chunk and only the requested part of the
+        block is read (if the blockstore allows it), so nothing is kept
+        between two chunks.
+
+        Returns: the chunk starting at `offset` and the size of the whole block
+
+        Raises:
+            BlockNotFoundError
+            BlockTimeoutError
+            BlockAccessError
+            BlockInMaintenanceError
+        """
+        raise NotImplementedError()
+
+    async def create_chunk(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        block_id: UUID,
+        realm_id: UUID,
+        digest: HashDigest,
+        size: int,
+        offset: int,
+        chunk: bytes,
+    ) -> int:
+        """
+        The block is created once its last chunk is received.
+
+        Chunks received so far must be stored where all the backend instances
+        can retrieve them (the next chunk can be sent on another connection).
+        Uploads inactive for `PENDING_UPLOAD_TIMEOUT` are dropped, as well as
+        the least recently active ones when a device has more than
+        `MAX_PENDING_UPLOADS_PER_DEVICE` of them.
+
+        Returns: the number of bytes received so far, if it is not `offset` +
+        the chunk size then the chunk has been ignored and the upload should
+        continue from the returned offset.
+
+        Raises:
+            BlockInvalidChunkError
+            BlockUploadsLimitReachedError: if the chunks of all the uploads in
+                progress would exceed `MAX_PENDING_UPLOADS_SIZE`
+            BlockNotFoundError: if cannot found realm
+            BlockAlreadyExistsError
+            BlockTimeoutError
+            BlockAccessError
+            BlockInMaintenanceError
+        """
+        raise NotImplementedError()
+
     async def read(
         self, organization_id: OrganizationID, author: DeviceID, block_id: UUID
     ) -> bytes:
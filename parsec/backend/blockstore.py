@@ -1,9 +1,12 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 from uuid import UUID
+from time import perf_counter
+from typing import Tuple
 
 from parsec.api.protocol import OrganizationID
 from parsec.backend.config import BaseBlockStoreConfig
+from parsec.backend.metrics import BackendMetrics
 
 
 class BaseBlockStoreComponent:
@@ -15,6 +18,23 @@ class BaseBlockStoreComponent:
         """
         raise NotImplementedError()
 
+    async def read_range(
+        self, organization_id: OrganizationID, id: UUID, offset: int, size: int
+    ) -> Tuple[bytes, int]:
+        """
+        Blockstores able to only retrieve part of a block should override
+        this method, by default the whole block is read.
+
+        Returns: at most `size` bytes starting at `offset` and the size of the
+        whole block
+
+        Raises:
+            BlockNotFoundError
+            BlockTimeoutError
+        """
+        block = await self.read(organization_id, id)
+        return block[offset : offset + size], len(block)
+
     async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
         """
         Raises:
@@ -24,6 +44,46 @@ class BaseBlockStoreComponent:
         raise NotImplementedError()
 
 
+class MeasuredBlockStoreComponent(BaseBlockStoreComponent):
+    """
+    Record the duration of the operations of the wrapped block store
+    """
+
+    def __init__(
+        self, blockstore: BaseBlockStoreComponent, blockstore_type: str, metrics: BackendMetrics
+    ):
+        self.blockstore = blockstore
+        self.blockstore_type = blockstore_type
+        self.metrics = metrics
+
+    async def read(self, organization_id: OrganizationID, id: UUID) -> bytes:
+        start = perf_counter()
+        try:
+            return await self.blockstore.read(organization_id, id)
+        finally:
+            self.metrics.observe_blockstore_op(self.blockstore_type, "read", perf_counter() - start)
+
+    async def read_range(
+        self, organization_id: OrganizationID, id: UUID, offset: int, size: int
+    ) -> Tuple[bytes, int]:
+        start = perf_counter()
+        try:
+            return await self.blockstore.read_range(organization_id, id, offset, size)
+        finally:
+            self.metrics.observe_blockstore_op(
+                self.blockstore_type, "read_range", perf_counter() - start
+            )
+
+    async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
+        start = perf_counter()
+        try:
+            await self.blockstore.create(organization_id, id, block)
+        finally:
+            self.metrics.observe_blockstore_op(
+                self.blockstore_type, "create", perf_counter() - start
+            )
+
+
 def blockstore_factory(
     config: BaseBlockStoreConfig, postgresql_dbh=None
 ) -> BaseBlockStoreComponent:
@@ -49,6 +109,11 @@ def blockstore_factory(
                 config.s3_key,
                 config.s3_secret,
                 config.s3_endpoint_url,
+                max_connections=config.s3_max_connections,
+                connect_timeout=config.s3_connect_timeout,
+                read_timeout=config.s3_read_timeout,
+                retries=config.s3_retries,
+                conditional_put=config.s3_conditional_put,
             )
         except ImportError as exc:
             raise ValueError("S3 block store is not available") from exc
@@ -63,6 +128,10 @@ def blockstore_factory(
                 config.swift_container,
                 config.swift_user,
                 config.swift_password,
+                max_connections=config.swift_max_connections,
+                timeout=config.swift_timeout,
+                retries=config.swift_retries,
+                conditional_put=config.swift_conditional_put,
             )
         except ImportError as exc:
             raise ValueError("Swift block store is not available") from exc
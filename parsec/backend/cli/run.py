@@ -3,16 +3,25 @@
 import ssl
 import trio
 import click
+import signal
+import socket
+import multiprocessing
+from multiprocessing.connection import wait as wait_processes
+from typing import List
 from structlog import get_logger
+from functools import partial
 from itertools import count
 from collections import defaultdict
 
 from parsec.utils import trio_run
+from parsec.crypto import SecretKey
 from parsec.cli_utils import cli_exception_handler
 from parsec.logging import configure_logging, configure_sentry_logging
 from parsec.backend import backend_app_factory
+from parsec.backend.metrics import serve_metrics_http
 from parsec.backend.config import (
     BackendConfig,
+    BaseBlockStoreConfig,
     MockedBlockStoreConfig,
     PostgreSQLBlockStoreConfig,
     S3BlockStoreConfig,
@@ -161,6 +170,79 @@ def _parse_blockstore_params(raw_params):
         raise click.BadParameter(f"Invalid multi blockstore mode `{raid_mode}`")
 
 
+def _is_blockstore_mocked(config: BaseBlockStoreConfig) -> bool:
+    if config.type == "MOCKED":
+        return True
+    return any(_is_blockstore_mocked(node) for node in getattr(config, "blockstores", ()))
+
+
+async def _open_tcp_listeners_with_reuseport(port: int, host: str) -> List[trio.SocketListener]:
+    """
+    Same as `trio.open_tcp_listeners` but with `SO_REUSEPORT` so that each
+    worker process can listen on the same port, the kernel then balancing
+    the incoming connections between them.
+    """
+    listeners = []
+    addresses = await trio.socket.getaddrinfo(
+        host, port, type=trio.socket.SOCK_STREAM, flags=trio.socket.AI_PASSIVE
+    )
+    try:
+        for family, type, proto, _, sockaddr in addresses:
+            sock = trio.socket.socket(family, type, proto)
+            try:
+                sock.setsockopt(trio.socket.SOL_SOCKET, trio.socket.SO_REUSEADDR, 1)
+                sock.setsockopt(trio.socket.SOL_SOCKET, trio.socket.SO_REUSEPORT, 1)
+                if family == trio.socket.AF_INET6:
+                    sock.setsockopt(trio.socket.IPPROTO_IPV6, trio.socket.IPV6_V6ONLY, 1)
+                await sock.bind(sockaddr)
+                sock.listen(socket.SOMAXCONN)
+            except BaseException:
+                sock.close()
+                raise
+            listeners.append(trio.SocketListener(sock))
+
+    except BaseException:
+        for listener in listeners:
+            listener.socket.close()
+        raise
+
+    return listeners
+
+
+def _run_workers(workers: int, run_worker) -> None:
+    def _worker_main(worker_index):
+        try:
+            run_worker(worker_index)
+        except KeyboardInterrupt:
+            pass
+
+    mp_context = multiprocessing.get_context("fork")
+    processes = [
+        mp_context.Process(target=_worker_main, args=(i,), name=f"parsec-backend-worker-{i}")
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Workers must not outlive us
+    def _on_sigterm(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    try:
+        # Any worker leaving means something went wrong, so stop everything
+        stopped = wait_processes([process.sentinel for process in processes])
+        crashed = [process.name for process in processes if process.sentinel in stopped]
+        raise RuntimeError(f"Backend worker(s) {', '.join(crashed)} stopped unexpectedly")
+
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
 class DevOption(click.Option):
     def handle_parse_result(self, ctx, opts, args):
         value, args = super().handle_parse_result(ctx, opts, args)
@@ -226,6 +308,15 @@ Allowed values:
     envvar="PARSEC_DB_MAX_CONNECTIONS",
     help="Maximum number of connections to the database if using PostgreSQL",
 )
+@click.option(
+    "--db-batched-notifications",
+    is_flag=True,
+    envvar="PARSEC_DB_BATCHED_NOTIFICATIONS",
+    help="""Notify the events of multiple requests as a single database notification
+if using PostgreSQL. Older backends sharing the same database cannot read those
+notifications, so this must only be enabled once all of them have been upgraded
+""",
+)
 @click.option(
     "--blockstore",
     "-b",
@@ -280,6 +371,38 @@ integer and `<config>` the MOCKED/POSTGRESQL/S3/SWIFT config.
 @click.option(
     "--log-format", "-f", type=click.Choice(("CONSOLE", "JSON")), envvar="PARSEC_LOG_FORMAT"
 )
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    envvar="PARSEC_WORKERS",
+    help="""Number of backend processes sharing the listening socket.
+Requires a PostgreSQL database and non-mocked blockstore given the events and
+the pending chunked block uploads are shared between processes through the
+database (note the database connections settings are for each process).
+Other state is per process: the fair scheduling of the requests between
+organizations, the lookup caches (invalidated through the database events)
+and the metrics
+""",
+)
+@click.option(
+    "--metrics-host",
+    default="127.0.0.1",
+    show_default=True,
+    envvar="PARSEC_METRICS_HOST",
+    help="Host to listen on for the metrics endpoint",
+)
+@click.option(
+    "--metrics-port",
+    type=int,
+    default=None,
+    envvar="PARSEC_METRICS_PORT",
+    help="""Port to serve the metrics (Prometheus text format) on at `/metrics`.
+Disabled by default. With multiple workers, each worker serves its own metrics
+on a dedicated port (i.e. `<metrics-port> + <worker index>`)
+""",
+)
 @click.option("--log-file", "-o", envvar="PARSEC_LOG_FILE")
 @click.option("--log-filter", envvar="PARSEC_LOG_FILTER")
 @click.option("--sentry-url", envvar="PARSEC_SENTRY_URL", help="Sentry URL for telemetry report")
@@ -298,10 +421,14 @@ def run_cmd(
     db_drop_deleted_data,
     db_min_connections,
     db_max_connections,
+    db_batched_notifications,
     blockstore,
     administration_token,
     ssl_keyfile,
     ssl_certfile,
+    workers,
+    metrics_host,
+    metrics_port,
     log_level,
     log_format,
     log_file,
@@ -314,6 +441,18 @@ def run_cmd(
     if sentry_url:
         configure_sentry_logging(sentry_url)
 
+    if workers > 1:
+        # In-memory components live in a single process
+        if db.upper() == "MOCKED" or _is_blockstore_mocked(blockstore):
+            raise click.BadParameter(
+                "Mocked database and blockstore cannot be shared between multiple workers",
+                param_hint="--workers",
+            )
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise click.BadParameter(
+                "Multiple workers are not supported on this platform", param_hint="--workers"
+            )
+
     with cli_exception_handler(debug):
 
         config = BackendConfig(
@@ -322,8 +461,12 @@ def run_cmd(
             db_drop_deleted_data=db_drop_deleted_data,
             db_min_connections=db_min_connections,
             db_max_connections=db_max_connections,
+            db_batched_notifications=db_batched_notifications,
             blockstore_config=blockstore,
             debug=debug,
+            # Session tickets issued by the authenticated handshake (not TLS
+            # ones) must be accepted whatever the worker
+            session_ticket_key=SecretKey.generate() if workers > 1 else None,
         )
 
         if ssl_certfile or ssl_keyfile:
@@ -335,7 +478,7 @@ def run_cmd(
         else:
             ssl_context = None
 
-        async def _run_backend():
+        async def _run_backend(worker_index=0):
             async with backend_app_factory(config=config) as backend:
 
                 async def _serve_client(stream):
@@ -350,13 +493,34 @@ def run_cmd(
                         logger.exception("Unexpected crash")
                         await stream.aclose()
 
-                await trio.serve_tcp(_serve_client, port, host=host)
+                async with trio.open_service_nursery() as nursery:
+                    if metrics_port is not None:
+                        nursery.start_soon(
+                            partial(
+                                trio.serve_tcp,
+                                partial(serve_metrics_http, backend.metrics),
+                                metrics_port + worker_index,
+                                host=metrics_host,
+                            )
+                        )
+
+                    if workers > 1:
+                        listeners = await _open_tcp_listeners_with_reuseport(port, host)
+                        await trio.serve_listeners(_serve_client, listeners)
+                    else:
+                        await trio.serve_tcp(_serve_client, port, host=host)
 
         click.echo(
             f"Starting Parsec Backend on {host}:{port} (db={config.db_type}, "
-            f"blockstore={config.blockstore_config.type})"
+            f"blockstore={config.blockstore_config.type}, workers={workers})"
         )
         try:
-            trio_run(_run_backend, use_asyncio=True)
+            if workers > 1:
+                _run_workers(
+                    workers,
+                    lambda worker_index: trio_run(_run_backend, worker_index, use_asyncio=True),
+                )
+            else:
+                trio_run(_run_backend, use_asyncio=True)
         except KeyboardInterrupt:
             click.echo("bye ;-)")
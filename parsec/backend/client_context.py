@@ -18,6 +18,10 @@ from parsec.api.protocol import (
 from parsec.backend.invite import Invitation
 
 
+# Events not listened yet by the client, above this they are dropped
+EVENTS_QUEUE_SIZE = 1000
+
+
 class BaseClientContext:
     __slots__ = ("transport", "handshake")
 
@@ -45,6 +49,7 @@ class AuthenticatedClientContext(BaseClientContext):
         "event_bus_ctx",
         "channels",
         "realms",
+        "pending_vlobs_updated",
         "conn_id",
         "logger",
     )
@@ -69,8 +74,10 @@ class AuthenticatedClientContext(BaseClientContext):
         self.verify_key = verify_key
 
         self.event_bus_ctx = None  # Overwritten in BackendApp.handle_client
-        self.channels = trio.open_memory_channel(100)
+        self.channels = trio.open_memory_channel(EVENTS_QUEUE_SIZE)
         self.realms = set()
+        # Coalesced `realm.vlobs_updated` events still in the channel, per realm
+        self.pending_vlobs_updated = {}
 
         self.conn_id = self.transport.conn_id
         self.logger = self.transport.logger = self.transport.logger.bind(
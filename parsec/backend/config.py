@@ -38,6 +38,13 @@ class S3BlockStoreConfig(BaseBlockStoreConfig):
     s3_bucket: str
     s3_key: str
     s3_secret: str
+    s3_max_connections: int = 32
+    s3_connect_timeout: float = 5
+    s3_read_timeout: float = 30
+    s3_retries: int = 1
+    # Rely on `If-None-Match` instead of a HEAD request to not overwrite an
+    # existing block, only if the S3 implementation supports it
+    s3_conditional_put: bool = False
 
 
 @attr.s(frozen=True, auto_attribs=True)
@@ -49,6 +56,12 @@ class SWIFTBlockStoreConfig(BaseBlockStoreConfig):
     swift_container: str
     swift_user: str
     swift_password: str
+    swift_max_connections: int = 16
+    swift_timeout: float = 30
+    swift_retries: int = 2
+    # Rely on `If-None-Match` instead of a HEAD request to not overwrite an
+    # existing block, only if the Swift deployment supports it
+    swift_conditional_put: bool = False
 
 
 @attr.s(frozen=True, auto_attribs=True)
@@ -75,6 +88,32 @@ class BackendConfig:
 
     debug: bool
 
+    # Key used to authenticate the session tickets, a random one is generated
+    # if not provided (hence tickets don't survive a backend restart)
+    session_ticket_key: Optional[bytes] = None
+    # Validity in seconds of a session ticket, 0 disables session resumption
+    session_ticket_validity: int = 600
+
+    # Max size in bytes of the cache for certificates lookups (e.g. user
+    # trustchain), 0 disables the cache
+    certificates_cache_max_size: int = 32 * 1024 * 1024
+
+    # Time to live in seconds of the cached organization, user and device
+    # lookups (invalidated on modification anyway), 0 disables the cache
+    lookup_cache_ttl: float = 60
+    lookup_cache_max_entries: int = 100000
+
+    # Notify the signals of multiple transactions as a single notification,
+    # only supported once all the backends sharing the database are upgraded
+    db_batched_notifications: bool = False
+
+    # Max number of client requests processed concurrently, additional ones
+    # wait for their turn (None means `db_max_connections`)
+    max_concurrent_requests: Optional[int] = None
+    # Max number of block requests processed concurrently, so they cannot
+    # starve the metadata ones (None means half of `max_concurrent_requests`)
+    max_concurrent_block_requests: Optional[int] = None
+
     @property
     def db_type(self):
         if self.db_url.upper() == "MOCKED":
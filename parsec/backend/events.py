@@ -2,11 +2,28 @@
 
 import trio
 
-from parsec.api.protocol import events_subscribe_serializer, events_listen_serializer
+from parsec.api.protocol import (
+    events_subscribe_serializer,
+    events_listen_serializer,
+    events_listen_batch_serializer,
+)
 from parsec.backend.utils import catch_protocol_errors, run_with_breathing_transport, api
 from parsec.backend.realm import BaseRealmComponent
 
 
+# Backend events parameters used to only dispatch them to the concerned clients
+EVENTS_ROUTES = {
+    "pinged": ("organization_id",),
+    "realm.roles_updated": ("organization_id", "user"),
+    "realm.vlobs_updated": ("organization_id", "realm_id"),
+    "realm.maintenance_started": ("organization_id", "realm_id"),
+    "realm.maintenance_finished": ("organization_id", "realm_id"),
+    "message.received": ("organization_id", "recipient"),
+    "invite.status_changed": ("organization_id", "greeter"),
+    "user.revoked": ("organization_id", "user_id"),
+}
+
+
 class EventsComponent:
     def __init__(self, realm_component: BaseRealmComponent):
         self._realm_component = realm_component
@@ -16,91 +33,125 @@ class EventsComponent:
     async def api_events_subscribe(self, client_ctx, msg):
         msg = events_subscribe_serializer.req_load(msg)
 
-        def _on_roles_updated(event, organization_id, author, realm_id, user, role):
-            if organization_id != client_ctx.organization_id or user != client_ctx.user_id:
-                return
+        def _listen_realm(realm_id):
+            client_ctx.realms.add(realm_id)
+            for event, cb in realm_events_callbacks.items():
+                client_ctx.event_bus_ctx.connect(
+                    event, cb, route=(client_ctx.organization_id, realm_id)
+                )
+
+        def _unlisten_realm(realm_id):
+            client_ctx.realms.discard(realm_id)
+            for event, cb in realm_events_callbacks.items():
+                client_ctx.event_bus_ctx.disconnect(
+                    event, cb, route=(client_ctx.organization_id, realm_id)
+                )
 
+        def _send_event(event_data):
+            try:
+                client_ctx.send_events_channel.send_nowait(event_data)
+                return True
+            except trio.WouldBlock:
+                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+                return False
+
+        def _on_roles_updated(event, organization_id, author, realm_id, user, role):
             if role is None:
-                client_ctx.realms.discard(realm_id)
-            else:
-                client_ctx.realms.add(realm_id)
+                if realm_id in client_ctx.realms:
+                    _unlisten_realm(realm_id)
+            elif realm_id not in client_ctx.realms:
+                _listen_realm(realm_id)
 
             # Note for this event we don't filter out the ones sent by the client's
             # device, there is two reason for this:
             # 1) A user cannot change it own role, so this case should never occur
             # 2) Returning this event inform the peer we are ready to send it
             #    `realm.vlobs_updated` events on this realm (especially useful during tests)
-            try:
-                client_ctx.send_events_channel.send_nowait(
-                    {"event": event, "realm_id": realm_id, "role": role}
-                )
-            except trio.WouldBlock:
-                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+            _send_event({"event": event, "realm_id": realm_id, "role": role})
 
         def _on_pinged(event, organization_id, author, ping):
-            if organization_id != client_ctx.organization_id or author == client_ctx.device_id:
+            if author == client_ctx.device_id:
                 return
 
-            try:
-                client_ctx.send_events_channel.send_nowait({"event": event, "ping": ping})
-            except trio.WouldBlock:
-                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+            _send_event({"event": event, "ping": ping})
 
         def _on_realm_events(event, organization_id, author, realm_id, **kwargs):
-            if (
-                organization_id != client_ctx.organization_id
-                or author == client_ctx.device_id
-                or realm_id not in client_ctx.realms
-            ):
+            if author == client_ctx.device_id:
                 return
 
-            try:
-                client_ctx.send_events_channel.send_nowait(
-                    {"event": event, "realm_id": realm_id, **kwargs}
-                )
-            except trio.WouldBlock:
-                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+            _send_event({"event": event, "realm_id": realm_id, **kwargs})
 
-        def _on_message_received(event, organization_id, author, recipient, index):
-            if organization_id != client_ctx.organization_id or recipient != client_ctx.user_id:
+        def _on_realm_vlobs_updated(
+            event, organization_id, author, realm_id, checkpoint, src_id, src_version
+        ):
+            if author == client_ctx.device_id:
                 return
 
-            try:
-                client_ctx.send_events_channel.send_nowait({"event": event, "index": index})
-            except trio.WouldBlock:
-                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+            if msg["coalesce_vlobs_updated"]:
+                key = realm_id
+            else:
+                key = (realm_id, src_id)
+            pending = client_ctx.pending_vlobs_updated.get(key)
+            if pending:
+                # An event is still waiting to be listened, merge into it
+                # (only keeping the last version of each vlob)
+                pending.update(checkpoint=checkpoint, src_id=src_id, src_version=src_version)
+                if "changes" in pending:
+                    pending["changes"].pop(src_id, None)
+                    pending["changes"][src_id] = src_version
+
+            else:
+                event_data = {
+                    "event": event,
+                    "realm_id": realm_id,
+                    "checkpoint": checkpoint,
+                    "src_id": src_id,
+                    "src_version": src_version,
+                }
+                if msg["coalesce_vlobs_updated"]:
+                    event_data["changes"] = {src_id: src_version}
+                if _send_event(event_data):
+                    client_ctx.pending_vlobs_updated[key] = event_data
+
+        def _on_message_received(event, organization_id, author, recipient, index):
+            _send_event({"event": event, "index": index})
 
         def _on_invite_status_changed(event, organization_id, greeter, token, status):
-            print("EVENT STATUS CHANGED ====>", organization_id, greeter, token, status)
-            if organization_id != client_ctx.organization_id or greeter != client_ctx.user_id:
-                return
+            _send_event({"event": event, "token": token, "invitation_status": status})
 
-            try:
-                client_ctx.send_events_channel.send_nowait(
-                    {"event": event, "token": token, "invitation_status": status}
-                )
-            except trio.WouldBlock:
-                client_ctx.logger.warning(f"event queue is full for {client_ctx}")
+        realm_events_callbacks = {
+            "realm.vlobs_updated": _on_realm_vlobs_updated,
+            "realm.maintenance_started": _on_realm_events,
+            "realm.maintenance_finished": _on_realm_events,
+        }
 
         # Drop previous event callbacks if any
         client_ctx.event_bus_ctx.clear()
-
-        # Connect the new callbacks
-        client_ctx.event_bus_ctx.connect("pinged", _on_pinged)
-        client_ctx.event_bus_ctx.connect("realm.vlobs_updated", _on_realm_events)
-        client_ctx.event_bus_ctx.connect("realm.maintenance_started", _on_realm_events)
-        client_ctx.event_bus_ctx.connect("realm.maintenance_finished", _on_realm_events)
-        client_ctx.event_bus_ctx.connect("message.received", _on_message_received)
-        client_ctx.event_bus_ctx.connect("invite.status_changed", _on_invite_status_changed)
+        client_ctx.realms = set()
+        client_ctx.pending_vlobs_updated = {}
+
+        # Connect the new callbacks, each one only being called for the
+        # events concerning this client (see `EVENTS_ROUTES`)
+        organization_id = client_ctx.organization_id
+        user_id = client_ctx.user_id
+        client_ctx.event_bus_ctx.connect("pinged", _on_pinged, route=(organization_id,))
+        client_ctx.event_bus_ctx.connect(
+            "message.received", _on_message_received, route=(organization_id, user_id)
+        )
+        client_ctx.event_bus_ctx.connect(
+            "invite.status_changed", _on_invite_status_changed, route=(organization_id, user_id)
+        )
 
         # Final event to keep up to date the list of realm we should listen on
-        client_ctx.event_bus_ctx.connect("realm.roles_updated", _on_roles_updated)
+        client_ctx.event_bus_ctx.connect(
+            "realm.roles_updated", _on_roles_updated, route=(organization_id, user_id)
+        )
 
         # Finally populate the list of realm we should listen on
-        realms_for_user = await self._realm_component.get_realms_for_user(
-            client_ctx.organization_id, client_ctx.user_id
-        )
-        client_ctx.realms = set(realms_for_user.keys())
+        realms_for_user = await self._realm_component.get_realms_for_user(organization_id, user_id)
+        for realm_id in realms_for_user.keys():
+            if realm_id not in client_ctx.realms:
+                _listen_realm(realm_id)
 
         return events_subscribe_serializer.rep_dump({"status": "ok"})
 
@@ -123,4 +174,51 @@ class EventsComponent:
             except trio.WouldBlock:
                 return {"status": "no_events"}
 
+        event_data = _listened_event(client_ctx, event_data)
         return events_listen_serializer.rep_dump({"status": "ok", **event_data})
+
+    @api("events_listen_batch")
+    @catch_protocol_errors
+    async def api_events_listen_batch(self, client_ctx, msg):
+        msg = events_listen_batch_serializer.req_load(msg)
+
+        events = []
+        if msg["wait"]:
+            event_data = await run_with_breathing_transport(
+                client_ctx.transport, client_ctx.receive_events_channel.receive
+            )
+
+            if not event_data:
+                return {"status": "cancelled", "reason": "Client cancelled the listening"}
+
+            events.append(_listened_event(client_ctx, event_data))
+
+        while len(events) < msg["limit"]:
+            try:
+                event_data = client_ctx.receive_events_channel.receive_nowait()
+            except trio.WouldBlock:
+                break
+            events.append(_listened_event(client_ctx, event_data))
+
+        return events_listen_batch_serializer.rep_dump({"status": "ok", "events": events})
+
+
+def _listened_event(client_ctx, event_data: dict) -> dict:
+    if event_data["event"] != "realm.vlobs_updated":
+        return event_data
+
+    # Event is no longer in the channel, so it cannot be updated anymore
+    if "changes" in event_data:
+        key = event_data["realm_id"]
+    else:
+        key = (event_data["realm_id"], event_data["src_id"])
+    if client_ctx.pending_vlobs_updated.get(key) is event_data:
+        del client_ctx.pending_vlobs_updated[key]
+
+    if "changes" in event_data:
+        changes = [
+            {"src_id": src_id, "src_version": src_version}
+            for src_id, src_version in event_data["changes"].items()
+        ]
+        event_data = {**event_data, "changes": changes}
+    return event_data
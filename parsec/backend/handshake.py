@@ -1,16 +1,24 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 from typing import Tuple, Dict, Optional
+from hmac import compare_digest
 from pendulum import now as pendulum_now
 
+from parsec.serde import BaseSchema, fields, SerdeError
+from parsec.crypto import SecretKey
 from parsec.api.transport import Transport
+from parsec.api.data import UserProfileField
 from parsec.api.protocol import (
     ProtocolError,
     InvitationType,
     HandshakeType,
     APIV1_HandshakeType,
     ServerHandshake,
+    OrganizationIDField,
+    DeviceIDField,
+    HumanHandleField,
 )
+from parsec.api.protocol.base import serializer_factory
 from parsec.backend.client_context import (
     BaseClientContext,
     AuthenticatedClientContext,
@@ -23,6 +31,44 @@ from parsec.backend.organization import OrganizationNotFoundError
 from parsec.backend.invite import InvitationError, UserInvitation, DeviceInvitation
 
 
+SESSION_TICKET_MAC_SIZE = 32
+
+
+class SessionTicketSchema(BaseSchema):
+    organization_id = OrganizationIDField(required=True)
+    device_id = DeviceIDField(required=True)
+    rvk = fields.VerifyKey(required=True)
+    human_handle = HumanHandleField(allow_none=True, missing=None)
+    profile = UserProfileField(required=True)
+    public_key = fields.PublicKey(required=True)
+    verify_key = fields.VerifyKey(required=True)
+    expires_on = fields.DateTime(required=True)
+
+
+session_ticket_serializer = serializer_factory(SessionTicketSchema)
+
+
+def build_session_ticket(key: SecretKey, **data) -> bytes:
+    raw = session_ticket_serializer.dumps(data)
+    return raw + key.hmac(raw, digest_size=SESSION_TICKET_MAC_SIZE)
+
+
+def load_session_ticket(key: SecretKey, ticket: bytes) -> Optional[dict]:
+    """
+    Returns None if the ticket has not been issued with this key or has expired.
+    """
+    raw, mac = ticket[:-SESSION_TICKET_MAC_SIZE], ticket[-SESSION_TICKET_MAC_SIZE:]
+    if not compare_digest(key.hmac(raw, digest_size=SESSION_TICKET_MAC_SIZE), mac):
+        return None
+    try:
+        data = session_ticket_serializer.loads(raw)
+    except SerdeError:
+        return None
+    if data["expires_on"] <= pendulum_now():
+        return None
+    return data
+
+
 async def do_handshake(
     backend, transport: Transport
 ) -> Tuple[Optional[BaseClientContext], Optional[Dict]]:
@@ -93,6 +139,20 @@ async def _do_process_authenticated_answer(
             "device_id": device_id,
         }
 
+    session_ticket = handshake.answer_data["session_ticket"]
+    if session_ticket and backend.config.session_ticket_validity:
+        ticket_data = load_session_ticket(backend.session_ticket_key, session_ticket)
+        if (
+            ticket_data
+            and ticket_data["organization_id"] == organization_id
+            and ticket_data["device_id"] == device_id
+            and ticket_data["rvk"] == expected_rvk
+        ):
+            return await _resume_authenticated_session(
+                backend, transport, handshake, ticket_data, _make_error_infos
+            )
+        # Invalid or expired ticket, fall back on the regular authentication
+
     try:
         organization = await backend.organization.get(organization_id)
         user, device = await backend.user.get_user_with_device(organization_id, device_id)
@@ -123,7 +183,74 @@ async def _do_process_authenticated_answer(
         public_key=user.public_key,
         verify_key=device.verify_key,
     )
-    result_req = handshake.build_result_req(device.verify_key)
+
+    if backend.config.session_ticket_validity:
+        expires_on = pendulum_now().add(seconds=backend.config.session_ticket_validity)
+        # Ticket must not allow to bypass the organization expiration
+        if organization.expiration_date is not None:
+            expires_on = min(expires_on, organization.expiration_date)
+        new_session_ticket = build_session_ticket(
+            backend.session_ticket_key,
+            organization_id=organization_id,
+            device_id=device_id,
+            rvk=expected_rvk,
+            human_handle=user.human_handle,
+            profile=user.profile,
+            public_key=user.public_key,
+            verify_key=device.verify_key,
+            expires_on=expires_on,
+        )
+    else:
+        new_session_ticket = None
+
+    result_req = handshake.build_result_req(device.verify_key, session_ticket=new_session_ticket)
+    return context, result_req, None
+
+
+async def _resume_authenticated_session(
+    backend, transport: Transport, handshake: ServerHandshake, ticket_data: dict, make_error_infos
+) -> Tuple[Optional[BaseClientContext], bytes, Optional[Dict]]:
+    """
+    The ticket only saves the device lookup (and the root verify key check):
+    the client must still sign the challenge, and the organization and user
+    are still looked up given the organization may have expired and the user
+    may have been revoked since the ticket was issued (the event-based
+    revocation only applies to the already connected clients). Those lookups
+    are typically served by the backend's lookup cache.
+    """
+    organization_id = ticket_data["organization_id"]
+    device_id = ticket_data["device_id"]
+
+    try:
+        organization = await backend.organization.get(organization_id)
+        user = await backend.user.get_user(organization_id, device_id.user_id)
+
+    except (OrganizationNotFoundError, UserNotFoundError) as exc:
+        result_req = handshake.build_bad_identity_result_req()
+        return None, result_req, make_error_infos(str(exc))
+
+    if organization.expiration_date is not None and organization.expiration_date <= pendulum_now():
+        result_req = handshake.build_organization_expired_result_req()
+        return None, result_req, make_error_infos("Expired organization")
+
+    if user.revoked_on and user.revoked_on <= pendulum_now():
+        result_req = handshake.build_revoked_device_result_req()
+        return None, result_req, make_error_infos("Revoked device")
+
+    context = AuthenticatedClientContext(
+        transport=transport,
+        handshake=handshake,
+        organization_id=organization_id,
+        device_id=device_id,
+        human_handle=ticket_data["human_handle"],
+        profile=ticket_data["profile"],
+        public_key=ticket_data["public_key"],
+        verify_key=ticket_data["verify_key"],
+    )
+    # The ticket is not a bearer token: the device must still prove it owns
+    # the signing key. No new ticket is issued, the client should do a full
+    # handshake once its ticket has expired
+    result_req = handshake.build_result_req(ticket_data["verify_key"])
     return context, result_req, None
 
 
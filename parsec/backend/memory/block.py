@@ -1,18 +1,27 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from uuid import UUID
 import attr
+import trio
+from uuid import UUID
+from typing import Tuple
+from collections import OrderedDict
 
-from parsec.api.protocol import DeviceID, OrganizationID
+from parsec.crypto import HashDigest
+from parsec.api.protocol import DeviceID, OrganizationID, BLOCK_CHUNK_SIZE
 from parsec.api.protocol import RealmRole
 from parsec.backend.realm import BaseRealmComponent, RealmNotFoundError
 from parsec.backend.blockstore import BaseBlockStoreComponent
 from parsec.backend.block import (
+    PENDING_UPLOAD_TIMEOUT,
+    MAX_PENDING_UPLOADS_PER_DEVICE,
+    MAX_PENDING_UPLOADS_SIZE,
     BaseBlockComponent,
     BlockAlreadyExistsError,
     BlockAccessError,
     BlockNotFoundError,
     BlockInMaintenanceError,
+    BlockInvalidChunkError,
+    BlockUploadsLimitReachedError,
 )
 
 
@@ -22,9 +31,24 @@ class BlockMeta:
     size: int
 
 
+@attr.s(slots=True)
+class PendingBlockUpload:
+    author = attr.ib()
+    realm_id = attr.ib()
+    digest = attr.ib()
+    size = attr.ib()
+    chunks = attr.ib(factory=list)
+    received = attr.ib(default=0)
+    last_activity = attr.ib(factory=trio.current_time)
+
+    def is_for(self, realm_id, digest, size):
+        return (self.realm_id, self.digest, self.size) == (realm_id, digest, size)
+
+
 class MemoryBlockComponent(BaseBlockComponent):
     def __init__(self):
         self._blockmetas = {}
+        self._pending_uploads = OrderedDict()
         self._blockstore_component = None
         self._realm_component = None
 
@@ -59,19 +83,31 @@ class MemoryBlockComponent(BaseBlockComponent):
         if realm.status.in_maintenance:
             raise BlockInMaintenanceError(f"Realm `{realm_id}` is currently under maintenance")
 
-    async def read(
-        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID
-    ) -> bytes:
+    def _check_block_read_access(self, organization_id, block_id, user_id):
         try:
             blockmeta = self._blockmetas[(organization_id, block_id)]
 
         except KeyError:
             raise BlockNotFoundError()
 
-        self._check_realm_read_access(organization_id, blockmeta.realm_id, author.user_id)
+        self._check_realm_read_access(organization_id, blockmeta.realm_id, user_id)
+
+    async def read(
+        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID
+    ) -> bytes:
+        self._check_block_read_access(organization_id, block_id, author.user_id)
 
         return await self._blockstore_component.read(organization_id, block_id)
 
+    async def read_chunk(
+        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID, offset: int
+    ) -> Tuple[bytes, int]:
+        self._check_block_read_access(organization_id, block_id, author.user_id)
+
+        return await self._blockstore_component.read_range(
+            organization_id, block_id, offset, BLOCK_CHUNK_SIZE
+        )
+
     async def create(
         self,
         organization_id: OrganizationID,
@@ -85,6 +121,61 @@ class MemoryBlockComponent(BaseBlockComponent):
         await self._blockstore_component.create(organization_id, block_id, block)
         self._blockmetas[(organization_id, block_id)] = BlockMeta(realm_id, len(block))
 
+    async def create_chunk(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        block_id: UUID,
+        realm_id: UUID,
+        digest: HashDigest,
+        size: int,
+        offset: int,
+        chunk: bytes,
+    ) -> int:
+        # Memory backend runs in a single process, so uploads in progress
+        # can simply be kept in memory
+        key = (organization_id, author, block_id)
+        upload = self._pending_uploads.get(key)
+        if not upload or not upload.is_for(realm_id, digest, size):
+            upload = PendingBlockUpload(author, realm_id, digest, size)
+        self._pending_uploads[key] = upload
+        self._pending_uploads.move_to_end(key)
+        upload.last_activity = trio.current_time()
+        self._forget_stale_pending_uploads(author)
+
+        if offset != upload.received:
+            return upload.received
+        if offset + len(chunk) > size:
+            del self._pending_uploads[key]
+            raise BlockInvalidChunkError("Chunk goes beyond the block size")
+        pending_size = sum(upload.received for upload in self._pending_uploads.values())
+        if pending_size + len(chunk) > MAX_PENDING_UPLOADS_SIZE:
+            raise BlockUploadsLimitReachedError()
+
+        upload.chunks.append(chunk)
+        upload.received += len(chunk)
+        if upload.received < size:
+            return upload.received
+
+        del self._pending_uploads[key]
+        block = b"".join(upload.chunks)
+        if HashDigest.from_data(block) != digest:
+            raise BlockInvalidChunkError("Block digest mismatch")
+        await self.create(organization_id, author, block_id, realm_id, block)
+        return size
+
+    def _forget_stale_pending_uploads(self, author: DeviceID) -> None:
+        now = trio.current_time()
+        author_uploads = []
+        for key, upload in list(self._pending_uploads.items()):
+            if now - upload.last_activity > PENDING_UPLOAD_TIMEOUT:
+                del self._pending_uploads[key]
+            elif upload.author == author:
+                author_uploads.append(key)
+        # Uploads are ordered from the least recently active
+        for key in author_uploads[:-MAX_PENDING_UPLOADS_PER_DEVICE]:
+            del self._pending_uploads[key]
+
 
 class MemoryBlockStoreComponent(BaseBlockStoreComponent):
     def __init__(self):
@@ -6,7 +6,8 @@ from async_generator import asynccontextmanager
 
 from parsec.event_bus import EventBus
 from parsec.backend.config import BackendConfig
-from parsec.backend.blockstore import blockstore_factory
+from parsec.backend.metrics import BackendMetrics
+from parsec.backend.blockstore import blockstore_factory, MeasuredBlockStoreComponent
 from parsec.backend.events import EventsComponent
 from parsec.backend.memory.organization import MemoryOrganizationComponent
 from parsec.backend.memory.ping import MemoryPingComponent
@@ -19,7 +20,7 @@ from parsec.backend.memory.block import MemoryBlockComponent
 
 
 @asynccontextmanager
-async def components_factory(config: BackendConfig, event_bus: EventBus):
+async def components_factory(config: BackendConfig, event_bus: EventBus, metrics: BackendMetrics):
     (send_events_channel, receive_events_channel) = trio.open_memory_channel(math.inf)
 
     async def _send_event(event: str, **kwargs):
@@ -53,8 +54,16 @@ async def components_factory(config: BackendConfig, event_bus: EventBus):
         "block": block,
         "blockstore": blockstore,
     }
-    for component in (organization, user, invite, message, realm, vlob, ping, block):
+    for component in (organization, user, invite, message, realm, vlob, ping):
         component.register_components(**components)
+    block.register_components(
+        **{
+            **components,
+            "blockstore": MeasuredBlockStoreComponent(
+                blockstore, config.blockstore_config.type, metrics
+            ),
+        }
+    )
 
     async with trio.open_service_nursery() as nursery:
         nursery.start_soon(_dispatch_event)
@@ -109,3 +109,11 @@ class MemoryOrganizationComponent(BaseOrganizationComponent):
             )
         except KeyError:
             raise OrganizationNotFoundError()
+
+    async def set_compact_manifests(self, id: OrganizationID, compact_manifests: bool) -> None:
+        try:
+            self._organizations[id] = self._organizations[id].evolve(
+                compact_manifests=compact_manifests
+            )
+        except KeyError:
+            raise OrganizationNotFoundError()
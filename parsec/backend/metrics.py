@@ -0,0 +1,204 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import trio
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple, Iterable
+
+
+# In seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_HTTP_REQUEST_MAX_SIZE = 8192
+METRICS_HTTP_TIMEOUT = 5
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Last count is for the values above the biggest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        for i, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+
+
+class BackendMetrics:
+    """
+    In-process metrics of the backend, rendered in the Prometheus text format.
+
+    Each backend process has its own metrics (hence with multiple workers,
+    each worker must be scraped).
+    """
+
+    def __init__(self):
+        self.request_duration: Dict[Labels, Histogram] = defaultdict(Histogram)
+        self.requests_total: Dict[Labels, int] = defaultdict(int)
+        self.request_bytes: Dict[Labels, int] = defaultdict(int)
+        self.response_bytes: Dict[Labels, int] = defaultdict(int)
+        self.requests_in_flight: Dict[Labels, int] = defaultdict(int)
+        self.pg_pool_acquire_duration = Histogram()
+        self.blockstore_op_duration: Dict[Labels, Histogram] = defaultdict(Histogram)
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[Labels, float]]]] = []
+
+    def add_gauge(self, name: str, doc: str, collect: Callable[[], Dict[Labels, float]]) -> None:
+        """
+        `collect` is called each time the metrics are rendered
+        """
+        self._gauges.append((name, doc, collect))
+
+    def request_started(self, cmd: str) -> None:
+        self.requests_in_flight[(("cmd", cmd),)] += 1
+
+    def request_done(self, cmd: str, status: str, duration: float) -> None:
+        self.requests_in_flight[(("cmd", cmd),)] -= 1
+        self.request_duration[(("cmd", cmd),)].observe(duration)
+        self.requests_total[(("cmd", cmd), ("status", status))] += 1
+
+    def observe_payloads(self, cmd: str, request_size: int, response_size: int) -> None:
+        self.request_bytes[(("cmd", cmd),)] += request_size
+        self.response_bytes[(("cmd", cmd),)] += response_size
+
+    def observe_pg_pool_acquire(self, duration: float) -> None:
+        self.pg_pool_acquire_duration.observe(duration)
+
+    def observe_blockstore_op(self, blockstore: str, op: str, duration: float) -> None:
+        self.blockstore_op_duration[(("blockstore", blockstore), ("op", op))].observe(duration)
+
+    def render(self) -> str:
+        lines = []
+
+        def _render_family(name, doc, type, samples: Iterable[Tuple[str, Labels, float]]):
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {value}")
+
+        def _histogram_samples(histograms: Dict[Labels, Histogram]):
+            for labels, histogram in sorted(histograms.items()):
+                cumulated = 0
+                for bucket, count in zip(histogram.buckets, histogram.counts):
+                    cumulated += count
+                    yield "_bucket", labels + (("le", str(bucket)),), cumulated
+                yield "_bucket", labels + (("le", "+Inf"),), histogram.count
+                yield "_sum", labels, histogram.sum
+                yield "_count", labels, histogram.count
+
+        def _samples(values: Dict[Labels, float]):
+            for labels, value in sorted(values.items()):
+                yield "", labels, value
+
+        _render_family(
+            "parsec_backend_request_duration_seconds",
+            "Time spent processing the client requests.",
+            "histogram",
+            _histogram_samples(self.request_duration),
+        )
+        _render_family(
+            "parsec_backend_requests_total",
+            "Client requests processed.",
+            "counter",
+            _samples(self.requests_total),
+        )
+        _render_family(
+            "parsec_backend_requests_in_flight",
+            "Client requests currently being processed.",
+            "gauge",
+            _samples(self.requests_in_flight),
+        )
+        _render_family(
+            "parsec_backend_request_bytes_total",
+            "Size of the client requests.",
+            "counter",
+            _samples(self.request_bytes),
+        )
+        _render_family(
+            "parsec_backend_response_bytes_total",
+            "Size of the responses sent to the clients.",
+            "counter",
+            _samples(self.response_bytes),
+        )
+        _render_family(
+            "parsec_backend_pg_pool_acquire_duration_seconds",
+            "Time spent waiting for a PostgreSQL connection from the pool.",
+            "histogram",
+            _histogram_samples(
+                {(): self.pg_pool_acquire_duration} if self.pg_pool_acquire_duration.count else {}
+            ),
+        )
+        _render_family(
+            "parsec_backend_blockstore_op_duration_seconds",
+            "Time spent in blockstore operations.",
+            "histogram",
+            _histogram_samples(self.blockstore_op_duration),
+        )
+        for name, doc, collect in self._gauges:
+            _render_family(name, doc, "gauge", _samples(collect()))
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    formatted = ",".join(
+        '{}="{}"'.format(
+            key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for key, value in labels
+    )
+    return f"{{{formatted}}}"
+
+
+async def serve_metrics_http(metrics: BackendMetrics, stream: trio.abc.Stream) -> None:
+    """
+    Minimal HTTP/1.1 server answering `GET /metrics` with the rendered metrics,
+    intended to be exposed on an admin port only.
+    """
+    try:
+        data = b""
+        with trio.move_on_after(METRICS_HTTP_TIMEOUT):
+            while b"\r\n\r\n" not in data and len(data) < METRICS_HTTP_REQUEST_MAX_SIZE:
+                chunk = await stream.receive_some(4096)
+                if not chunk:
+                    break
+                data += chunk
+
+        request_line = data.split(b"\r\n", 1)[0].split()
+        if len(request_line) == 3 and request_line[0] == b"GET":
+            if request_line[1].split(b"?", 1)[0] == b"/metrics":
+                status = b"200 OK"
+                body = metrics.render().encode("utf8")
+            else:
+                status = b"404 Not Found"
+                body = b"Not Found"
+        else:
+            status = b"400 Bad Request"
+            body = b"Bad Request"
+
+        headers = (
+            b"HTTP/1.1 %s\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: %d\r\n"
+            b"Connection: close\r\n"
+            b"\r\n"
+        ) % (status, len(body))
+        await stream.send_all(headers + body)
+
+    except trio.BrokenResourceError:
+        pass
+
+    finally:
+        await stream.aclose()
@@ -17,6 +17,7 @@ from parsec.api.protocol import (
     apiv1_organization_stats_serializer,
     apiv1_organization_status_serializer,
     apiv1_organization_update_serializer,
+    organization_config_serializer,
 )
 from parsec.api.data import UserCertificateContent, DeviceCertificateContent, DataError, UserProfile
 from parsec.backend.user import User, Device
@@ -57,6 +58,7 @@ class Organization:
     bootstrap_token: str
     expiration_date: Optional[Pendulum] = None
     root_verify_key: Optional[VerifyKey] = None
+    compact_manifests: bool = False
 
     def is_bootstrapped(self):
         return self.root_verify_key is not None
@@ -117,6 +119,7 @@ class BaseOrganizationComponent:
             {
                 "is_bootstrapped": organization.is_bootstrapped(),
                 "expiration_date": organization.expiration_date,
+                "compact_manifests": organization.compact_manifests,
                 "status": "ok",
             }
         )
@@ -147,15 +150,30 @@ class BaseOrganizationComponent:
         msg = apiv1_organization_update_serializer.req_load(msg)
 
         try:
-            await self.set_expiration_date(
-                msg["organization_id"], expiration_date=msg["expiration_date"]
-            )
+            if "expiration_date" in msg:
+                await self.set_expiration_date(
+                    msg["organization_id"], expiration_date=msg["expiration_date"]
+                )
+            if "compact_manifests" in msg:
+                await self.set_compact_manifests(
+                    msg["organization_id"], compact_manifests=msg["compact_manifests"]
+                )
 
         except OrganizationNotFoundError:
             return {"status": "not_found"}
 
         return apiv1_organization_update_serializer.rep_dump({"status": "ok"})
 
+    @api("organization_config")
+    @catch_protocol_errors
+    async def api_organization_config(self, client_ctx, msg):
+        msg = organization_config_serializer.req_load(msg)
+
+        organization = await self.get(client_ctx.organization_id)
+        return organization_config_serializer.rep_dump(
+            {"status": "ok", "compact_manifests": organization.compact_manifests}
+        )
+
     @api("organization_bootstrap", handshake_types=[APIV1_HandshakeType.ANONYMOUS])
     @catch_protocol_errors
     async def api_organization_bootstrap(self, client_ctx, msg):
@@ -319,3 +337,10 @@ class BaseOrganizationComponent:
             OrganizationNotFoundError
         """
         raise NotImplementedError()
+
+    async def set_compact_manifests(self, id: OrganizationID, compact_manifests: bool) -> None:
+        """
+        Raises:
+            OrganizationNotFoundError
+        """
+        raise NotImplementedError()
@@ -2,19 +2,26 @@
 
 from triopg.exceptions import UniqueViolationError
 from uuid import UUID
+from typing import Tuple
 import pendulum
 from pypika import Parameter
 
-from parsec.api.protocol import DeviceID, OrganizationID
+from parsec.crypto import HashDigest
+from parsec.api.protocol import DeviceID, OrganizationID, BLOCK_CHUNK_SIZE
 from parsec.backend.vlob import BaseVlobComponent
 from parsec.backend.blockstore import BaseBlockStoreComponent
 from parsec.backend.block import (
+    PENDING_UPLOAD_TIMEOUT,
+    MAX_PENDING_UPLOADS_PER_DEVICE,
+    MAX_PENDING_UPLOADS_SIZE,
     BaseBlockComponent,
     BlockError,
     BlockAlreadyExistsError,
     BlockNotFoundError,
     BlockAccessError,
     BlockInMaintenanceError,
+    BlockInvalidChunkError,
+    BlockUploadsLimitReachedError,
 )
 from parsec.backend.postgresql.handler import PGHandler
 from parsec.backend.postgresql.utils import Query, fn_exists
@@ -77,6 +84,112 @@ _q_insert_block = (
 )
 
 
+_q_delete_stale_block_uploads = """
+DELETE FROM block_upload WHERE last_activity < $1
+"""
+
+
+_q_insert_block_upload = """
+INSERT INTO block_upload (
+    organization,
+    block_id,
+    author,
+    realm_id,
+    digest,
+    size,
+    received,
+    last_activity
+)
+SELECT
+    ({}), $3, ({}), $4, $5, $6, 0, $7
+ON CONFLICT (organization, author, block_id) DO NOTHING
+""".format(
+    q_organization_internal_id(Parameter("$1")),
+    q_device_internal_id(organization_id=Parameter("$1"), device_id=Parameter("$2")),
+)
+
+
+_q_get_block_upload = """
+SELECT
+    _id,
+    realm_id,
+    digest,
+    size,
+    received
+FROM block_upload
+WHERE
+    organization = ({})
+    AND author = ({})
+    AND block_id = $3
+FOR UPDATE
+""".format(
+    q_organization_internal_id(Parameter("$1")),
+    q_device_internal_id(organization_id=Parameter("$1"), device_id=Parameter("$2")),
+)
+
+
+_q_reset_block_upload = """
+UPDATE block_upload
+SET
+    realm_id = $2,
+    digest = $3,
+    size = $4,
+    received = 0
+WHERE _id = $1
+"""
+
+
+_q_touch_block_upload = """
+UPDATE block_upload SET last_activity = $2 WHERE _id = $1
+"""
+
+
+# Least recently active uploads of the author beyond the limit (the current
+# upload being the most recently active one)
+_q_delete_extra_block_uploads = """
+DELETE FROM block_upload
+WHERE _id IN (
+    SELECT _id
+    FROM block_upload
+    WHERE
+        author = (SELECT author FROM block_upload WHERE _id = $1)
+        AND _id != $1
+    ORDER BY last_activity DESC
+    OFFSET $2
+)
+"""
+
+
+_q_get_block_uploads_size = """
+SELECT COALESCE(SUM(received), 0) FROM block_upload
+"""
+
+
+_q_insert_block_upload_chunk = """
+INSERT INTO block_upload_chunk (upload, chunk_offset, data) VALUES ($1, $2, $3)
+"""
+
+
+_q_update_block_upload_received = """
+UPDATE block_upload SET received = $2 WHERE _id = $1
+"""
+
+
+_q_get_block_upload_chunks = """
+SELECT data FROM block_upload_chunk WHERE upload = $1 ORDER BY chunk_offset
+"""
+
+
+_q_delete_block_upload_chunks = """
+DELETE FROM block_upload_chunk WHERE upload = $1
+"""
+
+
+_q_delete_block_upload = """
+DELETE FROM block_upload WHERE _id = $1
+"""
+
+
 async def _check_realm(conn, organization_id, realm_id):
     try:
         rep = await get_realm_status(conn, organization_id, realm_id)
@@ -99,9 +212,9 @@ class PGBlockComponent(BaseBlockComponent):
         self._blockstore_component = blockstore_component
         self._vlob_component = vlob_component
 
-    async def read(
+    async def _check_block_read_access(
         self, organization_id: OrganizationID, author: DeviceID, block_id: UUID
-    ) -> bytes:
+    ) -> None:
         async with self.dbh.pool.acquire() as conn, conn.transaction():
             realm_id = await conn.fetchval(_q_get_realm_id_from_block_id, organization_id, block_id)
             if not realm_id:
@@ -114,8 +227,20 @@ class PGBlockComponent(BaseBlockComponent):
             elif not ret[1]:
                 raise BlockAccessError()
 
+    async def read(
+        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID
+    ) -> bytes:
+        await self._check_block_read_access(organization_id, author, block_id)
         return await self._blockstore_component.read(organization_id, block_id)
 
+    async def read_chunk(
+        self, organization_id: OrganizationID, author: DeviceID, block_id: UUID, offset: int
+    ) -> Tuple[bytes, int]:
+        await self._check_block_read_access(organization_id, author, block_id)
+        return await self._blockstore_component.read_range(
+            organization_id, block_id, offset, BLOCK_CHUNK_SIZE
+        )
+
     async def create(
         self,
         organization_id: OrganizationID,
@@ -167,6 +292,80 @@ class PGBlockComponent(BaseBlockComponent):
             if ret != "INSERT 0 1":
                 raise BlockError(f"Insertion error: {ret}")
 
+    async def create_chunk(
+        self,
+        organization_id: OrganizationID,
+        author: DeviceID,
+        block_id: UUID,
+        realm_id: UUID,
+        digest: HashDigest,
+        size: int,
+        offset: int,
+        chunk: bytes,
+    ) -> int:
+        now = pendulum.now()
+        error = None
+        async with self.dbh.pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                _q_delete_stale_block_uploads, now.subtract(seconds=PENDING_UPLOAD_TIMEOUT)
+            )
+            await conn.execute(
+                _q_insert_block_upload,
+                organization_id,
+                author,
+                block_id,
+                realm_id,
+                digest,
+                size,
+                now,
+            )
+            upload_id, *upload_params, received = await conn.fetchrow(
+                _q_get_block_upload, organization_id, author, block_id
+            )
+            if tuple(upload_params) != (realm_id, digest, size):
+                # The upload has been started over with other data
+                await conn.execute(_q_delete_block_upload_chunks, upload_id)
+                await conn.execute(_q_reset_block_upload, upload_id, realm_id, digest, size)
+                received = 0
+            await conn.execute(_q_touch_block_upload, upload_id, now)
+            await conn.execute(
+                _q_delete_extra_block_uploads, upload_id, MAX_PENDING_UPLOADS_PER_DEVICE - 1
+            )
+
+            if offset != received:
+                return received
+
+            # Errors are raised once the transaction is committed so the
+            # upload deletion is not rolled back
+            if offset + len(chunk) > size:
+                await conn.execute(_q_delete_block_upload, upload_id)
+                error = BlockInvalidChunkError("Chunk goes beyond the block size")
+
+            elif (
+                await conn.fetchval(_q_get_block_uploads_size) + len(chunk)
+                > MAX_PENDING_UPLOADS_SIZE
+            ):
+                error = BlockUploadsLimitReachedError()
+
+            else:
+                await conn.execute(_q_insert_block_upload_chunk, upload_id, offset, chunk)
+                received += len(chunk)
+                if received < size:
+                    await conn.execute(_q_update_block_upload_received, upload_id, received)
+                    return received
+
+                rows = await conn.fetch(_q_get_block_upload_chunks, upload_id)
+                await conn.execute(_q_delete_block_upload, upload_id)
+
+        if error:
+            raise error
+
+        block = b"".join(row[0] for row in rows)
+        if HashDigest.from_data(block) != digest:
+            raise BlockInvalidChunkError("Block digest mismatch")
+        await self.create(organization_id, author, block_id, realm_id, block)
+        return size
+
 
 _q_get_block_data = (
     Query.from_(t_block_data)
@@ -176,6 +375,17 @@ _q_get_block_data = (
 ).get_sql()
 
 
+_q_get_block_data_range = """
+SELECT
+    SUBSTRING(data FROM $3 FOR $4),
+    LENGTH(data)
+FROM block_data
+WHERE
+    organization_id = $1
+    AND block_id = $2
+"""
+
+
 _q_insert_block_data = (
     Query.into(t_block_data)
     .columns("organization_id", "block_id", "data")
@@ -196,6 +406,19 @@ class PGBlockStoreComponent(BaseBlockStoreComponent):
 
             return ret[0]
 
+    async def read_range(
+        self, organization_id: OrganizationID, id: UUID, offset: int, size: int
+    ) -> Tuple[bytes, int]:
+        async with self.dbh.pool.acquire() as conn:
+            # SQL substring starts at index 1
+            ret = await conn.fetchrow(
+                _q_get_block_data_range, organization_id, id, offset + 1, size
+            )
+            if not ret:
+                raise BlockNotFoundError()
+
+            return ret[0], ret[1]
+
     async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
         async with self.dbh.pool.acquire() as conn:
             try:
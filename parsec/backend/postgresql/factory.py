@@ -6,8 +6,10 @@ from async_generator import asynccontextmanager
 from parsec.event_bus import EventBus
 from parsec.backend.config import BackendConfig
 from parsec.backend.events import EventsComponent
-from parsec.backend.blockstore import blockstore_factory
+from parsec.backend.metrics import BackendMetrics
+from parsec.backend.blockstore import blockstore_factory, MeasuredBlockStoreComponent
 from parsec.backend.postgresql.handler import PGHandler
+from parsec.backend.postgresql.query_cache import QueryCache
 from parsec.backend.postgresql.organization import PGOrganizationComponent
 from parsec.backend.postgresql.ping import PGPingComponent
 from parsec.backend.postgresql.user import PGUserComponent
@@ -19,18 +21,41 @@ from parsec.backend.postgresql.block import PGBlockComponent
 
 
 @asynccontextmanager
-async def components_factory(config: BackendConfig, event_bus: EventBus):
-    dbh = PGHandler(config.db_url, config.db_min_connections, config.db_max_connections, event_bus)
+async def components_factory(config: BackendConfig, event_bus: EventBus, metrics: BackendMetrics):
+    dbh = PGHandler(
+        config.db_url,
+        config.db_min_connections,
+        config.db_max_connections,
+        event_bus,
+        metrics=metrics,
+        batched_notifications=config.db_batched_notifications,
+    )
 
-    organization = PGOrganizationComponent(dbh)
-    user = PGUserComponent(dbh, event_bus)
+    certificates_cache = QueryCache(config.certificates_cache_max_size)
+    metrics.add_gauge(
+        "parsec_backend_certificates_cache",
+        "Certificates cache statistics.",
+        lambda: {(("stat", key),): value for key, value in certificates_cache.stats().items()},
+    )
+
+    lookup_cache = QueryCache(config.lookup_cache_max_entries, ttl=config.lookup_cache_ttl)
+    metrics.add_gauge(
+        "parsec_backend_lookup_cache",
+        "Organization, user and device lookups cache statistics.",
+        lambda: {(("stat", key),): value for key, value in lookup_cache.stats().items()},
+    )
+
+    organization = PGOrganizationComponent(dbh, event_bus, lookup_cache)
+    user = PGUserComponent(dbh, event_bus, certificates_cache, lookup_cache)
     invite = PGInviteComponent(dbh, event_bus)
     message = PGMessageComponent(dbh)
-    realm = PGRealmComponent(dbh)
+    realm = PGRealmComponent(dbh, event_bus, certificates_cache)
     vlob = PGVlobComponent(dbh)
     ping = PGPingComponent(dbh)
     blockstore = blockstore_factory(config.blockstore_config, postgresql_dbh=dbh)
-    block = PGBlockComponent(dbh, blockstore, vlob)
+    block = PGBlockComponent(
+        dbh, MeasuredBlockStoreComponent(blockstore, config.blockstore_config.type, metrics), vlob
+    )
     events = EventsComponent(realm)
 
     async with trio.open_service_nursery() as nursery:
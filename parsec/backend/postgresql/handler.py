@@ -3,9 +3,12 @@
 import trio
 import attr
 import re
+from contextvars import ContextVar
+from async_generator import asynccontextmanager
+from time import perf_counter
 from pendulum import now as pendulum_now
 import triopg
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 
 from triopg import UniqueViolationError, UndefinedTableError, PostgresError
 from uuid import uuid4
@@ -16,6 +19,7 @@ import importlib_resources
 
 
 from parsec.event_bus import EventBus
+from parsec.backend.metrics import BackendMetrics
 from parsec.serde import packb, unpackb
 from parsec.utils import start_task, TaskStatus
 from parsec.backend.postgresql.tables import STR_TO_REALM_ROLE, STR_TO_INVITATION_STATUS
@@ -147,16 +151,60 @@ def retry_on_unique_violation(fn):
     return wrapper
 
 
+class MeasuredPool:
+    """
+    Connection pool recording the time spent waiting for a connection
+    """
+
+    def __init__(self, pool, metrics: BackendMetrics):
+        self._pool = pool
+        self._metrics = metrics
+
+    @asynccontextmanager
+    async def acquire(self):
+        start = perf_counter()
+        async with self._pool.acquire() as conn:
+            self._metrics.observe_pg_pool_acquire(perf_counter() - start)
+            yield conn
+
+
+# Every signal gets its own notification on the legacy channel, which is still
+# listened to so that the notifications of older backends are received during
+# a rolling upgrade
+NOTIFICATION_CHANNEL = "app_notification"
+# Signals from multiple transactions batched into a single notification
+BATCHED_NOTIFICATION_CHANNEL = "app_notification_v2"
+# PostgreSQL's NOTIFY payload must be shorter than 8000 bytes
+NOTIFICATION_PAYLOAD_MAX_SIZE = 7000
+# In seconds, time given to the signals of concurrent transactions to pile up
+# before being notified as a batch
+NOTIFICATIONS_FLUSH_INTERVAL = 0.01
+
+
 # TODO: replace by a fonction
 class PGHandler:
-    def __init__(self, url: str, min_connections: int, max_connections: int, event_bus: EventBus):
+    def __init__(
+        self,
+        url: str,
+        min_connections: int,
+        max_connections: int,
+        event_bus: EventBus,
+        metrics: Optional[BackendMetrics] = None,
+        batched_notifications: bool = False,
+    ):
         self.url = url
         self.min_connections = min_connections
         self.max_connections = max_connections
         self.event_bus = event_bus
-        self.pool: triopg.TrioPoolProxy
+        self.metrics = metrics
+        # Older backends don't listen to the batched notifications channel,
+        # hence it can only be used once all the backends have been upgraded
+        self.batched_notifications = batched_notifications
+        self.pool: Union[triopg.TrioPoolProxy, MeasuredPool]
         self.notification_conn: triopg.TrioConnectionProxy
         self._task_status: Optional[TaskStatus] = None
+        self._pending_signals: List[dict] = []
+        self._signals_pending = trio.Event()
 
     async def init(self, nursery):
         self._task_status = await start_task(nursery, self._run_connections)
@@ -164,19 +212,37 @@ class PGHandler:
     async def _run_connections(self, task_status=trio.TASK_STATUS_IGNORED):
         async with triopg.create_pool(
             self.url, min_size=self.min_connections, max_size=self.max_connections
-        ) as self.pool:
+        ) as pool:
+            self.pool = MeasuredPool(pool, self.metrics) if self.metrics else pool
             # This connection is dedicated to the notifications listening, so it
             # would only complicate stuff to include it into the connection pool
             async with triopg.connect(self.url) as self.notification_conn:
-                await self.notification_conn.add_listener("app_notification", self._on_notification)
-                task_status.started()
-                await trio.sleep_forever()
+                await self.notification_conn.add_listener(
+                    NOTIFICATION_CHANNEL, self._on_notification
+                )
+                await self.notification_conn.add_listener(
+                    BATCHED_NOTIFICATION_CHANNEL, self._on_batched_notification
+                )
+                async with trio.open_service_nursery() as nursery:
+                    if self.batched_notifications:
+                        nursery.start_soon(self._flush_notifications)
+                    task_status.started()
+                    await trio.sleep_forever()
 
     def _on_notification(self, connection, pid, channel, payload):
         data = unpackb(b64decode(payload.encode("ascii")))
         data.pop("__id__")  # Simply discard the notification id
-        signal = data.pop("__signal__")
         logger.debug("notif received", pid=pid, channel=channel, payload=payload)
+        self._dispatch_signal(data)
+
+    def _on_batched_notification(self, connection, pid, channel, payload):
+        data = unpackb(b64decode(payload.encode("ascii")))
+        logger.debug("notifs received", pid=pid, channel=channel, count=len(data["signals"]))
+        for signal_data in data["signals"]:
+            self._dispatch_signal(signal_data)
+
+    def _dispatch_signal(self, data: dict) -> None:
+        signal = data.pop("__signal__")
         # Kind of a hack, but fine enough for the moment
         if signal == "realm.roles_updated":
             data["role"] = STR_TO_REALM_ROLE.get(data.pop("role_str"))
@@ -184,20 +250,134 @@ class PGHandler:
             data["status"] = STR_TO_INVITATION_STATUS.get(data.pop("status_str"))
         self.event_bus.send(signal, **data)
 
+    @asynccontextmanager
+    async def deferred_signals_transaction(self, conn):
+        """
+        Open a transaction on `conn`, whose signals are buffered until it is
+        commited. They are then notified along with the ones of the other
+        transactions commited in the meantime, as a single batched notification.
+
+        Signals are notified as usual if batched notifications are not enabled.
+        Otherwise note they are sent outside of the transaction guarantees (i.e.
+        they are lost if the backend stops right after the commit), which is
+        fine for the signals clients can recover from (e.g. `realm.vlobs_updated`
+        given the realm checkpoint).
+        """
+        if not self.batched_notifications:
+            async with conn.transaction():
+                yield
+            return
+
+        signals = []
+        token = _signals_batch.set((conn, signals))
+        try:
+            async with conn.transaction():
+                yield
+        finally:
+            _signals_batch.reset(token)
+        if signals:
+            self._pending_signals += signals
+            self._signals_pending.set()
+
+    async def _flush_notifications(self):
+        while True:
+            await self._signals_pending.wait()
+            await trio.sleep(NOTIFICATIONS_FLUSH_INTERVAL)
+            self._signals_pending = trio.Event()
+            signals, self._pending_signals = self._pending_signals, []
+            try:
+                async with self.pool.acquire() as conn:
+                    await conn.execute(
+                        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                        BATCHED_NOTIFICATION_CHANNEL,
+                        _dump_batched_payloads(signals),
+                    )
+
+            except PostgresError as exc:
+                logger.warning("Cannot send notifications", count=len(signals), exc_info=exc)
+
+            else:
+                logger.debug("notifs sent", count=len(signals))
+
     async def teardown(self):
         if self._task_status:
             await self._task_status.cancel_and_join()
 
 
-async def send_signal(conn, signal, **kwargs):
+def _dump_payload(data: dict) -> str:
     # PostgreSQL's NOTIFY only accept string as payload, hence we must
     # use base64 on our payload...
 
     # Add UUID to ensure the payload is unique given it seems Postgresql can
     # drop duplicated NOTIFY (same channel/payload)
     # see: https://github.com/Scille/parsec-cloud/issues/199
-    raw_data = b64encode(packb({"__id__": uuid4().hex, "__signal__": signal, **kwargs})).decode(
-        "ascii"
-    )
-    await conn.execute("SELECT pg_notify($1, $2)", "app_notification", raw_data)
-    logger.debug("notif sent", signal=signal, kwargs=kwargs)
+    return b64encode(packb({"__id__": uuid4().hex, **data})).decode("ascii")
+
+
+def _dump_batched_payloads(signals: List[dict]) -> List[str]:
+    payloads = []
+    batch = []
+    batch_size = 0
+    for signal_data in signals:
+        size = len(packb(signal_data))
+        # Base64 encoding adds a third to the size
+        if batch and (batch_size + size) * 4 // 3 > NOTIFICATION_PAYLOAD_MAX_SIZE:
+            payloads.append(_dump_payload({"signals": batch}))
+            batch = []
+            batch_size = 0
+        batch.append(signal_data)
+        batch_size += size
+    if batch:
+        payloads.append(_dump_payload({"signals": batch}))
+    return payloads
+
+
+# Signals sent from within a `batched_signals` context (or a
+# `PGHandler.deferred_signals_transaction` one) are buffered there
+_signals_batch: ContextVar = ContextVar("signals_batch", default=None)
+
+
+@asynccontextmanager
+async def batched_signals(conn):
+    """
+    Buffer the signals sent on `conn` and notify them all in a single query
+    when leaving the context. This is intended to be used inside a transaction
+    (hence the signals are still only received by the listeners once it is
+    commited), and the buffered signals are simply discarded if an exception
+    occurs.
+
+    Note each signal still gets its own notification on the legacy channel,
+    see `PGHandler.deferred_signals_transaction` to batch them into a single notification.
+    """
+    batch = _signals_batch.get()
+    if batch is not None and batch[0] is conn:
+        # Already in a batch for this connection
+        yield
+        return
+
+    signals = []
+    token = _signals_batch.set((conn, signals))
+    try:
+        yield
+    finally:
+        _signals_batch.reset(token)
+    if signals:
+        await conn.execute(
+            "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+            NOTIFICATION_CHANNEL,
+            [_dump_payload(signal_data) for signal_data in signals],
+        )
+        logger.debug("notifs sent", count=len(signals))
+
+
+async def send_signal(conn, signal, **kwargs):
+    signal_data = {"__signal__": signal, **kwargs}
+    batch = _signals_batch.get()
+    if batch is not None and batch[0] is conn:
+        batch[1].append(signal_data)
+        logger.debug("notif buffered", signal=signal, kwargs=kwargs)
+    else:
+        await conn.execute(
+            "SELECT pg_notify($1, $2)", NOTIFICATION_CHANNEL, _dump_payload(signal_data)
+        )
+        logger.debug("notif sent", signal=signal, kwargs=kwargs)
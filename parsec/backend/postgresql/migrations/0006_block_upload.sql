@@ -0,0 +1,33 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+
+-------------------------------------------------------
+--  Migration
+-------------------------------------------------------
+
+
+-- Chunked block uploads in progress, stored in database so that any
+-- backend instance can receive the next chunk
+CREATE TABLE block_upload (
+    _id SERIAL PRIMARY KEY,
+    organization INTEGER REFERENCES organization (_id) NOT NULL,
+    block_id UUID NOT NULL,
+    author INTEGER REFERENCES device (_id) NOT NULL,
+    realm_id UUID NOT NULL,
+    digest BYTEA NOT NULL,
+    size INTEGER NOT NULL,
+    received INTEGER NOT NULL,
+    last_activity TIMESTAMPTZ NOT NULL,
+
+    UNIQUE(organization, author, block_id)
+);
+
+
+CREATE TABLE block_upload_chunk (
+    _id SERIAL PRIMARY KEY,
+    upload INTEGER REFERENCES block_upload (_id) ON DELETE CASCADE NOT NULL,
+    chunk_offset INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+
+    UNIQUE(upload, chunk_offset)
+);
@@ -0,0 +1,11 @@
+-- Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+
+-------------------------------------------------------
+--  Migration
+-------------------------------------------------------
+
+
+-- Enabled by the administrator once all the clients of the organization
+-- can read compact manifests
+ALTER TABLE organization ADD compact_manifests BOOLEAN NOT NULL DEFAULT FALSE;
@@ -20,7 +20,8 @@ from parsec.backend.organization import (
     OrganizationNotFoundError,
     OrganizationFirstUserCreationError,
 )
-from parsec.backend.postgresql.handler import PGHandler
+from parsec.backend.postgresql.handler import PGHandler, send_signal
+from parsec.backend.postgresql.query_cache import QueryCache
 from parsec.backend.postgresql.utils import Query
 from parsec.backend.postgresql.tables import (
     t_organization,
@@ -52,7 +53,7 @@ ON CONFLICT (organization_id) DO
 
 _q_get_organization = (
     q_organization(Parameter("$1"))
-    .select("bootstrap_token", "root_verify_key", "expiration_date")
+    .select("bootstrap_token", "root_verify_key", "expiration_date", "compact_manifests")
     .get_sql()
 )
 
@@ -93,10 +94,24 @@ _q_update_organisation_expiration_date = (
 )
 
 
+_q_update_organisation_compact_manifests = (
+    Query.update(t_organization)
+    .where((t_organization.organization_id == Parameter("$1")))
+    .set(t_organization.compact_manifests, Parameter("$2"))
+    .get_sql()
+)
+
+
 class PGOrganizationComponent(BaseOrganizationComponent):
-    def __init__(self, dbh: PGHandler, **kwargs):
+    def __init__(self, dbh: PGHandler, event_bus, lookup_cache: QueryCache, **kwargs):
         super().__init__(**kwargs)
         self.dbh = dbh
+        self._lookup_cache = lookup_cache
+
+        def _on_organization_updated(event, organization_id, **kwargs):
+            lookup_cache.invalidate(organization_id, lambda key: key == ("organization",))
+
+        event_bus.connect("organization.updated", _on_organization_updated)
 
     async def create(
         self, id: OrganizationID, bootstrap_token: str, expiration_date: Optional[Pendulum] = None
@@ -113,8 +128,17 @@ class PGOrganizationComponent(BaseOrganizationComponent):
                 raise OrganizationAlreadyExistsError()
 
     async def get(self, id: OrganizationID) -> Organization:
-        async with self.dbh.pool.acquire() as conn:
-            return await self._get(conn, id)
+        async def _fetch():
+            async with self.dbh.pool.acquire() as conn:
+                return await self._get(conn, id)
+
+        # Organization not bootstrapped yet is about to change
+        return await self._lookup_cache.get_or_fetch(
+            id,
+            ("organization",),
+            _fetch,
+            cacheable=lambda organization: organization.is_bootstrapped(),
+        )
 
     @staticmethod
     async def _get(conn, id: OrganizationID) -> Organization:
@@ -128,6 +152,7 @@ class PGOrganizationComponent(BaseOrganizationComponent):
             bootstrap_token=data[0],
             root_verify_key=rvk,
             expiration_date=data[2],
+            compact_manifests=data[3],
         )
 
     async def bootstrap(
@@ -172,11 +197,22 @@ class PGOrganizationComponent(BaseOrganizationComponent):
     async def set_expiration_date(
         self, id: OrganizationID, expiration_date: Pendulum = None
     ) -> None:
+        await self._update(_q_update_organisation_expiration_date, id, expiration_date)
+
+    async def set_compact_manifests(self, id: OrganizationID, compact_manifests: bool) -> None:
+        await self._update(_q_update_organisation_compact_manifests, id, compact_manifests)
+
+    async def _update(self, query: str, id: OrganizationID, value) -> None:
         async with self.dbh.pool.acquire() as conn, conn.transaction():
-            result = await conn.execute(_q_update_organisation_expiration_date, id, expiration_date)
+            result = await conn.execute(query, id, value)
 
             if result == "UPDATE 0":
                 raise OrganizationNotFoundError
 
             if result != "UPDATE 1":
                 raise OrganizationError(f"Update error: {result}")
+
+            await send_signal(conn, "organization.updated", organization_id=id)
+
+        # Don't wait for the signal, the next requests must see the new values
+        self._lookup_cache.invalidate(id, lambda key: key == ("organization",))
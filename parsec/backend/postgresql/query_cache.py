@@ -0,0 +1,111 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import trio
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from parsec.api.protocol import OrganizationID
+
+
+class QueryCache:
+    """
+    In-process LRU cache for query results which rarely (e.g. organization,
+    user and device lookups) or never (e.g. certificates) change.
+
+    Entries are indexed per organization and must be invalidated by the
+    caller when a modification makes them outdated. Given invalidation
+    is event-based (hence received after the modification has been commited),
+    a result fetched concurrently with an invalidation is not stored given
+    it may be outdated. On top of that, entries expire after `ttl` seconds
+    (if provided) to bound the consequences of a missed invalidation.
+
+    Size of the cache is the sum of the entries' size as provided by the
+    caller (1 per entry by default), 0 for `max_size` or `ttl` disables
+    the cache.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # (organization_id, key) -> (value, size, expires_on)
+        self._entries: "OrderedDict[Tuple[OrganizationID, Hashable], tuple]" = OrderedDict()
+        self._keys_per_organization: Dict[OrganizationID, Set[Hashable]] = defaultdict(set)
+        self._generations: Dict[OrganizationID, int] = defaultdict(int)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def get_or_fetch(
+        self,
+        organization_id: OrganizationID,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        size_of: Callable[[Any], int] = lambda value: 1,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Exceptions raised by `fetch` are not cached and bubble up, neither are
+        the values rejected by `cacheable`.
+        """
+        if not self.max_size or self.ttl == 0:
+            return await fetch()
+
+        try:
+            value, _, expires_on = self._entries[(organization_id, key)]
+
+        except KeyError:
+            pass
+
+        else:
+            if expires_on is None or expires_on > trio.current_time():
+                self._entries.move_to_end((organization_id, key))
+                self.hits += 1
+                return value
+            self._remove(organization_id, key)
+
+        self.misses += 1
+        generation = self._generations[organization_id]
+        value = await fetch()
+        if self._generations[organization_id] == generation and cacheable(value):
+            self._store(organization_id, key, value, size_of(value))
+        return value
+
+    def invalidate(
+        self, organization_id: OrganizationID, match: Callable[[Hashable], bool] = lambda key: True
+    ) -> None:
+        self._generations[organization_id] += 1
+        keys = self._keys_per_organization.get(organization_id, ())
+        for key in [key for key in keys if match(key)]:
+            self._remove(organization_id, key)
+
+    def _store(self, organization_id: OrganizationID, key: Hashable, value: Any, size: int):
+        if size > self.max_size:
+            return
+        if (organization_id, key) in self._entries:
+            self._remove(organization_id, key)
+        expires_on = trio.current_time() + self.ttl if self.ttl is not None else None
+        self._entries[(organization_id, key)] = (value, size, expires_on)
+        self._keys_per_organization[organization_id].add(key)
+        self.size += size
+        while self.size > self.max_size:
+            lru_organization_id, lru_key = next(iter(self._entries))
+            self._remove(lru_organization_id, lru_key)
+
+    def _remove(self, organization_id: OrganizationID, key: Hashable):
+        _, size, _ = self._entries.pop((organization_id, key))
+        self.size -= size
+        keys = self._keys_per_organization[organization_id]
+        keys.discard(key)
+        if not keys:
+            del self._keys_per_organization[organization_id]
@@ -4,15 +4,18 @@ import pendulum
 from uuid import UUID
 from typing import Dict, List, Optional
 
+from parsec.event_bus import EventBus
 from parsec.api.protocol import RealmRole
 from parsec.api.protocol import DeviceID, UserID, OrganizationID
 from parsec.backend.realm import BaseRealmComponent, RealmStatus, RealmGrantedRole
 from parsec.backend.postgresql.handler import PGHandler
+from parsec.backend.postgresql.query_cache import QueryCache
 from parsec.backend.postgresql.realm_queries import (
     query_create,
     query_get_status,
     query_get_current_roles,
-    query_get_role_certificates,
+    query_get_role_certificates_rows,
+    filter_role_certificates,
     query_get_realms_for_user,
     query_update_roles,
     query_start_reencryption_maintenance,
@@ -21,8 +24,14 @@ from parsec.backend.postgresql.realm_queries import (
 
 
 class PGRealmComponent(BaseRealmComponent):
-    def __init__(self, dbh: PGHandler):
+    def __init__(self, dbh: PGHandler, event_bus: EventBus, certificates_cache: QueryCache):
         self.dbh = dbh
+        self._certificates_cache = certificates_cache
+
+        def _on_roles_updated(event, organization_id, realm_id, **kwargs):
+            certificates_cache.invalidate(organization_id, lambda key: key == ("realm", realm_id))
+
+        event_bus.connect("realm.roles_updated", _on_roles_updated)
 
     async def create(
         self, organization_id: OrganizationID, self_granted_role: RealmGrantedRole
@@ -49,8 +58,17 @@ class PGRealmComponent(BaseRealmComponent):
         realm_id: UUID,
         since: pendulum.Pendulum,
     ) -> List[bytes]:
-        async with self.dbh.pool.acquire() as conn:
-            return await query_get_role_certificates(conn, organization_id, author, realm_id, since)
+        async def _fetch():
+            async with self.dbh.pool.acquire() as conn:
+                return await query_get_role_certificates_rows(conn, organization_id, realm_id)
+
+        rows = await self._certificates_cache.get_or_fetch(
+            organization_id,
+            ("realm", realm_id),
+            _fetch,
+            size_of=lambda rows: sum(len(row[2]) for row in rows),
+        )
+        return filter_role_certificates(rows, author, since)
 
     async def get_realms_for_user(
         self, organization_id: OrganizationID, user: UserID
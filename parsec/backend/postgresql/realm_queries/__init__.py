@@ -4,7 +4,8 @@ from parsec.backend.postgresql.realm_queries.create import query_create
 from parsec.backend.postgresql.realm_queries.get import (
     query_get_status,
     query_get_current_roles,
-    query_get_role_certificates,
+    query_get_role_certificates_rows,
+    filter_role_certificates,
     query_get_realms_for_user,
 )
 from parsec.backend.postgresql.realm_queries.update_roles import query_update_roles
@@ -18,7 +19,8 @@ __all__ = (
     "query_create",
     "query_get_status",
     "query_get_current_roles",
-    "query_get_role_certificates",
+    "query_get_role_certificates_rows",
+    "filter_role_certificates",
     "query_get_realms_for_user",
     "query_update_roles",
     "query_start_reencryption_maintenance",
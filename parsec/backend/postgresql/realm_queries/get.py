@@ -2,7 +2,7 @@
 
 import pendulum
 from uuid import UUID
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from pypika import Parameter
 
 from parsec.api.protocol import RealmRole
@@ -102,22 +102,31 @@ async def query_get_current_roles(
 
 
 @query()
-async def query_get_role_certificates(
-    conn,
-    organization_id: OrganizationID,
-    author: DeviceID,
-    realm_id: UUID,
-    since: pendulum.Pendulum,
-) -> List[bytes]:
+async def query_get_role_certificates_rows(
+    conn, organization_id: OrganizationID, realm_id: UUID
+) -> List[Tuple[UserID, Optional[str], bytes, pendulum.Pendulum]]:
+    """
+    Returns the (user_id, role, certificate, certified_on) rows of the
+    realm, given they are immutable they can be cached and filtered for a
+    given request with `filter_role_certificates`.
+    """
     ret = await conn.fetch(_q_get_role_certificates, organization_id, realm_id)
 
     if not ret:
         # Existing group must have at least one owner user
         raise RealmNotFoundError(f"Realm `{realm_id}` doesn't exist")
 
+    return [tuple(row) for row in ret]
+
+
+def filter_role_certificates(
+    rows: List[Tuple[UserID, Optional[str], bytes, pendulum.Pendulum]],
+    author: DeviceID,
+    since: pendulum.Pendulum,
+) -> List[bytes]:
     out = []
     author_current_role = None
-    for user_id, role, certif, certified_on in ret:
+    for user_id, role, certif, certified_on in rows:
         if not since or certified_on > since:
             out.append(certif)
         if user_id == author.user_id:
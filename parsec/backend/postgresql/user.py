@@ -15,6 +15,7 @@ from parsec.backend.user import (
     HumanFindResultItem,
 )
 from parsec.backend.postgresql.handler import PGHandler
+from parsec.backend.postgresql.query_cache import QueryCache
 from parsec.backend.postgresql.user_queries import (
     query_create_user,
     query_create_device,
@@ -37,10 +38,51 @@ from parsec.backend.postgresql.user_queries import (
 )
 
 
+def _get_user_result_size(result: GetUserAndDevicesResult) -> int:
+    return (
+        len(result.user_certificate)
+        + len(result.revoked_user_certificate or b"")
+        + sum(len(x) for x in result.device_certificates)
+        + sum(len(x) for x in result.trustchain_user_certificates)
+        + sum(len(x) for x in result.trustchain_device_certificates)
+        + sum(len(x) for x in result.trustchain_revoked_user_certificates)
+    )
+
+
 class PGUserComponent(BaseUserComponent):
-    def __init__(self, dbh: PGHandler, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(
+        self, dbh: PGHandler, event_bus, certificates_cache: QueryCache, lookup_cache: QueryCache
+    ):
+        super().__init__(event_bus)
         self.dbh = dbh
+        self._certificates_cache = certificates_cache
+        self._lookup_cache = lookup_cache
+
+        def _on_user_changed(event, organization_id, user_id, **kwargs):
+            certificates_cache.invalidate(organization_id, lambda key: key[:2] == ("user", user_id))
+            self._invalidate_lookups(organization_id, user_id)
+
+        def _on_device_created(event, organization_id, device_id, **kwargs):
+            # Event params are plain strings when coming from a PostgreSQL notification
+            user_id = DeviceID(device_id).user_id
+            certificates_cache.invalidate(organization_id, lambda key: key[:2] == ("user", user_id))
+            self._invalidate_lookups(organization_id, user_id)
+
+        def _on_user_revoked(event, organization_id, user_id, **kwargs):
+            # Revoked user can be part of the trustchain of any other user
+            certificates_cache.invalidate(organization_id, lambda key: key[0] == "user")
+            self._invalidate_lookups(organization_id, user_id)
+
+        event_bus.connect("user.created", _on_user_changed)
+        event_bus.connect("device.created", _on_device_created)
+        event_bus.connect("user.revoked", _on_user_revoked)
+
+    def _invalidate_lookups(self, organization_id: OrganizationID, user_id: UserID) -> None:
+        # Keys are `("user", user_id)` and `("device", user_id, device_id)`, but
+        # the cache also contains the organization's `("organization",)` key
+        self._lookup_cache.invalidate(
+            organization_id, lambda key: key[0] in ("user", "device") and key[1] == user_id
+        )
 
     async def create_user(
         self, organization_id: OrganizationID, user: User, first_device: Device
@@ -55,8 +97,11 @@ class PGUserComponent(BaseUserComponent):
             await query_create_device(conn, organization_id, device, encrypted_answer)
 
     async def get_user(self, organization_id: OrganizationID, user_id: UserID) -> User:
-        async with self.dbh.pool.acquire() as conn:
-            return await query_get_user(conn, organization_id, user_id)
+        async def _fetch():
+            async with self.dbh.pool.acquire() as conn:
+                return await query_get_user(conn, organization_id, user_id)
+
+        return await self._lookup_cache.get_or_fetch(organization_id, ("user", user_id), _fetch)
 
     async def get_user_with_trustchain(
         self, organization_id: OrganizationID, user_id: UserID
@@ -73,16 +118,26 @@ class PGUserComponent(BaseUserComponent):
     async def get_user_with_devices_and_trustchain(
         self, organization_id: OrganizationID, user_id: UserID, redacted: bool = False
     ) -> GetUserAndDevicesResult:
-        async with self.dbh.pool.acquire() as conn:
-            return await query_get_user_with_devices_and_trustchain(
-                conn, organization_id, user_id, redacted=redacted
-            )
+        async def _fetch():
+            async with self.dbh.pool.acquire() as conn:
+                return await query_get_user_with_devices_and_trustchain(
+                    conn, organization_id, user_id, redacted=redacted
+                )
+
+        return await self._certificates_cache.get_or_fetch(
+            organization_id, ("user", user_id, redacted), _fetch, size_of=_get_user_result_size
+        )
 
     async def get_user_with_device(
         self, organization_id: OrganizationID, device_id: DeviceID
     ) -> Tuple[User, Device]:
-        async with self.dbh.pool.acquire() as conn:
-            return await query_get_user_with_device(conn, organization_id, device_id)
+        async def _fetch():
+            async with self.dbh.pool.acquire() as conn:
+                return await query_get_user_with_device(conn, organization_id, device_id)
+
+        return await self._lookup_cache.get_or_fetch(
+            organization_id, ("device", device_id.user_id, device_id), _fetch
+        )
 
     async def find(
         self,
@@ -170,7 +225,7 @@ class PGUserComponent(BaseUserComponent):
         revoked_on: pendulum.Pendulum = None,
     ) -> None:
         async with self.dbh.pool.acquire() as conn:
-            return await query_revoke_user(
+            await query_revoke_user(
                 conn,
                 organization_id,
                 user_id,
@@ -178,3 +233,6 @@ class PGUserComponent(BaseUserComponent):
                 revoked_user_certifier,
                 revoked_on,
             )
+        # Don't wait for the `user.revoked` signal, the revoked user must not
+        # be able to connect to this backend anymore
+        self._invalidate_lookups(organization_id, user_id)
@@ -11,11 +11,13 @@ from pypika.enums import Comparator, JoinType
 
 def query(in_transaction=False):
     if in_transaction:
+        # Imported here to avoid circular import (handler -> tables -> utils)
+        from parsec.backend.postgresql.handler import batched_signals
 
         def decorator(fn):
             @wraps(fn)
             async def wrapper(conn, *args, **kwargs):
-                async with conn.transaction():
+                async with conn.transaction(), batched_signals(conn):
                     return await fn(conn, *args, **kwargs)
 
             return wrapper
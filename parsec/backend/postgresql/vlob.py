@@ -179,7 +179,8 @@ class PGVlobComponent(BaseVlobComponent):
         timestamp: pendulum.Pendulum,
         blob: bytes,
     ) -> None:
-        async with self.dbh.pool.acquire() as conn, conn.transaction():
+        # Many vlobs are typically uploaded at once, so their signals are notified together
+        async with self.dbh.pool.acquire() as conn, self.dbh.deferred_signals_transaction(conn):
             await _check_realm_and_write_access(
                 conn, organization_id, author, realm_id, encryption_revision
             )
@@ -358,7 +359,8 @@ WHERE
         timestamp: pendulum.Pendulum,
         blob: bytes,
     ) -> None:
-        async with self.dbh.pool.acquire() as conn, conn.transaction():
+        # Many vlobs are typically uploaded at once, so their signals are notified together
+        async with self.dbh.pool.acquire() as conn, self.dbh.deferred_signals_transaction(conn):
 
             realm_id = await _get_realm_id_from_vlob_id(conn, organization_id, vlob_id)
             await _check_realm_and_write_access(
@@ -478,7 +480,9 @@ ORDER BY vlob_id, version DESC
                 ),
             )
 
-            rows = await conn.fetch(query, organization_id, author.user_id, to_check_dict.keys())
+            rows = await conn.fetch(
+                query, organization_id, author.user_id, list(to_check_dict.keys())
+            )
 
         for vlob_id, version in rows:
             if version != to_check_dict[vlob_id]["version"]:
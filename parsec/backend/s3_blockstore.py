@@ -2,11 +2,10 @@
 
 import trio
 import boto3
-from botocore.exceptions import (
-    ClientError as S3ClientError,
-    EndpointConnectionError as S3EndpointConnectionError,
-)
+from botocore.config import Config as S3Config
+from botocore.exceptions import BotoCoreError, ClientError as S3ClientError
 from uuid import UUID
+from typing import Tuple
 from functools import partial
 
 from parsec.api.protocol import OrganizationID
@@ -14,55 +13,143 @@ from parsec.backend.blockstore import BaseBlockStoreComponent
 from parsec.backend.block import BlockAlreadyExistsError, BlockNotFoundError, BlockTimeoutError
 
 
+S3_DEFAULT_MAX_CONNECTIONS = 32
+# A failing request is better reported to the client (which will retry
+# later) than blocking a worker thread any longer
+S3_DEFAULT_RETRIES = 1
+# In seconds
+S3_DEFAULT_CONNECT_TIMEOUT = 5
+S3_DEFAULT_READ_TIMEOUT = 30
+
+
+def _add_if_none_match_header(params, **kwargs):
+    # Conditional write: the PUT is rejected (HTTP 412) if the object already
+    # exists, which saves the HEAD request otherwise needed to check it
+    # (not supported by all S3 implementations, hence it must be enabled)
+    params["headers"]["If-None-Match"] = "*"
+
+
 class S3BlockStoreComponent(BaseBlockStoreComponent):
-    def __init__(self, s3_region, s3_bucket, s3_key, s3_secret, s3_endpoint_url=None):
-        self._s3 = None
-        self._s3_bucket = None
+    def __init__(
+        self,
+        s3_region,
+        s3_bucket,
+        s3_key,
+        s3_secret,
+        s3_endpoint_url=None,
+        max_connections=S3_DEFAULT_MAX_CONNECTIONS,
+        connect_timeout=S3_DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=S3_DEFAULT_READ_TIMEOUT,
+        retries=S3_DEFAULT_RETRIES,
+        conditional_put=False,
+    ):
         self._s3 = boto3.client(
             "s3",
             region_name=s3_region,
             aws_access_key_id=s3_key,
             aws_secret_access_key=s3_secret,
             endpoint_url=s3_endpoint_url,
+            config=S3Config(
+                max_pool_connections=max_connections,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={"max_attempts": retries},
+            ),
         )
+        self._conditional_put = conditional_put
+        if conditional_put:
+            self._s3.meta.events.register("before-call.s3.PutObject", _add_if_none_match_header)
         self._s3_bucket = s3_bucket
+        # Boto3 is blocking, hence requests are run in worker threads (no
+        # more than the pooled connections so they never wait for one)
+        self._limiter = trio.CapacityLimiter(max_connections)
         self._s3.head_bucket(Bucket=s3_bucket)
 
+    async def _run_sync(self, fn):
+        return await trio.to_thread.run_sync(fn, limiter=self._limiter)
+
     async def read(self, organization_id: OrganizationID, id: UUID) -> bytes:
         slug = f"{organization_id}/{id}"
-        try:
+
+        def _read():
             obj = self._s3.get_object(Bucket=self._s3_bucket, Key=slug)
+            return obj["Body"].read()
+
+        try:
+            return await self._run_sync(_read)
 
         except S3ClientError as exc:
-            if exc.response["Error"]["Code"] == "404":
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey"):
                 raise BlockNotFoundError() from exc
 
             else:
                 raise BlockTimeoutError() from exc
 
-        except S3EndpointConnectionError as exc:
+        # Connection error, timeout etc.
+        except BotoCoreError as exc:
             raise BlockTimeoutError() from exc
 
-        return obj["Body"].read()
+    async def read_range(
+        self, organization_id: OrganizationID, id: UUID, offset: int, size: int
+    ) -> Tuple[bytes, int]:
+        slug = f"{organization_id}/{id}"
+
+        def _read_range():
+            obj = self._s3.get_object(
+                Bucket=self._s3_bucket, Key=slug, Range=f"bytes={offset}-{offset + size - 1}"
+            )
+            return obj.get("ContentRange"), obj["Body"].read()
+
+        try:
+            content_range, data = await self._run_sync(_read_range)
+
+        except S3ClientError as exc:
+            code = exc.response["Error"]["Code"]
+            if code in ("404", "NoSuchKey"):
+                raise BlockNotFoundError() from exc
+
+            elif code in ("416", "InvalidRange"):
+                # Offset is beyond the end of the block
+                return await super().read_range(organization_id, id, offset, size)
+
+            else:
+                raise BlockTimeoutError() from exc
+
+        except BotoCoreError as exc:
+            raise BlockTimeoutError() from exc
+
+        # e.g. `bytes 0-99/1234`, the range may have been ignored by the
+        # server in which case the whole block has been returned
+        if not content_range:
+            return data[offset : offset + size], len(data)
+        return data, int(content_range.rsplit("/", 1)[1])
 
     async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
         slug = f"{organization_id}/{id}"
         try:
-            await trio.to_thread.run_sync(
-                partial(self._s3.head_object, Bucket=self._s3_bucket, Key=slug)
+            if not self._conditional_put:
+                await self._check_not_exists(slug)
+            await self._run_sync(
+                partial(self._s3.put_object, Bucket=self._s3_bucket, Key=slug, Body=block)
             )
+
         except S3ClientError as exc:
-            if exc.response["Error"]["Code"] == "404":
-                try:
-                    await trio.to_thread.run_sync(
-                        partial(self._s3.put_object, Bucket=self._s3_bucket, Key=slug, Body=block)
-                    )
-                except (S3ClientError, S3EndpointConnectionError) as exc:
-                    raise BlockTimeoutError() from exc
+            if exc.response["Error"]["Code"] in ("412", "PreconditionFailed"):
+                raise BlockAlreadyExistsError() from exc
+
             else:
                 raise BlockTimeoutError() from exc
 
-        except S3EndpointConnectionError as exc:
+        except BotoCoreError as exc:
             raise BlockTimeoutError() from exc
-        else:
-            raise BlockAlreadyExistsError()
+
+    async def _check_not_exists(self, slug: str) -> None:
+        try:
+            await self._run_sync(partial(self._s3.head_object, Bucket=self._s3_bucket, Key=slug))
+
+        except S3ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return
+            raise
+
+        raise BlockAlreadyExistsError()
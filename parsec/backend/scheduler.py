@@ -0,0 +1,186 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import trio
+from enum import Enum
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Optional
+from async_generator import asynccontextmanager
+
+
+class RequestPriority(Enum):
+    METADATA = "METADATA"
+    BULK = "BULK"
+
+
+# Commands transfering blocks, they are served after the metadata ones
+BULK_CMDS = {"block_create", "block_read", "block_create_chunk", "block_read_chunk"}
+
+# Commands waiting for an event or a peer, they would hold their slot for
+# an unbounded amount of time (and could even deadlock if their peer cannot
+# get a slot) so they are not scheduled
+UNSCHEDULED_CMDS = {
+    "events_listen",
+    "events_listen_batch",
+    "invite_1_greeter_wait_peer",
+    "invite_2a_greeter_get_hashed_nonce",
+    "invite_2b_greeter_send_nonce",
+    "invite_3a_greeter_wait_peer_trust",
+    "invite_3b_greeter_signify_trust",
+    "invite_4_greeter_communicate",
+    "invite_1_claimer_wait_peer",
+    "invite_2a_claimer_send_hashed_nonce",
+    "invite_2b_claimer_send_nonce",
+    "invite_3a_claimer_signify_trust",
+    "invite_3b_claimer_wait_peer_trust",
+    "invite_4_claimer_communicate",
+    # APIv1 invitations
+    "user_invite",
+    "device_invite",
+}
+
+
+def get_request_priority(cmd: str) -> Optional[RequestPriority]:
+    """
+    Returns: `None` if the request should not be scheduled
+    """
+    if cmd in UNSCHEDULED_CMDS:
+        return None
+    elif cmd in BULK_CMDS:
+        return RequestPriority.BULK
+    else:
+        return RequestPriority.METADATA
+
+
+class RequestScheduler:
+    """
+    Bound the number of requests processed concurrently (typically to the
+    size of the database connection pool).
+
+    Waiting requests are admitted by priority: up to `metadata_weight`
+    metadata requests are admitted for each bulk one, and bulk requests have
+    their own (lower) concurrency limit so they cannot take all the slots.
+    Within a priority, requests are admitted in round robin between the
+    organizations, then between the devices of each organization, so a
+    single device sending a lot of requests only delays its own requests.
+    """
+
+    def __init__(self, max_concurrency: int, max_bulk_concurrency: int, metadata_weight: int = 4):
+        assert 0 < max_bulk_concurrency <= max_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_bulk_concurrency = max_bulk_concurrency
+        self.metadata_weight = metadata_weight
+        self.running: Dict[RequestPriority, int] = {priority: 0 for priority in RequestPriority}
+        # Priority -> organization -> device -> waiters
+        self._waiting: Dict[
+            RequestPriority, "OrderedDict[Hashable, OrderedDict[Hashable, deque]]"
+        ] = {priority: OrderedDict() for priority in RequestPriority}
+        self._metadata_streak = 0
+
+    def stats(self) -> dict:
+        return {
+            priority: {
+                "running": self.running[priority],
+                "waiting": sum(
+                    len(waiters)
+                    for devices in self._waiting[priority].values()
+                    for waiters in devices.values()
+                ),
+            }
+            for priority in RequestPriority
+        }
+
+    @asynccontextmanager
+    async def admit(
+        self, priority: RequestPriority, organization_id: Hashable, device_id: Hashable
+    ):
+        if self._can_run(priority) and not self._waiting[priority]:
+            self._start(priority)
+
+        else:
+            waiter = trio.Event()
+            devices = self._waiting[priority].setdefault(organization_id, OrderedDict())
+            devices.setdefault(device_id, deque()).append(waiter)
+            try:
+                await waiter.wait()
+
+            except BaseException:
+                if waiter.is_set():
+                    # Slot has been given to us in the meantime
+                    self._finish(priority)
+                else:
+                    self._remove_waiter(priority, organization_id, device_id, waiter)
+                raise
+
+        try:
+            yield
+
+        finally:
+            self._finish(priority)
+
+    def _can_run(self, priority: RequestPriority) -> bool:
+        if sum(self.running.values()) >= self.max_concurrency:
+            return False
+        return (
+            priority != RequestPriority.BULK
+            or self.running[RequestPriority.BULK] < self.max_bulk_concurrency
+        )
+
+    def _start(self, priority: RequestPriority) -> None:
+        self.running[priority] += 1
+
+    def _finish(self, priority: RequestPriority) -> None:
+        self.running[priority] -= 1
+        self._wake_up_waiters()
+
+    def _wake_up_waiters(self) -> None:
+        while True:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            self._start(priority)
+            self._pop_waiter(priority).set()
+
+    def _next_priority(self) -> Optional[RequestPriority]:
+        metadata_waiting = self._waiting[RequestPriority.METADATA] and self._can_run(
+            RequestPriority.METADATA
+        )
+        bulk_waiting = self._waiting[RequestPriority.BULK] and self._can_run(RequestPriority.BULK)
+        if metadata_waiting and (not bulk_waiting or self._metadata_streak < self.metadata_weight):
+            self._metadata_streak += 1
+            return RequestPriority.METADATA
+        elif bulk_waiting:
+            self._metadata_streak = 0
+            return RequestPriority.BULK
+        else:
+            return None
+
+    def _pop_waiter(self, priority: RequestPriority) -> trio.Event:
+        organizations = self._waiting[priority]
+        organization_id, devices = next(iter(organizations.items()))
+        device_id, waiters = next(iter(devices.items()))
+        waiter = waiters.popleft()
+        # Next turn goes to the other devices and organizations
+        if waiters:
+            devices.move_to_end(device_id)
+        else:
+            del devices[device_id]
+        if devices:
+            organizations.move_to_end(organization_id)
+        else:
+            del organizations[organization_id]
+        return waiter
+
+    def _remove_waiter(
+        self,
+        priority: RequestPriority,
+        organization_id: Hashable,
+        device_id: Hashable,
+        waiter: trio.Event,
+    ) -> None:
+        devices = self._waiting[priority][organization_id]
+        waiters = devices[device_id]
+        waiters.remove(waiter)
+        if not waiters:
+            del devices[device_id]
+            if not devices:
+                del self._waiting[priority][organization_id]
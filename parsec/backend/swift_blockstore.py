@@ -1,9 +1,11 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import trio
+import socket
 from unittest.mock import Mock
 import pbr.version
 from uuid import UUID
+from typing import Tuple
 from functools import partial
 
 
@@ -22,26 +24,85 @@ pbr.version.VersionInfo = Mock(side_effect=side_effect)
 
 import swiftclient
 from swiftclient.exceptions import ClientException
+from requests.exceptions import RequestException
 
 from parsec.api.protocol import OrganizationID
 from parsec.backend.blockstore import BaseBlockStoreComponent
 from parsec.backend.block import BlockAlreadyExistsError, BlockNotFoundError, BlockTimeoutError
 
 
+SWIFT_DEFAULT_MAX_CONNECTIONS = 16
+SWIFT_DEFAULT_RETRIES = 2
+# In seconds
+SWIFT_DEFAULT_TIMEOUT = 30
+SWIFT_STARTING_BACKOFF = 0.5
+SWIFT_MAX_BACKOFF = 4
+
+
 class SwiftBlockStoreComponent(BaseBlockStoreComponent):
-    def __init__(self, auth_url, tenant, container, user, password):
-        self.swift_client = swiftclient.Connection(
-            authurl=auth_url, user=":".join([user, tenant]), key=password
-        )
+    def __init__(
+        self,
+        auth_url,
+        tenant,
+        container,
+        user,
+        password,
+        max_connections=SWIFT_DEFAULT_MAX_CONNECTIONS,
+        timeout=SWIFT_DEFAULT_TIMEOUT,
+        retries=SWIFT_DEFAULT_RETRIES,
+        conditional_put=False,
+    ):
+        self._connection_kwargs = {
+            "authurl": auth_url,
+            "user": ":".join([user, tenant]),
+            "key": password,
+            "timeout": timeout,
+            "retries": retries,
+            "starting_backoff": SWIFT_STARTING_BACKOFF,
+            "max_backoff": SWIFT_MAX_BACKOFF,
+        }
         self._container = container
-        self.swift_client.head_container(container)
+        self._conditional_put = conditional_put
+        # Swift connections are not thread safe, hence each one is used by a
+        # single worker thread at a time and then given back to the pool
+        self._limiter = trio.CapacityLimiter(max_connections)
+        self._idle_connections = []
+        # Storage url and token shared between connections so that only
+        # the first one (or the one hitting token expiration) authenticates
+        self._preauth = (None, None)
+        connection = self._new_connection()
+        connection.head_container(container)
+        self._release_connection(connection)
+
+    def _new_connection(self):
+        preauthurl, preauthtoken = self._preauth
+        return swiftclient.Connection(
+            preauthurl=preauthurl, preauthtoken=preauthtoken, **self._connection_kwargs
+        )
+
+    def _release_connection(self, connection):
+        if connection.token:
+            self._preauth = (connection.url, connection.token)
+        self._idle_connections.append(connection)
+
+    async def _run_sync(self, method, *args, **kwargs):
+        async with self._limiter:
+            if self._idle_connections:
+                connection = self._idle_connections.pop()
+            else:
+                connection = self._new_connection()
+            try:
+                return await trio.to_thread.run_sync(
+                    partial(getattr(connection, method), *args, **kwargs)
+                )
+
+            finally:
+                self._release_connection(connection)
 
     async def read(self, organization_id: OrganizationID, id: UUID) -> bytes:
         slug = f"{organization_id}/{id}"
         try:
-            headers, obj = await trio.to_thread.run_sync(
-                self.swift_client.get_object, self._container, slug
-            )
+            headers, obj = await self._run_sync("get_object", self._container, slug)
 
         except ClientException as exc:
             if exc.http_status == 404:
@@ -50,22 +111,77 @@ class SwiftBlockStoreComponent(BaseBlockStoreComponent):
             else:
                 raise BlockTimeoutError() from exc
 
+        # Connection error, timeout etc. (once retries are exhausted)
+        except (RequestException, socket.error) as exc:
+            raise BlockTimeoutError() from exc
+
         return obj
 
-    async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
+    async def read_range(
+        self, organization_id: OrganizationID, id: UUID, offset: int, size: int
+    ) -> Tuple[bytes, int]:
         slug = f"{organization_id}/{id}"
         try:
-            _, obj = await trio.to_thread.run_sync(
-                self.swift_client.get_object, self._container, slug
+            headers, obj = await self._run_sync(
+                "get_object",
+                self._container,
+                slug,
+                headers={"Range": f"bytes={offset}-{offset + size - 1}"},
             )
 
         except ClientException as exc:
             if exc.http_status == 404:
-                await trio.to_thread.run_sync(
-                    partial(self.swift_client.put_object, self._container, slug, block)
+                raise BlockNotFoundError() from exc
+
+            elif exc.http_status == 416:
+                # Offset is beyond the end of the block
+                return await super().read_range(organization_id, id, offset, size)
+
+            else:
+                raise BlockTimeoutError() from exc
+
+        except (RequestException, socket.error) as exc:
+            raise BlockTimeoutError() from exc
+
+        # e.g. `bytes 0-99/1234`, the range may have been ignored by the
+        # server in which case the whole block has been returned
+        content_range = headers.get("content-range")
+        if not content_range:
+            return obj[offset : offset + size], len(obj)
+        return obj, int(content_range.rsplit("/", 1)[1])
+
+    async def create(self, organization_id: OrganizationID, id: UUID, block: bytes) -> None:
+        slug = f"{organization_id}/{id}"
+        try:
+            if self._conditional_put:
+                # Conditional write: the PUT is rejected (HTTP 412) if the object
+                # already exists, which saves the HEAD request otherwise needed to
+                # check it (not supported by all Swift deployments, hence it must
+                # be enabled)
+                await self._run_sync(
+                    "put_object", self._container, slug, block, headers={"If-None-Match": "*"}
                 )
+            else:
+                await self._check_not_exists(slug)
+                await self._run_sync("put_object", self._container, slug, block)
+
+        except ClientException as exc:
+            if exc.http_status == 412:
+                raise BlockAlreadyExistsError() from exc
+
             else:
                 raise BlockTimeoutError() from exc
 
-        else:
-            raise BlockAlreadyExistsError()
+        except (RequestException, socket.error) as exc:
+            raise BlockTimeoutError() from exc
+
+    async def _check_not_exists(self, slug: str) -> None:
+        try:
+            await self._run_sync("head_object", self._container, slug)
+
+        except ClientException as exc:
+            if exc.http_status == 404:
+                return
+            raise
+
+        raise BlockAlreadyExistsError()
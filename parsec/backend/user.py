@@ -23,6 +23,7 @@ from parsec.api.protocol import (
     HandshakeType,
     APIV1_HandshakeType,
     user_get_serializer,
+    user_get_batch_serializer,
     apiv1_user_find_serializer,
     human_find_serializer,
     apiv1_user_get_invitation_creator_serializer,
@@ -200,6 +201,64 @@ class BaseUserComponent:
             }
         )
 
+    @api("user_get_batch")
+    @catch_protocol_errors
+    async def api_user_get_batch(self, client_ctx, msg):
+        msg = user_get_batch_serializer.req_load(msg)
+        need_redacted = client_ctx.profile == UserProfile.OUTSIDER
+
+        results = []
+        not_found = []
+        for user_id in dict.fromkeys(msg["user_ids"]):
+            try:
+                results.append(
+                    await self.get_user_with_devices_and_trustchain(
+                        client_ctx.organization_id, user_id, redacted=need_redacted
+                    )
+                )
+            except UserNotFoundError:
+                not_found.append(user_id)
+
+        # Users often share most of their trustchain, so it is only sent once
+        provided = set()
+        for result in results:
+            provided.add(result.user_certificate)
+            provided.add(result.revoked_user_certificate)
+            provided.update(result.device_certificates)
+        trustchain_devices = {}
+        trustchain_users = {}
+        trustchain_revoked_users = {}
+        for result in results:
+            for certif in result.trustchain_device_certificates:
+                if certif not in provided:
+                    trustchain_devices[certif] = None
+            for certif in result.trustchain_user_certificates:
+                if certif not in provided:
+                    trustchain_users[certif] = None
+            for certif in result.trustchain_revoked_user_certificates:
+                if certif not in provided:
+                    trustchain_revoked_users[certif] = None
+
+        return user_get_batch_serializer.rep_dump(
+            {
+                "status": "ok",
+                "users": [
+                    {
+                        "user_certificate": result.user_certificate,
+                        "revoked_user_certificate": result.revoked_user_certificate,
+                        "device_certificates": result.device_certificates,
+                    }
+                    for result in results
+                ],
+                "not_found": not_found,
+                "trustchain": {
+                    "devices": list(trustchain_devices),
+                    "users": list(trustchain_users),
+                    "revoked_users": list(trustchain_revoked_users),
+                },
+            }
+        )
+
     @api("user_find", handshake_types=[APIV1_HandshakeType.AUTHENTICATED])
     @catch_protocol_errors
     async def api_user_find(self, client_ctx, msg):
@@ -87,6 +87,10 @@ async def run_with_breathing_transport(transport, fn, *args, **kwargs):
     connection with the client in order to make sure it is still
     online and handles websocket pings
     """
+    # In multiplexed mode the connection loop keeps reading the transport
+    # and new requests are processed concurrently
+    if transport.multiplexed:
+        return await fn(*args, **kwargs)
 
     rep = None
 
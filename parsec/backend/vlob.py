@@ -12,6 +12,7 @@ from parsec.api.protocol import (
     vlob_read_serializer,
     vlob_update_serializer,
     vlob_poll_changes_serializer,
+    vlob_group_check_serializer,
     vlob_list_versions_serializer,
     vlob_maintenance_get_reencryption_batch_serializer,
     vlob_maintenance_save_reencryption_batch_serializer,
@@ -185,6 +186,17 @@ class BaseVlobComponent:
             {"status": "ok", "current_checkpoint": checkpoint, "changes": changes}
         )
 
+    @api("vlob_group_check")
+    @catch_protocol_errors
+    async def api_vlob_group_check(self, client_ctx, msg):
+        msg = vlob_group_check_serializer.req_load(msg)
+
+        changed = await self.group_check(
+            client_ctx.organization_id, client_ctx.device_id, msg["to_check"]
+        )
+
+        return vlob_group_check_serializer.rep_dump({"status": "ok", "changed": changed})
+
     @api("vlob_list_versions")
     @catch_protocol_errors
     async def api_vlob_list_versions(self, client_ctx, msg):
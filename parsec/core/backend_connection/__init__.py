@@ -8,6 +8,7 @@ from parsec.core.backend_connection.exceptions import (
 )
 from parsec.core.backend_connection.authenticated import (
     BackendAuthenticatedCmds,
+    OrganizationConfig,
     BackendConnStatus,
     BackendAuthenticatedConn,
     backend_authenticated_cmds_factory,
@@ -36,6 +37,7 @@ __all__ = (
     "BackendConnectionRefused",
     # Authenticated
     "BackendAuthenticatedCmds",
+    "OrganizationConfig",
     "BackendConnStatus",
     "BackendAuthenticatedConn",
     "backend_authenticated_cmds_factory",
@@ -15,7 +15,7 @@ from parsec.core.backend_connection import cmds
 from parsec.core.backend_connection.transport import apiv1_connect, TransportPool
 from parsec.core.backend_connection.exceptions import BackendNotAvailable, BackendConnectionRefused
 from parsec.core.backend_connection.expose_cmds import expose_cmds_with_retrier
-from parsec.core.backend_connection.authenticated import BackendConnStatus
+from parsec.core.backend_connection.authenticated import BackendConnStatus, OrganizationConfig
 from parsec.api.protocol import APIV1_AUTHENTICATED_CMDS
 
 
@@ -26,6 +26,20 @@ class APIV1_BackendAuthenticatedCmds:
     def __init__(self, addr: BackendOrganizationAddr, acquire_transport):
         self.addr = addr
         self.acquire_transport = acquire_transport
+        self._organization_config = None
+
+    async def get_organization_config(self) -> OrganizationConfig:
+        """
+        Raises:
+            BackendConnectionError
+        """
+        if self._organization_config is None:
+            rep = await self.organization_config()
+            self._organization_config = OrganizationConfig.load_from_rep(rep)
+        return self._organization_config
+
+    def reset_organization_config(self) -> None:
+        self._organization_config = None
 
     for cmd_name in APIV1_AUTHENTICATED_CMDS:
         vars()[cmd_name] = expose_cmds_with_retrier(cmd_name, apiv1=True)
@@ -72,15 +86,36 @@ def _handle_event(event_bus: EventBus, rep: dict) -> None:
         )
 
 
-def _transport_pool_factory(addr, device_id, signing_key, max_pool, keepalive):
+def _transport_pool_factory(
+    addr, device_id, signing_key, max_pool, min_pool, idle_timeout, keepalive
+):
+    session_ticket = None
+
     async def _connect():
+        nonlocal session_ticket
         transport = await apiv1_connect(
-            addr, device_id=device_id, signing_key=signing_key, keepalive=keepalive
+            addr,
+            device_id=device_id,
+            signing_key=signing_key,
+            keepalive=keepalive,
+            session_ticket=session_ticket,
         )
+        # A new ticket is only issued when the previous one couldn't be used
+        if transport.handshake.issued_session_ticket:
+            session_ticket = transport.handshake.issued_session_ticket
         transport.logger = transport.logger.bind(device_id=device_id)
         return transport
 
-    return TransportPool(_connect, max_pool=max_pool)
+    return TransportPool(
+        _connect,
+        max_pool=max_pool,
+        multiplexing=True,
+        min_pool=min_pool,
+        idle_timeout=idle_timeout,
+        # Idle transports don't benefit from the keepalive pings done while
+        # receiving, so they get their own ones
+        health_check_interval=keepalive,
+    )
 
 
 class APIV1_BackendAuthenticatedConn:
@@ -92,6 +127,8 @@ class APIV1_BackendAuthenticatedConn:
         event_bus: EventBus,
         max_cooldown: int = 30,
         max_pool: int = 4,
+        min_pool: int = 1,
+        idle_timeout: Optional[int] = None,
         keepalive: Optional[int] = None,
     ):
         if max_pool < 2:
@@ -99,7 +136,7 @@ class APIV1_BackendAuthenticatedConn:
 
         self._started = False
         self._transport_pool = _transport_pool_factory(
-            addr, device_id, signing_key, max_pool, keepalive
+            addr, device_id, signing_key, max_pool, min_pool, idle_timeout, keepalive
         )
         self._status = BackendConnStatus.LOST
         self._status_exc = None
@@ -195,6 +232,7 @@ class APIV1_BackendAuthenticatedConn:
             )
             logger.info("Backend online")
 
+            self._cmds.reset_organization_config()
             await cmds.events_subscribe(transport)
 
             # Quis custodiet ipsos custodes?
@@ -229,6 +267,10 @@ class APIV1_BackendAuthenticatedConn:
                         "backend.connection.changed", status=self._status, status_exc=None
                     )
 
+                    # Backend is online, make sure the next requests won't have to
+                    # wait for the connection to be established
+                    monitors_nursery.start_soon(self._transport_pool.run_maintenance)
+
                     while True:
                         rep = await cmds.events_listen(transport, wait=True)
                         _handle_event(self.event_bus, rep)
@@ -1,5 +1,6 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import attr
 import trio
 from enum import Enum
 from async_generator import asynccontextmanager
@@ -14,7 +15,11 @@ from parsec.api.protocol import DeviceID
 from parsec.core.types import BackendOrganizationAddr
 from parsec.core.backend_connection import cmds
 from parsec.core.backend_connection.transport import connect_as_authenticated, TransportPool
-from parsec.core.backend_connection.exceptions import BackendNotAvailable, BackendConnectionRefused
+from parsec.core.backend_connection.exceptions import (
+    BackendConnectionError,
+    BackendNotAvailable,
+    BackendConnectionRefused,
+)
 from parsec.core.backend_connection.expose_cmds import expose_cmds_with_retrier
 from parsec.api.protocol import AUTHENTICATED_CMDS
 
@@ -25,15 +30,61 @@ logger = get_logger()
 BackendConnStatus = Enum("BackendConnStatus", "READY LOST INITIALIZING REFUSED CRASHED")
 
 
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class OrganizationConfig:
+    # All the clients of the organization can read compact manifests
+    # (envelope serialization and folder manifest deltas)
+    compact_manifests: bool = False
+
+    @classmethod
+    def load_from_rep(cls, rep: dict) -> "OrganizationConfig":
+        """
+        Raises:
+            BackendConnectionError
+        """
+        if rep["status"] == "unknown_command":
+            # Backend predates the organization config
+            return cls()
+        elif rep["status"] != "ok":
+            raise BackendConnectionError(f"Cannot retrieve organization config: `{rep['status']}`")
+        return cls(compact_manifests=rep["compact_manifests"])
+
+
 class BackendAuthenticatedCmds:
     def __init__(self, addr: BackendOrganizationAddr, acquire_transport):
         self.addr = addr
         self.acquire_transport = acquire_transport
+        self._organization_config = None
+
+    async def get_organization_config(self) -> OrganizationConfig:
+        """
+        The config is only fetched again once `reset_organization_config` has
+        been called (i.e. each time the connection to the backend is established).
+
+        Raises:
+            BackendConnectionError
+        """
+        if self._organization_config is None:
+            rep = await self.organization_config()
+            self._organization_config = OrganizationConfig.load_from_rep(rep)
+        return self._organization_config
+
+    def reset_organization_config(self) -> None:
+        self._organization_config = None
 
     for cmd_name in AUTHENTICATED_CMDS:
         vars()[cmd_name] = expose_cmds_with_retrier(cmd_name)
 
 
+def _handle_events_batch(event_bus: EventBus, rep: dict) -> None:
+    if rep["status"] != "ok":
+        logger.warning("Bad response to `events_listen_batch` command", rep=rep)
+        return
+
+    for event in rep["events"]:
+        _handle_event(event_bus, {"status": "ok", **event})
+
+
 def _handle_event(event_bus: EventBus, rep: dict) -> None:
     if rep["status"] != "ok":
         logger.warning("Bad response to `events_listen` command", rep=rep)
@@ -50,15 +101,20 @@ def _handle_event(event_bus: EventBus, rep: dict) -> None:
         event_bus.send("backend.realm.roles_updated", realm_id=realm_id, role=rep["role"])
 
     elif rep["event"] == "realm.vlobs_updated":
-        src_id = EntryID(rep["src_id"])
         realm_id = EntryID(rep["realm_id"])
-        event_bus.send(
-            "backend.realm.vlobs_updated",
-            realm_id=realm_id,
-            checkpoint=rep["checkpoint"],
-            src_id=src_id,
-            src_version=rep["src_version"],
-        )
+        # Coalesced event only provides the checkpoint of the last change,
+        # older backends don't coalesce events hence don't provide `changes`
+        changes = rep.get("changes") or [
+            {"src_id": rep["src_id"], "src_version": rep["src_version"]}
+        ]
+        for change in changes:
+            event_bus.send(
+                "backend.realm.vlobs_updated",
+                realm_id=realm_id,
+                checkpoint=rep["checkpoint"],
+                src_id=EntryID(change["src_id"]),
+                src_version=change["src_version"],
+            )
 
     elif rep["event"] == "realm.maintenance_started":
         event_bus.send(
@@ -75,15 +131,36 @@ def _handle_event(event_bus: EventBus, rep: dict) -> None:
         )
 
 
-def _transport_pool_factory(addr, device_id, signing_key, max_pool, keepalive):
+def _transport_pool_factory(
+    addr, device_id, signing_key, max_pool, min_pool, idle_timeout, keepalive
+):
+    session_ticket = None
+
     async def _connect():
+        nonlocal session_ticket
         transport = await connect_as_authenticated(
-            addr, device_id=device_id, signing_key=signing_key, keepalive=keepalive
+            addr,
+            device_id=device_id,
+            signing_key=signing_key,
+            keepalive=keepalive,
+            session_ticket=session_ticket,
         )
+        # A new ticket is only issued when the previous one couldn't be used
+        if transport.handshake.issued_session_ticket:
+            session_ticket = transport.handshake.issued_session_ticket
         transport.logger = transport.logger.bind(device_id=device_id)
         return transport
 
-    return TransportPool(_connect, max_pool=max_pool)
+    return TransportPool(
+        _connect,
+        max_pool=max_pool,
+        multiplexing=True,
+        min_pool=min_pool,
+        idle_timeout=idle_timeout,
+        # Idle transports don't benefit from the keepalive pings done while
+        # receiving, so they get their own ones
+        health_check_interval=keepalive,
+    )
 
 
 class BackendAuthenticatedConn:
@@ -95,6 +172,8 @@ class BackendAuthenticatedConn:
         event_bus: EventBus,
         max_cooldown: int = 30,
         max_pool: int = 4,
+        min_pool: int = 1,
+        idle_timeout: Optional[int] = None,
         keepalive: Optional[int] = None,
     ):
         if max_pool < 2:
@@ -102,7 +181,7 @@ class BackendAuthenticatedConn:
 
         self._started = False
         self._transport_pool = _transport_pool_factory(
-            addr, device_id, signing_key, max_pool, keepalive
+            addr, device_id, signing_key, max_pool, min_pool, idle_timeout, keepalive
         )
         self._status = BackendConnStatus.LOST
         self._status_exc = None
@@ -198,7 +277,10 @@ class BackendAuthenticatedConn:
             )
             logger.info("Backend online")
 
-            await cmds.events_subscribe(transport)
+            # Organization config may have changed while we were offline
+            self._cmds.reset_organization_config()
+            # Vlobs updated while we were not listening are notified together
+            await cmds.events_subscribe(transport, coalesce_vlobs_updated=True)
 
             # Quis custodiet ipsos custodes?
             monitors_states = ["STALLED" for _ in range(len(self._monitors_cbs))]
@@ -232,9 +314,23 @@ class BackendAuthenticatedConn:
                         "backend.connection.changed", status=self._status, status_exc=None
                     )
 
+                    # Backend is online, make sure the next requests won't have to
+                    # wait for the connection to be established
+                    monitors_nursery.start_soon(self._transport_pool.run_maintenance)
+
+                    listen_batch = True
                     while True:
-                        rep = await cmds.events_listen(transport, wait=True)
-                        _handle_event(self.event_bus, rep)
+                        if listen_batch:
+                            rep = await cmds.events_listen_batch(transport, wait=True)
+                            if rep["status"] == "unknown_command":
+                                # Backend predates batch support, fallback on
+                                # listening events one by one
+                                listen_batch = False
+                                continue
+                            _handle_events_batch(self.event_bus, rep)
+                        else:
+                            rep = await cmds.events_listen(transport, wait=True)
+                            _handle_event(self.event_bus, rep)
 
             finally:
                 # No more monitors are running
@@ -5,7 +5,7 @@ from uuid import UUID
 import pendulum
 from pendulum import Pendulum
 
-from parsec.crypto import VerifyKey, PublicKey
+from parsec.crypto import VerifyKey, PublicKey, HashDigest
 from parsec.api.transport import Transport, TransportError
 from parsec.api.protocol import (
     OrganizationID,
@@ -13,6 +13,7 @@ from parsec.api.protocol import (
     DeviceName,
     DeviceID,
     ProtocolError,
+    UNCOMPRESSED_CMDS,
     InvitationType,
     InvitationDeletedReason,
     invite_new_serializer,
@@ -37,13 +38,16 @@ from parsec.api.protocol import (
     apiv1_organization_status_serializer,
     apiv1_organization_update_serializer,
     apiv1_organization_bootstrap_serializer,
+    organization_config_serializer,
     events_subscribe_serializer,
     events_listen_serializer,
+    events_listen_batch_serializer,
     message_get_serializer,
     vlob_read_serializer,
     vlob_create_serializer,
     vlob_update_serializer,
     vlob_poll_changes_serializer,
+    vlob_group_check_serializer,
     vlob_list_versions_serializer,
     vlob_maintenance_get_reencryption_batch_serializer,
     vlob_maintenance_save_reencryption_batch_serializer,
@@ -55,7 +59,10 @@ from parsec.api.protocol import (
     realm_finish_reencryption_maintenance_serializer,
     block_create_serializer,
     block_read_serializer,
+    block_create_chunk_serializer,
+    block_read_chunk_serializer,
     user_get_serializer,
+    user_get_batch_serializer,
     human_find_serializer,
     apiv1_user_find_serializer,
     apiv1_user_invite_serializer,
@@ -74,6 +81,7 @@ from parsec.api.protocol import (
 )
 from parsec.core.types import EntryID
 from parsec.core.backend_connection.exceptions import BackendNotAvailable, BackendProtocolError
+from parsec.core.backend_connection.transport import MultiplexedTransport
 
 
 async def _send_cmd(transport: Transport, serializer, **req) -> dict:
@@ -89,24 +97,40 @@ async def _send_cmd(transport: Transport, serializer, **req) -> dict:
         BackendCmdsBadResponse
     """
     transport.logger.info("Request", cmd=req["cmd"])
+    multiplexed = isinstance(transport, MultiplexedTransport)
+    compress = req["cmd"] not in UNCOMPRESSED_CMDS
 
     try:
-        raw_req = serializer.req_dumps(req)
+        # Multiplexed transport takes care of the final serialization
+        if multiplexed:
+            raw_req = serializer.req_dump(req)
+        else:
+            raw_req = serializer.req_dumps(req)
 
     except ProtocolError as exc:
         transport.logger.exception("Invalid request data", cmd=req["cmd"], error=exc)
         raise BackendProtocolError("Invalid request data") from exc
 
     try:
-        await transport.send(raw_req)
-        raw_rep = await transport.recv()
+        if multiplexed:
+            raw_rep = await transport.request(raw_req, compress=compress)
+        else:
+            await transport.send(raw_req, compress=compress)
+            raw_rep = await transport.recv()
 
     except TransportError as exc:
         transport.logger.debug("Request failed (backend not available)", cmd=req["cmd"])
         raise BackendNotAvailable(exc) from exc
 
+    except ProtocolError as exc:
+        transport.logger.exception("Invalid multiplexed response", cmd=req["cmd"], error=exc)
+        raise BackendProtocolError("Invalid response data") from exc
+
     try:
-        rep = serializer.rep_loads(raw_rep)
+        if multiplexed:
+            rep = serializer.rep_load(raw_rep)
+        else:
+            rep = serializer.rep_loads(raw_rep)
 
     except ProtocolError as exc:
         transport.logger.exception("Invalid response data", cmd=req["cmd"], error=exc)
@@ -129,14 +153,32 @@ async def ping(transport: Transport, ping: str = "") -> dict:
     return await _send_cmd(transport, ping_serializer, cmd="ping", ping=ping)
 
 
-async def events_subscribe(transport: Transport,) -> dict:
-    return await _send_cmd(transport, events_subscribe_serializer, cmd="events_subscribe")
+async def events_subscribe(transport: Transport, coalesce_vlobs_updated: bool = False) -> dict:
+    return await _send_cmd(
+        transport,
+        events_subscribe_serializer,
+        cmd="events_subscribe",
+        coalesce_vlobs_updated=coalesce_vlobs_updated,
+    )
 
 
 async def events_listen(transport: Transport, wait: bool = True) -> dict:
     return await _send_cmd(transport, events_listen_serializer, cmd="events_listen", wait=wait)
 
 
+async def events_listen_batch(transport: Transport, wait: bool = True) -> dict:
+    return await _send_cmd(
+        transport, events_listen_batch_serializer, cmd="events_listen_batch", wait=wait
+    )
+
+
+### Organization API ###
+
+
+async def organization_config(transport: Transport) -> dict:
+    return await _send_cmd(transport, organization_config_serializer, cmd="organization_config")
+
+
 ### Message API ###
 
 
@@ -215,6 +257,15 @@ async def vlob_poll_changes(transport: Transport, realm_id: UUID, last_checkpoin
     )
 
 
+async def vlob_group_check(transport: Transport, to_check: List[Tuple[EntryID, int]]) -> dict:
+    return await _send_cmd(
+        transport,
+        vlob_group_check_serializer,
+        cmd="vlob_group_check",
+        to_check=[{"vlob_id": vlob_id, "version": version} for vlob_id, version in to_check],
+    )
+
+
 async def vlob_list_versions(transport: Transport, vlob_id: UUID) -> dict:
     return await _send_cmd(
         transport, vlob_list_versions_serializer, cmd="vlob_list_versions", vlob_id=vlob_id
@@ -265,12 +316,15 @@ async def realm_status(transport: Transport, realm_id: UUID) -> dict:
     )
 
 
-async def realm_get_role_certificates(transport: Transport, realm_id: UUID) -> dict:
+async def realm_get_role_certificates(
+    transport: Transport, realm_id: UUID, since: Pendulum = None
+) -> dict:
     return await _send_cmd(
         transport,
         realm_get_role_certificates_serializer,
         cmd="realm_get_role_certificates",
         realm_id=realm_id,
+        since=since,
     )
 
 
@@ -334,6 +388,38 @@ async def block_read(transport: Transport, block_id: UUID) -> dict:
     return await _send_cmd(transport, block_read_serializer, cmd="block_read", block_id=block_id)
 
 
+async def block_create_chunk(
+    transport: Transport,
+    block_id: UUID,
+    realm_id: UUID,
+    digest: HashDigest,
+    size: int,
+    offset: int,
+    chunk: bytes,
+) -> dict:
+    return await _send_cmd(
+        transport,
+        block_create_chunk_serializer,
+        cmd="block_create_chunk",
+        block_id=block_id,
+        realm_id=realm_id,
+        digest=digest,
+        size=size,
+        offset=offset,
+        chunk=chunk,
+    )
+
+
+async def block_read_chunk(transport: Transport, block_id: UUID, offset: int) -> dict:
+    return await _send_cmd(
+        transport,
+        block_read_chunk_serializer,
+        cmd="block_read_chunk",
+        block_id=block_id,
+        offset=offset,
+    )
+
+
 ### Invite API ###
 
 
@@ -480,6 +566,12 @@ async def user_get(transport: Transport, user_id: UserID) -> dict:
     return await _send_cmd(transport, user_get_serializer, cmd="user_get", user_id=user_id)
 
 
+async def user_get_batch(transport: Transport, user_ids: List[UserID]) -> dict:
+    return await _send_cmd(
+        transport, user_get_batch_serializer, cmd="user_get_batch", user_ids=user_ids
+    )
+
+
 async def apiv1_user_find(
     transport: Transport,
     query: str = None,
@@ -8,8 +8,12 @@ from structlog import get_logger
 from typing import Optional, Union
 
 from parsec.crypto import SigningKey
+from parsec.api.version import is_multiplexing_supported
 from parsec.api.transport import Transport, TransportError, TransportClosedByPeer
 from parsec.api.protocol import (
+    packb,
+    unpackb,
+    MessageSerializationError,
     DeviceID,
     ProtocolError,
     HandshakeError,
@@ -37,12 +41,19 @@ from parsec.core.backend_connection.exceptions import (
 logger = get_logger()
 
 
+# Time to wait for the pong answering a transport health check ping
+HEALTH_CHECK_TIMEOUT = 10
+# Period of the pool maintenance when neither idle timeout nor health check is configured
+MAINTENANCE_INTERVAL = 30
+
+
 async def apiv1_connect(
     addr: Union[BackendAddr, BackendOrganizationBootstrapAddr, BackendOrganizationAddr],
     device_id: Optional[DeviceID] = None,
     signing_key: Optional[SigningKey] = None,
     administration_token: Optional[str] = None,
     keepalive: Optional[int] = None,
+    session_ticket: Optional[bytes] = None,
 ) -> Transport:
     """
     Raises:
@@ -75,7 +86,7 @@ async def apiv1_connect(
         if not signing_key:
             raise BackendConnectionError(f"Missing signing_key to connect as `{device_id}`")
         handshake = APIV1_AuthenticatedClientHandshake(
-            addr.organization_id, device_id, signing_key, addr.root_verify_key
+            addr.organization_id, device_id, signing_key, addr.root_verify_key, session_ticket
         )
 
     return await _connect(addr.hostname, addr.port, addr.use_ssl, keepalive, handshake)
@@ -93,12 +104,19 @@ async def connect_as_authenticated(
     device_id: DeviceID,
     signing_key: SigningKey,
     keepalive: Optional[int] = None,
+    session_ticket: Optional[bytes] = None,
 ):
+    """
+    `session_ticket` is the ticket issued by the backend during a previous
+    handshake (available as `transport.handshake.issued_session_ticket`),
+    it allows the backend to skip most of the authentication checks.
+    """
     handshake = AuthenticatedClientHandshake(
         organization_id=addr.organization_id,
         device_id=device_id,
         user_signkey=signing_key,
         root_verify_key=addr.root_verify_key,
+        session_ticket=session_ticket,
     )
     return await _connect(addr.hostname, addr.port, addr.use_ssl, keepalive, handshake)
 
@@ -173,12 +191,192 @@ async def _do_handshake(transport: Transport, handshake):
         raise BackendProtocolError(exc) from exc
 
 
+class MultiplexedTransport:
+    """
+    Allow concurrent requests on a single transport, given the backend
+    supports requests multiplexing (see `is_multiplexing_supported`).
+
+    Each message is sent as a `[req_id, msg]` envelope and responses can come
+    in any order. Responses are read by a reader task owned by the transport
+    which dispatches them to the requests waiting for them. This way a
+    cancelled request (typically a long poll or a request with a timeout)
+    only gives up on its own response, the transport is only considered
+    broken on transport error or if a message has been partially sent.
+    """
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
+        self._next_req_id = 0
+        self._waiters = {}
+        self._replies = {}
+        self._send_lock = trio.Lock()
+        self._broken = None
+        self.last_used = trio.current_time()
+        self._reader_cancel_scope = trio.CancelScope()
+        # The reader is not bound to the lifetime of a request (nor to the
+        # pool which has no nursery), it stops once the transport is closed
+        trio.hazmat.spawn_system_task(self._run_reader)
+
+    @property
+    def logger(self):
+        return self.transport.logger
+
+    @property
+    def broken(self) -> bool:
+        return self._broken is not None
+
+    @property
+    def idle(self) -> bool:
+        return not self._waiters
+
+    async def aclose(self) -> None:
+        self._reader_cancel_scope.cancel()
+        await self.transport.aclose()
+
+    def _set_broken(self, exc: Exception) -> None:
+        if not self._broken:
+            self._broken = exc
+        for event in self._waiters.values():
+            event.set()
+
+    async def _run_reader(self) -> None:
+        with self._reader_cancel_scope:
+            try:
+                while True:
+                    self._dispatch(await self.transport.recv())
+
+            except (TransportError, MessageSerializationError) as exc:
+                self._set_broken(exc)
+
+            except BaseException as exc:
+                self._set_broken(TransportError("Multiplexed transport reader has stopped"))
+                if isinstance(exc, Exception):
+                    # Must not crash the trio run given this is a system task
+                    self.logger.exception("Multiplexed transport reader has crashed")
+                else:
+                    raise
+
+        self._set_broken(TransportError("Multiplexed transport has been closed"))
+
+    async def check_alive(self, timeout: float) -> bool:
+        """
+        Only checks a transport without requests in progress (otherwise those
+        requests are enough to find out the transport is dead).
+        """
+        if self._broken:
+            return False
+        if not self.idle:
+            return True
+
+        with trio.move_on_after(timeout):
+            try:
+                # Any response (even an error status) means the peer is alive
+                await self.request({"cmd": "ping", "ping": "health_check"})
+                return True
+
+            except (TransportError, MessageSerializationError):
+                return False
+
+        self._set_broken(TransportError("Multiplexed transport health check has failed"))
+        return False
+
+    async def request(self, req: dict, compress: bool = True) -> dict:
+        """
+        Raises:
+            TransportError
+            MessageSerializationError
+        """
+        if self._broken:
+            raise self._broken
+
+        req_id = self._next_req_id
+        self._next_req_id += 1
+        event = self._waiters[req_id] = trio.Event()
+        try:
+            await self._send(packb([req_id, req]), compress)
+            await event.wait()
+            try:
+                return self._replies.pop(req_id)
+            except KeyError:
+                raise self._broken
+
+        finally:
+            self._waiters.pop(req_id, None)
+            self._replies.pop(req_id, None)
+            self.last_used = trio.current_time()
+
+    async def _send(self, raw_req: bytes, compress: bool) -> None:
+        # Being cancelled while waiting for our turn is harmless given
+        # nothing has been sent yet
+        async with self._send_lock:
+            if self._broken:
+                raise self._broken
+            try:
+                await self.transport.send(raw_req, compress=compress)
+
+            except TransportError as exc:
+                self._set_broken(exc)
+                raise
+
+            except BaseException:
+                # Cancelled while sending, a partially sent message would make
+                # the transport unusable
+                self._set_broken(TransportError("Multiplexed transport sender has been cancelled"))
+                raise
+
+    def _dispatch(self, raw_rep: bytes) -> None:
+        envelope = unpackb(raw_rep)
+        try:
+            rep_id, rep = envelope
+            if not isinstance(rep_id, int) or not isinstance(rep, dict):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise MessageSerializationError(f"Invalid multiplexed message: {envelope!r}")
+
+        # Response to a cancelled request is simply dropped
+        event = self._waiters.get(rep_id)
+        if event:
+            self._replies[rep_id] = rep
+            event.set()
+
+
 class TransportPool:
-    def __init__(self, connect_cb, max_pool):
+    """
+    Pool of transports, ready to be reused between requests.
+
+    `run_maintenance` should run in background while the backend is online to:
+    - pre-connect transports so that at least `min_pool` of them are ready
+      (given a single multiplexed transport can serve all the requests, it
+      is enough on its own)
+    - close the extra transports idle for more than `idle_timeout` seconds
+    - ping every `health_check_interval` seconds the idle transports to drop
+      dead ones before they get used
+    """
+
+    def __init__(
+        self,
+        connect_cb,
+        max_pool,
+        multiplexing=False,
+        min_pool=0,
+        idle_timeout=None,
+        health_check_interval=None,
+        health_check_timeout=HEALTH_CHECK_TIMEOUT,
+    ):
+        if min_pool > max_pool:
+            raise ValueError("min_pool cannot be greater than max_pool")
         self._connect_cb = connect_cb
+        # Idle transports with the time they were released, oldest first
         self._transports = []
         self._closed = False
+        self._max_pool = max_pool
         self._lock = trio.Semaphore(max_pool)
+        self._multiplexing = multiplexing
+        self._multiplexed_transport = None
+        self._min_pool = min_pool
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._health_check_timeout = health_check_timeout
 
     @asynccontextmanager
     async def acquire(self, force_fresh=False):
@@ -187,12 +385,17 @@ class TransportPool:
             BackendConnectionError
             trio.ClosedResourceError: if used after having being closed
         """
+        if not force_fresh and self._multiplexed_transport:
+            async with self._acquire_multiplexed() as transport:
+                yield transport
+            return
+
         async with self._lock:
             transport = None
             if not force_fresh:
                 try:
                     # Fifo style to retrieve oldest first
-                    transport = self._transports.pop(0)
+                    transport, _ = self._transports.pop(0)
                 except IndexError:
                     pass
 
@@ -201,16 +404,157 @@ class TransportPool:
                     raise trio.ClosedResourceError()
 
                 transport = await self._connect_cb()
+                if not force_fresh and self._try_promote_to_multiplexed(transport):
+                    transport = None
 
-            try:
-                yield transport
+            if transport:
+                try:
+                    yield transport
+
+                except TransportClosedByPeer:
+                    raise
+
+                except Exception:
+                    await transport.aclose()
+                    raise
+
+                else:
+                    self._transports.append((transport, trio.current_time()))
+                return
+
+        async with self._acquire_multiplexed() as transport:
+            yield transport
+
+    def _try_promote_to_multiplexed(self, transport) -> bool:
+        # Given the multiplexed transport can be shared by all the
+        # requests, there is no need for more than one of them
+        if (
+            self._multiplexing
+            and not self._multiplexed_transport
+            and is_multiplexing_supported(transport.handshake.backend_api_version)
+        ):
+            self._multiplexed_transport = MultiplexedTransport(transport)
+            return True
+        return False
 
-            except TransportClosedByPeer:
-                raise
+    @asynccontextmanager
+    async def _acquire_multiplexed(self):
+        transport = self._multiplexed_transport
+        try:
+            yield transport
+
+        except Exception:
+            # Other requests may still be using the transport, so only close
+            # it if it cannot be used anymore
+            if transport.broken:
+                await self._drop_multiplexed(transport)
+            raise
+
+    async def _drop_multiplexed(self, transport):
+        if self._multiplexed_transport is transport:
+            self._multiplexed_transport = None
+        await transport.aclose()
 
-            except Exception:
-                await transport.aclose()
-                raise
+    def _get_maintenance_interval(self):
+        intervals = [
+            interval
+            for interval in (self._idle_timeout, self._health_check_interval)
+            if interval is not None
+        ]
+        return min(intervals, default=MAINTENANCE_INTERVAL)
+
+    async def run_maintenance(self) -> None:
+        while not self._closed:
+            await self._prewarm()
+            await trio.sleep(self._get_maintenance_interval())
+            await self._evict_idle_transports()
+            await self._check_transports_health()
+
+    async def _prewarm(self) -> None:
+        while (
+            not self._closed
+            and not self._multiplexed_transport
+            and len(self._transports) < self._min_pool
+        ):
+            try:
+                self._lock.acquire_nowait()
+            except trio.WouldBlock:
+                # All the slots are used by requests, which will release
+                # their transports in the pool soon enough
+                return
+
+            try:
+                # Only the transports in use hold a slot (this includes the
+                # one we are about to connect), idle ones must be counted too
+                in_use = self._max_pool - self._lock.value
+                if len(self._transports) + in_use > self._max_pool:
+                    return
 
+                try:
+                    transport = await self._connect_cb()
+
+                except BackendConnectionError as exc:
+                    # Requests will report the error if the backend is really gone
+                    logger.debug("Cannot pre-connect transport", exc_info=exc)
+                    return
+
+                if self._try_promote_to_multiplexed(transport):
+                    return
+                elif self._multiplexed_transport:
+                    # A request has connected a multiplexed transport in the meantime
+                    await transport.aclose()
+                    return
+                self._transports.append((transport, trio.current_time()))
+
+            finally:
+                self._lock.release()
+
+    async def _evict_idle_transports(self) -> None:
+        if self._idle_timeout is None:
+            return
+        now = trio.current_time()
+
+        multiplexed_transport = self._multiplexed_transport
+        if (
+            self._min_pool == 0
+            and multiplexed_transport
+            and multiplexed_transport.idle
+            and now - multiplexed_transport.last_used > self._idle_timeout
+        ):
+            await self._drop_multiplexed(multiplexed_transport)
+
+        # Oldest transports are the first ones, always keep `min_pool` of them
+        while (
+            len(self._transports) > self._min_pool
+            and now - self._transports[0][1] > self._idle_timeout
+        ):
+            transport, _ = self._transports.pop(0)
+            transport.logger.debug("Closing idle transport")
+            await transport.aclose()
+
+    async def _check_transports_health(self) -> None:
+        if self._health_check_interval is None:
+            return
+        now = trio.current_time()
+
+        multiplexed_transport = self._multiplexed_transport
+        if multiplexed_transport and (
+            now - multiplexed_transport.last_used >= self._health_check_interval
+        ):
+            if not await multiplexed_transport.check_alive(self._health_check_timeout):
+                await self._drop_multiplexed(multiplexed_transport)
+
+        # Transports are taken out of the pool during the check so they
+        # cannot be acquired by a request in the meantime
+        to_check = [
+            item for item in self._transports if now - item[1] >= self._health_check_interval
+        ]
+        for item in to_check:
+            self._transports.remove(item)
+        for transport, released_at in to_check:
+            if await transport.check_alive(self._health_check_timeout):
+                self._transports.append((transport, released_at))
             else:
-                self._transports.append(transport)
+                transport.logger.info("Closing dead transport")
+                await transport.aclose()
+        self._transports.sort(key=lambda item: item[1])
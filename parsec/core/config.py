@@ -10,6 +10,12 @@ from structlog import get_logger
 
 logger = get_logger()
 
+# Default sync debounce settings (in seconds, except the file size in bytes)
+SYNC_MIN_WAIT = 1
+SYNC_MAX_WAIT = 60
+SYNC_LARGE_FILE_SIZE = 8 * 1024 * 1024
+SYNC_MAX_WAIT_LARGE_FILE = 600
+
 
 def get_default_data_base_dir(environ: dict):
     if os.name == "nt":
@@ -57,6 +63,13 @@ class CoreConfig:
     backend_max_cooldown: int = 30
     backend_connection_keepalive: Optional[int] = 29
     backend_max_connections: int = 4
+    backend_min_connections: int = 1
+    backend_connection_idle_timeout: Optional[int] = 300
+
+    sync_min_wait: float = SYNC_MIN_WAIT
+    sync_max_wait: float = SYNC_MAX_WAIT
+    sync_large_file_size: int = SYNC_LARGE_FILE_SIZE
+    sync_max_wait_large_file: float = SYNC_MAX_WAIT_LARGE_FILE
 
     invitation_token_size: int = 8
 
@@ -93,6 +106,12 @@ def config_factory(
     backend_max_cooldown: int = 30,
     backend_connection_keepalive: Optional[int] = 29,
     backend_max_connections: int = 4,
+    backend_min_connections: int = 1,
+    backend_connection_idle_timeout: Optional[int] = 300,
+    sync_min_wait: float = SYNC_MIN_WAIT,
+    sync_max_wait: float = SYNC_MAX_WAIT,
+    sync_large_file_size: int = SYNC_LARGE_FILE_SIZE,
+    sync_max_wait_large_file: float = SYNC_MAX_WAIT_LARGE_FILE,
     telemetry_enabled: bool = True,
     debug: bool = False,
     gui_last_device: str = None,
@@ -116,6 +135,12 @@ def config_factory(
         backend_max_cooldown=backend_max_cooldown,
         backend_connection_keepalive=backend_connection_keepalive,
         backend_max_connections=backend_max_connections,
+        backend_min_connections=backend_min_connections,
+        backend_connection_idle_timeout=backend_connection_idle_timeout,
+        sync_min_wait=sync_min_wait,
+        sync_max_wait=sync_max_wait,
+        sync_large_file_size=sync_large_file_size,
+        sync_max_wait_large_file=sync_max_wait_large_file,
         telemetry_enabled=telemetry_enabled,
         debug=debug,
         sentry_url=environ.get("SENTRY_URL") or None,
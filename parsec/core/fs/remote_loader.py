@@ -1,21 +1,32 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import attr
 from pendulum import Pendulum, now as pendulum_now
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, FrozenSet, Iterable, Optional, List, Tuple, Union
 
-from parsec.utils import timestamps_in_the_ballpark
+from parsec.utils import timestamps_in_the_ballpark, TIMESTAMP_MAX_DT
 from parsec.crypto import HashDigest, CryptoError
-from parsec.api.protocol import UserID, DeviceID, RealmRole
+from parsec.api.protocol import (
+    UserID,
+    DeviceID,
+    RealmRole,
+    BLOCK_CHUNK_SIZE,
+    BLOCK_CHUNKED_TRANSFER_THRESHOLD,
+)
 from parsec.api.data import (
     DataError,
     BlockAccess,
     RealmRoleCertificateContent,
     Manifest as RemoteManifest,
+    FolderManifest as RemoteFolderManifest,
+    WorkspaceManifest as RemoteWorkspaceManifest,
+    FolderManifestDelta,
 )
 from parsec.core.backend_connection import BackendConnectionError, BackendNotAvailable
 from parsec.core.types import EntryID, ChunkID
 from parsec.core.fs.exceptions import (
     FSError,
+    FSLocalMissError,
     FSRemoteSyncError,
     FSRemoteManifestNotFound,
     FSRemoteManifestNotFoundBadVersion,
@@ -29,6 +40,70 @@ from parsec.core.fs.exceptions import (
 )
 
 
+# Folderish manifests with at least this number of children are uploaded as
+# a delta against their previous version (see `FolderManifestDelta`)
+FOLDER_MANIFEST_DELTA_THRESHOLD = 1000
+# Every N versions, a full folderish manifest is uploaded no matter what.
+# This bounds the number of vlobs needed to rebuild any given version.
+FOLDER_MANIFEST_SNAPSHOT_INTERVAL = 16
+# A chunked upload not progressing (e.g. the backend has lost the chunks
+# received so far) is started over at most this number of times
+MAX_CHUNKED_UPLOAD_RESTARTS = 3
+# Ciphered data of the interrupted uploads kept to resume them (oldest
+# ones are forgotten and will be ciphered again)
+MAX_INTERRUPTED_UPLOADS_SIZE = 256 * 1024 * 1024  # 256 MB
+
+RemoteFolderishManifest = Union[RemoteFolderManifest, RemoteWorkspaceManifest]
+
+
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class RealmRoleCertificatesHistory:
+    # Verified certificates, sorted by timestamp
+    certificates: Tuple[RealmRoleCertificateContent, ...]
+    raw_certificates: FrozenSet[bytes]
+    current_roles: Dict[UserID, RealmRole]
+    fetched_on: Pendulum
+
+
+def _apply_realm_role_certificates(
+    current_roles: Dict[UserID, RealmRole], certificates: Iterable[RealmRoleCertificateContent]
+) -> Dict[UserID, RealmRole]:
+    """
+    Make sure each certificate's author had the right to give the role at
+    that time. Certificates must be sorted by timestamp and `current_roles`
+    is updated in place.
+
+    Raises:
+        FSError
+    """
+    owner_only = (RealmRole.OWNER,)
+    owner_or_manager = (RealmRole.OWNER, RealmRole.MANAGER)
+
+    for certif in certificates:
+        existing_user_role = current_roles.get(certif.user_id)
+        if not current_roles and certif.user_id == certif.author.user_id:
+            # First user is autosigned
+            needed_roles = (None,)
+        elif existing_user_role in owner_or_manager or certif.role in owner_or_manager:
+            needed_roles = owner_only
+        else:
+            needed_roles = owner_or_manager
+        if current_roles.get(certif.author.user_id) not in needed_roles:
+            raise FSError(
+                f"Invalid realm role certificates: "
+                f"{certif.author} has not right to give "
+                f"{certif.role} role to {certif.user_id} "
+                f"on {certif.timestamp}"
+            )
+
+        if certif.role is None:
+            current_roles.pop(certif.user_id, None)
+        else:
+            current_roles[certif.user_id] = certif.role
+
+    return current_roles
+
+
 class RemoteLoader:
     def __init__(
         self,
@@ -45,20 +120,22 @@ class RemoteLoader:
         self.backend_cmds = backend_cmds
         self.remote_device_manager = remote_device_manager
         self.local_storage = local_storage
-        self._realm_role_certificates_cache = None
-        self._realm_role_certificates_cache_timestamp = None
+        # Transfer counters exposed as part of the sync stats
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        # Ciphered blocks whose chunked upload has been interrupted by a
+        # connection loss, kept as is so the upload can be resumed
+        self._interrupted_uploads = {}
+        self._realm_role_certificates_histories: Dict[EntryID, RealmRoleCertificatesHistory] = {}
 
     async def _get_user_realm_role_at(self, user_id: UserID, timestamp: Pendulum):
-        if (
-            not self._realm_role_certificates_cache
-            or self._realm_role_certificates_cache_timestamp <= timestamp
-        ):
-            cache_timestamp = pendulum_now()
-            self._realm_role_certificates_cache, _ = await self._load_realm_role_certificates()
-            # Set the cache timestamp in two times to avoid invalid value in case of exception
-            self._realm_role_certificates_cache_timestamp = cache_timestamp
+        history = self._realm_role_certificates_histories.get(self.workspace_id)
+        if not history or history.fetched_on <= timestamp:
+            certificates, _ = await self._load_realm_role_certificates()
+        else:
+            certificates = history.certificates
 
-        for certif in reversed(self._realm_role_certificates_cache):
+        for certif in reversed(certificates):
             if certif.user_id == user_id and certif.timestamp <= timestamp:
                 return certif.role
         else:
@@ -75,30 +152,50 @@ class RemoteLoader:
             raise FSError(f"`{cmd}` request has failed due to connection error `{exc}`") from exc
 
     async def _load_realm_role_certificates(self, realm_id: Optional[EntryID] = None):
-        rep = await self._backend_cmds("realm_get_role_certificates", realm_id or self.workspace_id)
+        """
+        Verified certificates are kept so that only the ones added since the
+        previous call are fetched and verified.
+        """
+        realm_id = realm_id or self.workspace_id
+        history = self._realm_role_certificates_histories.get(realm_id)
+        fetched_on = pendulum_now()
+        if history:
+            # Backend only checks new certificates' timestamp is in the ballpark
+            # of its own time, so a certificate added after our previous fetch
+            # can have an older timestamp (consider our clock may also be off)
+            since = history.fetched_on.subtract(seconds=2 * TIMESTAMP_MAX_DT)
+        else:
+            since = None
+
+        rep = await self._backend_cmds("realm_get_role_certificates", realm_id, since)
         if rep["status"] == "not_allowed":
             # Seems we lost the access to the realm
+            self._realm_role_certificates_histories.pop(realm_id, None)
             raise FSWorkspaceNoReadAccess("Cannot get workspace roles: no read access")
         elif rep["status"] != "ok":
             raise FSError(f"Cannot retrieve workspace roles: `{rep['status']}`")
 
+        known_raw_certificates = history.raw_certificates if history else frozenset()
+        new_raw_certificates = [
+            raw for raw in rep["certificates"] if raw not in known_raw_certificates
+        ]
+
         try:
             # Must read unverified certificates to access metadata
             unsecure_certifs = sorted(
                 [
                     (RealmRoleCertificateContent.unsecure_load(uv_role), uv_role)
-                    for uv_role in rep["certificates"]
+                    for uv_role in new_raw_certificates
                 ],
                 key=lambda x: x[0].timestamp,
             )
 
-            current_roles = {}
-            owner_only = (RealmRole.OWNER,)
-            owner_or_manager = (RealmRole.OWNER, RealmRole.MANAGER)
-
-            # Now verify each certif
+            # Now verify each certif, authors being retrieved all at once
+            authors = await self.remote_device_manager.get_devices(
+                unsecure_certif.author for unsecure_certif, _ in unsecure_certifs
+            )
             for unsecure_certif, raw_certif in unsecure_certifs:
-                author = await self.remote_device_manager.get_device(unsecure_certif.author)
+                author = authors[unsecure_certif.author]
 
                 RealmRoleCertificateContent.verify_and_load(
                     raw_certif,
@@ -106,37 +203,37 @@ class RemoteLoader:
                     expected_author=author.device_id,
                 )
 
-                # Make sure author had the right to do this
-                existing_user_role = current_roles.get(unsecure_certif.user_id)
-                if not current_roles and unsecure_certif.user_id == author.device_id.user_id:
-                    # First user is autosigned
-                    needed_roles = (None,)
-                elif (
-                    existing_user_role in owner_or_manager
-                    or unsecure_certif.role in owner_or_manager
-                ):
-                    needed_roles = owner_only
-                else:
-                    needed_roles = owner_or_manager
-                if current_roles.get(unsecure_certif.author.user_id) not in needed_roles:
-                    raise FSError(
-                        f"Invalid realm role certificates: "
-                        f"{unsecure_certif.author} has not right to give "
-                        f"{unsecure_certif.role} role to {unsecure_certif.user_id} "
-                        f"on {unsecure_certif.timestamp}"
-                    )
-
-                if unsecure_certif.role is None:
-                    current_roles.pop(unsecure_certif.user_id, None)
-                else:
-                    current_roles[unsecure_certif.user_id] = unsecure_certif.role
-
         # Decryption error
         except DataError as exc:
             raise FSError(f"Invalid realm role certificates: {exc}") from exc
 
         # Now unsecure_certifs is no longer unsecure we have valided it items
-        return [c for c, _ in unsecure_certifs], current_roles
+        new_certificates = tuple(c for c, _ in unsecure_certifs)
+        if history and (
+            not new_certificates
+            or history.certificates[-1].timestamp <= new_certificates[0].timestamp
+        ):
+            # Most common case: new certificates come after the known ones
+            certificates = history.certificates + new_certificates
+            current_roles = _apply_realm_role_certificates(
+                dict(history.current_roles), new_certificates
+            )
+        else:
+            certificates = tuple(
+                sorted(
+                    (history.certificates if history else ()) + new_certificates,
+                    key=lambda c: c.timestamp,
+                )
+            )
+            current_roles = _apply_realm_role_certificates({}, certificates)
+
+        self._realm_role_certificates_histories[realm_id] = RealmRoleCertificatesHistory(
+            certificates=certificates,
+            raw_certificates=known_raw_certificates | frozenset(new_raw_certificates),
+            current_roles=current_roles,
+            fetched_on=fetched_on,
+        )
+        return list(certificates), dict(current_roles)
 
     async def load_realm_role_certificates(
         self, realm_id: Optional[EntryID] = None
@@ -183,7 +280,10 @@ class RemoteLoader:
             FSWorkspaceNoAccess
         """
         # Download
-        rep = await self._backend_cmds("block_read", access.id)
+        if access.size > BLOCK_CHUNKED_TRANSFER_THRESHOLD:
+            rep = await self._download_block_chunks(access)
+        else:
+            rep = await self._backend_cmds("block_read", access.id)
         if rep["status"] == "not_found":
             raise FSRemoteBlockNotFound(access)
         elif rep["status"] == "not_allowed":
@@ -195,6 +295,7 @@ class RemoteLoader:
             )
         elif rep["status"] != "ok":
             raise FSError(f"Cannot download block: `{rep['status']}`")
+        self.bytes_downloaded += len(rep["block"])
 
         # Decryption
         try:
@@ -217,15 +318,23 @@ class RemoteLoader:
             FSWorkspaceNoAccess
         """
         # Encryption
+        ciphered = self._interrupted_uploads.pop(access.id, None)
         try:
-            ciphered = access.key.encrypt(data)
+            ciphered = ciphered or access.key.encrypt(data)
 
         # Encryption error
         except CryptoError as exc:
             raise FSError(f"Cannot encrypt block: {exc}") from exc
 
         # Upload block
-        rep = await self._backend_cmds("block_create", access.id, self.workspace_id, ciphered)
+        if len(ciphered) > BLOCK_CHUNKED_TRANSFER_THRESHOLD:
+            try:
+                rep = await self._upload_block_chunks(access, ciphered)
+            except FSBackendOfflineError:
+                self._remember_interrupted_upload(access, ciphered)
+                raise
+        else:
+            rep = await self._backend_cmds("block_create", access.id, self.workspace_id, ciphered)
         if rep["status"] == "already_exists":
             # Ignore exception if the block has already been uploaded
             # This might happen when a failure occurs before the local storage is updated
@@ -237,13 +346,68 @@ class RemoteLoader:
             raise FSWorkspaceInMaintenance(
                 f"Cannot upload block while the workspace in maintenance"
             )
+        elif rep["status"] == "uploads_limit_reached":
+            # Backend is overloaded by other uploads, try again later
+            self._remember_interrupted_upload(access, ciphered)
+            raise FSError("Cannot upload block: too many uploads in progress on the backend")
         elif rep["status"] != "ok":
             raise FSError(f"Cannot upload block: {rep}")
+        else:
+            self.bytes_uploaded += len(ciphered)
 
         # Update local storage
         await self.local_storage.set_clean_block(access.id, data)
         await self.local_storage.clear_chunk(ChunkID(access.id), miss_ok=True)
 
+    async def _upload_block_chunks(self, access: BlockAccess, ciphered: bytes) -> dict:
+        digest = HashDigest.from_data(ciphered)
+        size = len(ciphered)
+        # If the upload has been interrupted, the backend provides the offset
+        # to resume from in its first response
+        offset = 0
+        restarts = 0
+        while True:
+            rep = await self._backend_cmds(
+                "block_create_chunk",
+                access.id,
+                self.workspace_id,
+                digest,
+                size,
+                offset,
+                ciphered[offset : offset + BLOCK_CHUNK_SIZE],
+            )
+            if rep["status"] != "ok" or rep["offset"] == size:
+                return rep
+            if rep["offset"] > size:
+                raise FSError(f"Cannot upload block: invalid offset {rep['offset']}")
+            if rep["offset"] <= offset:
+                # Backend doesn't know about the chunks sent so far
+                restarts += 1
+                if restarts > MAX_CHUNKED_UPLOAD_RESTARTS:
+                    raise FSError("Cannot upload block: chunked upload doesn't progress")
+            offset = rep["offset"]
+
+    def _remember_interrupted_upload(self, access: BlockAccess, ciphered: bytes) -> None:
+        self._interrupted_uploads[access.id] = ciphered
+        total_size = sum(len(data) for data in self._interrupted_uploads.values())
+        # Dict keeps insertion order, so the oldest uploads are the first ones
+        for block_id in list(self._interrupted_uploads):
+            if total_size <= MAX_INTERRUPTED_UPLOADS_SIZE:
+                break
+            total_size -= len(self._interrupted_uploads.pop(block_id))
+
+    async def _download_block_chunks(self, access: BlockAccess) -> dict:
+        chunks = []
+        offset = 0
+        while True:
+            rep = await self._backend_cmds("block_read_chunk", access.id, offset)
+            if rep["status"] != "ok":
+                return rep
+            chunks.append(rep["chunk"])
+            offset += len(rep["chunk"])
+            if offset >= rep["size"] or not rep["chunk"]:
+                return {"status": "ok", "block": b"".join(chunks)}
+
     async def load_manifest(
         self,
         entry_id: EntryID,
@@ -299,6 +463,7 @@ class RemoteLoader:
             )
         elif rep["status"] != "ok":
             raise FSError(f"Cannot fetch vlob {entry_id}: `{rep['status']}`")
+        self.bytes_downloaded += len(rep["blob"])
 
         expected_version = rep["version"]
         expected_author = rep["author"]
@@ -345,8 +510,76 @@ class RemoteLoader:
                 "which had write right on the workspace at that time"
             )
 
+        # Rebuild the actual manifest from the previous version
+        if isinstance(remote_manifest, FolderManifestDelta):
+            base = await self._get_folderish_manifest_base(entry_id, remote_manifest.version - 1)
+            try:
+                remote_manifest = remote_manifest.apply(base)
+            except DataError as exc:
+                raise FSError(f"Cannot apply vlob delta: {exc}") from exc
+
         return remote_manifest
 
+    async def _get_local_folderish_manifest_base(
+        self, entry_id: EntryID, version: int
+    ) -> Optional[RemoteFolderishManifest]:
+        if self.local_storage is None:
+            return None
+        try:
+            local_manifest = await self.local_storage.get_manifest(entry_id)
+        except FSLocalMissError:
+            return None
+        base = local_manifest.base
+        if (
+            isinstance(base, (RemoteFolderManifest, RemoteWorkspaceManifest))
+            and base.version == version
+        ):
+            return base
+        return None
+
+    async def _get_folderish_manifest_base(
+        self, entry_id: EntryID, version: int
+    ) -> RemoteFolderishManifest:
+        # Most of the time the previous version is already known locally
+        base = await self._get_local_folderish_manifest_base(entry_id, version)
+        if base is None:
+            base = await self.load_manifest(entry_id, version=version)
+        if not isinstance(base, (RemoteFolderManifest, RemoteWorkspaceManifest)):
+            raise FSError(f"Cannot apply vlob delta on a non-folderish manifest `{entry_id}`")
+        return base
+
+    async def is_compact_manifests_enabled(self) -> bool:
+        """
+        Other clients may not be able to read compact manifests (envelope
+        serialization and folder manifest deltas), hence they must be enabled
+        in the organization config once all the clients have been upgraded.
+
+        Raises:
+            FSError
+            FSBackendOfflineError
+        """
+        organization_config = await self._backend_cmds("get_organization_config")
+        return organization_config.compact_manifests
+
+    async def _build_manifest_to_upload(
+        self, entry_id: EntryID, manifest: RemoteManifest, compact: bool
+    ) -> RemoteManifest:
+        # Big folderish manifests are uploaded as a delta whenever possible,
+        # given the organization's clients can read them (see `compact`)
+        if (
+            compact
+            and isinstance(manifest, (RemoteFolderManifest, RemoteWorkspaceManifest))
+            and manifest.version % FOLDER_MANIFEST_SNAPSHOT_INTERVAL != 1
+            and len(manifest.children) >= FOLDER_MANIFEST_DELTA_THRESHOLD
+        ):
+            base = await self._get_local_folderish_manifest_base(entry_id, manifest.version - 1)
+            if base is not None and type(base) is type(manifest):
+                delta = FolderManifestDelta.from_manifests(base, manifest)
+                # Not worth it if most of the children have changed
+                if len(delta.children_updates) * 2 < len(manifest.children):
+                    return delta
+        return manifest
+
     async def list_versions(self, entry_id: EntryID) -> Dict[int, Tuple[Pendulum, DeviceID]]:
         """
         Raises:
@@ -402,10 +635,12 @@ class RemoteLoader:
         assert timestamps_in_the_ballpark(manifest.timestamp, pendulum_now())
 
         workspace_entry = self.get_workspace_entry()
+        compact = await self.is_compact_manifests_enabled()
+        to_upload = await self._build_manifest_to_upload(entry_id, manifest, compact)
 
         try:
-            ciphered = manifest.dump_sign_and_encrypt(
-                key=workspace_entry.key, author_signkey=self.device.signing_key
+            ciphered = to_upload.dump_sign_and_encrypt(
+                key=workspace_entry.key, author_signkey=self.device.signing_key, compact=compact
             )
         except DataError as exc:
             raise FSError(f"Cannot encrypt vlob: {exc}") from exc
@@ -423,6 +658,7 @@ class RemoteLoader:
                 manifest.timestamp,
                 manifest.version,
             )
+        self.bytes_uploaded += len(ciphered)
 
     async def _vlob_create(
         self, encryption_revision: int, entry_id: EntryID, ciphered: bytes, now: Pendulum
@@ -512,8 +748,10 @@ class RemoteLoaderTimestamped(RemoteLoader):
         self.backend_cmds = remote_loader.backend_cmds
         self.remote_device_manager = remote_loader.remote_device_manager
         self.local_storage = remote_loader.local_storage.to_timestamped(timestamp)
-        self._realm_role_certificates_cache = None
-        self._realm_role_certificates_cache_timestamp = None
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        # Role certificates never change once written, no need for a separate history
+        self._realm_role_certificates_histories = remote_loader._realm_role_certificates_histories
         self.timestamp = timestamp
 
     async def upload_block(self, *e, **ke):
@@ -5,6 +5,7 @@ from parsec.core.fs.storage.user_storage import UserStorage
 from parsec.core.fs.storage.manifest_storage import ManifestStorage
 from parsec.core.fs.storage.chunk_storage import ChunkStorage, BlockStorage
 from parsec.core.fs.storage.workspace_storage import WorkspaceStorage, WorkspaceStorageTimestamped
+from parsec.core.fs.storage.certificate_storage import CertificateStorage
 
 __all__ = (
     "LocalDatabase",
@@ -14,4 +15,5 @@ __all__ = (
     "UserStorage",
     "WorkspaceStorage",
     "WorkspaceStorageTimestamped",
+    "CertificateStorage",
 )
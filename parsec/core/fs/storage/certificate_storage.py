@@ -0,0 +1,174 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from pendulum import Pendulum, from_timestamp
+from async_generator import asynccontextmanager
+
+from parsec.api.protocol import UserID, DeviceID
+from parsec.api.data import (
+    UserCertificateContent,
+    RevokedUserCertificateContent,
+    DeviceCertificateContent,
+)
+from parsec.core.types import LocalDevice
+
+from parsec.core.fs.storage.version import CERTIFICATE_STORAGE_NAME
+from parsec.core.fs.storage.local_database import LocalDatabase
+
+
+class CertificateStorage:
+    """Persistent storage for the already verified certificates.
+
+    Certificates are stored in their signed form and encrypted with the
+    device local key, hence they can be trusted without going through the
+    trustchain verification again. Given certificates are immutable, only
+    the user revocation status can become outdated, so the time of its last
+    check against the backend is also stored.
+    """
+
+    def __init__(self, device: LocalDevice, localdb: LocalDatabase):
+        self.device = device
+        self.localdb = localdb
+
+    @property
+    def path(self):
+        return self.localdb.path
+
+    @classmethod
+    @asynccontextmanager
+    async def run(cls, device: LocalDevice, path: Path):
+
+        # Local database service
+        async with LocalDatabase.run(path / CERTIFICATE_STORAGE_NAME) as localdb:
+
+            self = cls(device, localdb)
+            await self._create_db()
+            yield self
+
+    def _open_cursor(self):
+        return self.localdb.open_cursor(commit=True)
+
+    # Database initialization
+
+    async def _create_db(self):
+        async with self._open_cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS users
+                (
+                  user_id TEXT PRIMARY KEY NOT NULL,
+                  user_certificate BLOB NOT NULL,
+                  revoked_user_certificate BLOB,
+                  revocation_checked_on REAL  -- NULL if never checked
+                );
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS devices
+                (
+                  device_id TEXT PRIMARY KEY NOT NULL,
+                  device_certificate BLOB NOT NULL
+                );
+                """
+            )
+
+    # Certificate operations
+
+    async def get_user(
+        self, user_id: UserID
+    ) -> Optional[
+        Tuple[UserCertificateContent, Optional[RevokedUserCertificateContent], Optional[Pendulum]]
+    ]:
+        """
+        Returns: user certificate, revoked user certificate and time of the
+        last revocation check (`None` if the user is not in the storage)
+
+        Raises: Nothing !
+        """
+        async with self._open_cursor() as cursor:
+            cursor.execute(
+                "SELECT user_certificate, revoked_user_certificate, revocation_checked_on "
+                "FROM users WHERE user_id = ?",
+                (str(user_id),),
+            )
+            row = cursor.fetchone()
+
+        if not row:
+            return None
+        user_certif, revoked_user_certif, revocation_checked_on = row
+        user = UserCertificateContent.unsecure_load(self._decrypt(user_certif))
+        if revoked_user_certif is not None:
+            revoked_user = RevokedUserCertificateContent.unsecure_load(
+                self._decrypt(revoked_user_certif)
+            )
+        else:
+            revoked_user = None
+        if revocation_checked_on is not None:
+            revocation_checked_on = from_timestamp(revocation_checked_on)
+        return user, revoked_user, revocation_checked_on
+
+    async def get_device(self, device_id: DeviceID) -> Optional[DeviceCertificateContent]:
+        """
+        Raises: Nothing !
+        """
+        async with self._open_cursor() as cursor:
+            cursor.execute(
+                "SELECT device_certificate FROM devices WHERE device_id = ?", (str(device_id),)
+            )
+            row = cursor.fetchone()
+
+        if not row:
+            return None
+        return DeviceCertificateContent.unsecure_load(self._decrypt(row[0]))
+
+    async def add_certificates(
+        self,
+        users: Iterable[bytes] = (),
+        revoked_users: Iterable[bytes] = (),
+        devices: Iterable[bytes] = (),
+        revocation_checked: Iterable[Tuple[UserID, Pendulum]] = (),
+    ) -> None:
+        """
+        Certificates must have been verified beforehand. `revocation_checked`
+        are the users whose revocation status has just been fetched from the
+        backend along with the time of the fetch.
+
+        Raises: Nothing !
+        """
+        users = [(UserCertificateContent.unsecure_load(c).user_id, c) for c in users]
+        revoked_users = [
+            (RevokedUserCertificateContent.unsecure_load(c).user_id, c) for c in revoked_users
+        ]
+        devices = [(DeviceCertificateContent.unsecure_load(c).device_id, c) for c in devices]
+
+        async with self._open_cursor() as cursor:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO users (user_id, user_certificate) VALUES (?, ?)",
+                ((str(user_id), self._encrypt(certif)) for user_id, certif in users),
+            )
+            # Revocation is final, so no need to ever check it again
+            cursor.executemany(
+                "UPDATE users SET revoked_user_certificate = ?, revocation_checked_on = NULL "
+                "WHERE user_id = ? AND revoked_user_certificate IS NULL",
+                ((self._encrypt(certif), str(user_id)) for user_id, certif in revoked_users),
+            )
+            cursor.executemany(
+                "INSERT OR IGNORE INTO devices (device_id, device_certificate) VALUES (?, ?)",
+                ((str(device_id), self._encrypt(certif)) for device_id, certif in devices),
+            )
+            cursor.executemany(
+                "UPDATE users SET revocation_checked_on = ? "
+                "WHERE user_id = ? AND revoked_user_certificate IS NULL",
+                (
+                    (checked_on.timestamp(), str(user_id))
+                    for user_id, checked_on in revocation_checked
+                ),
+            )
+
+    def _encrypt(self, certif: bytes) -> bytes:
+        return self.device.local_symkey.encrypt(certif)
+
+    def _decrypt(self, ciphered: bytes) -> bytes:
+        return self.device.local_symkey.decrypt(ciphered)
@@ -136,6 +136,17 @@ class ManifestStorage:
                     remote_changes.add(manifest_id)
             return local_changes, remote_changes
 
+    async def get_synced_versions(self) -> Dict[EntryID, int]:
+        """
+        Return the base version of all the manifests that have already been
+        synchronized at least once (i.e. placeholders are not included).
+
+        Raises: Nothing !
+        """
+        async with self._open_cursor() as cursor:
+            cursor.execute("SELECT vlob_id, base_version FROM vlobs WHERE base_version > 0")
+            return {EntryID(vlob_id): base_version for vlob_id, base_version in cursor.fetchall()}
+
     # Manifest operations
 
     async def get_manifest(self, entry_id: EntryID) -> LocalManifest:
@@ -167,6 +178,12 @@ class ManifestStorage:
         # Always return the cached value
         return self._cache[entry_id]
 
+    def get_cached_manifest(self, entry_id: EntryID) -> Optional[LocalManifest]:
+        """
+        Raises: Nothing !
+        """
+        return self._cache.get(entry_id)
+
     async def set_manifest(
         self,
         entry_id: EntryID,
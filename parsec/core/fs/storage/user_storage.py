@@ -62,6 +62,9 @@ class UserStorage:
     async def get_need_sync_entries(self) -> Tuple[Set[EntryID], Set[EntryID]]:
         return await self.manifest_storage.get_need_sync_entries()
 
+    async def get_synced_versions(self) -> Dict[EntryID, int]:
+        return await self.manifest_storage.get_synced_versions()
+
     # User manifest
 
     def get_user_manifest(self):
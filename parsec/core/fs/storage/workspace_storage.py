@@ -166,12 +166,18 @@ class WorkspaceStorage:
     async def get_need_sync_entries(self) -> Tuple[Set[EntryID], Set[EntryID]]:
         return await self.manifest_storage.get_need_sync_entries()
 
+    async def get_synced_versions(self) -> Dict[EntryID, int]:
+        return await self.manifest_storage.get_synced_versions()
+
     # Manifest interface
 
     async def get_manifest(self, entry_id: EntryID) -> LocalManifest:
         """Raises: FSLocalMissError"""
         return await self.manifest_storage.get_manifest(entry_id)
 
+    def get_cached_manifest(self, entry_id: EntryID) -> Optional[LocalManifest]:
+        return self.manifest_storage.get_cached_manifest(entry_id)
+
     async def set_manifest(
         self,
         entry_id: EntryID,
@@ -55,6 +55,7 @@ def merge_workspace_entry(
         encrypted_on=encrypted_on,
         role_cached_on=role_cached_on,
         role=role,
+        blocksize=target.blocksize,
     )
 
 
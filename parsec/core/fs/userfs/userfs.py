@@ -311,12 +311,17 @@ class UserFS:
 
         return workspace
 
-    async def workspace_create(self, name: AnyEntryName) -> EntryID:
+    async def workspace_create(
+        self, name: AnyEntryName, blocksize: Optional[int] = None
+    ) -> EntryID:
         """
+        `blocksize` allows bigger blocks (hence less requests and backend
+        objects) for workspaces meant to store big files.
+
         Raises: Nothing !
         """
         name = EntryName(name)
-        workspace_entry = WorkspaceEntry.new(name)
+        workspace_entry = WorkspaceEntry.new(name, blocksize=blocksize)
         workspace_manifest = LocalWorkspaceManifest.new_placeholder(id=workspace_entry.id)
         async with self._update_user_manifest_lock:
             user_manifest = self.get_user_manifest()
@@ -373,6 +378,7 @@ class UserFS:
         expected_timestamp = rep["timestamp"]
         expected_version = rep["version"]
         blob = rep["blob"]
+        self.remote_loader.bytes_downloaded += len(blob)
 
         try:
             author = await self.remote_devices_manager.get_device(expected_author)
@@ -510,10 +516,13 @@ class UserFS:
             await self._workspace_minimal_sync(w)
 
         # Build vlob
+        compact = await self.remote_loader.is_compact_manifests_enabled()
         now = pendulum_now()
         to_sync_um = base_um.to_remote(author=self.device.device_id, timestamp=now)
         ciphered = to_sync_um.dump_sign_and_encrypt(
-            author_signkey=self.device.signing_key, key=self.device.user_manifest_key
+            author_signkey=self.device.signing_key,
+            key=self.device.user_manifest_key,
+            compact=compact,
         )
 
         # Sync the vlob with backend
@@ -544,6 +553,7 @@ class UserFS:
             )
         elif rep["status"] != "ok":
             raise FSError(f"Cannot sync user manifest: {rep}")
+        self.remote_loader.bytes_uploaded += len(ciphered)
 
         # Merge back the manifest in local
         async with self._update_user_manifest_lock:
@@ -617,6 +627,7 @@ class UserFS:
                     encryption_revision=workspace_entry.encryption_revision,
                     encrypted_on=workspace_entry.encrypted_on,
                     key=workspace_entry.key,
+                    blocksize=workspace_entry.blocksize,
                 )
 
             else:
@@ -799,6 +810,7 @@ class UserFS:
             encrypted_on=msg.encrypted_on,
             role=self_role,
             role_cached_on=pendulum_now(),
+            blocksize=msg.blocksize,
         )
 
         async with self._update_user_manifest_lock:
@@ -885,11 +897,8 @@ class UserFS:
 
         # Then retrieve each participant user data
         try:
-            users = []
-            for user_id in roles.keys():
-                user, revoked_user = await self.remote_devices_manager.get_user(user_id)
-                if not revoked_user:
-                    users.append(user)
+            participants = await self.remote_devices_manager.get_users(roles.keys())
+            users = [user for user, revoked_user in participants.values() if not revoked_user]
 
         except RemoteDevicesManagerBackendOfflineError as exc:
             raise FSBackendOfflineError(str(exc)) from exc
@@ -912,6 +921,7 @@ class UserFS:
             encryption_revision=new_workspace_entry.encryption_revision,
             encrypted_on=new_workspace_entry.encrypted_on,
             key=new_workspace_entry.key,
+            blocksize=new_workspace_entry.blocksize,
         )
 
         per_user_ciphered_msgs = {}
@@ -11,6 +11,7 @@ from parsec.core.types import (
     LocalFileManifest,
     LocalFolderManifest,
     FileDescriptor,
+    DEFAULT_BLOCK_SIZE,
 )
 
 
@@ -349,7 +350,8 @@ class EntryTransactions(FileTransactions):
                 raise FSFileExistsError(filename=path)
 
             # Create file
-            child = LocalFileManifest.new_placeholder(parent=parent.id)
+            blocksize = self.get_workspace_entry().blocksize or DEFAULT_BLOCK_SIZE
+            child = LocalFileManifest.new_placeholder(parent=parent.id, blocksize=blocksize)
 
             # New parent manifest
             new_parent = parent.evolve_children_and_mark_updated({path.name: child.id})
@@ -170,18 +170,20 @@ class WorkspaceFS:
                 role_revoked.discard(certif.user_id)
                 has_role.add(certif.user_id)
 
-        user_revoked = []
         try:
-            for user_id in has_role:
-                _, revoked_user = await self.remote_device_manager.get_user(user_id, no_cache=True)
-                if revoked_user and revoked_user.timestamp > wentry.encrypted_on:
-                    user_revoked.append(user_id)
+            users = await self.remote_device_manager.get_users(has_role, no_cache=True)
 
         except RemoteDevicesManagerBackendOfflineError as exc:
             raise FSBackendOfflineError(str(exc)) from exc
 
         except RemoteDevicesManagerError as exc:
-            raise FSError(f"Cannot retrieve workspace participant {user_id}: {exc}") from exc
+            raise FSError(f"Cannot retrieve workspace participants: {exc}") from exc
+
+        user_revoked = []
+        for user_id in has_role:
+            _, revoked_user = users[user_id]
+            if revoked_user and revoked_user.timestamp > wentry.encrypted_on:
+                user_revoked.append(user_id)
 
         return ReencryptionNeed(user_revoked=tuple(user_revoked), role_revoked=tuple(role_revoked))
 
@@ -49,12 +49,20 @@ def before_quit(systray):
 async def _start_ipc_server(config, main_window, start_arg, result_queue):
     new_instance_needed_qt = ThreadSafeQtSignal(main_window, "new_instance_needed", object)
     foreground_needed_qt = ThreadSafeQtSignal(main_window, "foreground_needed")
+    sync_stats_needed_qt = ThreadSafeQtSignal(main_window, "sync_stats_needed", object)
 
     async def cmd_handler(cmd):
         if cmd["cmd"] == "foreground":
             foreground_needed_qt.emit()
         elif cmd["cmd"] == "new_instance":
             new_instance_needed_qt.emit(cmd.get("start_arg"))
+        elif cmd["cmd"] == "sync_stats":
+            # Logged cores are retrieved from the tabs, which can only be
+            # accessed from the Qt thread
+            sync_stats_queue = Queue(maxsize=1)
+            sync_stats_needed_qt.emit(sync_stats_queue)
+            sync_stats = await trio.to_thread.run_sync(sync_stats_queue.get, cancellable=True)
+            return {"status": "ok", "sync_stats": sync_stats}
         return {"status": "ok"}
 
     while True:
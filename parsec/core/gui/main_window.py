@@ -20,6 +20,7 @@ from parsec.core.types import (
     BackendOrganizationFileLinkAddr,
 )
 from parsec.core.gui.lang import translate as _
+from parsec.core.gui.trio_thread import JobSchedulerNotAvailable
 from parsec.core.gui.instance_widget import InstanceWidget
 from parsec.core.gui.parsec_application import ParsecApp
 from parsec.core.gui import telemetry
@@ -45,6 +46,7 @@ logger = get_logger()
 class MainWindow(QMainWindow, Ui_MainWindow):
     foreground_needed = pyqtSignal()
     new_instance_needed = pyqtSignal(object)
+    sync_stats_needed = pyqtSignal(object)
     systray_notification = pyqtSignal(str, str)
 
     TAB_NOTIFICATION_COLOR = QColor(46, 146, 208)
@@ -66,6 +68,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.setWindowTitle(_("TEXT_PARSEC_WINDOW_TITLE_version").format(version=PARSEC_VERSION))
         self.foreground_needed.connect(self._on_foreground_needed)
         self.new_instance_needed.connect(self._on_new_instance_needed)
+        self.sync_stats_needed.connect(self._on_sync_stats_needed)
         self.tab_center.tabCloseRequested.connect(self.close_tab)
         # self.button_send_feedback = QPushButton(_("ACTION_FEEDBACK_SEND"))
         # self.button_send_feedback.clicked.connect(self._on_send_feedback_clicked)
@@ -480,6 +483,21 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if not ParsecApp.has_active_modal():
             self.tab_center.setCurrentIndex(idx)
 
+    def _on_sync_stats_needed(self, sync_stats_queue):
+        sync_stats = []
+        for idx in range(self.tab_center.count()):
+            w = self.tab_center.widget(idx)
+            if not w or not w.core or not w.core_jobs_ctx:
+                continue
+            # Sync monitor's state must only be accessed from the core's trio thread
+            try:
+                realms = w.core_jobs_ctx.run_sync(w.core.get_sync_stats)
+            except JobSchedulerNotAvailable:
+                # Core is being logged out
+                continue
+            sync_stats.append({"device_id": w.core.device.device_id, "realms": realms})
+        sync_stats_queue.put(sync_stats)
+
     def go_to_file_link(self, action_addr):
         for idx in range(self.tab_center.count()):
             if self.tab_center.tabText(idx) == _("TEXT_TAB_TITLE_LOG_IN_SCREEN"):
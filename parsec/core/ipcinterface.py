@@ -17,6 +17,8 @@ from parsec.serde import (
     SerdeError,
     MsgpackSerializer,
 )
+from parsec.api.protocol import DeviceIDField
+from parsec.core.types import EntryIDField
 
 
 logger = get_logger()
@@ -51,18 +53,44 @@ class NewInstanceReqSchema(BaseSchema):
     start_arg = fields.String(allow_none=True)
 
 
+class SyncStatsReqSchema(BaseSchema):
+    cmd = fields.CheckedConstant("sync_stats", required=True)
+
+
 class CommandReqSchema(OneOfSchema):
     type_field = "cmd"
     type_field_remove = False
-    type_schemas = {"foreground": ForegroundReqSchema, "new_instance": NewInstanceReqSchema}
+    type_schemas = {
+        "foreground": ForegroundReqSchema,
+        "new_instance": NewInstanceReqSchema,
+        "sync_stats": SyncStatsReqSchema,
+    }
 
     def get_obj_type(self, obj):
         return obj["cmd"]
 
 
+class RealmSyncStatsSchema(BaseSchema):
+    id = EntryIDField(required=True)
+    local_changes = fields.Integer(required=True)
+    remote_changes = fields.Integer(required=True)
+    oldest_change_age = fields.Float(required=True, allow_none=True)
+    syncs = fields.Integer(required=True)
+    syncs_per_second = fields.Float(required=True)
+    sync_failures = fields.Integer(required=True)
+    bytes_uploaded = fields.Integer(required=True)
+    bytes_downloaded = fields.Integer(required=True)
+
+
+class DeviceSyncStatsSchema(BaseSchema):
+    device_id = DeviceIDField(required=True)
+    realms = fields.List(fields.Nested(RealmSyncStatsSchema), required=True)
+
+
 class CommandRepSchema(BaseSchema):
     status = fields.String(required=True)
     reason = fields.String(allow_none=True)
+    sync_stats = fields.List(fields.Nested(DeviceSyncStatsSchema))
 
 
 cmd_req_serializer = MsgpackSerializer(CommandReqSchema)
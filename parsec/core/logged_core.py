@@ -1,7 +1,7 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import attr
-from typing import Optional
+from typing import List, Optional
 from structlog import get_logger
 from functools import partial
 from async_generator import asynccontextmanager
@@ -13,8 +13,9 @@ from parsec.core.backend_connection import APIV1_BackendAuthenticatedConn
 from parsec.core.mountpoint import mountpoint_manager_factory
 from parsec.core.remote_devices_manager import RemoteDevicesManager
 from parsec.core.messages_monitor import monitor_messages
-from parsec.core.sync_monitor import monitor_sync
+from parsec.core.sync_monitor import monitor_sync, SyncMonitorStats, SyncDebounceConfig
 from parsec.core.fs import UserFS
+from parsec.core.fs.storage import CertificateStorage
 
 
 logger = get_logger()
@@ -29,6 +30,7 @@ class LoggedCore:
     mountpoint_manager = attr.ib()
     backend_conn = attr.ib()
     user_fs = attr.ib()
+    sync_stats = attr.ib()
 
     @property
     def backend_cmds(self):
@@ -40,6 +42,14 @@ class LoggedCore:
     async def wait_idle_monitors(self):
         await self.backend_conn.wait_idle_monitors()
 
+    def get_sync_stats(self) -> List[dict]:
+        """
+        Return for each realm (workspaces and user manifest) the sync backlog,
+        throughput and failures. Those stats are also periodically sent on
+        the event bus as `sync.stats_updated`.
+        """
+        return self.sync_stats.snapshot()
+
 
 @asynccontextmanager
 async def logged_core_factory(
@@ -54,30 +64,46 @@ async def logged_core_factory(
         event_bus=event_bus,
         max_cooldown=config.backend_max_cooldown,
         max_pool=config.backend_max_connections,
+        min_pool=config.backend_min_connections,
+        idle_timeout=config.backend_connection_idle_timeout,
         keepalive=config.backend_connection_keepalive,
     )
 
     path = config.data_base_dir / device.slug
-    remote_devices_manager = RemoteDevicesManager(backend_conn.cmds, device.root_verify_key)
-    async with UserFS.run(
-        device, path, backend_conn.cmds, remote_devices_manager, event_bus
-    ) as user_fs:
-
-        backend_conn.register_monitor(partial(monitor_messages, user_fs, event_bus))
-        backend_conn.register_monitor(partial(monitor_sync, user_fs, event_bus))
-
-        async with backend_conn.run():
-
-            async with mountpoint_manager_factory(
-                user_fs, event_bus, config.mountpoint_base_dir
-            ) as mountpoint_manager:
-
-                yield LoggedCore(
-                    config=config,
-                    device=device,
-                    event_bus=event_bus,
-                    remote_devices_manager=remote_devices_manager,
-                    mountpoint_manager=mountpoint_manager,
-                    backend_conn=backend_conn,
-                    user_fs=user_fs,
-                )
+    async with CertificateStorage.run(device, path) as certificate_storage:
+
+        remote_devices_manager = RemoteDevicesManager(
+            backend_conn.cmds, device.root_verify_key, certificate_storage=certificate_storage
+        )
+        sync_stats = SyncMonitorStats()
+        async with UserFS.run(
+            device, path, backend_conn.cmds, remote_devices_manager, event_bus
+        ) as user_fs:
+
+            backend_conn.register_monitor(partial(monitor_messages, user_fs, event_bus))
+            sync_debounce = SyncDebounceConfig(
+                min_wait=config.sync_min_wait,
+                max_wait=config.sync_max_wait,
+                large_file_size=config.sync_large_file_size,
+                max_wait_large_file=config.sync_max_wait_large_file,
+            )
+            backend_conn.register_monitor(
+                partial(monitor_sync, user_fs, event_bus, stats=sync_stats, debounce=sync_debounce)
+            )
+
+            async with backend_conn.run():
+
+                async with mountpoint_manager_factory(
+                    user_fs, event_bus, config.mountpoint_base_dir
+                ) as mountpoint_manager:
+
+                    yield LoggedCore(
+                        config=config,
+                        device=device,
+                        event_bus=event_bus,
+                        remote_devices_manager=remote_devices_manager,
+                        mountpoint_manager=mountpoint_manager,
+                        backend_conn=backend_conn,
+                        user_fs=user_fs,
+                        sync_stats=sync_stats,
+                    )
@@ -1,9 +1,10 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Dict, Iterable
+from pendulum import now as pendulum_now
 
 from parsec.crypto import VerifyKey
-from parsec.api.protocol import DeviceID, UserID
+from parsec.api.protocol import DeviceID, UserID, USER_GET_BATCH_MAX_SIZE
 from parsec.api.data import (
     UserCertificateContent,
     DeviceCertificateContent,
@@ -49,6 +50,11 @@ class RemoteDevicesManager:
     """
     Fetch users&devices from backend, verify their trustchain and keep
     a cache of them for a limited duration.
+
+    If a certificate storage is provided, verified certificates are also
+    persisted so they survive restarts. Given certificates are immutable,
+    persisted devices are always valid while persisted users are only valid
+    for `cache_validity` since their revocation status was last checked.
     """
 
     def __init__(
@@ -56,11 +62,13 @@ class RemoteDevicesManager:
         backend_cmds: APIV1_BackendAuthenticatedCmds,
         root_verify_key: VerifyKey,
         cache_validity: int = DEFAULT_CACHE_VALIDITY,
+        certificate_storage=None,
     ):
         self._backend_cmds = backend_cmds
         self._devices = {}
         self._users = {}
         self._trustchain_ctx = TrustchainContext(root_verify_key, cache_validity)
+        self._certificate_storage = certificate_storage
 
     @property
     def cache_validity(self):
@@ -83,6 +91,8 @@ class RemoteDevicesManager:
             )
         except TrustchainError as exc:
             raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
+        if not verified_user and not no_cache and self._certificate_storage:
+            verified_user, verified_revoked_user = await self._get_persisted_user(user_id)
         if not verified_user:
             verified_user, verified_revoked_user, _ = await self.get_user_and_devices(
                 user_id, no_cache=True
@@ -103,6 +113,10 @@ class RemoteDevicesManager:
             verified_device = None if no_cache else self._trustchain_ctx.get_device(device_id)
         except TrustchainError as exc:
             raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
+        if not verified_device and not no_cache and self._certificate_storage:
+            verified_device = await self._certificate_storage.get_device(device_id)
+            if verified_device:
+                self._trustchain_ctx.populate_cache(pendulum_now(), devices=(verified_device,))
         if not verified_device:
             _, _, verified_devices = await self.get_user_and_devices(
                 device_id.user_id, no_cache=True
@@ -132,6 +146,7 @@ class RemoteDevicesManager:
             RemoteDevicesManagerNotFoundError
             RemoteDevicesManagerInvalidTrustchainError
         """
+        now = pendulum_now()
         try:
             rep = await self._backend_cmds.user_get(user_id)
         except BackendNotAvailable as exc:
@@ -149,7 +164,7 @@ class RemoteDevicesManager:
             raise RemoteDevicesManagerError(f"Cannot fetch user {user_id}: `{rep['status']}`")
 
         try:
-            return self._trustchain_ctx.load_user_and_devices(
+            verified = self._trustchain_ctx.load_user_and_devices(
                 trustchain=rep["trustchain"],
                 user_certif=rep["user_certificate"],
                 revoked_user_certif=rep["revoked_user_certificate"],
@@ -159,6 +174,201 @@ class RemoteDevicesManager:
         except TrustchainError as exc:
             raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
 
+        if self._certificate_storage:
+            # All the certificates have been verified at this point
+            revoked_users_certifs = rep["trustchain"]["revoked_users"]
+            if rep["revoked_user_certificate"]:
+                revoked_users_certifs = (rep["revoked_user_certificate"], *revoked_users_certifs)
+            await self._certificate_storage.add_certificates(
+                users=(rep["user_certificate"], *rep["trustchain"]["users"]),
+                revoked_users=revoked_users_certifs,
+                devices=(*rep["device_certificates"], *rep["trustchain"]["devices"]),
+                revocation_checked=[(user_id, now)],
+            )
+
+        return verified
+
+    async def get_users(
+        self, user_ids: Iterable[UserID], no_cache: bool = False
+    ) -> Dict[UserID, Tuple[UserCertificateContent, Optional[RevokedUserCertificateContent]]]:
+        """
+        Batch version of `get_user`, users not in cache are fetched together.
+        Raises:
+            RemoteDevicesManagerError
+            RemoteDevicesManagerBackendOfflineError
+            RemoteDevicesManagerNotFoundError
+            RemoteDevicesManagerInvalidTrustchainError
+        """
+        results = {}
+        to_fetch = []
+        for user_id in dict.fromkeys(user_ids):
+            try:
+                verified_user = None if no_cache else self._trustchain_ctx.get_user(user_id)
+                verified_revoked_user = (
+                    None if no_cache else self._trustchain_ctx.get_revoked_user(user_id)
+                )
+            except TrustchainError as exc:
+                raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
+            if not verified_user and not no_cache and self._certificate_storage:
+                verified_user, verified_revoked_user = await self._get_persisted_user(user_id)
+            if verified_user:
+                results[user_id] = (verified_user, verified_revoked_user)
+            else:
+                to_fetch.append(user_id)
+
+        fetched = await self.get_users_and_devices(to_fetch)
+        for user_id, (verified_user, verified_revoked_user, _) in fetched.items():
+            results[user_id] = (verified_user, verified_revoked_user)
+        return results
+
+    async def get_devices(
+        self, device_ids: Iterable[DeviceID], no_cache: bool = False
+    ) -> Dict[DeviceID, DeviceCertificateContent]:
+        """
+        Batch version of `get_device`, devices not in cache are fetched together.
+        Raises:
+            RemoteDevicesManagerError
+            RemoteDevicesManagerBackendOfflineError
+            RemoteDevicesManagerNotFoundError
+            RemoteDevicesManagerInvalidTrustchainError
+        """
+        results = {}
+        to_fetch = []
+        for device_id in dict.fromkeys(device_ids):
+            try:
+                verified_device = None if no_cache else self._trustchain_ctx.get_device(device_id)
+            except TrustchainError as exc:
+                raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
+            if not verified_device and not no_cache and self._certificate_storage:
+                verified_device = await self._certificate_storage.get_device(device_id)
+                if verified_device:
+                    self._trustchain_ctx.populate_cache(pendulum_now(), devices=(verified_device,))
+            if verified_device:
+                results[device_id] = verified_device
+            else:
+                to_fetch.append(device_id)
+
+        fetched = await self.get_users_and_devices(device_id.user_id for device_id in to_fetch)
+        for device_id in to_fetch:
+            _, _, verified_devices = fetched[device_id.user_id]
+            try:
+                results[device_id] = next(
+                    vd for vd in verified_devices if vd.device_id == device_id
+                )
+
+            except StopIteration:
+                raise RemoteDevicesManagerNotFoundError(
+                    f"User `{device_id.user_id}` doesn't have a device `{device_id}`"
+                )
+        return results
+
+    async def get_users_and_devices(
+        self, user_ids: Iterable[UserID]
+    ) -> Dict[
+        UserID,
+        Tuple[
+            UserCertificateContent,
+            Optional[RevokedUserCertificateContent],
+            List[DeviceCertificateContent],
+        ],
+    ]:
+        """
+        Batch version of `get_user_and_devices` (hence cache is never used).
+        Raises:
+            RemoteDevicesManagerError
+            RemoteDevicesManagerBackendOfflineError
+            RemoteDevicesManagerNotFoundError
+            RemoteDevicesManagerInvalidTrustchainError
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        results = {}
+        for i in range(0, len(user_ids), USER_GET_BATCH_MAX_SIZE):
+            results.update(
+                await self._get_users_and_devices_batch(user_ids[i : i + USER_GET_BATCH_MAX_SIZE])
+            )
+        return results
+
+    async def _get_users_and_devices_batch(self, user_ids: List[UserID]):
+        now = pendulum_now()
+        try:
+            rep = await self._backend_cmds.user_get_batch(user_ids)
+        except BackendNotAvailable as exc:
+            raise RemoteDevicesManagerBackendOfflineError(
+                f"Users `{', '.join(user_ids)}` are not in local cache and we are offline."
+            ) from exc
+        except BackendConnectionError as exc:
+            raise RemoteDevicesManagerError(
+                f"Failed to fetch users `{', '.join(user_ids)}` from the backend: {exc}"
+            ) from exc
+
+        if rep["status"] == "unknown_command":
+            # Backend predates batch support, fallback on fetching users one by one
+            return {user_id: await self.get_user_and_devices(user_id) for user_id in user_ids}
+        elif rep["status"] != "ok":
+            raise RemoteDevicesManagerError(
+                f"Cannot fetch users {', '.join(user_ids)}: `{rep['status']}`"
+            )
+        if rep["not_found"]:
+            raise RemoteDevicesManagerNotFoundError(
+                f"Users `{', '.join(rep['not_found'])}` don't exist in backend"
+            )
+
+        try:
+            verified = self._trustchain_ctx.load_users_and_devices(
+                trustchain=rep["trustchain"], users=rep["users"]
+            )
+        except TrustchainError as exc:
+            raise RemoteDevicesManagerInvalidTrustchainError(exc) from exc
+        results = {item[0].user_id: item for item in verified}
+        if results.keys() != set(user_ids):
+            raise RemoteDevicesManagerInvalidTrustchainError(
+                f"Expected certificates from `{', '.join(user_ids)}` "
+                f"but got `{', '.join(results.keys())}`"
+            )
+
+        if self._certificate_storage:
+            # All the certificates have been verified at this point
+            await self._certificate_storage.add_certificates(
+                users=(*(u["user_certificate"] for u in rep["users"]), *rep["trustchain"]["users"]),
+                revoked_users=(
+                    *(
+                        u["revoked_user_certificate"]
+                        for u in rep["users"]
+                        if u["revoked_user_certificate"]
+                    ),
+                    *rep["trustchain"]["revoked_users"],
+                ),
+                devices=(
+                    *(c for u in rep["users"] for c in u["device_certificates"]),
+                    *rep["trustchain"]["devices"],
+                ),
+                revocation_checked=[(user_id, now) for user_id in user_ids],
+            )
+
+        return results
+
+    async def _get_persisted_user(
+        self, user_id: UserID
+    ) -> Tuple[Optional[UserCertificateContent], Optional[RevokedUserCertificateContent]]:
+        now = pendulum_now()
+        persisted = await self._certificate_storage.get_user(user_id)
+        if not persisted:
+            return None, None
+
+        user, revoked_user, revocation_checked_on = persisted
+        if revoked_user:
+            # Revocation is final, no need to check it again
+            self._trustchain_ctx.populate_cache(now, users=(user,), revoked_users=(revoked_user,))
+            return user, revoked_user
+        if (
+            revocation_checked_on
+            and (now - revocation_checked_on).total_seconds() < self.cache_validity
+        ):
+            self._trustchain_ctx.populate_cache(revocation_checked_on, users=(user,))
+            return user, None
+        # Revocation status is outdated, user must be fetched from the backend again
+        return None, None
+
 
 async def get_device_invitation_creator(
     backend_cmds: APIV1_BackendAnonymousCmds, root_verify_key: VerifyKey, new_device_id: DeviceID
@@ -1,11 +1,15 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import attr
 import trio
 from trio.hazmat import current_clock
 import math
+from collections import defaultdict, deque
+from typing import List, Optional
 from structlog import get_logger
 
-from parsec.core.types import EntryID, WorkspaceRole
+from parsec.api.protocol import VLOB_GROUP_CHECK_MAX_SIZE
+from parsec.core.types import EntryID, WorkspaceRole, LocalFileManifest
 from parsec.core.fs import (
     FSBackendOfflineError,
     FSWorkspaceNotFoundError,
@@ -14,14 +18,21 @@ from parsec.core.fs import (
     FSWorkspaceInMaintenance,
 )
 from parsec.core.backend_connection import BackendConnectionError, BackendNotAvailable
+from parsec.core.config import (
+    SYNC_MIN_WAIT,
+    SYNC_MAX_WAIT,
+    SYNC_LARGE_FILE_SIZE,
+    SYNC_MAX_WAIT_LARGE_FILE,
+)
 
 
 logger = get_logger()
 
-MIN_WAIT = 1
-MAX_WAIT = 60
 MAINTENANCE_MIN_WAIT = 30
+WRITE_INTERVAL_SMOOTHING = 0.3
 TICK_CRASH_COOLDOWN = 5
+SYNC_RATE_WINDOW = 60
+STATS_EVENT_INTERVAL = 5
 
 
 async def freeze_sync_monitor_mockpoint():
@@ -37,22 +48,138 @@ def timestamp():
     return current_clock().current_time()
 
 
-class LocalChange:
-    __slots__ = ("first_changed_on", "last_changed_on", "due_time")
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class SyncDebounceConfig:
+    # Quiet period to wait after the last change before syncing
+    min_wait: float = SYNC_MIN_WAIT
+    # Maximum time a change can wait before being synced
+    max_wait: float = SYNC_MAX_WAIT
+    # Files bigger than this are synced less often: their maximum wait grows
+    # linearly with their size (up to `max_wait_large_file`) and their quiet
+    # period grows with their observed write interval
+    large_file_size: int = SYNC_LARGE_FILE_SIZE
+    max_wait_large_file: float = SYNC_MAX_WAIT_LARGE_FILE
 
-    def __init__(self, now):
+
+class LocalChange:
+    __slots__ = (
+        "debounce",
+        "first_changed_on",
+        "last_changed_on",
+        "write_interval",
+        "size",
+        "due_time",
+    )
+
+    def __init__(
+        self,
+        now,
+        debounce: SyncDebounceConfig = SyncDebounceConfig(),
+        size: Optional[int] = None,
+        previous: Optional["LocalChange"] = None,
+    ):
+        self.debounce = debounce
         self.first_changed_on = self.last_changed_on = now
+        self.size = size
+        # The write rate is kept across syncs given entries continuously
+        # written are precisely the ones that need to be debounced
+        self.write_interval = None
+        if previous:
+            self.write_interval = previous.write_interval
+            self._update_write_interval(now - previous.last_changed_on)
+            if size is None:
+                self.size = previous.size
         self.due_time = self._compute_due_time()
 
+    def _update_write_interval(self, interval):
+        if self.write_interval is None:
+            self.write_interval = interval
+        else:
+            self.write_interval += WRITE_INTERVAL_SMOOTHING * (interval - self.write_interval)
+
+    def is_large(self) -> bool:
+        return self.size is not None and self.size > self.debounce.large_file_size
+
     def _compute_due_time(self):
-        return min(self.last_changed_on + MIN_WAIT, self.first_changed_on + MAX_WAIT)
+        min_wait = self.debounce.min_wait
+        max_wait = self.debounce.max_wait
+        if self.is_large():
+            max_wait = max(
+                max_wait,
+                min(
+                    max_wait * self.size / self.debounce.large_file_size,
+                    self.debounce.max_wait_large_file,
+                ),
+            )
+            if self.write_interval is not None:
+                # Wait for a pause significantly longer than the usual write interval
+                min_wait = min(max(min_wait, 2 * self.write_interval), max_wait)
+        return min(self.last_changed_on + min_wait, self.first_changed_on + max_wait)
 
-    def changed(self, changed_on) -> float:
+    def changed(self, changed_on, size: Optional[int] = None) -> float:
+        self._update_write_interval(changed_on - self.last_changed_on)
         self.last_changed_on = changed_on
+        if size is not None:
+            self.size = size
         self.due_time = self._compute_due_time()
         return self.due_time
 
 
+class SyncStats:
+    """
+    Sync counters of a given realm, unlike the sync context they are kept
+    around when the context is reset
+    """
+
+    __slots__ = ("syncs", "failures", "_recent_syncs")
+
+    def __init__(self):
+        self.syncs = 0
+        self.failures = 0
+        self._recent_syncs = deque()
+
+    def _prune_recent_syncs(self, now):
+        while self._recent_syncs and self._recent_syncs[0] <= now - SYNC_RATE_WINDOW:
+            self._recent_syncs.popleft()
+
+    def synced(self, now):
+        self.syncs += 1
+        self._recent_syncs.append(now)
+        self._prune_recent_syncs(now)
+
+    def failed(self):
+        self.failures += 1
+
+    def syncs_per_second(self, now) -> float:
+        self._prune_recent_syncs(now)
+        return len(self._recent_syncs) / SYNC_RATE_WINDOW
+
+
+class SyncMonitorStats:
+    """
+    Expose the sync monitor's state (backlog, throughput and failures).
+    Nothing is computed until a snapshot is requested, which makes the
+    accounting on the sync path itself almost free.
+    """
+
+    def __init__(self):
+        self._realms_stats = defaultdict(SyncStats)
+        self._ctxs = None
+
+    def track_contexts(self, ctxs: "SyncContextStore") -> None:
+        self._ctxs = ctxs
+
+    def get_realm_stats(self, realm_id: EntryID) -> SyncStats:
+        return self._realms_stats[realm_id]
+
+    def snapshot(self) -> List[dict]:
+        # Contexts are kept after the monitor stops (typically when going
+        # offline) given they still reflect the last known backlog
+        ctxs = self._ctxs.iter() if self._ctxs else ()
+        now = timestamp()
+        return [ctx.get_stats(now) for ctx in ctxs]
+
+
 class SyncContext:
     """
     The SyncContext keeps track of local and remote changes and trigger sync
@@ -62,16 +189,33 @@ class SyncContext:
     - Otherwise (typically when the application starts or when back online after
       an disconnection) it uses the realm's checkpoint stored in the persistent
       storage to get the list of changes (entry id + version) it has missed
+    On top of that, a reconciliation can be requested (typically after the
+    local storage has been restored or its checkpoint corrupted). In such case
+    the base versions of all the locally known manifests are checked against
+    the backend in batches and the stale ones are considered as remote changes.
     """
 
-    def __init__(self, user_fs, id: EntryID, read_only: bool = False):
+    def __init__(
+        self,
+        user_fs,
+        id: EntryID,
+        read_only: bool = False,
+        stats: Optional[SyncStats] = None,
+        debounce: SyncDebounceConfig = SyncDebounceConfig(),
+    ):
         self.user_fs = user_fs
         self.id = id
         self.read_only = read_only
+        self.stats = stats or SyncStats()
+        self.debounce = debounce
         self.due_time = math.inf
         self._changes_loaded = False
+        self._reconcile_requested = False
         self._local_changes = {}
         self._remote_changes = set()
+        # Keep track of the recently synced large files to retrieve
+        # their write rate if they get modified again
+        self._synced_large_changes = {}
 
     def _sync(self, entry_id: EntryID):
         raise NotImplementedError
@@ -82,6 +226,12 @@ class SyncContext:
     def _get_local_storage(self):
         raise NotImplementedError
 
+    def _get_remote_loader(self):
+        raise NotImplementedError
+
+    def _get_size_hint(self, entry_id: EntryID) -> Optional[int]:
+        return None
+
     def __repr__(self):
         return f"{type(self).__name__}(id={self.id!r})"
 
@@ -119,6 +269,12 @@ class SyncContext:
             new_checkpoint = rep["current_checkpoint"]
             changes = rep["changes"]
 
+        # Local checkpoint ahead of the backend's one means it cannot be trusted
+        # (e.g. local storage corrupted or restored against another backend),
+        # hence we may have missed changes the poll cannot tell about
+        if new_checkpoint < realm_checkpoint:
+            self.user_fs.event_bus.send("fs.reconcile_requested", workspace_id=self.id)
+
         # 2) Store new checkpoint and changes
         await self._get_local_storage().update_realm_checkpoint(new_checkpoint, changes)
 
@@ -127,7 +283,9 @@ class SyncContext:
         now = timestamp()
         # Ignore local changes in read only mode
         if not self.read_only:
-            self._local_changes = {entry_id: LocalChange(now) for entry_id in need_sync_local}
+            self._local_changes = {
+                entry_id: LocalChange(now, self.debounce) for entry_id in need_sync_local
+            }
         self._remote_changes = need_sync_remote
 
         # 4) Finally refresh due time according to the changes
@@ -136,16 +294,57 @@ class SyncContext:
         self._changes_loaded = True
         return True
 
+    async def _reconcile(self) -> bool:
+        synced_versions = await self._get_local_storage().get_synced_versions()
+        to_check = list(synced_versions.items())
+        stale = set()
+        for i in range(0, len(to_check), VLOB_GROUP_CHECK_MAX_SIZE):
+            batch = to_check[i : i + VLOB_GROUP_CHECK_MAX_SIZE]
+            try:
+                rep = await self._get_backend_cmds().vlob_group_check(batch)
+
+            except BackendNotAvailable:
+                raise
+
+            # Another backend error
+            except BackendConnectionError as exc:
+                logger.warning("Unexpected backend response during reconciliation", exc_info=exc)
+                return False
+
+            if rep["status"] != "ok":
+                logger.warning(
+                    "Bad response to `vlob_group_check` command during reconciliation",
+                    workspace_id=self.id,
+                    rep=rep,
+                )
+                return False
+            stale.update(EntryID(item["vlob_id"]) for item in rep["changed"])
+
+        self._remote_changes |= stale
+        self._reconcile_requested = False
+        return True
+
+    def request_reconcile(self) -> bool:
+        self._reconcile_requested = True
+        self.due_time = timestamp()
+        return True
+
     def set_local_change(self, entry_id: EntryID) -> bool:
         # Ignore local changes in read only mode
         if self.read_only:
             return
 
         now = timestamp()
+        size = self._get_size_hint(entry_id)
         try:
-            new_due_time = self._local_changes[entry_id].changed(now)
+            new_due_time = self._local_changes[entry_id].changed(now, size=size)
         except KeyError:
-            local_change = LocalChange(now)
+            local_change = LocalChange(
+                now,
+                self.debounce,
+                size=size,
+                previous=self._synced_large_changes.pop(entry_id, None),
+            )
             self._local_changes[entry_id] = local_change
             new_due_time = local_change.due_time
 
@@ -156,13 +355,39 @@ class SyncContext:
         else:
             return False
 
+    def _forget_stale_synced_large_changes(self, now):
+        # Write rate of an entry not modified for a long time is meaningless
+        for entry_id, change_info in list(self._synced_large_changes.items()):
+            if change_info.last_changed_on < now - self.debounce.max_wait_large_file:
+                del self._synced_large_changes[entry_id]
+
     def set_remote_change(self, entry_id: EntryID) -> bool:
         self._remote_changes.add(entry_id)
         self.due_time = timestamp()
         return True
 
+    def get_stats(self, now: float) -> dict:
+        remote_loader = self._get_remote_loader()
+        if self._local_changes:
+            oldest_change_age = now - min(
+                change_info.first_changed_on for change_info in self._local_changes.values()
+            )
+        else:
+            oldest_change_age = None
+        return {
+            "id": self.id,
+            "local_changes": len(self._local_changes),
+            "remote_changes": len(self._remote_changes),
+            "oldest_change_age": oldest_change_age,
+            "syncs": self.stats.syncs,
+            "syncs_per_second": self.stats.syncs_per_second(now),
+            "sync_failures": self.stats.failures,
+            "bytes_uploaded": remote_loader.bytes_uploaded,
+            "bytes_downloaded": remote_loader.bytes_downloaded,
+        }
+
     def _compute_due_time(self, now=None, min_due_time=None):
-        if self._remote_changes:
+        if self._remote_changes or self._reconcile_requested:
             self.due_time = now or timestamp()
         elif self._local_changes:
             # TODO: index changes by due_time to avoid this O(n) operation
@@ -193,6 +418,11 @@ class SyncContext:
 
         min_due_time = None
 
+        # On failure the reconciliation request is kept around and retried
+        # later, in the meantime regular sync can go on
+        if self._reconcile_requested and not await self._reconcile():
+            min_due_time = now + SYNC_MIN_WAIT
+
         # Remote changes sync have priority over local changes
         if self._remote_changes:
             entry_id = self._remote_changes.pop()
@@ -205,8 +435,9 @@ class SyncContext:
                 # This likely means a `sharing.updated` event we soon arrive
                 # and destroy this sync context.
                 # Until then just pretent nothing happened.
-                min_due_time = now + MIN_WAIT
+                min_due_time = now + SYNC_MIN_WAIT
                 self._remote_changes.add(entry_id)
+                self.stats.failed()
             except FSWorkspaceNoWriteAccess:
                 # We don't have write access and this entry contains local
                 # modifications. Hence we can forget about this change given
@@ -216,6 +447,9 @@ class SyncContext:
                 # Not the right time for the sync, retry later
                 min_due_time = now + MAINTENANCE_MIN_WAIT
                 self._remote_changes.add(entry_id)
+                self.stats.failed()
+            else:
+                self.stats.synced(now)
 
         elif self._local_changes:
             entry_id = next(
@@ -227,7 +461,7 @@ class SyncContext:
                 None,
             )
             if entry_id:
-                del self._local_changes[entry_id]
+                change_info = self._local_changes.pop(entry_id)
                 try:
                     await self._sync(entry_id)
                 except FSBackendOfflineError as exc:
@@ -239,11 +473,22 @@ class SyncContext:
                     # We keep track of the change (given we may be given back
                     # the write access in the future) but pretent it just accured
                     # to avoid a busy sync loop until `read_only` flag is updated.
-                    self._local_changes[entry_id] = LocalChange(now)
+                    self._local_changes[entry_id] = LocalChange(
+                        now, self.debounce, size=change_info.size
+                    )
+                    self.stats.failed()
                 except FSWorkspaceInMaintenance:
                     # Not the right time for the sync, retry later
                     min_due_time = now + MAINTENANCE_MIN_WAIT
-                    self._local_changes[entry_id] = LocalChange(now)
+                    self._local_changes[entry_id] = LocalChange(
+                        now, self.debounce, size=change_info.size
+                    )
+                    self.stats.failed()
+                else:
+                    self.stats.synced(now)
+                    if change_info.is_large():
+                        self._forget_stale_synced_large_changes(now)
+                        self._synced_large_changes[entry_id] = change_info
 
                 # This is where we plug our vacuuming routine
                 # as it corresponds to a fresh synchronized state
@@ -255,10 +500,10 @@ class SyncContext:
 
 
 class WorkspaceSyncContext(SyncContext):
-    def __init__(self, user_fs, id: EntryID):
+    def __init__(self, user_fs, id: EntryID, **kwargs):
         self.workspace = user_fs.get_workspace(id)
         read_only = self.workspace.get_workspace_entry().role == WorkspaceRole.READER
-        super().__init__(user_fs, id, read_only=read_only)
+        super().__init__(user_fs, id, read_only=read_only, **kwargs)
 
     async def _sync(self, entry_id: EntryID):
         # No recursion here: only the manifest that has changed
@@ -271,6 +516,14 @@ class WorkspaceSyncContext(SyncContext):
     def _get_local_storage(self):
         return self.workspace.local_storage
 
+    def _get_remote_loader(self):
+        return self.workspace.remote_loader
+
+    def _get_size_hint(self, entry_id: EntryID) -> Optional[int]:
+        # The manifest has just been modified so it should be in cache
+        manifest = self.workspace.local_storage.get_cached_manifest(entry_id)
+        return manifest.size if isinstance(manifest, LocalFileManifest) else None
+
 
 class UserManifestSyncContext(SyncContext):
     async def _sync(self, entry_id: EntryID):
@@ -283,6 +536,9 @@ class UserManifestSyncContext(SyncContext):
     def _get_local_storage(self):
         return self.user_fs.storage
 
+    def _get_remote_loader(self):
+        return self.user_fs.remote_loader
+
 
 class SyncContextStore:
     """
@@ -290,9 +546,18 @@ class SyncContextStore:
     when a newly created workspace is modified for the first time)
     """
 
-    def __init__(self, user_fs):
+    def __init__(
+        self,
+        user_fs,
+        stats: Optional[SyncMonitorStats] = None,
+        debounce: SyncDebounceConfig = SyncDebounceConfig(),
+    ):
         self.user_fs = user_fs
+        self.stats = stats
+        self.debounce = debounce
         self._ctxs = {}
+        if stats:
+            stats.track_contexts(self)
 
     def iter(self):
         return self._ctxs.copy().values()
@@ -301,11 +566,16 @@ class SyncContextStore:
         try:
             return self._ctxs[entry_id]
         except KeyError:
+            ctx_stats = self.stats.get_realm_stats(entry_id) if self.stats else None
             if entry_id == self.user_fs.user_manifest_id:
-                ctx = UserManifestSyncContext(self.user_fs, entry_id)
+                ctx = UserManifestSyncContext(
+                    self.user_fs, entry_id, stats=ctx_stats, debounce=self.debounce
+                )
             else:
                 try:
-                    ctx = WorkspaceSyncContext(self.user_fs, entry_id)
+                    ctx = WorkspaceSyncContext(
+                        self.user_fs, entry_id, stats=ctx_stats, debounce=self.debounce
+                    )
                 except FSWorkspaceNotFoundError:
                     # It's possible the workspace is not yet available
                     # (this can happen when a workspace is just shared with
@@ -319,8 +589,16 @@ class SyncContextStore:
         self._ctxs.pop(entry_id, None)
 
 
-async def monitor_sync(user_fs, event_bus, task_status):
-    ctxs = SyncContextStore(user_fs)
+async def monitor_sync(
+    user_fs,
+    event_bus,
+    task_status,
+    stats: Optional[SyncMonitorStats] = None,
+    debounce: SyncDebounceConfig = SyncDebounceConfig(),
+):
+    stats = stats or SyncMonitorStats()
+    ctxs = SyncContextStore(user_fs, stats, debounce)
+    last_stats_event = -math.inf
     early_wakeup = trio.Event()
 
     def _trigger_early_wakeup():
@@ -345,6 +623,16 @@ async def monitor_sync(user_fs, event_bus, task_status):
         if ctx and ctx.set_remote_change(src_id):
             _trigger_early_wakeup()
 
+    def _on_reconcile_requested(event, workspace_id=None):
+        if workspace_id is None:
+            reconcile_ctxs = ctxs.iter()
+        else:
+            ctx = ctxs.get(workspace_id)
+            reconcile_ctxs = [ctx] if ctx else []
+        for ctx in reconcile_ctxs:
+            if ctx.request_reconcile():
+                _trigger_early_wakeup()
+
     def _on_sharing_updated(sender, new_entry, previous_entry):
         # If role have changed we have to reset the sync context given
         # behavior could have changed a lot (e.g. switching to/from read-only)
@@ -364,6 +652,7 @@ async def monitor_sync(user_fs, event_bus, task_status):
             raise
         except Exception:
             logger.exception("Sync monitor has crashed", workspace_id=ctx.id)
+            ctx.stats.failed()
             # Reset sync context which is now in an undefined state
             ctxs.discard(ctx.id)
             ctx = ctxs.get(ctx.id)
@@ -378,6 +667,7 @@ async def monitor_sync(user_fs, event_bus, task_status):
         ("fs.entry.updated", _on_entry_updated),
         ("backend.realm.vlobs_updated", _on_realm_vlobs_updated),
         ("sharing.updated", _on_sharing_updated),
+        ("fs.reconcile_requested", _on_reconcile_requested),
     ):
         due_times = []
         # Init userfs sync context
@@ -394,6 +684,12 @@ async def monitor_sync(user_fs, event_bus, task_status):
         task_status.started()
         while True:
             next_due_time = min(due_times)
+            # Stats sampling is rate limited to avoid flooding the event bus
+            # during a busy sync, but the final state is always provided
+            now = timestamp()
+            if next_due_time == math.inf or now - last_stats_event >= STATS_EVENT_INTERVAL:
+                last_stats_event = now
+                event_bus.send("sync.stats_updated", stats=stats.snapshot())
             if next_due_time == math.inf:
                 task_status.idle()
             with trio.move_on_at(next_due_time) as cancel_scope:
@@ -73,6 +73,27 @@ class TrustchainContext:
             pass
         return None
 
+    def populate_cache(
+        self,
+        cached_on: Pendulum,
+        users: List[UserCertificateContent] = (),
+        revoked_users: List[RevokedUserCertificateContent] = (),
+        devices: List[DeviceCertificateContent] = (),
+    ) -> None:
+        """
+        Add certificates already verified elsewhere (e.g. loaded from the
+        local storage) to the cache.
+        """
+        for verified_user in users:
+            self._users_cache[verified_user.user_id] = (cached_on, verified_user)
+        for verified_revoked_user in revoked_users:
+            self._revoked_users_cache[verified_revoked_user.user_id] = (
+                cached_on,
+                verified_revoked_user,
+            )
+        for verified_device in devices:
+            self._devices_cache[verified_device.device_id] = (cached_on, verified_device)
+
     def load_user_and_devices(
         self,
         trustchain: dict,
@@ -119,6 +140,67 @@ class TrustchainContext:
 
         return verified_user, verified_revoked_user, verified_devices
 
+    def load_users_and_devices(
+        self, trustchain: dict, users: List[dict]
+    ) -> List[
+        Tuple[
+            UserCertificateContent,
+            Optional[RevokedUserCertificateContent],
+            List[DeviceCertificateContent],
+        ]
+    ]:
+        """
+        Batch version of `load_user_and_devices`, each item of `users` providing
+        `user_certificate`, `revoked_user_certificate` and `device_certificates`.
+        All the certificates are verified together so the common parts of the
+        trustchain are only verified once.
+        """
+        now = pendulum_now()
+        verified_users, verified_revoked_users, verified_devices = self.load_trustchain(
+            users=(*(u["user_certificate"] for u in users), *trustchain["users"]),
+            revoked_users=(
+                *(u["revoked_user_certificate"] for u in users if u["revoked_user_certificate"]),
+                *trustchain["revoked_users"],
+            ),
+            devices=(*(c for u in users for c in u["device_certificates"]), *trustchain["devices"]),
+            now=now,
+        )
+        verified_users = {u.user_id: u for u in verified_users}
+        verified_revoked_users = {u.user_id: u for u in verified_revoked_users}
+        verified_devices = {d.device_id: d for d in verified_devices}
+
+        results = []
+        try:
+            for item in users:
+                user_id = UserCertificateContent.unsecure_load(item["user_certificate"]).user_id
+                if item["revoked_user_certificate"]:
+                    revoked_user_id = RevokedUserCertificateContent.unsecure_load(
+                        item["revoked_user_certificate"]
+                    ).user_id
+                    if revoked_user_id != user_id:
+                        raise TrustchainError(
+                            f"Expected certificate from `{user_id}` but got `{revoked_user_id}`"
+                        )
+                    verified_revoked_user = verified_revoked_users[user_id]
+                else:
+                    verified_revoked_user = None
+                user_verified_devices = []
+                for certif in item["device_certificates"]:
+                    device_id = DeviceCertificateContent.unsecure_load(certif).device_id
+                    if device_id.user_id != user_id:
+                        raise TrustchainError(
+                            f"Expected certificate from `{user_id}` but got `{device_id}`"
+                        )
+                    user_verified_devices.append(verified_devices[device_id])
+                results.append(
+                    (verified_users[user_id], verified_revoked_user, user_verified_devices)
+                )
+
+        except DataError as exc:
+            raise TrustchainError(f"Invalid certificate: {exc}") from exc
+
+        return results
+
     def load_trustchain(
         self,
         users: List[bytes] = (),
@@ -1,6 +1,6 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
-from typing import List
+from typing import List, Optional, Tuple
 import trio
 from structlog import get_logger
 from collections import defaultdict
@@ -34,11 +34,30 @@ class EventWaiter:
 
 
 class EventBus:
+    """
+    Callbacks can be connected to an event along with a route (i.e. the
+    values of the event parameters declared with `set_event_route`), in
+    which case they are only called for the events matching this route.
+    This allows dispatching an event without going through the callbacks of
+    all the listeners only interested in other organizations, users etc.
+    """
+
     def __init__(self):
         self._event_handlers = defaultdict(list)
+        self._event_routes = {}
+        self._routed_event_handlers = {}
 
     def stats(self):
-        return {event: len(cbs) for event, cbs in self._event_handlers.items() if cbs}
+        stats = {event: len(cbs) for event, cbs in self._event_handlers.items() if cbs}
+        for (event, _), cbs in self._routed_event_handlers.items():
+            stats[event] = stats.get(event, 0) + len(cbs)
+        return stats
+
+    def set_event_route(self, event: str, *params: str):
+        """
+        Declare which parameters of the event are used to route it.
+        """
+        self._event_routes[event] = params
 
     def connection_context(self):
         return EventBusConnectionContext(self)
@@ -47,7 +66,14 @@ class EventBus:
         # Do not log meta events (event.connected and event.disconnected)
         if "event_name" not in kwargs:
             logger.debug("Send event", event_name=event, **kwargs)
-        for cb in self._event_handlers[event]:
+        cbs = self._event_handlers.get(event, [])
+        route_params = self._event_routes.get(event)
+        if route_params:
+            route = tuple(kwargs.get(param) for param in route_params)
+            routed_cbs = self._routed_event_handlers.get((event, route))
+            if routed_cbs:
+                cbs = [*cbs, *routed_cbs]
+        for cb in cbs:
             try:
                 cb(event, **kwargs)
             except Exception:
@@ -80,8 +106,12 @@ class EventBus:
             for event in events:
                 self.disconnect(event, ew._cb)
 
-    def connect(self, event: str, cb):
-        self._event_handlers[event].append(cb)
+    def connect(self, event: str, cb, route: Optional[Tuple] = None):
+        if route is None:
+            self._event_handlers[event].append(cb)
+        else:
+            assert len(route) == len(self._event_routes[event])
+            self._routed_event_handlers.setdefault((event, route), []).append(cb)
         self.send("event.connected", event_name=event)
 
     @contextmanager
@@ -95,8 +125,14 @@ class EventBus:
             for event, cb in events:
                 self.disconnect(event, cb)
 
-    def disconnect(self, event: str, cb):
-        self._event_handlers[event].remove(cb)
+    def disconnect(self, event: str, cb, route: Optional[Tuple] = None):
+        if route is None:
+            self._event_handlers[event].remove(cb)
+        else:
+            routed_cbs = self._routed_event_handlers[(event, route)]
+            routed_cbs.remove(cb)
+            if not routed_cbs:
+                del self._routed_event_handlers[(event, route)]
         self.send("event.disconnected", event_name=event)
 
 
@@ -112,8 +148,8 @@ class EventBusConnectionContext:
         self.clear()
 
     def clear(self):
-        for event, cb in self.to_disconnect:
-            self.event_bus.disconnect(event, cb)
+        for event, cb, route in self.to_disconnect:
+            self.event_bus.disconnect(event, cb, route)
         self.to_disconnect.clear()
 
     def send(self, event: str, **kwargs):
@@ -125,13 +161,13 @@ class EventBusConnectionContext:
     def waiter_on_first(self, *events: List[str]):
         return self.event_bus.waiter_on_first(*events)
 
-    def connect(self, event: str, cb):
-        self.to_disconnect.append((event, cb))
-        self.event_bus.connect(event, cb)
+    def connect(self, event: str, cb, route: Optional[Tuple] = None):
+        self.to_disconnect.append((event, cb, route))
+        self.event_bus.connect(event, cb, route)
 
     def connect_in_context(self, *events: List[str]):
         return self.event_bus.connect_in_context(*events)
 
-    def disconnect(self, event: str, cb):
-        self.event_bus.disconnect(event, cb)
-        self.to_disconnect.remove((event, cb))
+    def disconnect(self, event: str, cb, route: Optional[Tuple] = None):
+        self.event_bus.disconnect(event, cb, route)
+        self.to_disconnect.remove((event, cb, route))
@@ -0,0 +1,184 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+from uuid import UUID as _UUID
+from pendulum import Pendulum
+from typing import Callable, Iterable, Optional
+from marshmallow import Schema, ValidationError, missing
+
+from parsec.serde import fields
+from parsec.serde.schema import OneOfSchema
+
+
+__all__ = ("FALLBACK", "compile_loader", "compile_dumper")
+
+
+# Returned by the compiled functions when the data must go through the schema
+# (invalid data or data too unusual to be handled by the fast path)
+FALLBACK = object()
+
+
+# Fields whose (de)serialization is a no-op for values of the given exact type
+_PASSTHROUGH_TYPES = {
+    fields.UUID: (_UUID,),
+    fields.DateTime: (Pendulum,),
+    fields.Bytes: (bytes,),
+    fields.String: (str,),
+    fields.Integer: (int,),
+    fields.Boolean: (bool,),
+}
+_DUMP_PASSTHROUGH_TYPES = {**_PASSTHROUGH_TYPES, fields.CheckedConstant: (str,)}
+
+
+def _is_compilable(schema: Schema, ignored_processors: Iterable[str]) -> bool:
+    # Schemas with custom load/dump (e.g. `OneOfSchema`) are not field-based
+    cls = type(schema)
+    if cls.load is not Schema.load or cls.dump is not Schema.dump:
+        return False
+    return not any(
+        name not in ignored_processors for names in schema.__processors__.values() for name in names
+    )
+
+
+def compile_loader(
+    schema: Schema, ignored_processors: Iterable[str] = ()
+) -> Optional[Callable[[dict], dict]]:
+    """
+    Build a function equivalent to `schema.load(data).data` for the valid
+    data, returning `FALLBACK` for the others.
+
+    Returns: `None` if the schema cannot be handled by the fast path
+    """
+    if not _is_compilable(schema, ignored_processors):
+        return None
+
+    plan = []
+    for name, field in schema.fields.items():
+        if field.dump_only:
+            continue
+        if field.load_from or field.load_only or callable(field.missing):
+            return None
+        plan.append(
+            (
+                name,
+                field,
+                field.missing,
+                field.required,
+                field.allow_none,
+                _PASSTHROUGH_TYPES.get(type(field)),
+                tuple(field.validators),
+            )
+        )
+
+    def _load(data):
+        if type(data) is not dict:
+            return FALLBACK
+        loaded = {}
+        for name, field, missing_value, required, allow_none, types, validators in plan:
+            value = data.get(name, missing)
+            if value is missing:
+                if required:
+                    return FALLBACK
+                if missing_value is missing:
+                    continue
+                value = missing_value
+            if value is None:
+                if not allow_none:
+                    return FALLBACK
+                loaded[name] = None
+                continue
+            try:
+                if types is None:
+                    value = field.deserialize(value, name, data)
+                else:
+                    if type(value) not in types:
+                        return FALLBACK
+                    for validator in validators:
+                        if validator(value) is False:
+                            return FALLBACK
+            except ValidationError:
+                return FALLBACK
+            loaded[name] = value
+        return loaded
+
+    return _load
+
+
+def compile_dumper(schema: Schema) -> Optional[Callable[[dict], dict]]:
+    """
+    Build a function equivalent to `schema.dump(data).data` for the
+    common data, returning `FALLBACK` for the others.
+
+    Returns: `None` if the schema cannot be handled by the fast path
+    """
+    if isinstance(schema, OneOfSchema):
+        return _compile_one_of_dumper(schema)
+    if not _is_compilable(schema, ()):
+        return None
+
+    plan = []
+    for name, field in schema.fields.items():
+        if field.load_only:
+            continue
+        if field.dump_to or field.attribute:
+            return None
+        items_dumper = None
+        if type(field) is fields.List and type(field.container) is fields.Nested:
+            items_dumper = compile_dumper(field.container.schema)
+        plan.append(
+            (name, field, field.default, _DUMP_PASSTHROUGH_TYPES.get(type(field)), items_dumper)
+        )
+
+    def _dump(data):
+        if type(data) is not dict:
+            return FALLBACK
+        dumped = {}
+        for name, field, default, types, items_dumper in plan:
+            value = data.get(name, missing)
+            if value is missing:
+                if default is not missing:
+                    return FALLBACK
+                continue
+            if value is None:
+                pass
+            elif items_dumper and type(value) is list:
+                value = [items_dumper(item) for item in value]
+                if FALLBACK in value:
+                    return FALLBACK
+            elif types is not None:
+                if type(value) not in types:
+                    return FALLBACK
+            else:
+                try:
+                    value = field.serialize(name, data)
+                except ValidationError:
+                    return FALLBACK
+            dumped[name] = value
+        return dumped
+
+    return _dump
+
+
+def _compile_one_of_dumper(schema: OneOfSchema) -> Optional[Callable[[dict], dict]]:
+    if schema.fallback_type_schema:
+        return None
+    dumpers = {}
+    for obj_type in schema.type_schemas:
+        dumper = compile_dumper(schema._get_schema(obj_type))
+        if not dumper:
+            return None
+        dumpers[obj_type] = dumper
+
+    def _dump(data):
+        try:
+            obj_type = schema.get_obj_type(data)
+        except Exception:
+            return FALLBACK
+        dumper = dumpers.get(obj_type) if type(obj_type) is str else None
+        if not dumper:
+            return FALLBACK
+        dumped = dumper(data)
+        if dumped is not FALLBACK and dumped:
+            dumped[schema.type_field] = obj_type
+        return dumped
+
+    return _dump
@@ -13,6 +13,7 @@ from marshmallow.fields import (
     Dict,
     Nested,
     Integer,
+    Float,
     Boolean,
     Email,
     Field,
@@ -40,6 +41,7 @@ __all__ = (
     "Dict",
     "Nested",
     "Integer",
+    "Float",
     "Boolean",
     "Email",
     "Field",
@@ -91,3 +91,95 @@ class ZipMsgpackSerializer(MsgpackSerializer):
             SerdePackingError
         """
         return zlib.compress(super().dumps(data))
+
+
+class EnvelopeZipMsgpackSerializer(MsgpackSerializer):
+    """
+    Msgpack serializer prefixing the data with a codec byte so the
+    compression can be picked according to the size of the data:
+    - small data is not compressed (zlib header and CPU cost would dominate)
+    - medium data is compressed by zlib using `ZDICT` as preset dictionary
+    - big data is compressed by zlib at its fastest level
+
+    Data produced by `ZipMsgpackSerializer` can still be loaded: a zlib
+    stream always starts with a byte whose lower nibble is 8, hence it
+    cannot be confused with one of the codecs.
+    """
+
+    CODEC_RAW = 0x01
+    CODEC_ZLIB_FAST = 0x02
+    # Once data has been produced with the preset dictionary, the dictionary
+    # must never change (a new codec should be introduced instead)
+    CODEC_ZLIB_ZDICT = 0x03
+
+    ZDICT = b""
+    MIN_COMPRESSION_SIZE = 128
+    FAST_COMPRESSION_SIZE = 64 * 1024
+
+    def _zlib_compressobj(self):
+        if self.ZDICT:
+            return zlib.compressobj(zdict=self.ZDICT)
+        else:
+            return zlib.compressobj()
+
+    def _zlib_decompressobj(self):
+        if self.ZDICT:
+            return zlib.decompressobj(zdict=self.ZDICT)
+        else:
+            return zlib.decompressobj()
+
+    def loads(self, data: bytes) -> dict:
+        """
+        Raises:
+            SerdeValidationError
+            SerdePackingError
+        """
+        if not data:
+            raise self.packing_exc("Empty data")
+        codec = data[0]
+        payload = memoryview(data)[1:]
+        try:
+            if codec == self.CODEC_RAW:
+                raw = payload
+            elif codec == self.CODEC_ZLIB_FAST:
+                raw = zlib.decompress(payload)
+            elif codec == self.CODEC_ZLIB_ZDICT:
+                decompressobj = self._zlib_decompressobj()
+                raw = decompressobj.decompress(payload)
+                if not decompressobj.eof or decompressobj.unused_data:
+                    raise self.packing_exc("Invalid compressed data")
+            else:
+                # Legacy data without envelope
+                raw = zlib.decompress(data)
+        except zlib.error as exc:
+            raise self.packing_exc(str(exc)) from exc
+        return super().loads(raw)
+
+    def dumps(self, data: dict, envelope: bool = True) -> bytes:
+        """
+        Without `envelope`, data is serialized like `ZipMsgpackSerializer`
+        does (hence can be loaded by peers not knowing about the envelope).
+
+        Raises:
+            SerdeValidationError
+            SerdePackingError
+        """
+        raw = super().dumps(data)
+        if not envelope:
+            return zlib.compress(raw)
+
+        if len(raw) < self.MIN_COMPRESSION_SIZE:
+            return bytes((self.CODEC_RAW,)) + raw
+
+        if len(raw) >= self.FAST_COMPRESSION_SIZE:
+            codec = self.CODEC_ZLIB_FAST
+            compressed = zlib.compress(raw, 1)
+        else:
+            codec = self.CODEC_ZLIB_ZDICT
+            compressobj = self._zlib_compressobj()
+            compressed = compressobj.compress(raw) + compressobj.flush()
+
+        # Incompressible data
+        if len(compressed) >= len(raw):
+            return bytes((self.CODEC_RAW,)) + raw
+        return bytes((codec,)) + compressed
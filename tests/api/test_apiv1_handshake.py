@@ -44,6 +44,7 @@ def test_good_handshake(alice):
         "organization_id": alice.organization_id,
         "device_id": alice.device_id,
         "rvk": alice.root_verify_key,
+        "session_ticket": None,
     }
     result_req = sh.build_result_req(alice.verify_key)
     assert sh.state == "result"
@@ -48,6 +48,7 @@ def test_good_authenticated_handshake(alice):
         "organization_id": alice.organization_id,
         "device_id": alice.device_id,
         "rvk": alice.root_verify_key,
+        "session_ticket": None,
     }
     result_req = sh.build_result_req(alice.verify_key)
     assert sh.state == "result"
@@ -366,6 +367,37 @@ def test_build_result_req_bad_challenge(alice):
         sh.build_result_req(alice.verify_key)
 
 
+def test_build_result_req_with_session_ticket(alice, bob):
+    sh = ServerHandshake()
+    sh.build_challenge_req()
+    answer = {
+        "handshake": "answer",
+        "type": HandshakeType.AUTHENTICATED.value,
+        "client_api_version": API_V2_VERSION,
+        "organization_id": alice.organization_id,
+        "device_id": alice.device_id,
+        "rvk": alice.root_verify_key.encode(),
+        "answer": bob.signing_key.sign(sh.challenge),
+        "session_ticket": b"<ticket>",
+    }
+    sh.process_answer_req(packb(answer))
+    assert sh.answer_data["session_ticket"] == b"<ticket>"
+    # Answer is checked even if a session ticket is provided
+    with pytest.raises(HandshakeFailedChallenge):
+        sh.build_result_req(alice.verify_key, session_ticket=b"<new ticket>")
+
+    sh = ServerHandshake()
+    sh.build_challenge_req()
+    answer["answer"] = alice.signing_key.sign(sh.challenge)
+    sh.process_answer_req(packb(answer))
+    result_req = sh.build_result_req(alice.verify_key, session_ticket=b"<new ticket>")
+    assert unpackb(result_req) == {
+        "handshake": "result",
+        "result": "ok",
+        "session_ticket": b"<new ticket>",
+    }
+
+
 @pytest.mark.parametrize(
     "method,expected_result",
     [
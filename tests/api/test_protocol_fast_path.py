@@ -0,0 +1,199 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+from copy import deepcopy
+from uuid import UUID
+from pendulum import Pendulum
+from hypothesis import given, strategies as st
+
+from parsec.crypto import HashDigest
+from parsec.api.protocol import (
+    DeviceID,
+    RealmRole,
+    InvitationStatus,
+    ping_serializer,
+    block_create_serializer,
+    block_read_serializer,
+    block_create_chunk_serializer,
+    block_read_chunk_serializer,
+    vlob_create_serializer,
+    vlob_read_serializer,
+    vlob_update_serializer,
+    vlob_poll_changes_serializer,
+    vlob_group_check_serializer,
+    events_listen_serializer,
+    events_listen_batch_serializer,
+)
+
+
+ID = UUID("00000000000000000000000000000001")
+NOW = Pendulum(2000, 1, 1)
+
+# Valid requests and responses, mutated to check the invalid ones too
+SAMPLES = {
+    "ping": (ping_serializer, {"ping": "foo"}, {"pong": "foo"}),
+    "block_create": (
+        block_create_serializer,
+        {"block_id": ID, "realm_id": ID, "block": b"foo"},
+        {},
+    ),
+    "block_read": (block_read_serializer, {"block_id": ID}, {"block": b"foo"}),
+    "block_create_chunk": (
+        block_create_chunk_serializer,
+        {
+            "block_id": ID,
+            "realm_id": ID,
+            "digest": HashDigest.from_data(b"foo"),
+            "size": 3,
+            "offset": 0,
+            "chunk": b"foo",
+        },
+        {"offset": 3},
+    ),
+    "block_read_chunk": (
+        block_read_chunk_serializer,
+        {"block_id": ID, "offset": 0},
+        {"chunk": b"foo", "size": 3},
+    ),
+    "vlob_create": (
+        vlob_create_serializer,
+        {"realm_id": ID, "encryption_revision": 1, "vlob_id": ID, "timestamp": NOW, "blob": b"foo"},
+        {},
+    ),
+    "vlob_read": (
+        vlob_read_serializer,
+        {"encryption_revision": 1, "vlob_id": ID, "version": 2, "timestamp": NOW},
+        {"version": 2, "blob": b"foo", "author": DeviceID("alice@dev1"), "timestamp": NOW},
+    ),
+    "vlob_update": (
+        vlob_update_serializer,
+        {"encryption_revision": 1, "vlob_id": ID, "timestamp": NOW, "version": 2, "blob": b"foo"},
+        {},
+    ),
+    "vlob_poll_changes": (
+        vlob_poll_changes_serializer,
+        {"realm_id": ID, "last_checkpoint": 1},
+        {"changes": {ID: 2}, "current_checkpoint": 2},
+    ),
+    "vlob_group_check": (
+        vlob_group_check_serializer,
+        {"to_check": [{"vlob_id": ID, "version": 1}]},
+        {"changed": [{"vlob_id": ID, "version": 2}]},
+    ),
+    "events_listen": (
+        events_listen_serializer,
+        {"wait": False},
+        {
+            "event": "realm.vlobs_updated",
+            "realm_id": ID,
+            "checkpoint": 1,
+            "src_id": ID,
+            "src_version": 1,
+        },
+    ),
+    "events_listen_batch": (
+        events_listen_batch_serializer,
+        {"wait": False, "limit": 10},
+        {
+            "events": [
+                {"event": "pinged", "ping": "foo"},
+                {"event": "realm.roles_updated", "realm_id": ID, "role": RealmRole.OWNER},
+                {"event": "message.received", "index": 1},
+                {
+                    "event": "invite.status_changed",
+                    "token": ID,
+                    "invitation_status": InvitationStatus.READY,
+                },
+            ]
+        },
+    ),
+}
+
+ODD_VALUES = [
+    None,
+    True,
+    0,
+    -1,
+    2 ** 70,
+    1.0,
+    "",
+    "foo",
+    b"",
+    b"foo",
+    ID,
+    str(ID),
+    NOW,
+    [],
+    [{}],
+    [{"vlob_id": ID, "version": 1}],
+    [{"event": "pinged", "ping": "foo"}],
+    [{"event": "dummy"}],
+    {},
+    {ID: 1},
+    RealmRole.OWNER,
+    "alice@dev1",
+    DeviceID("alice@dev1"),
+]
+
+ALL_KEYS = sorted(
+    {key for _, req, rep in SAMPLES.values() for key in {*req, *rep}}
+    | {"cmd", "status", "reason", "errors", "event", "src_version", "changes", "dummy"}
+)
+
+
+def _mutations():
+    return st.lists(
+        st.tuples(
+            st.sampled_from(ALL_KEYS), st.one_of(st.none(), st.sampled_from(range(len(ODD_VALUES))))
+        ),
+        max_size=3,
+    )
+
+
+def _mutate(data, mutations):
+    data = deepcopy(data)
+    for key, value_index in mutations:
+        if value_index is None:
+            data.pop(key, None)
+        else:
+            data[key] = deepcopy(ODD_VALUES[value_index])
+    return data
+
+
+def _outcome(fn, data):
+    try:
+        return "ok", fn(deepcopy(data))
+    except Exception as exc:
+        return type(exc), str(exc)
+
+
+@pytest.mark.parametrize("cmd", SAMPLES)
+@given(mutations=_mutations())
+def test_fast_path_conformance(cmd, mutations):
+    serializer, req, rep = SAMPLES[cmd]
+    # Fast path must be enabled on the hot commands
+    assert serializer.req_load != serializer._req_serializer.load
+    assert serializer.rep_dump != serializer._rep_serializer.dump
+
+    req = _mutate({"cmd": cmd, **req}, mutations)
+    assert _outcome(serializer.req_load, req) == _outcome(serializer._req_serializer.load, req)
+
+    for status in ("ok", "not_found"):
+        status_rep = _mutate({**rep, "status": status}, mutations)
+        assert _outcome(serializer.rep_dump, status_rep) == _outcome(
+            serializer._rep_serializer.dump, status_rep
+        )
+
+
+@pytest.mark.parametrize("cmd", SAMPLES)
+def test_fast_path_handles_valid_data(cmd, monkeypatch):
+    serializer, req, rep = SAMPLES[cmd]
+
+    def _no_fallback(data):
+        raise AssertionError("Unexpected fallback on the schema")
+
+    monkeypatch.setattr(serializer._req_serializer, "load", _no_fallback)
+    monkeypatch.setattr(serializer._rep_serializer, "dump", _no_fallback)
+    serializer.req_load({"cmd": cmd, **req})
+    serializer.rep_dump({"status": "ok", **rep})
+    serializer.rep_dump({"status": "not_found", "reason": None})
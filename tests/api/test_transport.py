@@ -5,7 +5,13 @@ import trio
 from functools import partial
 
 from parsec.serde import BaseSchema, fields
-from parsec.api.transport import Transport, TransportClosedByPeer
+from parsec.api.transport import (
+    Transport,
+    TransportError,
+    TransportClosedByPeer,
+    COMPRESSION_MIN_SIZE,
+    MAX_INFLATED_MESSAGE_SIZE,
+)
 from parsec.api.protocol.base import MsgpackSerializer
 
 
@@ -116,7 +122,95 @@ async def test_big_buffer_bench(backend_addr):
         del raw
 
 
-# TODO: test websocket can work with message sent across mutiple TCP frames
+@pytest.mark.trio
+async def test_message_across_multiple_reads():
+    server_stream, client_stream = trio.testing.memory_stream_pair()
+    server_transport = None
+
+    async def _boot_server():
+        nonlocal server_transport
+        server_transport = await Transport.init_for_server(server_stream)
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(_boot_server)
+        client_transport = await Transport.init_for_client(client_stream, host="127.0.0.1")
+
+    reads = []
+    vanilla_receive_some = server_stream.receive_some
+
+    async def _receive_some(max_bytes):
+        data = await vanilla_receive_some(max_bytes)
+        reads.append((max_bytes, len(data)))
+        return data
+
+    server_stream.receive_some = _receive_some
+
+    # Small message fits in a single read
+    await client_transport.send(b"hello")
+    assert await server_transport.recv() == b"hello"
+    assert reads == [(Transport.RECEIVE_BYTES_MIN, 11)]
+
+    # Big message is reassembled from multiple reads, which grow once the
+    # message is known to be large
+    payload = bytes(range(256)) * (3 * Transport.RECEIVE_BYTES // 256)
+    reads.clear()
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(partial(client_transport.send, payload, compress=False))
+        assert await server_transport.recv() == payload
+    assert len(reads) > 1
+    assert reads[0][0] == Transport.RECEIVE_BYTES_MIN
+    assert reads[-1][0] == Transport.RECEIVE_BYTES
+
+    # Back to small reads for the next message
+    reads.clear()
+    await client_transport.send(b"world")
+    assert await server_transport.recv() == b"world"
+    assert reads == [(Transport.RECEIVE_BYTES_MIN, 11)]
+
+
+@pytest.mark.trio
+async def test_message_compression():
+    server_stream, client_stream = trio.testing.memory_stream_pair()
+    server_transport = None
+
+    async def _boot_server():
+        nonlocal server_transport
+        server_transport = await Transport.init_for_server(server_stream)
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(_boot_server)
+        client_transport = await Transport.init_for_client(client_stream, host="127.0.0.1")
+
+    sent = []
+    vanilla_send_all = client_stream.send_all
+
+    async def _send_all(data):
+        sent.append(len(data))
+        await vanilla_send_all(data)
+
+    client_stream.send_all = _send_all
+
+    async def _roundtrip(payload, **kwargs):
+        sent.clear()
+        async with trio.open_service_nursery() as nursery:
+            nursery.start_soon(partial(client_transport.send, payload, **kwargs))
+            assert await server_transport.recv() == payload
+        return sum(sent)
+
+    payload = b"<metadata>" * 10000
+    assert await _roundtrip(payload) < len(payload) // 10
+    assert await _roundtrip(payload, compress=False) > len(payload)
+    # Small messages are never compressed
+    small_payload = b"a" * (COMPRESSION_MIN_SIZE - 1)
+    assert await _roundtrip(small_payload) > len(small_payload)
+
+    # Peer cannot make us inflate a message without limit
+    bomb = b"\x00" * (MAX_INFLATED_MESSAGE_SIZE + 1)
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(client_transport.send, bomb)
+        with pytest.raises(TransportError):
+            await server_transport.recv()
+        nursery.cancel_scope.cancel()
 
 
 @pytest.mark.trio
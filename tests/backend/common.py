@@ -7,8 +7,11 @@ from async_generator import asynccontextmanager
 
 from parsec.api.protocol import (
     ping_serializer,
+    organization_config_serializer,
     block_create_serializer,
     block_read_serializer,
+    block_create_chunk_serializer,
+    block_read_chunk_serializer,
     realm_create_serializer,
     realm_status_serializer,
     realm_get_role_certificates_serializer,
@@ -20,11 +23,14 @@ from parsec.api.protocol import (
     vlob_update_serializer,
     vlob_list_versions_serializer,
     vlob_poll_changes_serializer,
+    vlob_group_check_serializer,
     vlob_maintenance_get_reencryption_batch_serializer,
     vlob_maintenance_save_reencryption_batch_serializer,
     events_subscribe_serializer,
     events_listen_serializer,
+    events_listen_batch_serializer,
     user_get_serializer,
+    user_get_batch_serializer,
     human_find_serializer,
     user_create_serializer,
     user_revoke_serializer,
@@ -114,6 +120,12 @@ ping = CmdSock(
 )
 
 
+### Organization ###
+
+
+organization_config = CmdSock("organization_config", organization_config_serializer)
+
+
 ### Block ###
 
 
@@ -130,6 +142,23 @@ block_create = CmdSock(
 block_read = CmdSock(
     "block_read", block_read_serializer, parse_args=lambda self, block_id: {"block_id": block_id}
 )
+block_create_chunk = CmdSock(
+    "block_create_chunk",
+    block_create_chunk_serializer,
+    parse_args=lambda self, block_id, realm_id, digest, size, offset, chunk: {
+        "block_id": block_id,
+        "realm_id": realm_id,
+        "digest": digest,
+        "size": size,
+        "offset": offset,
+        "chunk": chunk,
+    },
+)
+block_read_chunk = CmdSock(
+    "block_read_chunk",
+    block_read_chunk_serializer,
+    parse_args=lambda self, block_id, offset: {"block_id": block_id, "offset": offset},
+)
 
 
 ### Realm ###
@@ -234,6 +263,11 @@ vlob_poll_changes = CmdSock(
         "last_checkpoint": last_checkpoint,
     },
 )
+vlob_group_check = CmdSock(
+    "vlob_group_check",
+    vlob_group_check_serializer,
+    parse_args=lambda self, to_check: {"to_check": to_check},
+)
 vlob_maintenance_get_reencryption_batch = CmdSock(
     "vlob_maintenance_get_reencryption_batch",
     vlob_maintenance_get_reencryption_batch_serializer,
@@ -258,7 +292,9 @@ vlob_maintenance_save_reencryption_batch = CmdSock(
 ### Events ###
 
 
-events_subscribe = CmdSock("events_subscribe", events_subscribe_serializer)
+events_subscribe = CmdSock(
+    "events_subscribe", events_subscribe_serializer, parse_args=lambda self, **kwargs: kwargs
+)
 
 _events_listen = CmdSock(
     "events_listen", events_listen_serializer, parse_args=lambda self, wait: {"wait": wait}
@@ -279,12 +315,22 @@ async def events_listen(sock):
         yield box
 
 
+events_listen_batch = CmdSock(
+    "events_listen_batch", events_listen_batch_serializer, parse_args=lambda self, **kwargs: kwargs
+)
+
+
 ### User ###
 
 
 user_get = CmdSock(
     "user_get", user_get_serializer, parse_args=lambda self, user_id: {"user_id": user_id}
 )
+user_get_batch = CmdSock(
+    "user_get_batch",
+    user_get_batch_serializer,
+    parse_args=lambda self, user_ids: {"user_ids": user_ids},
+)
 human_find = CmdSock(
     "human_find",
     human_find_serializer,
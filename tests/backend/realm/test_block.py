@@ -7,6 +7,7 @@ import pendulum
 from uuid import UUID, uuid4
 from hypothesis import given, strategies as st
 
+from parsec.crypto import HashDigest
 from parsec.backend.block import BlockTimeoutError
 from parsec.backend.realm import RealmGrantedRole
 from parsec.backend.raid5_blockstore import (
@@ -14,9 +15,15 @@ from parsec.backend.raid5_blockstore import (
     generate_checksum_chunk,
     rebuild_block_from_chunks,
 )
-from parsec.api.protocol import block_create_serializer, block_read_serializer, packb, RealmRole
+from parsec.api.protocol import (
+    block_create_serializer,
+    block_read_serializer,
+    packb,
+    RealmRole,
+    BLOCK_CHUNK_SIZE,
+)
 
-from tests.backend.common import block_create, block_read
+from tests.backend.common import block_create, block_read, block_create_chunk, block_read_chunk
 
 
 BLOCK_ID = UUID("00000000000000000000000000000001")
@@ -408,3 +415,134 @@ def test_split_block(block, nb_blockstores):
         partial_chunks[missing] = None
         rebuilt = rebuild_block_from_chunks(partial_chunks, checksum_chunk)
         assert rebuilt == block
+
+
+@pytest.mark.trio
+async def test_block_chunked_transfer(alice_backend_sock, bob_backend_sock, realm):
+    block_id = uuid4()
+    block = bytes(range(256)) * (5 * BLOCK_CHUNK_SIZE // 2 // 256)
+    digest = HashDigest.from_data(block)
+    size = len(block)
+
+    async def _create_chunk(offset, chunk, sock=alice_backend_sock):
+        return await block_create_chunk(sock, block_id, realm, digest, size, offset, chunk)
+
+    rep = await _create_chunk(0, block[:BLOCK_CHUNK_SIZE])
+    assert rep == {"status": "ok", "offset": BLOCK_CHUNK_SIZE}
+
+    # Upload is interrupted and restarted: backend tells where to resume from
+    rep = await _create_chunk(0, block[:BLOCK_CHUNK_SIZE])
+    assert rep == {"status": "ok", "offset": BLOCK_CHUNK_SIZE}
+
+    # Block is not available until the last chunk is received
+    rep = await block_read(alice_backend_sock, block_id)
+    assert rep == {"status": "not_found"}
+
+    # Other users cannot complete the upload
+    rep = await _create_chunk(
+        2 * BLOCK_CHUNK_SIZE, block[2 * BLOCK_CHUNK_SIZE :], sock=bob_backend_sock
+    )
+    assert rep == {"status": "ok", "offset": 0}
+
+    rep = await _create_chunk(BLOCK_CHUNK_SIZE, block[BLOCK_CHUNK_SIZE : 2 * BLOCK_CHUNK_SIZE])
+    assert rep == {"status": "ok", "offset": 2 * BLOCK_CHUNK_SIZE}
+    rep = await _create_chunk(2 * BLOCK_CHUNK_SIZE, block[2 * BLOCK_CHUNK_SIZE :])
+    assert rep == {"status": "ok", "offset": size}
+
+    # Now download the block
+    offset = 0
+    chunks = []
+    while offset < size:
+        rep = await block_read_chunk(alice_backend_sock, block_id, offset)
+        assert rep["status"] == "ok"
+        assert rep["size"] == size
+        assert len(rep["chunk"]) <= BLOCK_CHUNK_SIZE
+        chunks.append(rep["chunk"])
+        offset += len(rep["chunk"])
+    assert b"".join(chunks) == block
+
+    # Access is checked when reading
+    rep = await block_read_chunk(bob_backend_sock, block_id, 0)
+    assert rep == {"status": "not_allowed"}
+
+
+@pytest.mark.trio
+async def test_block_chunked_create_bad_digest(alice_backend_sock, realm):
+    block_id = uuid4()
+    block = b"x" * (BLOCK_CHUNK_SIZE + 1)
+    digest = HashDigest.from_data(b"<other data>")
+
+    rep = await block_create_chunk(
+        alice_backend_sock, block_id, realm, digest, len(block), 0, block[:BLOCK_CHUNK_SIZE]
+    )
+    assert rep == {"status": "ok", "offset": BLOCK_CHUNK_SIZE}
+    rep = await block_create_chunk(
+        alice_backend_sock,
+        block_id,
+        realm,
+        digest,
+        len(block),
+        BLOCK_CHUNK_SIZE,
+        block[BLOCK_CHUNK_SIZE:],
+    )
+    assert rep == {"status": "bad_message", "reason": "Block digest mismatch"}
+
+    rep = await block_read(alice_backend_sock, block_id)
+    assert rep == {"status": "not_found"}
+
+
+@pytest.mark.trio
+async def test_block_chunked_read_check_access_on_each_chunk(
+    backend, alice, bob, alice_backend_sock, bob_backend_sock, realm
+):
+    block_id = uuid4()
+    block = b"x" * (BLOCK_CHUNK_SIZE + 1)
+    await backend.block.create(alice.organization_id, alice.device_id, block_id, realm, block)
+
+    await backend.realm.update_roles(
+        alice.organization_id,
+        RealmGrantedRole(
+            certificate=b"<dummy>",
+            realm_id=realm,
+            user_id=bob.user_id,
+            role=RealmRole.READER,
+            granted_by=alice.device_id,
+        ),
+    )
+    rep = await block_read_chunk(bob_backend_sock, block_id, 0)
+    assert rep == {"status": "ok", "chunk": block[:BLOCK_CHUNK_SIZE], "size": len(block)}
+
+    # Access is revoked while the download is in progress
+    await backend.realm.update_roles(
+        alice.organization_id,
+        RealmGrantedRole(
+            certificate=b"<dummy>",
+            realm_id=realm,
+            user_id=bob.user_id,
+            role=None,
+            granted_by=alice.device_id,
+        ),
+    )
+    rep = await block_read_chunk(bob_backend_sock, block_id, BLOCK_CHUNK_SIZE)
+    assert rep == {"status": "not_allowed"}
+
+
+@pytest.mark.trio
+async def test_block_chunked_create_uploads_limit_reached(monkeypatch, alice_backend_sock, realm):
+    monkeypatch.setattr("parsec.backend.memory.block.MAX_PENDING_UPLOADS_SIZE", BLOCK_CHUNK_SIZE)
+    monkeypatch.setattr(
+        "parsec.backend.postgresql.block.MAX_PENDING_UPLOADS_SIZE", BLOCK_CHUNK_SIZE
+    )
+    block = b"x" * (2 * BLOCK_CHUNK_SIZE)
+    digest = HashDigest.from_data(block)
+
+    rep = await block_create_chunk(
+        alice_backend_sock, uuid4(), realm, digest, len(block), 0, block[:BLOCK_CHUNK_SIZE]
+    )
+    assert rep == {"status": "ok", "offset": BLOCK_CHUNK_SIZE}
+
+    # The limit is shared between all the pending uploads
+    rep = await block_create_chunk(
+        alice_backend_sock, uuid4(), realm, digest, len(block), 0, block[:BLOCK_CHUNK_SIZE]
+    )
+    assert rep == {"status": "uploads_limit_reached"}
@@ -0,0 +1,67 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+from uuid import UUID
+from pendulum import Pendulum
+
+from parsec.api.protocol import VLOB_GROUP_CHECK_MAX_SIZE
+
+from tests.backend.common import vlob_group_check
+
+
+UNKNOWN_VLOB_ID = UUID("0000000000000000000000000000000F")
+
+
+@pytest.mark.trio
+async def test_vlob_group_check(alice_backend_sock, vlobs):
+    rep = await vlob_group_check(
+        alice_backend_sock,
+        [
+            # Up to date
+            {"vlob_id": vlobs[1], "version": 1},
+            # Outdated
+            {"vlob_id": vlobs[0], "version": 1},
+            # Unknown vlob are simply ignored
+            {"vlob_id": UNKNOWN_VLOB_ID, "version": 1},
+        ],
+    )
+    assert rep == {"status": "ok", "changed": [{"vlob_id": vlobs[0], "version": 2}]}
+
+
+@pytest.mark.trio
+async def test_vlob_group_check_placeholder(alice_backend_sock, vlobs):
+    # Version 0 means the vlob has never been synchronized
+    rep = await vlob_group_check(alice_backend_sock, [{"vlob_id": UNKNOWN_VLOB_ID, "version": 0}])
+    assert rep == {"status": "ok", "changed": [{"vlob_id": UNKNOWN_VLOB_ID, "version": 0}]}
+
+
+@pytest.mark.trio
+async def test_vlob_group_check_no_read_access(bob_backend_sock, vlobs):
+    # Vlobs from realms without read access are ignored
+    rep = await vlob_group_check(bob_backend_sock, [{"vlob_id": vlobs[0], "version": 1}])
+    assert rep == {"status": "ok", "changed": []}
+
+
+@pytest.mark.trio
+async def test_vlob_group_check_during_maintenance(
+    backend, alice, alice_backend_sock, realm, vlobs
+):
+    await backend.realm.start_reencryption_maintenance(
+        alice.organization_id,
+        alice.device_id,
+        realm,
+        2,
+        {alice.user_id: b"whatever"},
+        Pendulum(2000, 1, 2),
+    )
+
+    # Realm under maintenance are simply skipped
+    rep = await vlob_group_check(alice_backend_sock, [{"vlob_id": vlobs[0], "version": 1}])
+    assert rep == {"status": "ok", "changed": []}
+
+
+@pytest.mark.trio
+async def test_vlob_group_check_too_big(alice_backend_sock, vlobs):
+    to_check = [{"vlob_id": vlobs[0], "version": 1}] * (VLOB_GROUP_CHECK_MAX_SIZE + 1)
+    rep = await vlob_group_check(alice_backend_sock, to_check)
+    assert rep["status"] == "bad_message"
@@ -115,8 +115,8 @@ async def test_vlobs_updated_event_ok(
         await events_listen_nowait(alice_backend_sock),
         await events_listen_nowait(alice_backend_sock),
         await events_listen_nowait(alice_backend_sock),
-        await events_listen_nowait(alice_backend_sock),
     ]
+    # Events about the same vlob waiting to be listened only keep the last version
     assert reps == [
         {
             "status": "ok",
@@ -126,14 +126,6 @@ async def test_vlobs_updated_event_ok(
             "src_id": OTHER_VLOB_ID,
             "src_version": 1,
         },
-        {
-            "status": "ok",
-            "event": "realm.vlobs_updated",
-            "realm_id": realm,
-            "checkpoint": 2,
-            "src_id": VLOB_ID,
-            "src_version": 2,
-        },
         {
             "status": "ok",
             "event": "realm.vlobs_updated",
@@ -146,6 +138,72 @@ async def test_vlobs_updated_event_ok(
     ]
 
 
+@pytest.mark.trio
+async def test_vlobs_updated_event_coalesced(backend, alice_backend_sock, alice, alice2, realm):
+    await events_subscribe(alice_backend_sock, coalesce_vlobs_updated=True)
+
+    async def _update(vlob_id, version):
+        if version == 1:
+            await backend.vlob.create(
+                organization_id=alice.organization_id,
+                author=alice2.device_id,
+                realm_id=realm,
+                encryption_revision=1,
+                vlob_id=vlob_id,
+                timestamp=NOW,
+                blob=b"v1",
+            )
+        else:
+            await backend.vlob.update(
+                organization_id=alice.organization_id,
+                author=alice2.device_id,
+                encryption_revision=1,
+                vlob_id=vlob_id,
+                version=version,
+                timestamp=NOW,
+                blob=f"v{version}".encode(),
+            )
+
+    with backend.event_bus.listen() as spy:
+        await _update(VLOB_ID, 1)
+        await _update(OTHER_VLOB_ID, 1)
+        await _update(VLOB_ID, 2)
+        await spy.wait_multiple_with_timeout(["realm.vlobs_updated"] * 3)
+
+    # Events waiting to be listened are coalesced into a single one
+    rep = await events_listen_nowait(alice_backend_sock)
+    assert rep == {
+        "status": "ok",
+        "event": "realm.vlobs_updated",
+        "realm_id": realm,
+        "checkpoint": 3,
+        "src_id": VLOB_ID,
+        "src_version": 2,
+        "changes": [
+            {"src_id": OTHER_VLOB_ID, "src_version": 1},
+            {"src_id": VLOB_ID, "src_version": 2},
+        ],
+    }
+
+    # Listened event is no longer updated
+    with backend.event_bus.listen() as spy:
+        await _update(YET_ANOTHER_VLOB_ID, 1)
+        await spy.wait_with_timeout("realm.vlobs_updated")
+
+    rep = await events_listen_nowait(alice_backend_sock)
+    assert rep == {
+        "status": "ok",
+        "event": "realm.vlobs_updated",
+        "realm_id": realm,
+        "checkpoint": 4,
+        "src_id": YET_ANOTHER_VLOB_ID,
+        "src_version": 1,
+        "changes": [{"src_id": YET_ANOTHER_VLOB_ID, "src_version": 1}],
+    }
+    rep = await events_listen_nowait(alice_backend_sock)
+    assert rep == {"status": "no_events"}
+
+
 @pytest.mark.trio
 async def test_vlobs_updated_event_handle_self_events(backend, alice_backend_sock, alice, realm):
     await events_subscribe(alice_backend_sock)
@@ -281,19 +339,8 @@ async def test_vlobs_updated_event_realm_created_after_subscribe(
         "role": RealmRole.OWNER,
     }
 
-    # Create vlob in realm event
-    if not realm_created_by_self:
-        rep = await events_listen_nowait(alice_backend_sock)
-        assert rep == {
-            "status": "ok",
-            "event": "realm.vlobs_updated",
-            "realm_id": realm_id,
-            "checkpoint": 1,
-            "src_id": VLOB_ID,
-            "src_version": 1,
-        }
-
-    # Update vlob in realm event
+    # Update vlob in realm event (if the create vlob event has been sent, it
+    # has been merged with this one given it was still waiting to be listened)
     rep = await events_listen_nowait(alice_backend_sock)
     assert rep == {
         "status": "ok",
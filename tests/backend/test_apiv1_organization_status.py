@@ -8,6 +8,7 @@ from parsec.api.protocol import (
     apiv1_organization_status_serializer,
     apiv1_organization_update_serializer,
 )
+from tests.backend.common import organization_config
 from tests.backend.test_apiv1_organization import organization_create
 
 
@@ -21,14 +22,10 @@ async def organization_status(sock, organization_id):
     return apiv1_organization_status_serializer.rep_loads(raw_rep)
 
 
-async def organization_update(sock, organization_id, expiration_date: Pendulum = None):
+async def organization_update(sock, organization_id, **kwargs):
     raw_rep = await sock.send(
         apiv1_organization_update_serializer.req_dumps(
-            {
-                "cmd": "organization_update",
-                "organization_id": organization_id,
-                "expiration_date": expiration_date,
-            }
+            {"cmd": "organization_update", "organization_id": organization_id, **kwargs}
         )
     )
     raw_rep = await sock.recv()
@@ -38,7 +35,12 @@ async def organization_update(sock, organization_id, expiration_date: Pendulum =
 @pytest.mark.trio
 async def test_organization_status_bootstrapped(coolorg, administration_backend_sock):
     rep = await organization_status(administration_backend_sock, coolorg.organization_id)
-    assert rep == {"status": "ok", "is_bootstrapped": True, "expiration_date": None}
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": True,
+        "expiration_date": None,
+        "compact_manifests": False,
+    }
 
 
 @pytest.mark.trio
@@ -52,7 +54,12 @@ async def test_organization_status_not_bootstrapped(
 
     # 2) Check its status
     rep = await organization_status(administration_backend_sock, neworg.organization_id)
-    assert rep == {"status": "ok", "is_bootstrapped": False, "expiration_date": None}
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": False,
+        "expiration_date": None,
+        "compact_manifests": False,
+    }
 
 
 @pytest.mark.trio
@@ -60,19 +67,34 @@ async def test_organization_update_expiration_date(
     coolorg, organization_factory, administration_backend_sock
 ):
     rep = await organization_status(administration_backend_sock, coolorg.organization_id)
-    assert rep == {"status": "ok", "is_bootstrapped": True, "expiration_date": None}
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": True,
+        "expiration_date": None,
+        "compact_manifests": False,
+    }
     rep = await organization_update(
         administration_backend_sock, coolorg.organization_id, expiration_date=Pendulum(2077, 1, 1)
     )
     assert rep == {"status": "ok"}
     rep = await organization_status(administration_backend_sock, coolorg.organization_id)
-    assert rep == {"status": "ok", "is_bootstrapped": True, "expiration_date": Pendulum(2077, 1, 1)}
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": True,
+        "expiration_date": Pendulum(2077, 1, 1),
+        "compact_manifests": False,
+    }
     rep = await organization_update(
         administration_backend_sock, coolorg.organization_id, expiration_date=None
     )
     assert rep == {"status": "ok"}
     rep = await organization_status(administration_backend_sock, coolorg.organization_id)
-    assert rep == {"status": "ok", "is_bootstrapped": True, "expiration_date": None}
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": True,
+        "expiration_date": None,
+        "compact_manifests": False,
+    }
 
 
 @pytest.mark.trio
@@ -85,6 +107,29 @@ async def test_organization_update_expiration_date_unknown_organization(
     assert rep == {"status": "not_found"}
 
 
+@pytest.mark.trio
+async def test_organization_update_compact_manifests(
+    coolorg, administration_backend_sock, alice_backend_sock
+):
+    rep = await organization_config(alice_backend_sock)
+    assert rep == {"status": "ok", "compact_manifests": False}
+
+    rep = await organization_update(
+        administration_backend_sock, coolorg.organization_id, compact_manifests=True
+    )
+    assert rep == {"status": "ok"}
+    rep = await organization_config(alice_backend_sock)
+    assert rep == {"status": "ok", "compact_manifests": True}
+    # Expiration date is left untouched
+    rep = await organization_status(administration_backend_sock, coolorg.organization_id)
+    assert rep == {
+        "status": "ok",
+        "is_bootstrapped": True,
+        "expiration_date": None,
+        "compact_manifests": True,
+    }
+
+
 @pytest.mark.trio
 async def test_status_unknown_organization(administration_backend_sock):
     rep = await organization_status(administration_backend_sock, organization_id="dummy")
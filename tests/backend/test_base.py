@@ -24,3 +24,26 @@ async def test_bad_cmd(alice_backend_sock):
 #     await alice_backend_sock.stream.send_all(b"\x00\x00\x00\x04fooo")
 #     rep = await alice_backend_sock.recv()
 #     assert unpackb(rep) == {"status": "invalid_msg_format", "reason": "Invalid message format"}
+
+
+@pytest.mark.trio
+async def test_multiplexed_requests(alice_backend_sock, alice2_backend_sock):
+    await alice_backend_sock.send(packb([0, {"cmd": "events_subscribe"}]))
+    assert unpackb(await alice_backend_sock.recv()) == [0, {"status": "ok"}]
+
+    # Long polling request doesn't prevent the next ones from being processed
+    await alice_backend_sock.send(packb([1, {"cmd": "events_listen", "wait": True}]))
+    await alice_backend_sock.send(packb([2, {"cmd": "ping", "ping": "foo"}]))
+    await alice_backend_sock.send(packb([3, {"cmd": "dummy"}]))
+    assert unpackb(await alice_backend_sock.recv()) == [2, {"status": "ok", "pong": "foo"}]
+    assert unpackb(await alice_backend_sock.recv()) == [
+        3,
+        {"status": "unknown_command", "reason": "Unknown command"},
+    ]
+
+    await alice2_backend_sock.send(packb({"cmd": "ping", "ping": "bar"}))
+    assert unpackb(await alice2_backend_sock.recv()) == {"status": "ok", "pong": "bar"}
+    assert unpackb(await alice_backend_sock.recv()) == [
+        1,
+        {"status": "ok", "event": "pinged", "ping": "bar"},
+    ]
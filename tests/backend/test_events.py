@@ -3,7 +3,13 @@
 import pytest
 import trio
 
-from tests.backend.common import events_subscribe, events_listen, events_listen_nowait, ping
+from tests.backend.common import (
+    events_subscribe,
+    events_listen,
+    events_listen_nowait,
+    events_listen_batch,
+    ping,
+)
 
 
 @pytest.mark.trio
@@ -54,6 +60,34 @@ async def test_event_resubscribe(backend, alice_backend_sock, alice2_backend_soc
     assert rep == {"status": "no_events"}
 
 
+@pytest.mark.trio
+async def test_events_listen_batch(backend, alice_backend_sock, alice2_backend_sock):
+    await events_subscribe(alice_backend_sock)
+
+    rep = await events_listen_batch(alice_backend_sock, wait=False)
+    assert rep == {"status": "ok", "events": []}
+
+    with backend.event_bus.listen() as spy:
+        for ping_msg in ("foo", "bar", "spam"):
+            await ping(alice2_backend_sock, ping_msg)
+
+        # No guarantees those events occur before the commands' return
+        await spy.wait_multiple_with_timeout(["pinged", "pinged", "pinged"])
+
+    rep = await events_listen_batch(alice_backend_sock, limit=2)
+    assert rep == {
+        "status": "ok",
+        "events": [{"event": "pinged", "ping": "foo"}, {"event": "pinged", "ping": "bar"}],
+    }
+    rep = await events_listen_batch(alice_backend_sock)
+    assert rep == {"status": "ok", "events": [{"event": "pinged", "ping": "spam"}]}
+
+    # Wait for at least one event
+    async with events_listen_batch.async_call(alice_backend_sock, wait=True) as box:
+        await ping(alice2_backend_sock, "ham")
+    assert box.rep == {"status": "ok", "events": [{"event": "pinged", "ping": "ham"}]}
+
+
 @pytest.mark.trio
 @pytest.mark.postgresql
 async def test_cross_backend_event(backend_factory, backend_sock_factory, alice, bob):
@@ -1,9 +1,12 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import pytest
+import trio
 from uuid import uuid4
 
-from parsec.api.protocol import packb, unpackb, OrganizationID
+from pendulum import now as pendulum_now
+
+from parsec.api.protocol import packb, unpackb, OrganizationID, InvalidMessageError
 from parsec.api.version import ApiVersion, API_VERSION
 from parsec.api.transport import Transport
 from parsec.api.protocol import (
@@ -13,6 +16,7 @@ from parsec.api.protocol import (
     HandshakeRVKMismatch,
     HandshakeBadIdentity,
     HandshakeOrganizationExpired,
+    HandshakeRevokedDevice,
 )
 
 
@@ -53,7 +57,7 @@ async def test_handshake_incompatible_version(backend, server_factory):
         assert unpackb(result_req) == {
             "handshake": "result",
             "result": "bad_protocol",
-            "help": "No overlap between client API versions {3.0} and backend API versions {2.0, 1.2}",
+            "help": "No overlap between client API versions {3.0} and backend API versions {2.2, 1.3}",
         }
 
 
@@ -261,3 +265,105 @@ async def test_authenticated_handshake_unknown_device(backend, server_factory, m
         result_req = await transport.recv()
         with pytest.raises(HandshakeBadIdentity):
             ch.process_result_req(result_req)
+
+
+async def _authenticated_handshake(server, device, session_ticket=None, signing_key=None):
+    ch = AuthenticatedClientHandshake(
+        organization_id=device.organization_id,
+        device_id=device.device_id,
+        user_signkey=signing_key or device.signing_key,
+        root_verify_key=device.root_verify_key,
+        session_ticket=session_ticket,
+    )
+    stream = server.connection_factory()
+    transport = await Transport.init_for_client(stream, server.addr.hostname)
+    challenge_req = await transport.recv()
+    await transport.send(ch.process_challenge_req(challenge_req))
+    result_req = await transport.recv()
+    ch.process_result_req(result_req)
+    return ch
+
+
+@pytest.mark.trio
+async def test_authenticated_handshake_session_resumption(backend, server_factory, alice, bob):
+    async with server_factory(backend.handle_client) as server:
+        ch = await _authenticated_handshake(server, alice)
+        ticket = ch.issued_session_ticket
+        assert ticket
+
+        ch = await _authenticated_handshake(server, alice, session_ticket=ticket)
+        # Ticket is still valid, no need for a new one
+        assert ch.issued_session_ticket is None
+
+        # Ticket is not a bearer token, the answer signature is still checked
+        with pytest.raises(InvalidMessageError) as exc:
+            await _authenticated_handshake(
+                server, alice, session_ticket=ticket, signing_key=bob.signing_key
+            )
+        assert "bad_protocol" in str(exc.value)
+
+        # Ticket cannot be used by another device, hence falling back to
+        # regular authentication (which provides a new ticket)
+        ch = await _authenticated_handshake(server, bob, session_ticket=ticket)
+        assert ch.issued_session_ticket
+
+        # Same thing for a tampered ticket
+        tampered_ticket = ticket[:-1] + bytes([ticket[-1] ^ 1])
+        ch = await _authenticated_handshake(server, alice, session_ticket=tampered_ticket)
+        assert ch.issued_session_ticket
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("validity", (0, 1))
+async def test_authenticated_handshake_session_ticket_not_usable(
+    backend_factory, server_factory, alice, validity
+):
+    async with backend_factory(config={"session_ticket_validity": validity}) as backend:
+        async with server_factory(backend.handle_client) as server:
+            ch = await _authenticated_handshake(server, alice)
+            ticket = ch.issued_session_ticket
+            if not validity:
+                # Session resumption is disabled
+                assert ticket is None
+                return
+
+            await trio.sleep(1)
+            # Expired ticket
+            ch = await _authenticated_handshake(server, alice, session_ticket=ticket)
+            assert ch.issued_session_ticket
+
+
+@pytest.mark.trio
+async def test_authenticated_handshake_session_resumption_revoked_device(
+    backend, server_factory, alice, bob
+):
+    async with server_factory(backend.handle_client) as server:
+        ch = await _authenticated_handshake(server, bob)
+        ticket = ch.issued_session_ticket
+
+        await backend.user.revoke_user(
+            bob.organization_id,
+            bob.user_id,
+            revoked_user_certificate=b"<dummy>",
+            revoked_user_certifier=alice.device_id,
+        )
+
+        with pytest.raises(HandshakeRevokedDevice):
+            await _authenticated_handshake(server, bob, session_ticket=ticket)
+
+
+@pytest.mark.trio
+async def test_authenticated_handshake_session_resumption_expired_organization(
+    backend, server_factory, alice
+):
+    async with server_factory(backend.handle_client) as server:
+        ch = await _authenticated_handshake(server, alice)
+        ticket = ch.issued_session_ticket
+
+        # Organization expires after the ticket has been issued
+        await backend.organization.set_expiration_date(
+            alice.organization_id, pendulum_now().subtract(seconds=1)
+        )
+
+        with pytest.raises(HandshakeOrganizationExpired):
+            await _authenticated_handshake(server, alice, session_ticket=ticket)
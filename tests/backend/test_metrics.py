@@ -0,0 +1,77 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+import trio
+from trio.testing import memory_stream_pair
+
+from parsec.backend.metrics import BackendMetrics, serve_metrics_http
+
+from tests.backend.common import ping
+
+
+def test_metrics_render():
+    metrics = BackendMetrics()
+    metrics.request_started("ping")
+    metrics.request_done("ping", "ok", 0.003)
+    metrics.request_started("ping")
+    metrics.request_done("ping", "bad_message", 42)
+    metrics.request_started("vlob_read")
+    metrics.observe_payloads("ping", 10, 20)
+    metrics.add_gauge("parsec_foo", "Foo.", lambda: {(("name", 'a"b'),): 1})
+
+    rendered = metrics.render().splitlines()
+    assert "# TYPE parsec_backend_request_duration_seconds histogram" in rendered
+    assert 'parsec_backend_request_duration_seconds_bucket{cmd="ping",le="0.0025"} 0' in rendered
+    assert 'parsec_backend_request_duration_seconds_bucket{cmd="ping",le="0.005"} 1' in rendered
+    assert 'parsec_backend_request_duration_seconds_bucket{cmd="ping",le="10"} 1' in rendered
+    assert 'parsec_backend_request_duration_seconds_bucket{cmd="ping",le="+Inf"} 2' in rendered
+    assert 'parsec_backend_request_duration_seconds_count{cmd="ping"} 2' in rendered
+    assert 'parsec_backend_requests_total{cmd="ping",status="ok"} 1' in rendered
+    assert 'parsec_backend_requests_total{cmd="ping",status="bad_message"} 1' in rendered
+    assert 'parsec_backend_requests_in_flight{cmd="ping"} 0' in rendered
+    assert 'parsec_backend_requests_in_flight{cmd="vlob_read"} 1' in rendered
+    assert 'parsec_backend_request_bytes_total{cmd="ping"} 10' in rendered
+    assert 'parsec_backend_response_bytes_total{cmd="ping"} 20' in rendered
+    assert 'parsec_foo{name="a\\"b"} 1' in rendered
+
+
+@pytest.mark.trio
+async def test_requests_metrics(backend, alice_backend_sock):
+    await ping(alice_backend_sock, "foo")
+
+    rendered = backend.metrics.render().splitlines()
+    assert 'parsec_backend_requests_total{cmd="ping",status="ok"} 1' in rendered
+    assert 'parsec_backend_requests_in_flight{cmd="ping"} 0' in rendered
+    assert "parsec_backend_connected_clients 1" in rendered
+    assert 'parsec_backend_events_queue_depth{stat="total"} 0' in rendered
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize(
+    "request_line, expected_status",
+    [
+        (b"GET /metrics HTTP/1.1", b"HTTP/1.1 200 OK"),
+        (b"GET /metrics?foo=bar HTTP/1.1", b"HTTP/1.1 200 OK"),
+        (b"GET / HTTP/1.1", b"HTTP/1.1 404 Not Found"),
+        (b"dummy", b"HTTP/1.1 400 Bad Request"),
+    ],
+)
+async def test_metrics_http(request_line, expected_status):
+    metrics = BackendMetrics()
+    metrics.request_started("ping")
+    client_stream, server_stream = memory_stream_pair()
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(serve_metrics_http, metrics, server_stream)
+        await client_stream.send_all(request_line + b"\r\nHost: localhost\r\n\r\n")
+        rep = b""
+        while True:
+            data = await client_stream.receive_some(4096)
+            if not data:
+                break
+            rep += data
+
+    headers, body = rep.split(b"\r\n\r\n", 1)
+    assert headers.split(b"\r\n")[0] == expected_status
+    if expected_status.endswith(b"200 OK"):
+        assert b'parsec_backend_requests_in_flight{cmd="ping"} 1' in body.splitlines()
@@ -0,0 +1,141 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+import trio
+from async_generator import asynccontextmanager
+
+from parsec.api.protocol import OrganizationID
+from parsec.backend.postgresql.handler import (
+    PGHandler,
+    send_signal,
+    batched_signals,
+    NOTIFICATION_CHANNEL,
+    BATCHED_NOTIFICATION_CHANNEL,
+)
+
+
+class NotifyConnection:
+    def __init__(self):
+        self.queries = 0
+        self.notifications = []
+        self.channels = set()
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, channel, payload):
+        self.queries += 1
+        self.channels.add(channel)
+        if query == "SELECT pg_notify($1, $2)":
+            self.notifications.append(payload)
+        else:
+            assert query == "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload"
+            self.notifications += payload
+
+
+@pytest.mark.trio
+async def test_batched_signals(event_bus):
+    org = OrganizationID("Org")
+    conn = NotifyConnection()
+    dbh = PGHandler("postgresql://", 1, 1, event_bus)
+
+    async def _dispatch_notifications():
+        with event_bus.listen() as spy:
+            for payload in conn.notifications:
+                dbh._on_notification(conn, 42, NOTIFICATION_CHANNEL, payload)
+        conn.queries = 0
+        conn.notifications.clear()
+        return [(event.event, event.kwargs) for event in spy.events]
+
+    # Signals sent outside of a batch are notified right away
+    await send_signal(conn, "pinged", organization_id=org, author=None, ping="foo")
+    assert len(conn.notifications) == 1
+    assert await _dispatch_notifications() == [
+        ("pinged", {"organization_id": org, "author": None, "ping": "foo"})
+    ]
+
+    # Batched signals are notified in a single query once the batch is over
+    async with batched_signals(conn):
+        for i in range(3):
+            await send_signal(conn, "pinged", organization_id=org, author=None, ping=str(i))
+        # Nested batch is merged with the current one
+        async with batched_signals(conn):
+            await send_signal(conn, "pinged", organization_id=org, author=None, ping="3")
+        assert not conn.notifications
+    assert conn.queries == 1
+    # Each signal still has its own notification (readable by older backends)
+    assert len(conn.notifications) == 4
+    assert await _dispatch_notifications() == [
+        ("pinged", {"organization_id": org, "author": None, "ping": str(i)}) for i in range(4)
+    ]
+
+    # Signals are discarded if the batch fails
+    with pytest.raises(RuntimeError):
+        async with batched_signals(conn):
+            await send_signal(conn, "pinged", organization_id=org, author=None, ping="foo")
+            raise RuntimeError()
+    assert not conn.queries
+
+
+class NotifyPool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("batched_notifications", (False, True))
+async def test_deferred_signals(event_bus, autojump_clock, batched_notifications):
+    org = OrganizationID("Org")
+    conn = NotifyConnection()
+    dbh = PGHandler("postgresql://", 1, 1, event_bus, batched_notifications=batched_notifications)
+    dbh.pool = NotifyPool(conn)
+
+    async def _transaction(pings):
+        async with dbh.deferred_signals_transaction(conn):
+            async with batched_signals(conn):
+                for ping in pings:
+                    await send_signal(conn, "pinged", organization_id=org, author=None, ping=ping)
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(dbh._flush_notifications)
+
+        # Concurrent transactions
+        async with trio.open_nursery() as transactions_nursery:
+            transactions_nursery.start_soon(_transaction, ["0", "1"])
+            transactions_nursery.start_soon(_transaction, ["2"])
+        await trio.sleep(1)
+
+        with event_bus.listen() as spy:
+            if batched_notifications:
+                # All the signals are notified in a single batched notification
+                assert conn.queries == 1
+                assert conn.channels == {BATCHED_NOTIFICATION_CHANNEL}
+                assert len(conn.notifications) == 1
+                dbh._on_batched_notification(
+                    conn, 42, BATCHED_NOTIFICATION_CHANNEL, conn.notifications[0]
+                )
+            else:
+                # One query per transaction, one notification per signal
+                assert conn.queries == 2
+                assert conn.channels == {NOTIFICATION_CHANNEL}
+                assert len(conn.notifications) == 3
+                for payload in conn.notifications:
+                    dbh._on_notification(conn, 42, NOTIFICATION_CHANNEL, payload)
+        assert sorted(event.kwargs["ping"] for event in spy.events) == ["0", "1", "2"]
+
+        # Signals are discarded if the transaction fails
+        conn.queries = 0
+        with pytest.raises(RuntimeError):
+            async with dbh.deferred_signals_transaction(conn):
+                async with batched_signals(conn):
+                    await send_signal(conn, "pinged", organization_id=org, author=None, ping="foo")
+                    raise RuntimeError()
+        await trio.sleep(1)
+        assert not conn.queries
+
+        nursery.cancel_scope.cancel()
@@ -0,0 +1,131 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+import trio
+
+from parsec.api.protocol import OrganizationID
+from parsec.backend.postgresql.query_cache import QueryCache
+
+
+@pytest.mark.trio
+async def test_query_cache():
+    org1 = OrganizationID("Org1")
+    org2 = OrganizationID("Org2")
+    cache = QueryCache(max_size=10)
+    fetches = []
+
+    async def _get(org, key, value):
+        async def _fetch():
+            fetches.append((org, key))
+            return value
+
+        return await cache.get_or_fetch(org, key, _fetch, size_of=len)
+
+    assert await _get(org1, "a", b"aaa") == b"aaa"
+    assert await _get(org1, "a", b"<ignored>") == b"aaa"
+    assert await _get(org2, "a", b"AAA") == b"AAA"
+    assert fetches == [(org1, "a"), (org2, "a")]
+    assert cache.stats() == {
+        "entries": 2,
+        "size": 6,
+        "max_size": 10,
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 1 / 3,
+    }
+
+    # Invalidation is per organization
+    cache.invalidate(org1, lambda key: key == "a")
+    fetches.clear()
+    assert await _get(org1, "a", b"aaaa") == b"aaaa"
+    assert await _get(org2, "a", b"<ignored>") == b"AAA"
+    assert fetches == [(org1, "a")]
+
+    # Least recently used entries are evicted when the cache is full
+    assert await _get(org1, "b", b"bbbb") == b"bbbb"
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["size"] == 7
+    fetches.clear()
+    assert await _get(org2, "a", b"<ignored>") == b"AAA"
+    assert await _get(org1, "b", b"<ignored>") == b"bbbb"
+    assert await _get(org1, "a", b"aaaa") == b"aaaa"
+    assert fetches == [(org1, "a")]
+
+    # Too big value is never stored
+    assert await _get(org1, "c", b"c" * 11) == b"c" * 11
+    assert cache.stats()["size"] == 8
+
+
+@pytest.mark.trio
+async def test_query_cache_invalidation_during_fetch():
+    org = OrganizationID("Org")
+    cache = QueryCache(max_size=1024)
+    fetch_started = trio.Event()
+    invalidated = trio.Event()
+
+    async def _outdated_fetch():
+        fetch_started.set()
+        await invalidated.wait()
+        return b"outdated"
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(cache.get_or_fetch, org, "a", _outdated_fetch, len)
+        await fetch_started.wait()
+        cache.invalidate(org)
+        invalidated.set()
+
+    # Result fetched before the invalidation has been discarded
+    assert cache.stats()["entries"] == 0
+
+    async def _fetch():
+        return b"up to date"
+
+    assert await cache.get_or_fetch(org, "a", _fetch, len) == b"up to date"
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.trio
+async def test_query_cache_ttl(autojump_clock):
+    org = OrganizationID("Org")
+    cache = QueryCache(max_size=2, ttl=10)
+    fetches = []
+
+    async def _get(key, value, **kwargs):
+        async def _fetch():
+            fetches.append(key)
+            return value
+
+        return await cache.get_or_fetch(org, key, _fetch, **kwargs)
+
+    assert await _get(("user", "a"), "a") == "a"
+    assert cache.stats()["size"] == 1
+
+    # Entries expire after the TTL
+    await trio.sleep(5)
+    assert await _get(("user", "a"), "<ignored>") == "a"
+    await trio.sleep(6)
+    assert await _get(("user", "a"), "aa") == "aa"
+    assert fetches == [("user", "a"), ("user", "a")]
+
+    # Values rejected by `cacheable` are not stored
+    fetches.clear()
+    assert await _get(("organization",), None, cacheable=bool) is None
+    assert await _get(("organization",), "org", cacheable=bool) == "org"
+    assert await _get(("organization",), "<ignored>", cacheable=bool) == "org"
+    assert fetches == [("organization",), ("organization",)]
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("kwargs", [{"max_size": 0}, {"max_size": 10, "ttl": 0}])
+async def test_query_cache_disabled(kwargs):
+    cache = QueryCache(**kwargs)
+    fetches = []
+
+    async def _fetch():
+        fetches.append(1)
+        return "a"
+
+    assert await cache.get_or_fetch(OrganizationID("Org"), ("user", "a"), _fetch) == "a"
+    assert await cache.get_or_fetch(OrganizationID("Org"), ("user", "a"), _fetch) == "a"
+    assert len(fetches) == 2
+    assert cache.stats()["entries"] == 0
@@ -1,12 +1,16 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import time
+import threading
 from unittest.mock import Mock
 from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from botocore.exceptions import (
     ClientError as S3ClientError,
     EndpointConnectionError as S3EndpointConnectionError,
 )
+import trio
 import pytest
 
 from parsec.backend.s3_blockstore import S3BlockStoreComponent
@@ -26,7 +30,7 @@ async def test_s3_read():
         assert await blockstore.read("org42", 123) == "content"
         # Not found
         client_mock().get_object.side_effect = S3ClientError(
-            error_response={"Error": {"Code": "404"}}, operation_name="GET"
+            error_response={"Error": {"Code": "NoSuchKey"}}, operation_name="GET"
         )
         with pytest.raises(BlockNotFoundError):
             assert await blockstore.read("org42", 123)
@@ -46,43 +50,169 @@ async def test_s3_read():
 async def test_s3_create():
     with mock.patch("boto3.client") as client_mock:
         client_mock.return_value = Mock()
-        client_mock().head_container.return_value = True
+        client_mock().head_bucket.return_value = True
         blockstore = S3BlockStoreComponent("europe", "parsec", "john", "secret")
         # Ok
         client_mock().head_object.side_effect = S3ClientError(
             error_response={"Error": {"Code": "404"}}, operation_name="HEAD"
         )
         await blockstore.create("org42", 123, "content")
-        client_mock().put_object.assert_called_with(
+        client_mock().head_object.assert_called_once_with(Bucket="parsec", Key="org42/123")
+        client_mock().put_object.assert_called_once_with(
             Bucket="parsec", Key="org42/123", Body="content"
         )
         client_mock().put_object.reset_mock()
-        # Already exist
-        client_mock().head_object.side_effect = None
-        with pytest.raises(BlockAlreadyExistsError):
+        # Connection error
+        client_mock().put_object.side_effect = S3EndpointConnectionError(endpoint_url="url")
+        with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
-        client_mock().put_object.assert_not_called()
-        # Connection error at HEAD
         client_mock().head_object.side_effect = S3EndpointConnectionError(endpoint_url="url")
         with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
-        client_mock().put_object.assert_not_called()
-        # Unknown exception at HEAD
+        # Unknown exception
         client_mock().head_object.side_effect = S3ClientError(
             error_response={"Error": {"Code": "401"}}, operation_name="HEAD"
         )
         with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
-        # Connection error at PUT
-        client_mock().head_object.side_effect = S3ClientError(
-            error_response={"Error": {"Code": "404"}}, operation_name="HEAD"
+        # Already exist
+        client_mock().head_object.side_effect = None
+        client_mock().head_object.return_value = {"ContentLength": 7}
+        with pytest.raises(BlockAlreadyExistsError):
+            await blockstore.create("org42", 123, "content")
+        client_mock().put_object.assert_called_once()
+
+
+@pytest.mark.trio
+async def test_s3_create_conditional_put():
+    with mock.patch("boto3.client") as client_mock:
+        client_mock.return_value = Mock()
+        client_mock().head_bucket.return_value = True
+        blockstore = S3BlockStoreComponent(
+            "europe", "parsec", "john", "secret", conditional_put=True
+        )
+        # Ok
+        await blockstore.create("org42", 123, "content")
+        client_mock().put_object.assert_called_once_with(
+            Bucket="parsec", Key="org42/123", Body="content"
+        )
+        client_mock().head_object.assert_not_called()
+        # Already exist
+        client_mock().put_object.side_effect = S3ClientError(
+            error_response={"Error": {"Code": "PreconditionFailed"}}, operation_name="PUT"
         )
+        with pytest.raises(BlockAlreadyExistsError):
+            await blockstore.create("org42", 123, "content")
+        # Connection error
         client_mock().put_object.side_effect = S3EndpointConnectionError(endpoint_url="url")
         with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
-        # Unknown exception at PUT
+        # Unknown exception
         client_mock().put_object.side_effect = S3ClientError(
             error_response={"Error": {"Code": "401"}}, operation_name="PUT"
         )
         with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
+
+
+def test_s3_retries_config():
+    with mock.patch("boto3.client") as client_mock:
+        S3BlockStoreComponent("europe", "parsec", "john", "secret")
+        assert client_mock.call_args[1]["config"].retries == {"max_attempts": 1}
+        S3BlockStoreComponent("europe", "parsec", "john", "secret", retries=3)
+        assert client_mock.call_args[1]["config"].retries == {"max_attempts": 3}
+
+
+class LocalS3Handler(BaseHTTPRequestHandler):
+    # Keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.server.connections.add(self.client_address)
+        # Bucket always exists
+        if self.path.count("/") == 1 or self.path in self.server.objects:
+            self._reply(200)
+        else:
+            self._reply(404)
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        time.sleep(self.server.delay)
+        try:
+            self._reply(200, self.server.objects[self.path])
+        except KeyError:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+
+    def do_PUT(self):
+        self.server.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("If-None-Match") == "*" and self.path in self.server.objects:
+            self._reply(412, b"<Error><Code>PreconditionFailed</Code></Error>")
+        else:
+            self.server.objects[self.path] = body
+            self._reply(200)
+
+
+@pytest.fixture
+def local_s3():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalS3Handler)
+    server.daemon_threads = True
+    server.objects = {}
+    server.connections = set()
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("conditional_put", (False, True))
+async def test_s3_local_stand_in(local_s3, conditional_put):
+    host, port = local_s3.server_address
+    blockstore = S3BlockStoreComponent(
+        "europe",
+        "parsec",
+        "john",
+        "secret",
+        f"http://{host}:{port}",
+        max_connections=2,
+        connect_timeout=1,
+        read_timeout=0.5,
+        conditional_put=conditional_put,
+    )
+
+    async def _create(i):
+        await blockstore.create("org42", i, b"content %d" % i)
+
+    async with trio.open_service_nursery() as nursery:
+        for i in range(10):
+            nursery.start_soon(_create, i)
+
+    # Existing block is not overwritten
+    with pytest.raises(BlockAlreadyExistsError):
+        await blockstore.create("org42", 3, b"overwritten")
+    assert local_s3.objects["/parsec/org42/3"] == b"content 3"
+
+    assert await blockstore.read("org42", 3) == b"content 3"
+    with pytest.raises(BlockNotFoundError):
+        await blockstore.read("org42", 42)
+
+    # Connections are reused between requests
+    # (one for the initial head_bucket, then up to max_connections)
+    assert len(local_s3.connections) <= 3
+
+    # Read timeout
+    local_s3.delay = 1
+    with pytest.raises(BlockTimeoutError):
+        await blockstore.read("org42", 3)
@@ -0,0 +1,133 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import pytest
+import trio
+from trio.testing import wait_all_tasks_blocked
+
+from parsec.backend.scheduler import RequestScheduler, RequestPriority, get_request_priority
+
+from tests.backend.common import ping
+
+
+METADATA = RequestPriority.METADATA
+BULK = RequestPriority.BULK
+
+
+def test_get_request_priority():
+    assert get_request_priority("vlob_read") == METADATA
+    assert get_request_priority("block_read") == BULK
+    assert get_request_priority("events_listen") is None
+    assert get_request_priority("invite_1_claimer_wait_peer") is None
+
+
+class SchedulerTester:
+    def __init__(self, scheduler, nursery):
+        self.scheduler = scheduler
+        self.nursery = nursery
+        self.admitted = []
+        self._releases = {}
+
+    async def submit(self, name, priority, organization_id, device_id):
+        release = self._releases[name] = trio.Event()
+
+        async def _request():
+            async with self.scheduler.admit(priority, organization_id, device_id):
+                self.admitted.append(name)
+                await release.wait()
+
+        self.nursery.start_soon(_request)
+        await wait_all_tasks_blocked()
+
+    async def release(self, name):
+        self._releases.pop(name).set()
+        await wait_all_tasks_blocked()
+
+
+@pytest.mark.trio
+async def test_scheduler_fairness():
+    scheduler = RequestScheduler(max_concurrency=1, max_bulk_concurrency=1)
+    async with trio.open_service_nursery() as nursery:
+        tester = SchedulerTester(scheduler, nursery)
+
+        await tester.submit("busy", METADATA, "org1", "a@1")
+        # A device flooding the backend...
+        for i in range(3):
+            await tester.submit(f"org1-a{i}", METADATA, "org1", "a@1")
+        # ...doesn't delay the other devices and organizations more than one turn
+        await tester.submit("org1-b0", METADATA, "org1", "b@1")
+        await tester.submit("org2-c0", METADATA, "org2", "c@1")
+        assert tester.admitted == ["busy"]
+        assert scheduler.stats()[METADATA] == {"running": 1, "waiting": 5}
+
+        for name in ["busy", "org1-a0", "org2-c0", "org1-b0", "org1-a1", "org1-a2"]:
+            await tester.release(name)
+        assert tester.admitted == ["busy", "org1-a0", "org2-c0", "org1-b0", "org1-a1", "org1-a2"]
+        assert scheduler.stats()[METADATA] == {"running": 0, "waiting": 0}
+
+
+@pytest.mark.trio
+async def test_scheduler_priorities():
+    scheduler = RequestScheduler(max_concurrency=2, max_bulk_concurrency=1, metadata_weight=2)
+    async with trio.open_service_nursery() as nursery:
+        tester = SchedulerTester(scheduler, nursery)
+
+        await tester.submit("bulk0", BULK, "org", "a@1")
+        # Bulk requests are limited even if there is capacity left...
+        await tester.submit("bulk1", BULK, "org", "a@1")
+        await tester.submit("bulk2", BULK, "org", "a@1")
+        assert tester.admitted == ["bulk0"]
+        # ...for the metadata requests
+        await tester.submit("meta0", METADATA, "org", "a@1")
+        assert tester.admitted == ["bulk0", "meta0"]
+
+        for i in range(1, 5):
+            await tester.submit(f"meta{i}", METADATA, "org", "a@1")
+
+        # Metadata requests get `metadata_weight` turns for each bulk one
+        for name in ["meta0", "meta1", "bulk0", "meta2", "bulk1"]:
+            await tester.release(name)
+        assert tester.admitted == ["bulk0", "meta0", "meta1", "meta2", "bulk1", "meta3", "meta4"]
+
+        for name in ["meta3", "meta4", "bulk2"]:
+            await tester.release(name)
+        assert tester.admitted[-1] == "bulk2"
+        assert scheduler.stats() == {
+            METADATA: {"running": 0, "waiting": 0},
+            BULK: {"running": 0, "waiting": 0},
+        }
+
+
+@pytest.mark.trio
+async def test_scheduler_cancelled_while_waiting():
+    scheduler = RequestScheduler(max_concurrency=1, max_bulk_concurrency=1)
+    async with trio.open_service_nursery() as nursery:
+        tester = SchedulerTester(scheduler, nursery)
+        await tester.submit("busy", METADATA, "org", "a@1")
+
+        cancel_scope = await nursery.start(_admit_and_record, scheduler, tester.admitted)
+        await wait_all_tasks_blocked()
+        assert scheduler.stats()[METADATA] == {"running": 1, "waiting": 1}
+        cancel_scope.cancel()
+        await wait_all_tasks_blocked()
+        assert scheduler.stats()[METADATA] == {"running": 1, "waiting": 0}
+
+        await tester.release("busy")
+        await tester.submit("next", METADATA, "org", "a@1")
+        assert tester.admitted == ["busy", "next"]
+        await tester.release("next")
+
+
+async def _admit_and_record(scheduler, admitted, task_status=trio.TASK_STATUS_IGNORED):
+    with trio.CancelScope() as cancel_scope:
+        task_status.started(cancel_scope)
+        async with scheduler.admit(METADATA, "org", "b@1"):
+            admitted.append("cancelled")
+
+
+@pytest.mark.trio
+async def test_scheduled_requests_metrics(backend, alice_backend_sock):
+    await ping(alice_backend_sock, "foo")
+
+    rendered = backend.metrics.render().splitlines()
+    assert 'parsec_backend_scheduled_requests{priority="metadata",state="running"} 0' in rendered
+    assert 'parsec_backend_scheduled_requests{priority="bulk",state="waiting"} 0' in rendered
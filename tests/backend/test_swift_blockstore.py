@@ -1,9 +1,14 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import time
+import threading
 from unittest.mock import Mock
 from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import swiftclient
 from swiftclient.exceptions import ClientException
+from requests.exceptions import ConnectionError
+import trio
 import pytest
 
 from parsec.backend.block import BlockAlreadyExistsError, BlockNotFoundError, BlockTimeoutError
@@ -30,6 +35,10 @@ async def test_swift_get():
         connection_mock().get_object.side_effect = ClientException(http_status=500, msg="")
         with pytest.raises(BlockTimeoutError):
             assert await blockstore.read("org42", 123)
+        # Connection error
+        connection_mock().get_object.side_effect = ConnectionError()
+        with pytest.raises(BlockTimeoutError):
+            assert await blockstore.read("org42", 123)
 
 
 @pytest.mark.trio
@@ -39,15 +48,190 @@ async def test_swift_post():
         connection_mock().head_container.return_value = True
         blockstore = SwiftBlockStoreComponent("http://url", "scille", "parsec", "john", "secret")
         # Ok
-        connection_mock().get_object.side_effect = ClientException(http_status=404, msg="")
+        connection_mock().head_object.side_effect = ClientException(http_status=404, msg="")
         await blockstore.create("org42", 123, "content")
-        connection_mock().put_object.assert_called_with("parsec", "org42/123", "content")
+        connection_mock().head_object.assert_called_once_with("parsec", "org42/123")
+        connection_mock().put_object.assert_called_once_with("parsec", "org42/123", "content")
         # Already exists
-        connection_mock().get_object.side_effect = None
-        connection_mock().get_object.return_value = True, "content"
+        connection_mock().put_object.reset_mock()
+        connection_mock().head_object.side_effect = None
         with pytest.raises(BlockAlreadyExistsError):
             await blockstore.create("org42", 123, "content")
+        connection_mock().put_object.assert_not_called()
         # Other exception
-        connection_mock().get_object.side_effect = ClientException(http_status=500, msg="")
+        connection_mock().head_object.side_effect = ClientException(http_status=500, msg="")
+        with pytest.raises(BlockTimeoutError):
+            await blockstore.create("org42", 123, "content")
+        connection_mock().head_object.side_effect = ClientException(http_status=404, msg="")
+        connection_mock().put_object.side_effect = ClientException(http_status=500, msg="")
+        with pytest.raises(BlockTimeoutError):
+            await blockstore.create("org42", 123, "content")
+        # Connection error
+        connection_mock().put_object.side_effect = ConnectionError()
+        with pytest.raises(BlockTimeoutError):
+            await blockstore.create("org42", 123, "content")
+
+
+@pytest.mark.trio
+async def test_swift_post_conditional_put():
+    with mock.patch("swiftclient.Connection") as connection_mock:
+        connection_mock.return_value = Mock()
+        connection_mock().head_container.return_value = True
+        blockstore = SwiftBlockStoreComponent(
+            "http://url", "scille", "parsec", "john", "secret", conditional_put=True
+        )
+        # Ok
+        await blockstore.create("org42", 123, "content")
+        connection_mock().put_object.assert_called_once_with(
+            "parsec", "org42/123", "content", headers={"If-None-Match": "*"}
+        )
+        connection_mock().head_object.assert_not_called()
+        # Already exists
+        connection_mock().put_object.side_effect = ClientException(http_status=412, msg="")
+        with pytest.raises(BlockAlreadyExistsError):
+            await blockstore.create("org42", 123, "content")
+        # Other exception
+        connection_mock().put_object.side_effect = ClientException(http_status=500, msg="")
         with pytest.raises(BlockTimeoutError):
             await blockstore.create("org42", 123, "content")
+        # Connection error
+        connection_mock().put_object.side_effect = ConnectionError()
+        with pytest.raises(BlockTimeoutError):
+            await blockstore.create("org42", 123, "content")
+
+
+class LocalSwiftHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers={}):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check_token(self):
+        self.server.connections.add(self.client_address)
+        if self.headers.get("X-Auth-Token") != "token":
+            self._reply(401)
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/auth/v1.0":
+            self.server.auths += 1
+            host, port = self.server.server_address
+            self._reply(
+                200,
+                headers={
+                    "X-Storage-Url": f"http://{host}:{port}/v1/AUTH_john",
+                    "X-Auth-Token": "token",
+                },
+            )
+            return
+        if not self._check_token():
+            return
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        try:
+            self._reply(200, self.server.objects[self.path])
+        except KeyError:
+            self._reply(404)
+
+    def do_HEAD(self):
+        if not self._check_token():
+            return
+        if self.path == "/v1/AUTH_john/parsec":
+            self._reply(204)
+        elif self.path in self.server.objects:
+            self._reply(200)
+        else:
+            self._reply(404)
+
+    def do_PUT(self):
+        if not self._check_token():
+            return
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("If-None-Match") == "*" and self.path in self.server.objects:
+            self._reply(412)
+        else:
+            self.server.objects[self.path] = body
+            self._reply(201)
+
+
+@pytest.fixture
+def local_swift():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalSwiftHandler)
+    server.daemon_threads = True
+    server.objects = {}
+    server.connections = set()
+    server.auths = 0
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("conditional_put", (False, True))
+async def test_swift_local_mock_server(local_swift, conditional_put):
+    host, port = local_swift.server_address
+    blockstore = SwiftBlockStoreComponent(
+        f"http://{host}:{port}/auth/v1.0",
+        "scille",
+        "parsec",
+        "john",
+        "secret",
+        max_connections=4,
+        timeout=0.5,
+        retries=1,
+        conditional_put=conditional_put,
+    )
+
+    async with trio.open_service_nursery() as nursery:
+        for i in range(10):
+            nursery.start_soon(blockstore.create, "org42", i, b"content %d" % i)
+
+    # Existing block is not overwritten
+    with pytest.raises(BlockAlreadyExistsError):
+        await blockstore.create("org42", 3, b"overwritten")
+    assert local_swift.objects["/v1/AUTH_john/parsec/org42/3"] == b"content 3"
+
+    with pytest.raises(BlockNotFoundError):
+        await blockstore.read("org42", 42)
+
+    # Concurrent reads are spread over the pooled connections
+    local_swift.delay = 0.2
+    results = {}
+
+    async def _read(i):
+        results[i] = await blockstore.read("org42", i)
+
+    async with trio.open_service_nursery() as nursery:
+        for i in range(8):
+            nursery.start_soon(_read, i)
+    assert results == {i: b"content %d" % i for i in range(8)}
+    assert local_swift.max_in_flight == 4
+
+    # Connections are reused and the token is shared between them
+    assert len(local_swift.connections) <= 5
+    assert local_swift.auths == 1
+
+    # Read timeout (after retries)
+    local_swift.delay = 1
+    with pytest.raises(BlockTimeoutError):
+        await blockstore.read("org42", 3)
@@ -4,10 +4,10 @@ import pytest
 from pendulum import Pendulum
 
 from parsec.api.data import UserProfile
-from parsec.api.protocol import packb, user_get_serializer
+from parsec.api.protocol import packb, user_get_serializer, user_get_batch_serializer
 
 from tests.common import freeze_time, customize_fixture
-from tests.backend.common import user_get
+from tests.backend.common import user_get, user_get_batch
 
 
 @pytest.fixture
@@ -171,3 +171,82 @@ async def test_api_user_get_other_organization(
     async with sock_from_other_organization_factory(backend) as sock:
         rep = await user_get(sock, alice.user_id)
         assert rep == {"status": "not_found"}
+
+
+@pytest.mark.trio
+async def test_api_user_get_batch_deduplicated_trustchain(
+    access_testbed, organization_factory, local_device_factory
+):
+    binder, org, godfrey1, sock = access_testbed
+    certificates_store = binder.certificates_store
+
+    roger1 = local_device_factory("roger@dev1", org)
+    mike1 = local_device_factory("mike@dev1", org)
+    ph1 = local_device_factory("philippe@dev1", org)
+
+    # <root> --> godfrey@dev1 --> roger@dev1 --> mike@dev1
+    #                         --> philippe@dev1
+    with freeze_time("2000-01-01"):
+        await binder.bind_device(roger1, certifier=godfrey1)
+        await binder.bind_device(mike1, certifier=roger1)
+        await binder.bind_device(ph1, certifier=godfrey1)
+
+    rep = await user_get_batch(
+        sock, [mike1.user_id, ph1.user_id, roger1.user_id, mike1.user_id, "dummy"]
+    )
+    cooked_rep = {
+        **rep,
+        "users": [
+            {
+                **item,
+                "user_certificate": certificates_store.translate_certif(item["user_certificate"]),
+                "device_certificates": certificates_store.translate_certifs(
+                    item["device_certificates"]
+                ),
+            }
+            for item in rep["users"]
+        ],
+        "trustchain": {
+            **rep["trustchain"],
+            "devices": certificates_store.translate_certifs(rep["trustchain"]["devices"]),
+            "users": certificates_store.translate_certifs(rep["trustchain"]["users"]),
+        },
+    }
+    assert cooked_rep == {
+        "status": "ok",
+        "users": [
+            {
+                "user_certificate": "<mike user certif>",
+                "revoked_user_certificate": None,
+                "device_certificates": ["<mike@dev1 device certif>"],
+            },
+            {
+                "user_certificate": "<philippe user certif>",
+                "revoked_user_certificate": None,
+                "device_certificates": ["<philippe@dev1 device certif>"],
+            },
+            {
+                "user_certificate": "<roger user certif>",
+                "revoked_user_certificate": None,
+                "device_certificates": ["<roger@dev1 device certif>"],
+            },
+        ],
+        "not_found": ["dummy"],
+        # Roger is part of mike's trustchain but has already been provided
+        "trustchain": {
+            "devices": ["<Godfrey@dev1 device certif>"],
+            "users": ["<Godfrey user certif>"],
+            "revoked_users": [],
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "bad_msg", [{"user_ids": []}, {"user_ids": [42]}, {"user_ids": ["a"] * 101}, {}]
+)
+@pytest.mark.trio
+async def test_api_user_get_batch_bad_msg(alice_backend_sock, bad_msg):
+    await alice_backend_sock.send(packb({"cmd": "user_get_batch", **bad_msg}))
+    raw_rep = await alice_backend_sock.recv()
+    rep = user_get_batch_serializer.rep_loads(raw_rep)
+    assert rep["status"] == "bad_message"
@@ -59,6 +59,27 @@ async def test_user_revoke_ok(backend, backend_sock_factory, adam_backend_sock,
             pass
 
 
+@pytest.mark.trio
+@pytest.mark.postgresql
+async def test_user_revoke_with_lookups_cached(
+    backend, backend_sock_factory, adam_backend_sock, alice, adam
+):
+    # Organization, user and device lookups are cached by the handshake
+    async with backend_sock_factory(backend, alice):
+        pass
+
+    alice_revocation = RevokedUserCertificateContent(
+        author=adam.device_id, timestamp=pendulum_now(), user_id=alice.user_id
+    ).dump_and_sign(adam.signing_key)
+    rep = await user_revoke(adam_backend_sock, revoked_user_certificate=alice_revocation)
+    assert rep == {"status": "ok"}
+
+    # Cached lookups don't allow Alice to connect anymore
+    with pytest.raises(HandshakeRevokedDevice):
+        async with backend_sock_factory(backend, alice):
+            pass
+
+
 @pytest.mark.trio
 async def test_user_revoke_not_admin(backend, backend_sock_factory, bob_backend_sock, alice, bob):
     now = pendulum_now()
@@ -83,9 +83,9 @@ class FreezeTestOnTransportError(Transport):
     def stream(self):
         return self.transport.stream
 
-    async def send(self, msg):
+    async def send(self, msg, compress=True):
         try:
-            return await self.transport.send(msg)
+            return await self.transport.send(msg, compress=compress)
 
         except TransportError:
             # Wait here until this coroutine is cancelled
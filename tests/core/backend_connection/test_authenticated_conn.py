@@ -3,6 +3,8 @@
 import pytest
 import trio
 
+from parsec.api.transport import TransportError
+
 from parsec.api.protocol import RealmRole
 from parsec.core.backend_connection import (
     BackendAuthenticatedConn,
@@ -10,6 +12,9 @@ from parsec.core.backend_connection import (
     BackendNotAvailable,
     BackendConnectionRefused,
 )
+from parsec.core.backend_connection import cmds
+from parsec.core.backend_connection.authenticated import _handle_events_batch
+from parsec.core.backend_connection.transport import connect_as_authenticated, MultiplexedTransport
 
 
 @pytest.fixture
@@ -199,6 +204,83 @@ async def test_concurrency_sends(running_backend, alice, event_bus):
             await work_all_done.wait()
 
 
+@pytest.mark.trio
+async def test_transport_prewarmed_once_online(running_backend, alice_backend_conn):
+    # No request has been sent yet, but a transport is ready for them
+    with trio.fail_after(1):
+        while not alice_backend_conn._transport_pool._multiplexed_transport:
+            await trio.sleep(0.01)
+
+    multiplexed_transport = alice_backend_conn._transport_pool._multiplexed_transport
+    rep = await alice_backend_conn.cmds.ping("foo")
+    assert rep == {"status": "ok", "pong": "foo"}
+    assert alice_backend_conn._transport_pool._multiplexed_transport is multiplexed_transport
+
+
+@pytest.mark.trio
+async def test_concurrency_sends_multiplexed(running_backend, alice, event_bus):
+    CONCURRENCY = 10
+
+    async def sender(cmds, x):
+        rep = await cmds.ping(x)
+        assert rep == {"status": "ok", "pong": str(x)}
+
+    conn = BackendAuthenticatedConn(
+        alice.organization_addr, alice.device_id, alice.signing_key, event_bus, max_pool=2
+    )
+    async with conn.run():
+        await conn.cmds.ping("warmup")
+        multiplexed_transport = conn._transport_pool._multiplexed_transport
+        assert multiplexed_transport is not None
+
+        with trio.fail_after(1):
+            async with trio.open_service_nursery() as nursery:
+                for x in range(CONCURRENCY):
+                    nursery.start_soon(sender, conn.cmds, str(x))
+
+        # All the requests have been sent through the same transport
+        assert conn._transport_pool._multiplexed_transport is multiplexed_transport
+        assert not conn._transport_pool._transports
+
+
+@pytest.mark.trio
+async def test_multiplexed_request_cancellation(running_backend, alice, bob):
+    transport = MultiplexedTransport(
+        await connect_as_authenticated(
+            alice.organization_addr, device_id=alice.device_id, signing_key=alice.signing_key
+        )
+    )
+    try:
+        assert await transport.request({"cmd": "events_subscribe"}) == {"status": "ok"}
+
+        # Cancelled long poll doesn't break the transport used by other requests
+        async with trio.open_service_nursery() as nursery:
+            with trio.move_on_after(0.1):
+                nursery.start_soon(transport.request, {"cmd": "ping", "ping": "foo"})
+                await transport.request({"cmd": "events_listen", "wait": True})
+        assert not transport.broken
+        assert transport.idle
+
+        # Response to the cancelled request is dropped once it arrives
+        await running_backend.backend.ping.ping(alice.organization_id, bob.device_id, "bar")
+        await trio.sleep(0.1)
+        rep = await transport.request({"cmd": "ping", "ping": "foo"})
+        assert rep == {"status": "ok", "pong": "foo"}
+        assert not transport._replies
+
+        assert await transport.check_alive(timeout=1)
+
+    finally:
+        await transport.aclose()
+
+    # Closed transport is broken
+    with trio.fail_after(1):
+        while not transport.broken:
+            await trio.sleep(0)
+    with pytest.raises(TransportError):
+        await transport.request({"cmd": "ping", "ping": "foo"})
+
+
 @pytest.mark.trio
 async def test_realm_notif_on_new_entry_sync(running_backend, alice_backend_conn, alice2_user_fs):
     wid = await alice2_user_fs.workspace_create("foo")
@@ -225,6 +307,44 @@ async def test_realm_notif_on_new_entry_sync(running_backend, alice_backend_conn
         )
 
 
+@pytest.mark.trio
+async def test_realm_notif_coalesced(running_backend, alice, alice2_user_fs, event_bus):
+    wid = await alice2_user_fs.workspace_create("foo")
+    workspace = alice2_user_fs.get_workspace(wid)
+    await alice2_user_fs.sync()
+    await workspace.touch("/foo")
+    entry_id = await workspace.path_id("/foo")
+
+    transport = MultiplexedTransport(
+        await connect_as_authenticated(
+            alice.organization_addr, device_id=alice.device_id, signing_key=alice.signing_key
+        )
+    )
+    try:
+        rep = await cmds.events_subscribe(transport, coalesce_vlobs_updated=True)
+        assert rep == {"status": "ok"}
+        # Updates done while not listening are gathered into a single event
+        await workspace.sync()
+        rep = await cmds.events_listen_batch(transport, wait=False)
+        assert len(rep["events"]) == 1
+
+        with event_bus.listen() as spy:
+            _handle_events_batch(event_bus, rep)
+        assert [(event.event, event.kwargs) for event in spy.events] == [
+            (
+                "backend.realm.vlobs_updated",
+                {"realm_id": wid, "checkpoint": 3, "src_id": entry_id, "src_version": 1},
+            ),
+            (
+                "backend.realm.vlobs_updated",
+                {"realm_id": wid, "checkpoint": 3, "src_id": wid, "src_version": 2},
+            ),
+        ]
+
+    finally:
+        await transport.aclose()
+
+
 @pytest.mark.trio
 async def test_realm_notif_on_new_workspace_sync(
     running_backend, alice_backend_conn, alice2_user_fs
@@ -0,0 +1,132 @@
+# Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
+
+import attr
+import pytest
+import trio
+from structlog import get_logger
+
+from parsec.api.version import ApiVersion
+from parsec.core.backend_connection import BackendNotAvailable
+from parsec.core.backend_connection.transport import TransportPool
+
+
+@attr.s
+class Handshake:
+    backend_api_version = attr.ib()
+
+
+@attr.s
+class FakeTransport:
+    handshake = attr.ib()
+    alive = attr.ib(default=True)
+    closed = attr.ib(default=False)
+    logger = attr.ib(factory=get_logger)
+
+    async def check_alive(self, timeout):
+        return self.alive
+
+    async def aclose(self):
+        self.closed = True
+
+
+def fake_connect_factory(backend_api_version):
+    connected = []
+    online = True
+
+    async def _connect():
+        if not online:
+            raise BackendNotAvailable()
+        transport = FakeTransport(Handshake(backend_api_version))
+        connected.append(transport)
+        return transport
+
+    def _set_online(value):
+        nonlocal online
+        online = value
+
+    _connect.connected = connected
+    _connect.set_online = _set_online
+    return _connect
+
+
+@pytest.mark.trio
+async def test_pool_prewarm_and_idle_eviction(autojump_clock):
+    # Old API version so no multiplexing
+    connect = fake_connect_factory(ApiVersion(1, 2))
+    pool = TransportPool(connect, max_pool=4, multiplexing=True, min_pool=2, idle_timeout=60)
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(pool.run_maintenance)
+        await trio.sleep(1)
+        # Transports are ready before any request
+        assert len(connect.connected) == 2
+
+        # Burst of requests uses the pre-connected transports first
+        async with pool.acquire() as t1:
+            async with pool.acquire() as t2:
+                async with pool.acquire() as t3:
+                    pass
+        assert t1 is connect.connected[0]
+        assert t2 is connect.connected[1]
+        assert t3 is connect.connected[2]
+
+        # Extra transport is closed once idle for too long
+        await trio.sleep(121)
+        assert [t.closed for t in connect.connected] == [False, False, True]
+
+        nursery.cancel_scope.cancel()
+
+
+@pytest.mark.trio
+async def test_pool_prewarm_within_max_pool(autojump_clock):
+    connect = fake_connect_factory(ApiVersion(1, 2))
+    pool = TransportPool(connect, max_pool=2, multiplexing=True, min_pool=2, idle_timeout=60)
+
+    async with trio.open_service_nursery() as nursery:
+        async with pool.acquire():
+            async with pool.acquire():
+                # All the slots are used, pre-connecting would exceed max_pool
+                nursery.start_soon(pool.run_maintenance)
+                await trio.sleep(1)
+                assert len(connect.connected) == 2
+
+        async with pool.acquire():
+            # Only one slot used but the other transport is idle in the pool
+            await trio.sleep(31)
+            assert len(connect.connected) == 2
+
+        nursery.cancel_scope.cancel()
+
+
+@pytest.mark.trio
+async def test_pool_health_check(autojump_clock):
+    connect = fake_connect_factory(ApiVersion(1, 2))
+    pool = TransportPool(
+        connect, max_pool=4, multiplexing=True, min_pool=1, health_check_interval=30
+    )
+
+    async with trio.open_service_nursery() as nursery:
+        nursery.start_soon(pool.run_maintenance)
+        await trio.sleep(1)
+        assert len(connect.connected) == 1
+
+        # Dead transport is replaced before being used by a request
+        connect.connected[0].alive = False
+        await trio.sleep(31)
+        assert connect.connected[0].closed
+        assert len(connect.connected) == 2
+        async with pool.acquire() as transport:
+            assert transport is connect.connected[1]
+
+        # Backend is not available, next maintenance will try again
+        # (transport has just been used so it is not checked right away)
+        connect.connected[1].alive = False
+        connect.set_online(False)
+        await trio.sleep(60)
+        assert connect.connected[1].closed
+        assert len(connect.connected) == 2
+        connect.set_online(True)
+        await trio.sleep(30)
+        assert len(connect.connected) == 3
+
+        nursery.cancel_scope.cancel()
@@ -6,7 +6,7 @@ from unittest.mock import ANY
 
 from parsec.core.types import WorkspaceEntry, WorkspaceRole
 from parsec.core.backend_connection import BackendNotAvailable
-from parsec.core.fs.exceptions import FSBackendOfflineError
+from parsec.core.fs.exceptions import FSError, FSBackendOfflineError
 
 from tests.common import freeze_time, create_shared_workspace
 
@@ -613,3 +613,47 @@ async def test_sync_data_before_workspace(running_backend, alice_user_fs):
 
 
 # TODO: test data/manifest updated between failed and new syncs
+
+
+@pytest.mark.trio
+async def test_sync_big_blocks(running_backend, alice_user_fs, alice2_user_fs):
+    # 4MB blocks are too big for a single message, hence transferred in chunks
+    blocksize = 4 * 1024 * 1024
+    wid = await alice_user_fs.workspace_create("w", blocksize=blocksize)
+    workspace = alice_user_fs.get_workspace(wid)
+    assert workspace.get_workspace_entry().blocksize == blocksize
+
+    data = bytes(range(256)) * (5 * 1024 * 1024 // 256)
+    await workspace.touch("/foo.txt")
+    await workspace.write_bytes("/foo.txt", data)
+    await workspace.sync()
+    await alice_user_fs.sync()
+
+    await alice2_user_fs.sync()
+    workspace2 = alice2_user_fs.get_workspace(wid)
+    assert workspace2.get_workspace_entry().blocksize == blocksize
+    await workspace2.sync()
+    assert await workspace2.read_bytes("/foo.txt") == data
+
+    manifest = await workspace2.remote_loader.load_manifest(
+        (await workspace2.path_info("/foo.txt"))["id"]
+    )
+    assert manifest.blocksize == blocksize
+    assert [block.size for block in manifest.blocks] == [blocksize, len(data) - blocksize]
+
+
+@pytest.mark.trio
+async def test_sync_big_blocks_upload_not_progressing(monkeypatch, running_backend, alice_user_fs):
+    async def _create_chunk(*args, **kwargs):
+        # Backend keeps losing the chunks sent so far
+        return 0
+
+    monkeypatch.setattr(running_backend.backend.block, "create_chunk", _create_chunk)
+
+    wid = await alice_user_fs.workspace_create("w", blocksize=4 * 1024 * 1024)
+    workspace = alice_user_fs.get_workspace(wid)
+    await workspace.touch("/foo.txt")
+    await workspace.write_bytes("/foo.txt", b"x" * 4 * 1024 * 1024)
+    with pytest.raises(FSError) as exc:
+        await workspace.sync()
+    assert str(exc.value) == "Cannot upload block: chunked upload doesn't progress"
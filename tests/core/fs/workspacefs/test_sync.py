@@ -3,6 +3,9 @@
 from functools import partial
 import pytest
 
+from parsec.crypto import VerifyKey
+from parsec.serde import ZipMsgpackSerializer
+from parsec.api.data import Manifest, FolderManifest, FolderManifestDelta
 from parsec.core.types import FsPath
 
 from tests.common import create_shared_workspace
@@ -93,3 +96,114 @@ async def test_sync_by_id_couple(alice_workspace, bob_workspace):
     expected = [FsPath("/a"), FsPath("/b")]
     assert await bob_workspace.listdir("/") == expected
     assert await alice_workspace.listdir("/") == expected
+
+
+@pytest.mark.trio
+async def test_sync_folder_manifest_delta(
+    monkeypatch, running_backend, alice, alice_workspace, bob_workspace
+):
+    monkeypatch.setattr("parsec.core.fs.remote_loader.FOLDER_MANIFEST_DELTA_THRESHOLD", 4)
+    monkeypatch.setattr("parsec.core.fs.remote_loader.FOLDER_MANIFEST_SNAPSHOT_INTERVAL", 4)
+    await running_backend.backend.organization.set_compact_manifests(alice.organization_id, True)
+    # Organization config is only fetched once per connection
+    for workspace in (alice_workspace, bob_workspace):
+        workspace.remote_loader.backend_cmds.reset_organization_config()
+
+    await alice_workspace.mkdir("/a")
+    for i in range(6):
+        await alice_workspace.touch(f"/a/{i}")
+    await alice_workspace.sync()
+    a_id = await alice_workspace.path_id("/a")
+    for i in range(5):
+        await alice_workspace.rename(f"/a/{i}", f"/a/renamed{i}")
+        await alice_workspace.sync()
+
+    # Only the changes are uploaded, except for the periodic full snapshot
+    # (version 1 is the empty placeholder, version 2 adds the children)
+    workspace_key = alice_workspace.get_workspace_entry().key
+    for version, expected_type in [
+        (2, FolderManifest),
+        (3, FolderManifestDelta),
+        (4, FolderManifestDelta),
+        (5, FolderManifest),
+        (6, FolderManifestDelta),
+        (7, FolderManifestDelta),
+    ]:
+        _, blob, _, _ = await running_backend.backend.vlob.read(
+            alice.organization_id, alice.device_id, 1, a_id, version=version
+        )
+        manifest = Manifest.unsecure_load(workspace_key.decrypt(blob))
+        assert isinstance(manifest, expected_type)
+        if expected_type is FolderManifestDelta:
+            renamed = version - 3
+            assert manifest.children_updates.keys() == {f"{renamed}", f"renamed{renamed}"}
+
+    # Bob has no local base and must rebuild the manifest from the deltas
+    await bob_workspace.sync()
+    bob_children = {str(path) for path in await bob_workspace.listdir("/a")}
+    alice_children = {str(path) for path in await alice_workspace.listdir("/a")}
+    assert bob_children == alice_children
+    bob_manifest = await bob_workspace.remote_loader.load_manifest(a_id, version=4)
+    assert bob_manifest.version == 4
+    assert set(bob_manifest.children) == {"renamed0", "renamed1", "2", "3", "4", "5"}
+
+    # Once disabled in the organization config, manifests are uploaded in full
+    await running_backend.backend.organization.set_compact_manifests(alice.organization_id, False)
+    alice_workspace.remote_loader.backend_cmds.reset_organization_config()
+    await alice_workspace.rename("/a/5", "/a/renamed5")
+    await alice_workspace.sync()
+    _, blob, _, _ = await running_backend.backend.vlob.read(
+        alice.organization_id, alice.device_id, 1, a_id, version=8
+    )
+    raw = VerifyKey.unsecure_unwrap(workspace_key.decrypt(blob))
+    manifest = ZipMsgpackSerializer(FolderManifest.SCHEMA_CLS).loads(raw)
+    assert isinstance(manifest, FolderManifest)
+    assert "renamed5" in manifest.children
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize("backend_kind", ["compact_disabled", "old_backend"])
+async def test_sync_no_compact_manifests_if_not_enabled(
+    monkeypatch, running_backend, alice, alice_workspace, bob_workspace, backend_kind
+):
+    monkeypatch.setattr("parsec.core.fs.remote_loader.FOLDER_MANIFEST_DELTA_THRESHOLD", 4)
+
+    if backend_kind == "old_backend":
+
+        async def _organization_config(self):
+            return {"status": "unknown_command", "reason": "Unknown command"}
+
+        monkeypatch.setattr(
+            "parsec.core.backend_connection.authenticated.BackendAuthenticatedCmds.organization_config",
+            _organization_config,
+        )
+        alice_workspace.remote_loader.backend_cmds.reset_organization_config()
+
+    await alice_workspace.mkdir("/a")
+    for i in range(6):
+        await alice_workspace.touch(f"/a/{i}")
+    await alice_workspace.sync()
+    a_id = await alice_workspace.path_id("/a")
+    await alice_workspace.rename("/a/0", "/a/renamed0")
+    await alice_workspace.sync()
+
+    # Manifest is uploaded in full and without envelope, so older clients
+    # can still read it
+    workspace_key = alice_workspace.get_workspace_entry().key
+    _, blob, _, _ = await running_backend.backend.vlob.read(
+        alice.organization_id, alice.device_id, 1, a_id, version=3
+    )
+    raw = VerifyKey.unsecure_unwrap(workspace_key.decrypt(blob))
+    manifest = ZipMsgpackSerializer(FolderManifest.SCHEMA_CLS).loads(raw)
+    assert isinstance(manifest, FolderManifest)
+    assert "renamed0" in manifest.children
+
+    await bob_workspace.sync()
+    assert {str(path) for path in await bob_workspace.listdir("/a")} == {
+        "/a/renamed0",
+        "/a/1",
+        "/a/2",
+        "/a/3",
+        "/a/4",
+        "/a/5",
+    }
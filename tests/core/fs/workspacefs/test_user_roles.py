@@ -2,6 +2,7 @@
 
 import pytest
 
+from parsec.api.data import RealmRoleCertificateContent
 from parsec.core.types import WorkspaceRole
 from parsec.core.fs import FSBackendOfflineError
 
@@ -41,3 +42,49 @@ async def test_while_offline_on_non_placeholder(running_backend, alice_user_fs):
     with running_backend.offline():
         with pytest.raises(FSBackendOfflineError):
             await workspace.get_user_roles()
+
+
+@pytest.mark.trio
+async def test_role_certificates_incremental_fetch(
+    running_backend, alice_user_fs, alice, bob, monkeypatch
+):
+    wid = await alice_user_fs.workspace_create("w")
+    workspace = alice_user_fs.get_workspace(wid)
+    await alice_user_fs.sync()
+
+    backend_cmds = workspace.remote_loader.backend_cmds
+    vanilla_realm_get_role_certificates = backend_cmds.realm_get_role_certificates
+    requests = []
+
+    async def _realm_get_role_certificates(realm_id, since=None):
+        requests.append(since)
+        return await vanilla_realm_get_role_certificates(realm_id, since)
+
+    monkeypatch.setattr(backend_cmds, "realm_get_role_certificates", _realm_get_role_certificates)
+
+    vanilla_verify_and_load = RealmRoleCertificateContent.verify_and_load.__func__
+    verified = []
+
+    def _verify_and_load(cls, raw, **kwargs):
+        certif = vanilla_verify_and_load(cls, raw, **kwargs)
+        verified.append(certif.user_id)
+        return certif
+
+    monkeypatch.setattr(
+        RealmRoleCertificateContent, "verify_and_load", classmethod(_verify_and_load)
+    )
+
+    roles = await workspace.get_user_roles()
+    assert roles == {alice.user_id: WorkspaceRole.OWNER}
+    assert requests == [None]
+    assert verified == [alice.user_id]
+
+    # Only the new certificate is verified
+    await alice_user_fs.workspace_share(wid, bob.user_id, WorkspaceRole.MANAGER)
+    requests.clear()
+    verified.clear()
+    roles = await workspace.get_user_roles()
+    assert roles == {alice.user_id: WorkspaceRole.OWNER, bob.user_id: WorkspaceRole.MANAGER}
+    assert len(requests) == 1
+    assert requests[0] is not None
+    assert verified == [bob.user_id]
@@ -7,6 +7,8 @@ import subprocess
 from uuid import uuid4
 from pathlib import Path
 
+from parsec.api.protocol import DeviceID
+from parsec.core.types import EntryID
 from parsec.core.ipcinterface import (
     _install_win32_mutex,
     _install_posix_file_lock,
@@ -141,3 +143,35 @@ async def test_ipc_server(tmpdir, monkeypatch):
                 "status": "invalid_format",
                 "reason": "{'cmd': ['Unsupported value: dummy']}",
             }
+
+
+@pytest.mark.trio
+async def test_ipc_server_sync_stats(tmpdir):
+    file1 = Path(tmpdir / "1.lock")
+    sync_stats = [
+        {
+            "device_id": DeviceID("alice@dev1"),
+            "realms": [
+                {
+                    "id": EntryID(),
+                    "local_changes": 1,
+                    "remote_changes": 0,
+                    "oldest_change_age": 0.5,
+                    "syncs": 2,
+                    "syncs_per_second": 0.1,
+                    "sync_failures": 0,
+                    "bytes_uploaded": 42,
+                    "bytes_downloaded": 0,
+                }
+            ],
+        }
+    ]
+
+    async def _cmd_handler(cmd):
+        assert cmd == {"cmd": "sync_stats"}
+        return {"status": "ok", "sync_stats": sync_stats}
+
+    with trio.fail_after(1):
+        async with run_ipc_server(_cmd_handler, socket_file=file1, win32_mutex_name=uuid4().hex):
+            ret = await send_to_ipc_server(file1, "sync_stats")
+            assert ret == {"status": "ok", "sync_stats": sync_stats}
@@ -1,9 +1,18 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import pytest
+from pathlib import Path
 from pendulum import Pendulum
 
-from parsec.core.remote_devices_manager import RemoteDevicesManagerBackendOfflineError
+from parsec.api.data import RevokedUserCertificateContent
+from parsec.core.backend_connection import backend_authenticated_cmds_factory
+from parsec.core.fs.storage import CertificateStorage
+from parsec.core.remote_devices_manager import (
+    DEFAULT_CACHE_VALIDITY,
+    RemoteDevicesManager,
+    RemoteDevicesManagerBackendOfflineError,
+    RemoteDevicesManagerNotFoundError,
+)
 
 from tests.common import freeze_time
 
@@ -103,3 +112,91 @@ async def test_retrieve_user_and_devices(
         with pytest.raises(RemoteDevicesManagerBackendOfflineError):
             with running_backend.offline():
                 await remote_devices_manager.get_user_and_devices(alice.user_id)
+
+
+@pytest.mark.trio
+async def test_persisted_certificates(running_backend, tmpdir, alice, bob):
+    d1 = Pendulum(2000, 1, 1)
+    d2 = d1.add(seconds=60)
+    d3 = d1.add(seconds=DEFAULT_CACHE_VALIDITY + 1)
+
+    async with backend_authenticated_cmds_factory(
+        alice.organization_addr, alice.device_id, alice.signing_key
+    ) as cmds:
+
+        async with CertificateStorage.run(alice, Path(tmpdir)) as storage:
+            rdm = RemoteDevicesManager(cmds, alice.root_verify_key, certificate_storage=storage)
+            with freeze_time(d1):
+                await rdm.get_user(bob.user_id)
+
+        # Simulate a restart, certificates are now retrieved from the local storage
+        async with CertificateStorage.run(alice, Path(tmpdir)) as storage:
+            rdm = RemoteDevicesManager(cmds, alice.root_verify_key, certificate_storage=storage)
+            with running_backend.offline():
+                with freeze_time(d2):
+                    user, revoked_user = await rdm.get_user(bob.user_id)
+                    assert user.user_id == bob.user_id
+                    assert user.public_key == bob.public_key
+                    assert revoked_user is None
+
+                with freeze_time(d3):
+                    # Device certificates are immutable and hence never expire...
+                    device = await rdm.get_device(bob.device_id)
+                    assert device.verify_key == bob.verify_key
+                    # ...unlike the user revocation status
+                    with pytest.raises(RemoteDevicesManagerBackendOfflineError):
+                        await rdm.get_user(bob.user_id)
+
+            revoked_user_certificate = RevokedUserCertificateContent(
+                author=alice.device_id, timestamp=d3, user_id=bob.user_id
+            ).dump_and_sign(alice.signing_key)
+            await running_backend.backend.user.revoke_user(
+                organization_id=alice.organization_id,
+                user_id=bob.user_id,
+                revoked_user_certificate=revoked_user_certificate,
+                revoked_user_certifier=alice.device_id,
+            )
+            with freeze_time(d3):
+                _, revoked_user = await rdm.get_user(bob.user_id)
+                assert revoked_user.user_id == bob.user_id
+
+        # User revocation is final, so it never expires
+        async with CertificateStorage.run(alice, Path(tmpdir)) as storage:
+            rdm = RemoteDevicesManager(cmds, alice.root_verify_key, certificate_storage=storage)
+            with running_backend.offline():
+                with freeze_time(d3.add(seconds=DEFAULT_CACHE_VALIDITY + 1)):
+                    _, revoked_user = await rdm.get_user(bob.user_id)
+                    assert revoked_user.user_id == bob.user_id
+
+
+@pytest.mark.trio
+async def test_retrieve_users_and_devices_batch(
+    running_backend, alice_remote_devices_manager, alice, alice2, bob, adam
+):
+    remote_devices_manager = alice_remote_devices_manager
+    user_get_calls = []
+    vanilla_user_get = remote_devices_manager._backend_cmds.user_get
+
+    async def _user_get(user_id):
+        user_get_calls.append(user_id)
+        return await vanilla_user_get(user_id)
+
+    remote_devices_manager._backend_cmds.user_get = _user_get
+
+    users = await remote_devices_manager.get_users([bob.user_id, adam.user_id])
+    assert users.keys() == {bob.user_id, adam.user_id}
+    assert users[bob.user_id][0].public_key == bob.public_key
+    assert users[bob.user_id][1] is None
+
+    # Users are now in cache
+    with running_backend.offline():
+        devices = await remote_devices_manager.get_devices(
+            [alice.device_id, alice2.device_id, bob.device_id]
+        )
+    assert devices[alice2.device_id].verify_key == alice2.verify_key
+    assert devices[bob.device_id].verify_key == bob.verify_key
+
+    with pytest.raises(RemoteDevicesManagerNotFoundError):
+        await remote_devices_manager.get_users_and_devices([bob.user_id, "dummy"])
+
+    assert not user_get_calls
@@ -1,10 +1,50 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
 import trio
+import math
 import pytest
 from unittest.mock import ANY
 
 from parsec.core.backend_connection import BackendConnStatus
+from parsec.core.sync_monitor import WorkspaceSyncContext, LocalChange, SyncDebounceConfig
+
+
+def test_local_change_adaptive_debounce():
+    debounce = SyncDebounceConfig(
+        min_wait=1, max_wait=60, large_file_size=1000, max_wait_large_file=600
+    )
+
+    # Small file continuously written is synced every `max_wait`
+    change = LocalChange(0, debounce, size=10)
+    assert change.due_time == 1
+    for now in range(1, 100):
+        change.changed(now * 0.5, size=10 + now)
+    assert change.due_time == 50.5
+    change.changed(59.5)
+    assert change.due_time == 60
+
+    # Small file is synced ~1s after the last write, whatever its write rate
+    previous = change
+    change = LocalChange(61, debounce, size=200, previous=previous)
+    assert change.due_time == 62
+
+    # Large file maximum wait grows with its size
+    change = LocalChange(0, debounce, size=5000)
+    assert change.due_time == 1
+    for now in range(1, 2000):
+        change.changed(now * 0.5)
+    assert change.due_time == 300
+
+    # Large hot file waits for a pause longer than its usual write interval
+    change = LocalChange(0, debounce, size=100000)
+    for now in range(1, 10):
+        change.changed(now * 3)
+    assert change.write_interval == pytest.approx(3)
+    assert change.due_time == pytest.approx(27 + 6)
+    # ...and keeps its write rate once synced
+    change = LocalChange(30, debounce, previous=change)
+    assert change.size == 100000
+    assert change.due_time == pytest.approx(36)
 
 
 @pytest.mark.trio
@@ -99,6 +139,48 @@ async def test_autosync_on_modification(
     assert path_info == path_info2
 
 
+@pytest.mark.trio
+async def test_sync_stats(mock_clock, running_backend, alice, alice_core):
+    mock_clock.autojump_threshold = 0
+
+    wid = await alice_core.user_fs.workspace_create("w")
+    workspace = alice_core.user_fs.get_workspace(wid)
+    with trio.fail_after(60):  # autojump, so not *really* 60s
+        await alice_core.wait_idle_monitors()
+
+    def _get_realm_stats(realm_id):
+        return next(s for s in alice_core.get_sync_stats() if s["id"] == realm_id)
+
+    stats = _get_realm_stats(alice.user_manifest_id)
+    assert stats["local_changes"] == 0
+    assert stats["remote_changes"] == 0
+    assert stats["oldest_change_age"] is None
+    assert stats["syncs"] >= 1
+    assert stats["bytes_uploaded"] > 0
+
+    # Freeze the time to observe the backlog
+    mock_clock.autojump_threshold = math.inf
+    await workspace.touch("/foo.txt")
+    mock_clock.jump(0.5)
+    stats = _get_realm_stats(wid)
+    assert stats["local_changes"] == 2  # Workspace and file manifests
+    assert stats["oldest_change_age"] == 0.5
+
+    mock_clock.autojump_threshold = 0
+    with alice_core.event_bus.listen() as spy:
+        with trio.fail_after(60):  # autojump, so not *really* 60s
+            await alice_core.wait_idle_monitors()
+    spy.assert_event_occured("sync.stats_updated", {"stats": ANY})
+
+    new_stats = _get_realm_stats(wid)
+    assert new_stats["local_changes"] == 0
+    assert new_stats["oldest_change_age"] is None
+    assert new_stats["syncs"] == 2
+    assert new_stats["syncs_per_second"] > 0
+    assert new_stats["sync_failures"] == 0
+    assert new_stats["bytes_uploaded"] > stats["bytes_uploaded"]
+
+
 @pytest.mark.trio
 async def test_autosync_on_remote_modifications(
     mock_clock, running_backend, alice, alice_core, alice2_user_fs
@@ -240,3 +322,58 @@ async def test_reconnect_with_remote_changes(
             in_order=False,
             timeout=60,  # autojump, so not *really* 60s
         )
+
+
+@pytest.mark.trio
+async def test_reconcile_with_missed_remote_changes(
+    mock_clock, running_backend, alice_user_fs, alice2_user_fs
+):
+    mock_clock.autojump_threshold = 0
+
+    wid = await alice_user_fs.workspace_create("w")
+    alice_w = alice_user_fs.get_workspace(wid)
+    await alice_w.touch("/foo.txt")
+    await alice_w.write_bytes("/foo.txt", b"v1")
+    await alice_w.sync()
+    await alice_user_fs.sync()
+
+    ctx = WorkspaceSyncContext(alice_user_fs, wid)
+    await ctx.bootstrap()
+
+    # No sync monitor is running, so the vlob updated events are missed
+    await alice2_user_fs.sync()
+    alice2_w = alice2_user_fs.get_workspace(wid)
+    await alice2_w.sync()
+    await alice2_w.write_bytes("/foo.txt", b"v2")
+    await alice2_w.sync()
+
+    # Nothing to do as far as the sync context knows
+    await ctx.tick()
+    assert await alice_w.read_bytes("/foo.txt") == b"v1"
+
+    # Reconciliation detects the outdated file manifest and sync it
+    assert ctx.request_reconcile()
+    await ctx.tick()
+    assert await alice_w.read_bytes("/foo.txt") == b"v2"
+    assert ctx.due_time == math.inf
+
+
+@pytest.mark.trio
+async def test_reconcile_requested_on_checkpoint_ahead_of_backend(running_backend, alice_user_fs):
+    wid = await alice_user_fs.workspace_create("w")
+    alice_w = alice_user_fs.get_workspace(wid)
+    await alice_w.touch("/foo.txt")
+    await alice_w.sync()
+
+    # Local checkpoint cannot be trusted if the backend doesn't know about it
+    await alice_w.local_storage.update_realm_checkpoint(1000, {})
+    ctx = WorkspaceSyncContext(alice_user_fs, wid)
+    with alice_user_fs.event_bus.listen() as spy:
+        await ctx.bootstrap()
+    spy.assert_event_occured("fs.reconcile_requested", kwargs={"workspace_id": wid})
+
+    # Consistent checkpoint doesn't need reconciliation
+    ctx = WorkspaceSyncContext(alice_user_fs, wid)
+    with alice_user_fs.event_bus.listen() as spy:
+        await ctx.bootstrap()
+    assert "fs.reconcile_requested" not in [event.event for event in spy.events]
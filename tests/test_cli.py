@@ -22,6 +22,7 @@ from async_generator import asynccontextmanager
 
 from parsec import __version__ as parsec_version
 from parsec.backend.postgresql import MigrationItem
+from parsec.backend.cli.run import _open_tcp_listeners_with_reuseport
 from parsec.cli import cli
 
 
@@ -35,6 +36,28 @@ def test_version():
     assert f"parsec, version {parsec_version}\n" in result.output
 
 
+def test_backend_workers_need_shared_components():
+    runner = CliRunner()
+    args = "backend run --db=MOCKED --blockstore=MOCKED --administration-token=s3cr3t --workers=2"
+    result = runner.invoke(cli, args.split())
+    assert result.exit_code == 2
+    assert "Mocked database and blockstore cannot be shared between multiple workers" in (
+        result.output
+    )
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SO_REUSEPORT not available on Windows")
+@pytest.mark.trio
+async def test_backend_workers_share_listening_port(unused_tcp_port):
+    listeners1 = await _open_tcp_listeners_with_reuseport(unused_tcp_port, "127.0.0.1")
+    listeners2 = await _open_tcp_listeners_with_reuseport(unused_tcp_port, "127.0.0.1")
+    try:
+        assert listeners1[0].socket.getsockname() == listeners2[0].socket.getsockname()
+    finally:
+        for listener in (*listeners1, *listeners2):
+            await listener.aclose()
+
+
 def test_share_workspace(tmpdir, alice, bob):
     # As usual Windows path require a big hack...
     config_dir = tmpdir.strpath.replace("\\", "\\\\")
@@ -126,3 +126,40 @@ def test_connection_context(event_bus):
     events_received.clear()
     event_bus_ctx.send("foo")
     assert events_received == [("global", "foo")]
+
+
+def test_routed_connection(event_bus):
+    events_received = []
+
+    def _listen(name):
+        def _cb(event, org, user, **kwargs):
+            events_received.append((name, org, user))
+
+        return _cb
+
+    event_bus.set_event_route("foo", "org", "user")
+    global_cb = _listen("global")
+    alice_cb = _listen("alice")
+    bob_cb = _listen("bob")
+    event_bus.connect("foo", global_cb)
+    event_bus.connect("foo", alice_cb, route=("org1", "alice"))
+
+    with event_bus.connection_context() as event_bus_ctx:
+        event_bus_ctx.connect("foo", bob_cb, route=("org1", "bob"))
+        assert event_bus.stats() == {"foo": 3}
+
+        event_bus.send("foo", org="org1", user="alice")
+        event_bus.send("foo", org="org2", user="alice")
+        event_bus.send("foo", org="org1", user="bob")
+        assert events_received == [
+            ("global", "org1", "alice"),
+            ("alice", "org1", "alice"),
+            ("global", "org2", "alice"),
+            ("global", "org1", "bob"),
+            ("bob", "org1", "bob"),
+        ]
+
+    assert event_bus.stats() == {"foo": 2}
+    event_bus.disconnect("foo", alice_cb, route=("org1", "alice"))
+    event_bus.disconnect("foo", global_cb)
+    assert event_bus.stats() == {}
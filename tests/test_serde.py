@@ -1,5 +1,7 @@
 # Parsec Cloud (https://parsec.cloud) Copyright (c) AGPLv3 2019 Scille SAS
 
+import os
+import zlib
 import pytest
 import pendulum
 import uuid
@@ -11,6 +13,8 @@ from parsec.serde import (
     BaseSchema,
     OneOfSchema,
     MsgpackSerializer,
+    ZipMsgpackSerializer,
+    EnvelopeZipMsgpackSerializer,
     fields,
     SerdeError,
 )
@@ -50,6 +54,64 @@ def test_serializer_loads_bad_data():
             serializer.loads(raw)
 
 
+@pytest.mark.parametrize(
+    "size,expected_codec",
+    [
+        (10, EnvelopeZipMsgpackSerializer.CODEC_RAW),
+        (1000, EnvelopeZipMsgpackSerializer.CODEC_ZLIB_ZDICT),
+        (100 * 1024, EnvelopeZipMsgpackSerializer.CODEC_ZLIB_FAST),
+    ],
+)
+@pytest.mark.parametrize("zdict", [b"", packb("data")])
+def test_envelope_zip_serializer(size, expected_codec, zdict):
+    class MySchema(BaseSchema):
+        data = fields.Bytes(required=True)
+
+    class MySerializer(EnvelopeZipMsgpackSerializer):
+        ZDICT = zdict
+
+    serializer = MySerializer(MySchema)
+    data = {"data": b"a" * size}
+    raw = serializer.dumps(data)
+    assert raw[0] == expected_codec
+    assert serializer.loads(raw) == data
+
+    # Incompressible data is not compressed
+    data = {"data": os.urandom(size)}
+    raw = serializer.dumps(data)
+    assert raw[0] == EnvelopeZipMsgpackSerializer.CODEC_RAW
+    assert raw[1:] == packb(data)
+    assert serializer.loads(raw) == data
+
+    # Data without envelope is readable by `ZipMsgpackSerializer`
+    legacy_raw = serializer.dumps(data, envelope=False)
+    assert ZipMsgpackSerializer(MySchema).loads(legacy_raw) == data
+
+    # Legacy data without envelope can still be loaded
+    legacy_raw = ZipMsgpackSerializer(MySchema).dumps(data)
+    assert serializer.loads(legacy_raw) == data
+
+
+def test_envelope_zip_serializer_loads_bad_data():
+    class MySchema(BaseSchema):
+        data = fields.String(required=True)
+
+    serializer = EnvelopeZipMsgpackSerializer(MySchema)
+    good = zlib.compress(packb({"data": "foo"}))
+    for raw in (
+        b"",
+        b"dummy",
+        bytes((EnvelopeZipMsgpackSerializer.CODEC_RAW,)) + b"dummy",
+        bytes((EnvelopeZipMsgpackSerializer.CODEC_ZLIB_FAST,)) + b"dummy",
+        bytes((EnvelopeZipMsgpackSerializer.CODEC_ZLIB_ZDICT,)) + b"dummy",
+        # Truncated and trailing data
+        bytes((EnvelopeZipMsgpackSerializer.CODEC_ZLIB_ZDICT,)) + good[:-2],
+        bytes((EnvelopeZipMsgpackSerializer.CODEC_ZLIB_ZDICT,)) + good + b"dummy",
+    ):
+        with pytest.raises(SerdeError):
+            serializer.loads(raw)
+
+
 def test_oneof_schema():
     class BirdSchema(BaseSchema):
         flying = fields.Boolean()